@@ -1,98 +1,111 @@
+from fractions import Fraction
+
+from projects.fixed_point import (
+    AREA_SCALE, LENGTH_SCALE, QUANTITY_SCALE,
+    rate, apply_rate, from_fixed, length_to_micrometres,
+)
+
 
 def convert_to_meters(value, unit):
     """Convert a measurement from the given unit to meters"""
     if value is None:
         return None
-        
-    if unit == 'meters':
-        return value
-    elif unit == 'centimeters':
-        return value / 100
-    elif unit == 'feet':
-        return value * 0.3048
-    elif unit == 'inches':
-        return value * 0.0254
-    return value  # Default case
-
-def calculate_wastage_factor(area):
-    """Calculate wastage factor based on area size
-    
-    The larger the area, the smaller the wastage factor
+    return from_fixed(length_to_micrometres(value, unit), LENGTH_SCALE, 6)
+
+# Wastage tiers: (area in square millimetres it applies below, percent);
+# the larger the area, the smaller the wastage
+WASTAGE_TIERS = [
+    (5 * AREA_SCALE, 15),    # Very small area (less than 5 sq meters)
+    (20 * AREA_SCALE, 12),   # Small area
+    (50 * AREA_SCALE, 10),   # Medium area
+    (100 * AREA_SCALE, 8),   # Large area
+    (None, 5),               # Very large area
+]
+
+def calculate_wastage_percentage(area):
+    """Calculate wastage percentage based on area size (area in square millimetres)
+
+    The larger the area, the smaller the wastage
     """
-    if area < 5:  # Very small area (less than 5 sq meters)
-        return 0.15  # 15% wastage
-    elif area < 20:  # Small area
-        return 0.12  # 12% wastage
-    elif area < 50:  # Medium area
-        return 0.10  # 10% wastage
-    elif area < 100:  # Large area
-        return 0.08  # 8% wastage
-    else:  # Very large area
-        return 0.05  # 5% wastage
-
-def calculate_materials(project_type, area, wastage_factor=0.1, floor_thickness=0.05):
-    """Calculate required materials based on project type and area"""
-    materials = {}
-    
-    # Define coverage areas for different materials
-    coverage_areas = {
-        'tiles': {
-            'cement': 6,
-            'sand': 3.75,
-            'chemical': 13,
-            'tile cement': 6,
-            'grout': 19,
-            'spacers': 80,
-            'strip': 30,
-            'tile adhesive': 10,
-        },
-        'pavement': {
-            'cement': 5,
-            'sand': 3,
-            'gravel': 2.5,
-            'paving stones': 10,
-        },
-        'masonry': {
-            'cement': 7,
-            'sand': 3.5,
-            'blocks': 10,
-            'rebar': 15,
-            'binding wire': 50,
-            'formwork': 8,
-        },
-        'carpentry': {
-            'timber': 2.5,
-            'nails': 30,
-            'wood glue': 20,
-            'screws': 40,
-            'sandpaper': 15,
-            'wood finish': 10,
-            'wood filler': 25,
-        }
+    for limit, percent in WASTAGE_TIERS:
+        if limit is None or area < limit:
+            return percent
+    return 0
+
+# Standard screed thickness the coverage areas below assume (5cm), in micrometres
+STANDARD_FLOOR_THICKNESS = 50_000
+# Materials scaled with the floor thickness, and the project types it applies to
+THICKNESS_PROJECT_TYPES = ['tiles', 'pavement']
+THICKNESS_MATERIALS = ['cement', 'sand']
+
+# m² covered by one unit of each material, per project type
+COVERAGE_AREAS = {
+    'tiles': {
+        'cement': 6,
+        'sand': '3.75',
+        'chemical': 13,
+        'tile cement': 6,
+        'grout': 19,
+        'spacers': 80,
+        'strip': 30,
+        'tile adhesive': 10,
+    },
+    'pavement': {
+        'cement': 5,
+        'sand': 3,
+        'gravel': '2.5',
+        'paving stones': 10,
+    },
+    'masonry': {
+        'cement': 7,
+        'sand': '3.5',
+        'blocks': 10,
+        'rebar': 15,
+        'binding wire': 50,
+        'formwork': 8,
+    },
+    'carpentry': {
+        'timber': '2.5',
+        'nails': 30,
+        'wood glue': 20,
+        'screws': 40,
+        'sandpaper': 15,
+        'wood finish': 10,
+        'wood filler': 25,
     }
-    
+}
+
+def calculate_materials(project_type, area, wastage_percentage=10, floor_thickness=STANDARD_FLOOR_THICKNESS):
+    """Calculate required materials based on project type and area
+
+    area is in square millimetres and floor_thickness in micrometres (see
+    projects.fixed_point). Quantities are returned as Decimals rounded to 2 places.
+    """
+    materials = {}
+
     # Get coverage areas for the selected project type
-    project_materials = coverage_areas.get(project_type, {})
-    
+    project_materials = COVERAGE_AREAS.get(project_type, {})
+    wastage_multiplier = 1 + rate(wastage_percentage, 100)
+
     # Calculate material quantities with wastage factor
     for material, coverage in project_materials.items():
-        quantity = (area / coverage) * (1 + wastage_factor)
-        
+        rates = [rate(1, coverage), wastage_multiplier]
+
         # Adjust cement and sand quantity based on floor thickness for tiles and pavement
-        if project_type in ['tiles', 'pavement'] and material in ['cement', 'sand'] and floor_thickness:
-            thickness_factor = floor_thickness / 0.05  # 0.05m (5cm) is the standard thickness
-            quantity *= thickness_factor
-        
+        if project_type in THICKNESS_PROJECT_TYPES and material in THICKNESS_MATERIALS and floor_thickness:
+            rates.append(Fraction(floor_thickness, STANDARD_FLOOR_THICKNESS))
+
         # Special calculation for masonry based on wall height
         if project_type == 'masonry' and material in ['blocks', 'mortar']:
             # This is a placeholder for masonry-specific calculations
             pass
-            
+
         # Special calculation for carpentry based on wood type
         if project_type == 'carpentry' and material == 'timber':
             # This is a placeholder for carpentry-specific calculations
             pass
-            
-        materials[material] = round(quantity, 2)
-    
+
+        # AREA_SCALE == QUANTITY_SCALE, so the area times the rates is a quantity
+        materials[material] = from_fixed(apply_rate(area, *rates), QUANTITY_SCALE, 2)
+
     return materials
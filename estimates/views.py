@@ -6,7 +6,11 @@ from rest_framework.permissions import IsAuthenticated
 from django.db.models import F, Sum
 from .models import Material, QuickEstimate, EstimateMaterial
 from .serializers import MaterialSerializer, QuickEstimateSerializer, QuickEstimateCreateSerializer, EstimateMaterialSerializer
-from .utils import calculate_materials, calculate_wastage_factor, convert_to_meters
+from .utils import calculate_materials, calculate_wastage_percentage
+from projects.fixed_point import (
+    rate, div_round, to_fixed, to_pesewas, from_pesewas, from_area,
+    length_to_micrometres, area_from_lengths,
+)
 
 class MaterialViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Material.objects.all()
@@ -48,24 +52,49 @@ class QuickEstimateViewSet(viewsets.ModelViewSet):
         auto_wastage = serializer.validated_data.get('auto_wastage', True)
         manual_wastage_factor = serializer.validated_data.get('manual_wastage_factor')
         
-        # Convert dimensions to meters for calculation
-        length_m = convert_to_meters(length, measurement_unit)
-        breadth_m = convert_to_meters(breadth, measurement_unit)
-        height_m = convert_to_meters(height, measurement_unit) if height else None
-        floor_thickness_m = convert_to_meters(floor_thickness, measurement_unit)
+        # Convert dimensions to micrometres for calculation (see projects.fixed_point)
+        length_um = length_to_micrometres(length, measurement_unit)
+        breadth_um = length_to_micrometres(breadth, measurement_unit)
+        height_um = length_to_micrometres(height, measurement_unit) if height else 0
+        floor_thickness_um = length_to_micrometres(floor_thickness, measurement_unit)
         
-        # Calculate total area (in square meters)
-        if project_type == 'masonry' and height_m:
-            total_area = length_m * height_m  # Wall area
+        # Calculate total area (in square millimetres)
+        if project_type == 'masonry' and height_um:
+            total_area = area_from_lengths(length_um, height_um)  # Wall area
         else:
-            total_area = length_m * breadth_m  # Floor/surface area
+            total_area = area_from_lengths(length_um, breadth_um)  # Floor/surface area
         
-        # Calculate wastage factor
+        # Calculate wastage percentage
         if auto_wastage:
-            wastage_factor = calculate_wastage_factor(total_area)
+            wastage_percentage = calculate_wastage_percentage(total_area)
         else:
-            wastage_factor = manual_wastage_factor if manual_wastage_factor else 0.1  # Default 10%
-            
+            # manual_wastage_factor is a fraction (0.10 == 10%)
+            wastage_percentage = rate(manual_wastage_factor) * 100 if manual_wastage_factor else 10  # Default 10%
+
+        # Calculate material requirements
+        material_requirements = calculate_materials(
+            project_type=project_type,
+            area=total_area,
+            wastage_percentage=wastage_percentage,
+            floor_thickness=floor_thickness_um
+        )
+
+        # Price the materials in pesewas
+        catalogue = {
+            material.name: material
+            for material in Material.objects.filter(name__in=material_requirements.keys(), project_type=project_type)
+        }
+        priced_materials = []
+        total_cost = 0
+        for material_name, quantity in material_requirements.items():
+            material = catalogue.get(material_name)
+            if material is None:
+                # Skip if material not found
+                continue
+            material_cost = div_round(to_fixed(quantity, 100) * to_pesewas(material.unit_price), 100)
+            total_cost += material_cost
+            priced_materials.append((material, quantity, material_cost))
+
         # Create the estimate
         estimate = QuickEstimate.objects.create(
             user=request.user,
@@ -79,42 +108,19 @@ class QuickEstimateViewSet(viewsets.ModelViewSet):
             floor_thickness=floor_thickness,
             auto_wastage=auto_wastage,
             manual_wastage_factor=manual_wastage_factor,
-            total_area=total_area
-        )
-        
-        # Calculate material requirements
-        material_requirements = calculate_materials(
-            project_type=project_type,
-            area=total_area,
-            wastage_factor=wastage_factor,
-            floor_thickness=floor_thickness_m
+            total_area=from_area(total_area, 2),
+            estimated_cost=from_pesewas(total_cost)
         )
         
         # Add materials to the estimate
-        total_cost = 0
-        for material_name, quantity in material_requirements.items():
-            try:
-                material = Material.objects.get(name=material_name, project_type=project_type)
-                
-                # Calculate cost
-                material_cost = quantity * material.unit_price
-                total_cost += material_cost
-                
-                # Create estimate material entry
-                EstimateMaterial.objects.create(
-                    estimate=estimate,
-                    material=material,
-                    quantity=quantity,
-                    unit_price=material.unit_price,
-                    total_price=material_cost
-                )
-            except Material.DoesNotExist:
-                # Skip if material not found
-                continue
-        
-        # Update total cost
-        estimate.estimated_cost = total_cost
-        estimate.save()
+        for material, quantity, material_cost in priced_materials:
+            EstimateMaterial.objects.create(
+                estimate=estimate,
+                material=material,
+                quantity=quantity,
+                unit_price=material.unit_price,
+                total_price=from_pesewas(material_cost)
+            )
         
         # Return the complete estimate
         return Response(
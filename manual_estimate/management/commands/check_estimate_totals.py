@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from manual_estimate.models import Estimate, MaterialItem, RoomArea
+from manual_estimate.services import DERIVED_FIELDS, estimate_derived_fields
+
+User = get_user_model()
+
+
+def _check_chunk(estimate_ids, dry_run):
+    """
+    Works out the derived fields of a chunk of estimates from their rooms and
+    materials and repairs the ones whose stored values differ, with the
+    estimate rows locked so an API save cannot interleave. Returns
+    {estimate_id: {field: (stored, expected)}} for the estimates that drifted.
+    """
+    drift = {}
+    with transaction.atomic():
+        estimates = list(
+            Estimate.objects.select_for_update().filter(pk__in=estimate_ids)
+            .only('pk', 'profit_type', 'profit_value', 'transport_cost', *DERIVED_FIELDS)
+        )
+        room_areas = defaultdict(list)
+        for estimate_id, floor_area, wall_area in RoomArea.objects.filter(estimate_id__in=estimate_ids).values_list('estimate_id', 'floor_area', 'wall_area'):
+            room_areas[estimate_id].append((floor_area, wall_area))
+        material_prices = defaultdict(list)
+        for estimate_id, unit_price, quantity in MaterialItem.objects.filter(estimate_id__in=estimate_ids).values_list('estimate_id', 'unit_price', 'quantity'):
+            material_prices[estimate_id].append((unit_price, quantity))
+
+        repaired = []
+        for estimate in estimates:
+            expected = estimate_derived_fields(estimate, room_areas[estimate.pk], material_prices[estimate.pk])
+            diff = {
+                field: (getattr(estimate, field), value)
+                for field, value in expected.items() if getattr(estimate, field) != value
+            }
+            if diff:
+                drift[estimate.pk] = diff
+                for field, (stored, value) in diff.items():
+                    setattr(estimate, field, value)
+                repaired.append(estimate)
+        if repaired and not dry_run:
+            Estimate.objects.bulk_update(repaired, list(DERIVED_FIELDS))
+    return drift
+
+
+class Command(BaseCommand):
+    help = (
+        'Check the stored totals of manual estimates (area, labour, material subtotal and grand total) '
+        'against their rooms and materials, and repair the ones that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only check estimates owned by this user (id or phone number).')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without repairing it.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of estimates checked in one transaction.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = max(1, options['chunk_size'])
+
+        queryset = Estimate.objects.all()
+        if options['user']:
+            user_value = options['user']
+            user_lookup = {'id': user_value} if user_value.isdigit() and len(user_value) < 9 else {'phone_number': user_value}
+            try:
+                user = User.objects.get(**user_lookup)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{user_value}' not found.")
+            queryset = queryset.filter(user=user)
+
+        estimate_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        drifted = 0
+        for start in range(0, len(estimate_ids), chunk_size):
+            drift = _check_chunk(estimate_ids[start:start + chunk_size], dry_run)
+            drifted += len(drift)
+            for estimate_id, diff in sorted(drift.items()):
+                self.stdout.write(f"Estimate {estimate_id}:")
+                for field, (stored, expected) in diff.items():
+                    self.stdout.write(f"    {field}: {stored} -> {expected}")
+
+        if drifted and dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"{drifted} of {len(estimate_ids)} estimate(s) have drifted totals (dry run, nothing saved)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Checked {len(estimate_ids)} estimate(s); {drifted} repaired."
+            ))
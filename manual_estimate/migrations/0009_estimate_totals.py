@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manual_estimate', '0008_estimate_measurement_unit_estimate_project_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estimate',
+            name='grand_total',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='Materials, labour and transport'),
+        ),
+        migrations.AddField(
+            model_name='estimate',
+            name='subtotal_cost',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='Materials and labour'),
+        ),
+        migrations.AddField(
+            model_name='estimate',
+            name='total_material_cost',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='Total material cost'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from collections import defaultdict
+from decimal import Decimal
+from fractions import Fraction
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+# Square metres per square yard, as manual_estimate.services had it when this migration was written
+SQ_YARD_RATE = Fraction(Decimal('0.836127'))
+
+DERIVED_FIELDS = (
+    'total_area_sq_m', 'labour_per_sq_meter', 'total_labour_cost',
+    'total_material_cost', 'subtotal_cost', 'grand_total',
+)
+
+
+def _exact(value):
+    return Fraction(value or 0)
+
+
+def _cents(value):
+    """An exact amount rounded half to even to 2 decimal places, as the services' fixed point does."""
+    return Decimal(round(value * 100)).scaleb(-2)
+
+
+def derived_fields(estimate, room_areas, material_prices):
+    """
+    The derived Estimate fields, worked out exactly as
+    manual_estimate.services.estimate_derived_fields did at the time. Kept
+    here so later changes to the services do not change this migration.
+    """
+    total_area = sum((_exact(floor_area) + _exact(wall_area) for floor_area, wall_area in room_areas), Fraction(0))
+    profit_value = _exact(estimate.profit_value)
+    labour, labour_per_sq_meter = Fraction(0), Fraction(0)
+    if estimate.profit_type == 'fixed_amount':
+        if total_area > 0:
+            labour, labour_per_sq_meter = profit_value, profit_value / total_area
+    elif estimate.profit_type == 'per_sq_meter':
+        labour, labour_per_sq_meter = profit_value * total_area, profit_value
+    elif estimate.profit_type == 'per_sq_yard':
+        labour, labour_per_sq_meter = profit_value * total_area / SQ_YARD_RATE, profit_value / SQ_YARD_RATE
+    total_labour_cost = _cents(labour)
+    # Each material line is rounded to the pesewa before they are added up
+    total_material_cost = sum((_cents(_exact(unit_price) * _exact(quantity)) for unit_price, quantity in material_prices), Decimal('0.00'))
+    subtotal_cost = total_material_cost + total_labour_cost
+    return {
+        'total_area_sq_m': _cents(total_area),
+        'labour_per_sq_meter': _cents(labour_per_sq_meter),
+        'total_labour_cost': total_labour_cost,
+        'total_material_cost': total_material_cost,
+        'subtotal_cost': subtotal_cost,
+        'grand_total': subtotal_cost + _cents(_exact(estimate.transport_cost)),
+    }
+
+
+def backfill_estimate_totals(apps, schema_editor):
+    """Works out the totals added in 0009 (and the other derived fields) for the existing estimates."""
+    Estimate = apps.get_model('manual_estimate', 'Estimate')
+    MaterialItem = apps.get_model('manual_estimate', 'MaterialItem')
+    RoomArea = apps.get_model('manual_estimate', 'RoomArea')
+
+    estimate_ids = list(Estimate.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(estimate_ids), BATCH_SIZE):
+        batch_ids = estimate_ids[start:start + BATCH_SIZE]
+        room_areas = defaultdict(list)
+        for estimate_id, floor_area, wall_area in RoomArea.objects.filter(estimate_id__in=batch_ids).values_list('estimate_id', 'floor_area', 'wall_area'):
+            room_areas[estimate_id].append((floor_area, wall_area))
+        material_prices = defaultdict(list)
+        for estimate_id, unit_price, quantity in MaterialItem.objects.filter(estimate_id__in=batch_ids).values_list('estimate_id', 'unit_price', 'quantity'):
+            material_prices[estimate_id].append((unit_price, quantity))
+
+        estimates = list(Estimate.objects.filter(pk__in=batch_ids))
+        for estimate in estimates:
+            for field, value in derived_fields(estimate, room_areas[estimate.pk], material_prices[estimate.pk]).items():
+                setattr(estimate, field, value)
+        Estimate.objects.bulk_update(estimates, list(DERIVED_FIELDS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manual_estimate', '0009_estimate_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_estimate_totals, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,13 @@
-import decimal
 from django.db import models
 from django.conf import settings
 
+from projects.fixed_point import div_round, to_fixed, to_pesewas, from_pesewas
+
+
+def material_total_pesewas(unit_price, quantity):
+    """unit_price * quantity in pesewas. Both have 2 decimal places, so the product is exact before rounding."""
+    return div_round(to_pesewas(unit_price) * to_fixed(quantity, 100), 100)
+
 
 class Customer(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='customers')
@@ -59,6 +65,21 @@ class Estimate(models.Model):
         max_digits=10, decimal_places=2, default=0.00,
         verbose_name=("Total profit per square meter")
     )
+    # Totals of the materials and the estimate, kept up to date by the save
+    # services (services.calculate_and_update_estimate_fields); the
+    # check_estimate_totals command repairs any that drift
+    total_material_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0.00,
+        verbose_name=("Total material cost")
+    )
+    subtotal_cost = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0.00,
+        verbose_name=("Materials and labour")
+    )
+    grand_total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0.00,
+        verbose_name=("Materials, labour and transport")
+    )
 
     def __str__(self):
         customer_name = getattr(self.customer, 'name', '-') if self.customer else '-'
@@ -77,9 +98,13 @@ class MaterialItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @property
+    def total_price_pesewas(self):
+        return material_total_pesewas(self.unit_price, self.quantity)
+
     @property
     def total_price(self):
-        return round(decimal.Decimal(self.unit_price or 0) * decimal.Decimal(self.quantity or 0), 2)
+        return from_pesewas(self.total_price_pesewas)
 
     def __str__(self):
         return f"{self.name or '-'} ({self.quantity or '-'} @ {self.unit_price or '-'})"
@@ -8,6 +8,7 @@ from django.contrib.auth import get_user_model
 
 # Import your models (assuming they are in the same app's models.py)
 from .models import Customer, Estimate, MaterialItem, RoomArea # Assuming LabourItem is your model for 'labour'
+from projects.fixed_point import div_round, to_fixed, to_pesewas, from_pesewas, to_area, from_area
 
 # Get the active user model
 User = get_user_model()
@@ -23,24 +24,26 @@ class CustomerSerializer(serializers.ModelSerializer):
 
 
 class MaterialItemSerializer(serializers.ModelSerializer):
+    # Writable so an estimate update can match the item to its saved row (services.sync_nested_items)
+    id = serializers.IntegerField(required=False)
     calculated_total_cost = serializers.SerializerMethodField()
 
     class Meta:
         model = MaterialItem
         fields = ['id', 'name', 'unit_price', 'quantity', 'total_price', 'calculated_total_cost', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'total_price', 'calculated_total_cost', 'created_at', 'updated_at']
+        read_only_fields = ['total_price', 'calculated_total_cost', 'created_at', 'updated_at']
 
     def get_calculated_total_cost(self, obj: MaterialItem) -> Decimal:
-        unit_price = obj.unit_price if obj.unit_price is not None else Decimal('0.00')
-        quantity = obj.quantity if obj.quantity is not None else Decimal('0.00')
-        return round(unit_price * quantity, 2)
+        return obj.total_price
 
 
 class RoomAreaSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)  # As MaterialItemSerializer.id
+
     class Meta:
         model = RoomArea
         fields = ['id', 'name', 'type', 'floor_area', 'wall_area', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at']
 
 
 # --- Main Estimate Serializer (Simplified create/update) ---
@@ -99,37 +102,31 @@ class EstimateSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at',
         ]
 
-    # --- Methods to Calculate Read-Only Fields (remain in serializer) ---
+    # --- Read-Only Totals ---
+    # The totals are stored on the estimate by the save services
+    # (services.calculate_and_update_estimate_fields), so these read columns
+    # instead of going through the materials.
     def get_total_material_cost(self, obj: Estimate) -> Decimal:
-        total = sum((item.total_price if item.total_price is not None else Decimal('0.00')) for item in obj.materials.all()) if obj.materials.exists() else Decimal('0.00')
-        return round(total, 2)
+        return obj.total_material_cost
 
     def get_total_labour_cost(self, obj: Estimate) -> Decimal:
-        # Access the property from the model, assuming it exists
-        # or calculate here if not a model property:
-        # return round(obj.labour_cost_per_day * obj.estimated_days, 2) if obj.labour_cost_per_day and obj.estimated_days else Decimal('0.00')
-        return round(obj.total_labour_cost, 2) # Access model's @property
-
+        return from_pesewas(to_pesewas(obj.total_labour_cost))
 
     def get_subtotal_cost(self, obj: Estimate) -> Decimal:
-        return round(self.get_total_material_cost(obj) + self.get_total_labour_cost(obj), 2)
+        return obj.subtotal_cost
 
     def get_grand_total(self, obj: Estimate) -> Decimal:
-        subtotal = self.get_subtotal_cost(obj)
-        transport = obj.transport_cost if obj.transport_cost is not None else Decimal('0.00')
-        # Access model's @property for profit if it exists
-        
-        return round(subtotal + transport , 2)
+        return obj.grand_total
 
     def get_total_area(self, obj: Estimate) -> Decimal:
         # Access the concrete field on the model, as it's updated by the view/service
-        return round(obj.total_area_sq_m, 2)
+        return from_area(to_area(obj.total_area_sq_m), 2)
 
     def get_cost_per_area(self, obj: Estimate) -> Decimal:
-        total_area = self.get_total_area(obj)
-        grand_total = self.get_grand_total(obj)
-        if total_area > Decimal('0.00'):
-            return round(grand_total / total_area, 2)
+        # Grand total over the area, both as displayed (2 places), like the PDF
+        total_area = to_fixed(self.get_total_area(obj), 100)
+        if total_area > 0:
+            return from_pesewas(div_round(to_pesewas(obj.grand_total) * 100, total_area))
         return Decimal('0.00')
 
     # --- SIMPLIFIED create and update methods ---
@@ -1,10 +1,15 @@
 # estimates/services.py
 
+from collections import defaultdict
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import Sum # If you need aggregates for calculations
+from django.utils import timezone
 
-from .models import Estimate, Customer, MaterialItem, RoomArea
+from .models import Estimate, Customer, MaterialItem, RoomArea, material_total_pesewas
+from projects.fixed_point import (
+    AREA_SCALE, rate, div_round, to_pesewas, from_pesewas, to_area, from_area,
+)
 from django.conf import settings # For SQ_YARD_TO_SQ_METER_CONVERSION if defined there
 
 # Assuming SQ_YARD_TO_SQ_METER_CONVERSION is defined in your settings or a constants file
@@ -14,57 +19,163 @@ except AttributeError:
     # Fallback or define directly if not in settings
     SQ_YARD_TO_SQ_METER_CONVERSION = Decimal('0.836127')
 
+# Square metres per square yard as an exact rate, times AREA_SCALE so it can
+# divide a (pesewas * square millimetres) product straight to pesewas.
+SQ_YARD_RATE = rate(SQ_YARD_TO_SQ_METER_CONVERSION)
+SQ_YARD_AREA_RATE = SQ_YARD_RATE * AREA_SCALE
+
+# The fields a saved estimate sends for each nested item (everything else is set by the model)
+MATERIAL_ITEM_FIELDS = ('name', 'unit_price', 'quantity')
+ROOM_AREA_FIELDS = ('name', 'type', 'floor_area', 'wall_area')
+
+# Estimate fields worked out from the rest of the estimate and its items
+DERIVED_FIELDS = (
+    'total_area_sq_m', 'labour_per_sq_meter', 'total_labour_cost',
+    'total_material_cost', 'subtotal_cost', 'grand_total',
+)
+
+
+def calculate_labour_totals(profit_type, profit_value, total_area):
+    """
+    Labour totals for an estimate, in fixed point (see projects.fixed_point).
+    profit_value is in pesewas and total_area in square millimetres.
+    Returns (total_labour_cost, labour_per_sq_meter) in pesewas.
+    """
+    total_labour_cost = 0
+    labour_per_sq_meter = 0
+    if profit_type == 'fixed_amount':
+        if total_area > 0:
+            total_labour_cost = profit_value
+            labour_per_sq_meter = div_round(profit_value * AREA_SCALE, total_area)
+    elif profit_type == 'per_sq_meter':
+        labour_per_sq_meter = profit_value
+        total_labour_cost = div_round(profit_value * total_area, AREA_SCALE)
+    elif profit_type == 'per_sq_yard':
+        labour_per_sq_meter = div_round(profit_value * SQ_YARD_RATE.denominator, SQ_YARD_RATE.numerator)
+        # Worked from the exact per-m² rate, not the rounded one
+        total_labour_cost = div_round(profit_value * total_area * SQ_YARD_AREA_RATE.denominator, SQ_YARD_AREA_RATE.numerator)
+    return total_labour_cost, labour_per_sq_meter
+
+
+def estimate_derived_fields(estimate_instance: Estimate, room_areas, material_prices):
+    """
+    The derived Estimate fields (DERIVED_FIELDS) for the estimate's profit
+    inputs and transport cost, the (floor_area, wall_area) of each room and
+    the (unit_price, quantity) of each material, as model field values.
+    Everything is summed in fixed point (see projects.fixed_point).
+    """
+    # Total area (floor + wall), in square millimetres
+    total_area = sum(to_area(floor_area) + to_area(wall_area) for floor_area, wall_area in room_areas)
+    total_labour_cost, labour_per_sq_meter = calculate_labour_totals(
+        estimate_instance.profit_type, to_pesewas(estimate_instance.profit_value), total_area,
+    )
+    total_material_cost = sum(material_total_pesewas(unit_price, quantity) for unit_price, quantity in material_prices)
+    subtotal_cost = total_material_cost + total_labour_cost
+    return {
+        'total_area_sq_m': from_area(total_area, 2),
+        'labour_per_sq_meter': from_pesewas(labour_per_sq_meter),
+        'total_labour_cost': from_pesewas(total_labour_cost),
+        'total_material_cost': from_pesewas(total_material_cost),
+        'subtotal_cost': from_pesewas(subtotal_cost),
+        'grand_total': from_pesewas(subtotal_cost + to_pesewas(estimate_instance.transport_cost)),
+    }
+
 
 def calculate_and_update_estimate_fields(estimate_instance: Estimate):
     """
-    Calculates derived fields for an Estimate instance (total_area_sq_m, profit_per_sq_meter)
-    and saves them back to the model.
-    This should be called *after* nested RoomArea objects have been updated.
+    Calculates derived fields for an Estimate instance (DERIVED_FIELDS: the
+    area, labour and material totals) from its saved rooms and materials and
+    saves them back to the model.
+    This should be called *after* nested items have been updated, in the same transaction.
     """
     print(f"--- Calculating and updating fields for Estimate ID: {estimate_instance.id} ---")
 
-    # 1. Recalculate total_area_sq_m
-    total_floor_area_sq_m = sum(room.floor_area for room in estimate_instance.rooms.all())
-    total_wall_area_sq_m = sum(room.wall_area for room in estimate_instance.rooms.all())
-    # Assuming total_area_sq_m only accounts for floor_area for profit calc, adjust if wall_area is included
-    estimate_instance.total_area_sq_m = total_floor_area_sq_m + total_wall_area_sq_m
+    derived_fields = estimate_derived_fields(
+        estimate_instance,
+        RoomArea.objects.filter(estimate=estimate_instance).values_list('floor_area', 'wall_area'),
+        MaterialItem.objects.filter(estimate=estimate_instance).values_list('unit_price', 'quantity'),
+    )
+    for attr, value in derived_fields.items():
+        setattr(estimate_instance, attr, value)
     print(f"Calculated total_area_sq_m: {estimate_instance.total_area_sq_m}")
+    print(f"Calculated profit_per_sq_meter: {estimate_instance.labour_per_sq_meter}")
+    print(f"Calculated grand_total: {estimate_instance.grand_total}")
+
+    # Save the updated estimate instance
+    estimate_instance.save(update_fields=list(DERIVED_FIELDS))
+    print("Estimate instance fields updated and saved.")
 
 
-    # 2. Recalculate profit_per_sq_meter
-    total_labour_c = Decimal(0)
-    calculated_profit_per_sq_m = Decimal(0)
-    profit_type_input = estimate_instance.profit_type
-    profit_value_input = estimate_instance.profit_value
-    total_floor_area = sum(room.floor_area for room in estimate_instance.rooms.all()) if estimate_instance.rooms.exists() else Decimal('0.00')
-    total_wall_area = sum(room.wall_area for room in estimate_instance.rooms.all()) if estimate_instance.rooms.exists() else Decimal('0.00')
-    total_area = total_wall_area + total_floor_area
-    if profit_type_input == 'fixed_amount':
-        if estimate_instance.total_area_sq_m > 0:
-            total_labour_c = profit_value_input
-            calculated_profit_per_sq_m = profit_value_input / estimate_instance.total_area_sq_m
+def _item_values(model, item_data, fields):
+    """An incoming item's values for `fields`, with the model defaults for the ones it leaves out."""
+    return tuple(
+        item_data[field] if field in item_data else model._meta.get_field(field).get_default()
+        for field in fields
+    )
+
+
+def sync_nested_items(estimate_instance: Estimate, model, items_data, fields):
+    """
+    Makes the estimate's `model` rows (MaterialItem or RoomArea) match
+    items_data, the validated list sent with the estimate, with at most one
+    bulk_update, one bulk_create and one delete; unchanged rows are not
+    written. An item is matched to a row:
+
+    1. by its id, which must be one of this estimate's rows;
+    2. without an id, by a remaining row with the same values, so a client
+       that sends the list back unchanged and without ids writes nothing.
+
+    Items left over are created and rows left over are deleted, so a row
+    keeps its id for as long as it is sent back with it or unchanged.
+    Returns (updated, created, deleted) counts.
+    """
+    existing = {row.pk: row for row in model.objects.filter(estimate=estimate_instance).order_by('pk')}
+    matched = []  # (row, values)
+    unmatched = []
+    for item_data in items_data:
+        values = _item_values(model, item_data, fields)
+        item_id = item_data.get('id')
+        if item_id is None:
+            unmatched.append(values)
+            continue
+        row = existing.pop(item_id, None)
+        if row is None:
+            raise ValueError(f"{model.__name__} with ID '{item_id}' not found on this estimate, or sent twice.")
+        matched.append((row, values))
+
+    rows_by_values = defaultdict(list)
+    for row in existing.values():
+        rows_by_values[tuple(getattr(row, field) for field in fields)].append(row)
+    new_values = []
+    for values in unmatched:
+        same_rows = rows_by_values.get(values)
+        if same_rows:
+            del existing[same_rows.pop(0).pk]
         else:
-            # If total_area_sq_m is 0 for a fixed_amount profit, profit_per_sq_meter should be 0
-            calculated_profit_per_sq_m = Decimal(0)
-    elif profit_type_input == 'per_sq_meter':
-        
-        calculated_profit_per_sq_m = profit_value_input
-        total_labour_c = total_area * calculated_profit_per_sq_m
-    elif profit_type_input == 'per_sq_yard':
-        calculated_profit_per_sq_m = profit_value_input / SQ_YARD_TO_SQ_METER_CONVERSION
-        total_labour_c = total_area * calculated_profit_per_sq_m
-
-    estimate_instance.labour_per_sq_meter = calculated_profit_per_sq_m
-    print(f"Calculated profit_per_sq_meter: {estimate_instance.labour_per_sq_meter}")
-    estimate_instance.total_labour_cost = total_labour_c
-    # 3. Save the updated estimate instance
-    estimate_instance.save(update_fields=[
-        'total_area_sq_m',
-        'labour_per_sq_meter',
-        'total_labour_cost',
-        # Include any other fields that are modified by this function if they were not explicitly updated earlier
-    ])
-    print("Estimate instance fields updated and saved.")
+            new_values.append(values)
+
+    removed_rows = list(existing.values())
+    to_create = [model(estimate=estimate_instance, **dict(zip(fields, values))) for values in new_values]
+
+    now = timezone.now()
+    to_update = []
+    for row, values in matched:
+        changed = False
+        for field, value in zip(fields, values):
+            if getattr(row, field) != value:
+                setattr(row, field, value)
+                changed = True
+        if changed:
+            row.updated_at = now  # bulk_update does not run auto_now
+            to_update.append(row)
+
+    if to_update:
+        model.objects.bulk_update(to_update, [*fields, 'updated_at'])
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if removed_rows:
+        model.objects.filter(pk__in=[row.pk for row in removed_rows]).delete()
+    return len(to_update), len(to_create), len(removed_rows)
 
 
 @transaction.atomic
@@ -102,24 +213,35 @@ def create_estimate_and_nested_items(user, validated_data):
     # Set the user for the estimate
     validated_data['user'] = user
 
-    # Create the Estimate instance (scalar fields first)
-    estimate = Estimate.objects.create(**validated_data)
-    print(f"Estimate instance {estimate.id} created.")
-
-    # Create related MaterialItems
-    for material_data in materials_data:
-        MaterialItem.objects.create(estimate=estimate, **material_data)
-    print(f"{len(materials_data)} MaterialItem(s) created.")
-
-    # Create related RoomAreas
-    for room_data in rooms_data:
-        RoomArea.objects.create(estimate=estimate, **room_data)
-    print(f"{len(rooms_data)} RoomArea(s) created.")
-
-    # Create related LabourItems
-
-    # Calculate and update derived fields (total_area_sq_m, profit_per_sq_meter)
-    calculate_and_update_estimate_fields(estimate)
+    # Nested ids are ignored on create; missing fields take the model defaults
+    materials = [
+        MaterialItem(**dict(zip(MATERIAL_ITEM_FIELDS, _item_values(MaterialItem, material_data, MATERIAL_ITEM_FIELDS))))
+        for material_data in materials_data
+    ]
+    rooms = [
+        RoomArea(**dict(zip(ROOM_AREA_FIELDS, _item_values(RoomArea, room_data, ROOM_AREA_FIELDS))))
+        for room_data in rooms_data
+    ]
+
+    # The derived fields are worked out from the payload, so the estimate is
+    # inserted once with them instead of saved again after its rooms
+    estimate = Estimate(**validated_data)
+    for attr, value in estimate_derived_fields(
+        estimate,
+        [(room.floor_area, room.wall_area) for room in rooms],
+        [(material.unit_price, material.quantity) for material in materials],
+    ).items():
+        setattr(estimate, attr, value)
+    estimate.save(force_insert=True)
+    print(f"Estimate instance {estimate.id} created (total_area_sq_m {estimate.total_area_sq_m}, grand_total {estimate.grand_total}).")
+
+    # Create the related MaterialItems and RoomAreas, one query each
+    for item in [*materials, *rooms]:
+        item.estimate = estimate
+    MaterialItem.objects.bulk_create(materials)
+    print(f"{len(materials)} MaterialItem(s) created.")
+    RoomArea.objects.bulk_create(rooms)
+    print(f"{len(rooms)} RoomArea(s) created.")
 
     print("--- create_estimate_and_nested_items service finished ---")
     return estimate
@@ -130,10 +252,17 @@ def update_estimate_and_nested_items(estimate_instance: Estimate, validated_data
     """
     Service function to update an Estimate and all its nested related items.
     Handles customer linking/creation/update and recalculation of derived fields.
-    Implements a delete-and-recreate strategy for nested lists.
+    Nested lists are diffed against the saved rows (sync_nested_items), so
+    item ids stay stable and unchanged items are not written.
     """
     print(f"--- update_estimate_and_nested_items service started for Estimate ID: {estimate_instance.id} ---")
 
+    # Concurrent saves of the same estimate wait here, and the estimate is read
+    # again under the lock: the serializer loaded it before, so a full save
+    # would otherwise write back the fields another save changed meanwhile,
+    # and the totals would be worked out from them
+    estimate_instance.refresh_from_db(from_queryset=Estimate.objects.select_for_update())
+
     materials_data = validated_data.pop('materials', None) # Use None to distinguish between empty list and not sent
     rooms_data = validated_data.pop('rooms', None)
     customer_data = validated_data.pop('customer', None)
@@ -166,19 +295,18 @@ def update_estimate_and_nested_items(estimate_instance: Estimate, validated_data
     estimate_instance.save()
     print("Estimate scalar fields and customer link updated.")
 
-    # --- Update Nested Items (Delete and Recreate) ---
+    # --- Update Nested Items (diffed against the saved rows) ---
     # Only process if the nested list was actually sent in the request
     if materials_data is not None:
-        estimate_instance.materials.all().delete()
-        for material_data in materials_data:
-            MaterialItem.objects.create(estimate=estimate_instance, **material_data)
-        print(f"Materials updated ({len(materials_data)} items).")
+        updated, created, deleted = sync_nested_items(estimate_instance, MaterialItem, materials_data, MATERIAL_ITEM_FIELDS)
+        print(f"Materials updated ({len(materials_data)} items: {updated} changed, {created} added, {deleted} removed).")
 
     if rooms_data is not None:
-        estimate_instance.rooms.all().delete()
-        for room_data in rooms_data:
-            RoomArea.objects.create(estimate=estimate_instance, **room_data)
-        print(f"Rooms updated ({len(rooms_data)} items).")
+        updated, created, deleted = sync_nested_items(estimate_instance, RoomArea, rooms_data, ROOM_AREA_FIELDS)
+        print(f"Rooms updated ({len(rooms_data)} items: {updated} changed, {created} added, {deleted} removed).")
+
+    # Rooms and materials prefetched with the estimate are out of date now
+    getattr(estimate_instance, '_prefetched_objects_cache', {}).clear()
 
 
     # Recalculate derived fields after nested items are updated
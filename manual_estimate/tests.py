@@ -1,3 +1,119 @@
+import contextlib
+import datetime
+import io
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import SubscriptionPlan, UserSubscription
+
+from .models import Estimate, MaterialItem, RoomArea
+from .services import update_estimate_and_nested_items
+
+ITEM_COUNT = 100
+
+# Queries per request, whatever the number of items (see services)
+CREATE_QUERIES = 15
+UPDATE_UNCHANGED_QUERIES = 21
+PATCH_MATERIALS_QUERIES = 23
+
+
+def estimate_payload(item_count=ITEM_COUNT):
+    return {
+        'title': 'Query count',
+        'profit_type': 'per_sq_meter',
+        'profit_value': '5.00',
+        'transport_cost': '20.00',
+        'materials': [{'name': f"Tile {i}", 'unit_price': '12.50', 'quantity': f"{i + 1}.00"} for i in range(item_count)],
+        'rooms': [{'name': f"Room {i}", 'floor_area': '10.00', 'wall_area': '4.50'} for i in range(item_count)],
+    }
+
+
+class EstimateSaveQueriesTests(TestCase):
+    """Saving an estimate takes a fixed number of queries, however many items it has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('0200000000', 'password', full_name='Query Count', email='q@example.com')
+        plan = SubscriptionPlan.objects.create(
+            name='Test', price=0, project_limit=1000, three_d_view_limit=1000, manual_estimate_limit=1000, duration_in_days=30,
+        )
+        UserSubscription.objects.create(
+            user=cls.user, plan=plan, end_date=timezone.now() + datetime.timedelta(days=30), manual_estimate_limit=1000,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url, data):
+        # The services print their progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def create_estimate(self, item_count=ITEM_COUNT):
+        response = self.request('post', reverse('estimate-list-create'), estimate_payload(item_count))
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_create_queries(self):
+        for item_count in (1, ITEM_COUNT):
+            with self.assertNumQueries(CREATE_QUERIES):
+                data = self.create_estimate(item_count)
+            self.assertEqual(len(data['materials']), item_count)
+            self.assertEqual(len(data['rooms']), item_count)
+
+    def test_unchanged_put_writes_no_items(self):
+        data = self.create_estimate()
+        saved = {
+            model: dict(model.objects.filter(estimate_id=data['id']).values_list('pk', 'updated_at'))
+            for model in (MaterialItem, RoomArea)
+        }
+        url = reverse('estimate-detail', args=[data['id']])
+        # Sent back as the client got it, with ids, and as first posted, without
+        for payload in ({**estimate_payload(), 'materials': data['materials'], 'rooms': data['rooms']}, estimate_payload()):
+            with self.assertNumQueries(UPDATE_UNCHANGED_QUERIES):
+                response = self.request('put', url, payload)
+            self.assertEqual(response.status_code, 200, response.data)
+            for model, rows in saved.items():
+                self.assertEqual(dict(model.objects.filter(estimate_id=data['id']).values_list('pk', 'updated_at')), rows)
+
+    def test_partial_patch_queries(self):
+        data = self.create_estimate()
+        materials = [dict(item) for item in data['materials']]
+        materials[0]['quantity'] = '99.00'
+        removed = materials.pop()
+        materials.append({'name': 'Grout', 'unit_price': '3.00', 'quantity': '2.00'})
+        url = reverse('estimate-detail', args=[data['id']])
+        with self.assertNumQueries(PATCH_MATERIALS_QUERIES):
+            response = self.request('patch', url, {'materials': materials})
+        self.assertEqual(response.status_code, 200, response.data)
+
+        rows = dict(MaterialItem.objects.filter(estimate_id=data['id']).values_list('pk', 'name'))
+        self.assertEqual(len(rows), ITEM_COUNT)
+        self.assertEqual(rows[materials[0]['id']], materials[0]['name'])
+        self.assertNotIn(removed['id'], rows)
+        # A new item gets a new row rather than a removed item's id
+        self.assertGreater(max(rows), max(item['id'] for item in data['materials']))
+        self.assertEqual(RoomArea.objects.filter(estimate_id=data['id']).count(), ITEM_COUNT)
+
+        estimate = Estimate.objects.get(pk=data['id'])
+        self.assertEqual(response.data['total_material_cost'], estimate.total_material_cost)
+        self.assertEqual(
+            estimate.total_material_cost,
+            sum(item.total_price for item in MaterialItem.objects.filter(estimate_id=data['id'])),
+        )
 
-# Create your tests here.
+    def test_update_does_not_write_back_stale_fields(self):
+        data = self.create_estimate(1)
+        # Loaded before another save changed the transport, as the serializer's instance is
+        stale = Estimate.objects.get(pk=data['id'])
+        Estimate.objects.filter(pk=data['id']).update(transport_cost='35.00')
+        with contextlib.redirect_stdout(io.StringIO()):
+            update_estimate_and_nested_items(stale, {'title': 'Renamed'})
+        estimate = Estimate.objects.get(pk=data['id'])
+        self.assertEqual((estimate.title, str(estimate.transport_cost)), ('Renamed', '35.00'))
+        self.assertEqual(estimate.grand_total, estimate.subtotal_cost + estimate.transport_cost)
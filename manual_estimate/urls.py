@@ -38,6 +38,8 @@ from django.urls import path, include
 from .views import (
     EstimateListCreateView, # For GET (list) and POST (create) /estimates/
     EstimateDetailView,    # For GET (detail), PUT/PATCH (update), DELETE (delete) /estimates/{pk}/
+    EstimateShareView,     # For POST (share link) /estimates/{pk}/share/
+    EstimatePdfView,       # For GET (PDF download) /estimates/{pk}/pdf/
     UserCustomerListView,  # For GET (list) /customers/ (for contact page)
 
     # --- Optional Views (Uncomment if you need standalone CRUD for these) ---
@@ -54,16 +56,24 @@ from .views import (
 urlpatterns = [
     # Endpoint for listing and creating Estimates (Projects) for the authenticated user.
     # GET /estimates/ -> Lists all Estimates for the user.
-    # POST /estimates/ -> Creates a new Estimate for the user and generates PDF.
+    # POST /estimates/ -> Creates a new Estimate for the user (the PDF is rendered later; see pdf_status).
     path('estimates/', EstimateListCreateView.as_view(), name='estimate-list-create'),
 
     # Endpoint for retrieving, updating, and deleting a specific Estimate (Project) by its owner.
     # GET /estimates/{pk}/ -> Retrieves details for a specific Estimate.
-    # PUT /estimates/{pk}/ -> Updates a specific Estimate and regenerates PDF.
-    # PATCH /estimates/{pk}/ -> Partially updates a specific Estimate and regenerates PDF.
+    # PUT /estimates/{pk}/ -> Updates a specific Estimate (the PDF is rendered later).
+    # PATCH /estimates/{pk}/ -> Partially updates a specific Estimate (the PDF is rendered later).
     # DELETE /estimates/{pk}/ -> Deletes a specific Estimate.
     path('estimates/<int:pk>/', EstimateDetailView.as_view(), name='estimate-detail'),
 
+    # Endpoint for sharing an Estimate with its customer.
+    # POST /estimates/{pk}/share/ -> Signed, expiring link to an HTML/PDF snapshot of the Estimate.
+    path('estimates/<int:pk>/share/', EstimateShareView.as_view(), name='estimate-share'),
+
+    # Endpoint for downloading an Estimate's PDF.
+    # GET /estimates/{pk}/pdf/ -> The PDF file (ETag, Range); Accept: application/json -> {"pdf_base64": ...}.
+    path('estimates/<int:pk>/pdf/', EstimatePdfView.as_view(), name='estimate-pdf'),
+
     # Endpoint for listing all Customers associated with the authenticated user's Estimates.
     # This is intended for the 'contact page' list.
     # GET /customers/ -> Lists customers (id, name, location, phone) linked to user's estimates.
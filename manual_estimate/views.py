@@ -9,20 +9,21 @@ from django.db.models import Sum # Only needed if doing sums in view, not serial
 from django.http import HttpResponse # To return the PDF as a response (if not Base64)
 from django.template.loader import render_to_string # To render the HTML template
 from django.conf import settings # To access template settings
-from weasyprint import HTML # Import WeasyPrint
 import base64 # For Base64 encoding/decoding
 from django.shortcuts import get_object_or_404 # Helper function
 from django.contrib.auth import get_user_model # To get the user model
 import traceback
 # --- Import DRF Modules ---
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from accounts.models import use_feature_if_allowed
+from projects import pdf_context, pdf_jobs, pdf_pool, pdf_responses, share_links
 
 # --- Import Your Models ---
 from .models import Estimate, Customer, MaterialItem, RoomArea
-from .services import create_estimate_and_nested_items
+from .services import create_estimate_and_nested_items, update_estimate_and_nested_items
 
 # --- Import Your Serializers ---
 # Ensure you import all the necessary serializers, including the nested ones
@@ -42,6 +43,29 @@ from .utils import generate_estimate_pdf_base64 # Assuming you put it in estimat
 User = get_user_model()
 
 
+def _flag(request, name):
+    return str(request.query_params.get(name, request.data.get(name, ''))).lower() in ('1', 'true', 'yes')
+
+
+def saved_estimate_pdf(request, estimate):
+    """
+    The PDF part of a create/update response. A save no longer renders the
+    PDF: unless the request is a draft (?draft=true), a background render is
+    scheduled (projects.pdf_jobs.schedule_prerender) that later saves push
+    back, and otherwise the first download renders it. ?include_pdf=true
+    renders it now and adds pdf_base64, for clients that still expect it.
+    Returns the fields to add; raises what generate_estimate_pdf_base64 raises.
+    """
+    data = {}
+    job = None
+    if _flag(request, 'include_pdf'):
+        data['pdf_base64'] = generate_estimate_pdf_base64(estimate, request.user, request=request)
+    elif not _flag(request, 'draft'):
+        job = pdf_jobs.schedule_prerender(request.user, 'manual', estimate.pk, request.build_absolute_uri('/'))
+    data.update(pdf_jobs.manual_estimate_pdf_status(estimate, request.user, request, job))
+    return data
+
+
 # --- Custom permission to only allow owners of an object to edit it. ---
 class IsOwner(permissions.BasePermission):
     """
@@ -69,8 +93,9 @@ class EstimateListCreateView(generics.ListCreateAPIView):
     API endpoint that allows Estimates (Projects) to be viewed (GET) or created (POST)
     by the authenticated user.
     GET: Lists all Estimates for the authenticated user with full details.
-    POST: Creates a new Estimate, including nested items, generates a PDF,
-          and returns the created Estimate data along with the Base64 PDF string.
+    POST: Creates a new Estimate, including nested items, and returns it with
+          pdf_status and pdf_url (see saved_estimate_pdf); the PDF is rendered
+          later, not during the request.
     Requires the user to be authenticated.
     """
     queryset = Estimate.objects.all() # Base queryset
@@ -91,8 +116,8 @@ class EstimateListCreateView(generics.ListCreateAPIView):
 
     def create(self, request, *args, **kwargs):
         """
-        Handles POST requests to create an Estimate (Project), save nested items,
-        and generate a Base64 encoded PDF.
+        Handles POST requests to create an Estimate (Project) and save nested items.
+        The PDF is deferred (saved_estimate_pdf).
         """
         usage_check = use_feature_if_allowed(request.user, 'manual_estimate')
 
@@ -106,11 +131,9 @@ class EstimateListCreateView(generics.ListCreateAPIView):
         self.perform_create(serializer)
         instance = serializer.instance # Get the newly created Estimate instance from perform_create
 
-        # --- Generate PDF and Encode to Base64 ---
-        pdf_base64 = None
+        # --- PDF status (rendered in the background or on first download) ---
         try:
-            pdf_base64 = generate_estimate_pdf_base64(instance, request.user, request=request)
-            print(f"PDF generated successfully for new estimate {instance.id}")
+            pdf_data = saved_estimate_pdf(request, instance)
         except Exception as e:
             print(f"Error generating PDF after creating estimate {instance.id}: {e}")
             traceback.print_exc()
@@ -128,7 +151,7 @@ class EstimateListCreateView(generics.ListCreateAPIView):
 
         # --- Prepare the DRF Response ---
         response_data = serializer.data
-        response_data['pdf_base64'] = pdf_base64
+        response_data.update(pdf_data)
 
         headers = self.get_success_headers(serializer.data)
         return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
@@ -153,7 +176,7 @@ class EstimateListCreateView(generics.ListCreateAPIView):
             print(f"Estimate {estimate.id} and nested items successfully created via service.")
         except ValueError as e: # Catch custom errors from service layer (e.g., customer not found)
             print(f"!!! Error in create_estimate_and_nested_items service: {e} !!!")
-            raise serializer.ValidationError({'detail': str(e)}) # Raise as a DRF validation error
+            raise ValidationError({'detail': str(e)}) # Raise as a DRF validation error
         except Exception as e:
             print(f"!!! Unexpected error during estimate creation in perform_create: {e} !!!")
             raise # Re-raise unexpected errors, DRF will catch it and return 500
@@ -249,8 +272,8 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
     API endpoint that allows a specific Estimate (Project) to be retrieved,
     updated, or deleted by its owner.
     GET: Retrieves details for a specific Estimate with full nested information.
-    PUT/PATCH: Updates a specific Estimate, including nested items, regenerates the PDF,
-               and returns the updated Estimate data along with the new Base64 PDF string.
+    PUT/PATCH: Updates a specific Estimate, including nested items, and returns it
+               with pdf_status and pdf_url (see saved_estimate_pdf).
     DELETE: Deletes a specific Estimate.
     Requires the user to be authenticated and the owner of the Estimate.
     """
@@ -268,13 +291,13 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
         """
         user = self.request.user
         # Fetch related data to avoid N+1 queries
-        return Estimate.objects.filter(user=user).select_related('customer').prefetch_related('rooms', 'materials', 'labour')
+        return Estimate.objects.filter(user=user).select_related('customer').prefetch_related('rooms', 'materials')
 
 
     def update(self, request, *args, **kwargs):
         """
-        Handles PUT/PATCH requests to update an Estimate (Project), save nested items,
-        and regenerate a Base64 encoded PDF.
+        Handles PUT/PATCH requests to update an Estimate (Project) and save nested items.
+        The PDF is deferred (saved_estimate_pdf), so saving a draft again and again renders nothing.
         """
         # Determine if it's a partial update (PATCH)
         partial = kwargs.pop('partial', False)
@@ -288,16 +311,13 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer.is_valid(raise_exception=True)
 
         # Save the updated Estimate instance and its nested objects.
-        # The serializer's custom update method handles the nested logic.
-        self.perform_update(serializer) # Calls serializer.save() which triggers the serializer's update method
+        # The service layer diffs the nested lists against the saved items.
+        self.perform_update(serializer) # Calls update_estimate_and_nested_items
         updated_instance = serializer.instance # Get the updated Estimate instance
 
-        # --- Regenerate PDF and Encode to Base64 ---
-        pdf_base64 = None
+        # --- PDF status (rendered in the background or on first download) ---
         try:
-             # Call the reusable PDF generation function with the updated instance
-             pdf_base64 = generate_estimate_pdf_base64(updated_instance, request.user, request=request)
-             print(f"PDF regenerated successfully for updated estimate {updated_instance.id}")
+             pdf_data = saved_estimate_pdf(request, updated_instance)
         except Exception as e:
              # Log the error and decide how to respond.
              # It's common to return the updated data but indicate the PDF failure.
@@ -311,9 +331,9 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
 
         # --- Prepare the DRF Response ---
         # Return the updated Estimate data (from the serializer's representation)
-        # AND the Base64 PDF string in a single response.
+        # AND its PDF status in a single response.
         response_data = serializer.data # Get the serialized representation of the updated instance
-        response_data['pdf_base64'] = pdf_base64 # Add the base64 PDF string
+        response_data.update(pdf_data) # pdf_status, pdf_url (and pdf_base64 with ?include_pdf=true)
 
         # Return 200 OK status code for a successful update
         return Response(response_data, status=status.HTTP_200_OK)
@@ -321,17 +341,85 @@ class EstimateDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def perform_update(self, serializer):
         """
-        Hook to save the updated serializer instance.
-        The serializer's custom update method handles nested item updates.
+        Hook to save the updated serializer instance, delegating to a service
+        function that also updates the nested items and the derived fields.
         """
-        serializer.save() # The serializer's update method is called here
-        print("Serializer save called in perform_update.")
+        try:
+            serializer.instance = update_estimate_and_nested_items(serializer.instance, serializer.validated_data)
+        except ValueError as e: # Customer or nested item not found (service layer)
+            print(f"!!! Error in update_estimate_and_nested_items service: {e} !!!")
+            raise ValidationError({'detail': str(e)})
+        print("Estimate updated via service in perform_update.")
 
     # destroy method (for DELETE requests) is provided by RetrieveUpdateDestroyAPIView by default.
     # It uses get_object() (which is filtered by get_queryset and checked by IsOwner)
     # and then calls instance.delete(). This is sufficient for basic deletion.
 
 
+class EstimateShareView(generics.GenericAPIView):
+    """
+    API endpoint that creates a signed, expiring share link to an immutable
+    HTML/PDF snapshot of an Estimate for the customer (see projects.share_links).
+    POST: {"expires_in_days": 14} -> link URLs, token and expiry. The snapshot
+          is rendered once per version of the estimate and reused after that.
+    """
+    serializer_class = EstimateSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_queryset(self):
+        return Estimate.objects.filter(user=self.request.user)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            expires_in_days = share_links.parse_share_days(request.data.get('expires_in_days'))
+        except share_links.ShareLinkError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        estimate = self.get_object()
+        base_url = request.build_absolute_uri('/')
+        version_data = pdf_context.manual_estimate_data(estimate.pk, request.user)
+
+        def render_html():
+            return render_to_string('manual_estimate_template.html', pdf_context.manual_estimate_context(version_data, base_url))
+
+        try:
+            key, created = share_links.store_snapshot('manual', version_data, render_html, base_url)
+        except Exception as e:
+            print(f"Error creating the share snapshot for estimate {estimate.id}: {e}")
+            traceback.print_exc()
+            return Response({"error": f"Failed to generate the estimate snapshot: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(
+            share_links.share_link_response(request, 'manual', key, created, expires_in_days),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+class EstimatePdfView(generics.GenericAPIView):
+    """
+    API endpoint that downloads an Estimate's PDF.
+    GET: the PDF file (ETag, Range requests), rendered once per version of the
+         estimate and served from the PDF cache after that. Accept:
+         application/json gives {"pdf_base64": ...} instead.
+    """
+    serializer_class = EstimateSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    renderer_classes = [pdf_responses.PDFRenderer, *pdf_responses.PDF_RENDERER_CLASSES[:-1]]
+
+    def get_queryset(self):
+        return Estimate.objects.filter(user=self.request.user).select_related('customer').prefetch_related('rooms', 'materials')
+
+    def get(self, request, *args, **kwargs):
+        estimate = self.get_object()
+        try:
+            pdf = pdf_pool.render('manual', request.user, request.build_absolute_uri('/'), object_id=estimate.pk)
+        except Exception as e:
+            print(f"Error generating the PDF for estimate {estimate.id}: {e}")
+            traceback.print_exc()
+            return Response({"error": f"Failed to generate PDF: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if pdf_responses.wants_pdf(request):
+            return pdf_responses.pdf_file_response(request, pdf.file, pdf.size, pdf.key, f"estimate-{estimate.pk}.pdf")
+        return pdf_responses.base64_json_response(pdf, 'pdf_base64')
+
+
 # --- Customer Views ---
 # These views are for managing Customer objects themselves, separate from Estimates.
 # If Customer objects are *only* created/managed nested within Estimates, you might
@@ -0,0 +1,176 @@
+"""
+Fixed-point arithmetic used by the estimate calculations.
+
+Every intermediate value is a plain int in a fixed unit:
+
+    money       -> pesewas (1/100 GHS)                   MONEY_SCALE
+    lengths     -> micrometres (1e-6 m)                  LENGTH_SCALE
+    areas       -> square millimetres (1e-6 m²)          AREA_SCALE
+    quantities  -> millionths of a unit (bag, kg, ...)   QUANTITY_SCALE
+
+Rates (coverage per m², unit conversion factors, ...) are exact Fractions
+built once at import time, so applying one is a single integer multiply and
+divide.
+
+Values enter with to_fixed() (from Decimal, int, str or float) and leave with
+from_fixed() (to Decimal, for model fields and API output). Every rounding
+step uses ROUND_HALF_EVEN, which is what DecimalField does when it stores a
+value and what round() does on a Decimal, so stored results match what the
+Decimal code produced.
+"""
+
+import decimal
+from fractions import Fraction
+
+MONEY_SCALE = 100
+MICRO = 1_000_000
+LENGTH_SCALE = MICRO
+AREA_SCALE = MICRO
+QUANTITY_SCALE = MICRO
+
+# Micrometres per unit. All exact (the foot and inch are defined in metres).
+LENGTH_FACTORS_TO_MICROMETRES = {
+    'meters': 1_000_000,
+    'feet': 304_800,
+    'inches': 25_400,
+    'centimeters': 10_000,
+}
+
+
+def rate(numerator, denominator=1):
+    """
+    Builds an exact rate. Arguments may be ints, Decimals or decimal strings;
+    floats are read through their shortest repr, so rate(1.4, 6) is exactly 7/30.
+    """
+    if isinstance(numerator, int) and isinstance(denominator, int):
+        return Fraction(numerator, denominator)
+    if isinstance(numerator, float):
+        numerator = repr(numerator)
+    if isinstance(denominator, float):
+        denominator = repr(denominator)
+    return Fraction(numerator) / Fraction(denominator)
+
+
+def div_round(numerator, denominator):
+    """Integer division rounded half to even. denominator must not be zero."""
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    twice_remainder = 2 * remainder
+    if twice_remainder > denominator or (twice_remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def ceil_div(numerator, denominator):
+    """Integer division rounded up (denominator > 0)."""
+    return -(-numerator // denominator)
+
+
+def to_fixed(value, scale):
+    """Converts a Decimal/int/str/float to an int in units of 1/scale."""
+    value_type = type(value)
+    if value_type is int:
+        return value * scale
+    if value is None or value == '':
+        return 0
+    if value_type is Fraction:
+        return div_round(value.numerator * scale, value.denominator)
+    if value_type is float:
+        value = repr(value)
+    try:
+        if value_type is not decimal.Decimal:
+            value = decimal.Decimal(value)
+        numerator, denominator = value.as_integer_ratio()
+    except (decimal.InvalidOperation, ValueError, TypeError, OverflowError):
+        return 0
+    # Model values have few decimal places, so the denominator usually divides
+    # the scale and no rounding is needed.
+    if not scale % denominator:
+        return numerator * (scale // denominator)
+    return div_round(numerator * scale, denominator)
+
+
+def from_fixed(value, scale, places=2):
+    """Converts an int in units of 1/scale to a Decimal with the given decimal places."""
+    quantum = 10 ** places
+    if scale == quantum:
+        units = value
+    else:
+        units = div_round(value * quantum, scale)
+    return decimal.Decimal(units).scaleb(-places)
+
+
+def round_fixed(value, scale, places=2):
+    """Rounds a fixed value to the given decimal places, keeping its scale."""
+    step = scale // (10 ** places)
+    return div_round(value, step) * step
+
+
+def apply_rate(value, *rates):
+    """Multiplies a fixed value by one or more exact rates with a single rounding."""
+    numerator, denominator = value, 1
+    for item in rates:
+        numerator *= item.numerator
+        denominator *= item.denominator
+    return div_round(numerator, denominator)
+
+
+def apply_percent(value, percent):
+    """value * (100 + percent) / 100, percent given as an int or exact rate."""
+    if isinstance(percent, int):
+        return div_round(value * (100 + percent), 100)
+    return apply_rate(value, 1 + Fraction(percent) / 100)
+
+
+def multiply(value_a, value_b, scale):
+    """Product of two fixed values where the result is wanted at the scale of value_a."""
+    return div_round(value_a * value_b, scale)
+
+
+def divide(value_a, value_b, scale):
+    """Quotient of two fixed values, returned at the given scale."""
+    if not value_b:
+        return 0
+    return div_round(value_a * scale, value_b)
+
+
+# --- Domain helpers ---
+
+def to_pesewas(amount):
+    """GHS amount (Decimal, str, int or float) to pesewas."""
+    return to_fixed(amount, MONEY_SCALE)
+
+
+def from_pesewas(pesewas):
+    """Pesewas to a GHS Decimal with two decimal places."""
+    return from_fixed(pesewas, MONEY_SCALE, 2)
+
+
+def length_to_micrometres(value, unit_name='meters'):
+    """A length in the project's measurement unit to micrometres."""
+    factor = LENGTH_FACTORS_TO_MICROMETRES.get((unit_name or 'meters').lower(), LENGTH_SCALE)
+    return to_fixed(value, factor)
+
+
+def area_from_lengths(length_um, breadth_um):
+    """Area in square millimetres from two lengths in micrometres."""
+    return div_round(length_um * breadth_um, LENGTH_SCALE * LENGTH_SCALE // AREA_SCALE)
+
+
+def to_area(value):
+    """An area in m² (Decimal, str, int or float) to square millimetres."""
+    return to_fixed(value, AREA_SCALE)
+
+
+def from_area(area, places=6):
+    """Square millimetres to m² as a Decimal (6 places keeps the value exact)."""
+    return from_fixed(area, AREA_SCALE, places)
+
+
+def to_quantity(value):
+    return to_fixed(value, QUANTITY_SCALE)
+
+
+def from_quantity(quantity, places=6):
+    return from_fixed(quantity, QUANTITY_SCALE, places)
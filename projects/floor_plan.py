@@ -0,0 +1,301 @@
+"""
+Room geometry kernel: polygon floors, per-wall heights and openings.
+
+A room is normally a length x breadth x height box. For L-shaped rooms, bay
+walls and the like the room can instead carry a floor outline: its corner
+points in order, in the project's measurement unit. Every edge of the outline
+is a wall; wall_heights can give each wall its own height (a low wall beside
+a full-height one, 0 for an open side), and openings (doors, windows) are
+taken off the wall area.
+
+Everything is integer arithmetic on the fixed-point units of fixed_point:
+points are micrometres, twice the floor area comes exactly from the shoelace
+formula, and the wall area is the exact sum of edge length x height minus the
+openings. Both are reported rounded to square millimetres and, exactly, as
+twice_floor_area and twice_wall_area (square micrometres x 2), which is what
+the stored room areas are rounded from. Edge lengths of sloping walls are
+square roots, rounded to the nearest micrometre with math.isqrt; they are
+the only rounding before the final one. A rectangle outline rounds to exactly
+the areas calculate_room_areas gives for the same length and breadth.
+
+The outline is checked for self-intersections when it is saved
+(validate_floor_plan); recalculation trusts stored outlines and skips that
+check, which keeps a room at a few microseconds per edge.
+"""
+
+import decimal
+import json
+import math
+from collections import namedtuple
+
+from .fixed_point import AREA_SCALE, LENGTH_FACTORS_TO_MICROMETRES, LENGTH_SCALE, div_round, to_fixed
+from .room_geometry import MAX_ROOM_DIMENSION
+
+MAX_OUTLINE_POINTS = 64
+MAX_OPENINGS = 100
+OPENING_KINDS = ('door', 'window', 'other')
+
+# Micrometre squares in a square millimetre of area (fixed point)
+SQUARE = LENGTH_SCALE * LENGTH_SCALE // AREA_SCALE
+
+FloorPlan = namedtuple('FloorPlan', ['floor_area', 'wall_area', 'perimeter', 'openings_area', 'walls', 'twice_floor_area', 'twice_wall_area'])
+PlanWall = namedtuple('PlanWall', ['length', 'height', 'area'])
+
+
+class FloorPlanError(ValueError):
+    """The outline, wall heights or openings are not a valid room."""
+
+
+def _load(value, name):
+    # CSV imports and form posts send the JSON as text
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise FloorPlanError(f"{name} is not valid JSON.")
+    return value
+
+
+def _unit_factor(unit):
+    return LENGTH_FACTORS_TO_MICROMETRES.get((unit or 'meters').lower(), LENGTH_SCALE)
+
+
+def _length(value, factor, name, allow_negative=False):
+    """A length in the project's unit to micrometres; raises FloorPlanError when it is not a number."""
+    if type(value) is int:
+        length = value * factor
+    else:
+        # Like fixed_point.to_fixed, but one parse per value and an error instead of 0
+        if type(value) is float:
+            value = repr(value)
+        elif not isinstance(value, (str, decimal.Decimal)):
+            raise FloorPlanError(f"{name} must be a number.")
+        try:
+            numerator, denominator = decimal.Decimal(value).as_integer_ratio()
+        except (decimal.InvalidOperation, ValueError, OverflowError):
+            raise FloorPlanError(f"{name} must be a number.")
+        numerator *= factor
+        length = numerator // denominator if not numerator % denominator else div_round(numerator, denominator)
+    if abs(length) > MAX_ROOM_DIMENSION or (length < 0 and not allow_negative):
+        limit = f"between -{MAX_ROOM_DIMENSION // LENGTH_SCALE} and" if allow_negative else "between 0 and"
+        raise FloorPlanError(f"{name} must be {limit} {MAX_ROOM_DIMENSION // LENGTH_SCALE} m.")
+    return length
+
+
+def _sqrt_round(value):
+    """Nearest integer to the square root of a non-negative integer."""
+    root = math.isqrt(value)
+    # (root + 1/2)² = root² + root + 1/4, so round up when value - root² > root
+    return root + 1 if value - root * root > root else root
+
+
+def _orientation(a, b, c):
+    cross = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (cross > 0) - (cross < 0)
+
+
+def _on_segment(a, b, point):
+    return min(a[0], b[0]) <= point[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= point[1] <= max(a[1], b[1])
+
+
+def _segments_touch(p1, p2, q1, q2):
+    if max(p1[0], p2[0]) < min(q1[0], q2[0]) or max(q1[0], q2[0]) < min(p1[0], p2[0]):
+        return False
+    if max(p1[1], p2[1]) < min(q1[1], q2[1]) or max(q1[1], q2[1]) < min(p1[1], p2[1]):
+        return False
+    d1, d2 = _orientation(q1, q2, p1), _orientation(q1, q2, p2)
+    d3, d4 = _orientation(p1, p2, q1), _orientation(p1, p2, q2)
+    if d1 * d2 < 0 and d3 * d4 < 0:
+        return True
+    return (
+        (d1 == 0 and _on_segment(q1, q2, p1)) or (d2 == 0 and _on_segment(q1, q2, p2))
+        or (d3 == 0 and _on_segment(p1, p2, q1)) or (d4 == 0 and _on_segment(p1, p2, q2))
+    )
+
+
+def check_simple(points):
+    """Raises FloorPlanError when the outline crosses or folds back on itself."""
+    count = len(points)
+    edges = [(points[index], points[(index + 1) % count]) for index in range(count)]
+    for index, (start, end) in enumerate(edges):
+        following = edges[(index + 1) % count][1]
+        # Adjacent walls only share their corner; one doubling back along the other is a spike
+        if _orientation(start, end, following) == 0:
+            if (end[0] - start[0]) * (following[0] - end[0]) + (end[1] - start[1]) * (following[1] - end[1]) < 0:
+                raise FloorPlanError(f"The outline doubles back on itself at point {(index + 1) % count + 1}.")
+        for other in range(index + 2, count):
+            if index == 0 and other == count - 1:
+                continue  # The last edge shares the first point
+            if _segments_touch(start, end, *edges[other]):
+                raise FloorPlanError(f"Wall {index + 1} crosses wall {other + 1}; the outline must not cross itself.")
+
+
+def parse_outline(outline, unit, check=True):
+    """
+    Corner points (micrometres) from [[x, y], ...] or [{"x": .., "y": ..}, ...]
+    in the project's unit. A closing point equal to the first and repeated
+    points are dropped. With check, self-intersecting outlines are rejected.
+    """
+    outline = _load(outline, "The floor outline")
+    if not isinstance(outline, (list, tuple)):
+        raise FloorPlanError("The floor outline must be a list of [x, y] points.")
+    if len(outline) > MAX_OUTLINE_POINTS + 1:
+        raise FloorPlanError(f"The floor outline can have at most {MAX_OUTLINE_POINTS} points.")
+    factor = _unit_factor(unit)
+    points = []
+    for number, point in enumerate(outline, start=1):
+        if isinstance(point, dict):
+            point = (point.get('x'), point.get('y'))
+        if not isinstance(point, (list, tuple)) or len(point) != 2:
+            raise FloorPlanError(f"Point {number} of the floor outline must be [x, y].")
+        point = (
+            _length(point[0], factor, f"Point {number} x", allow_negative=True),
+            _length(point[1], factor, f"Point {number} y", allow_negative=True),
+        )
+        if not points or point != points[-1]:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        raise FloorPlanError("The floor outline needs at least 3 different points.")
+    if check:
+        check_simple(points)
+    if not twice_area(points):
+        raise FloorPlanError("The floor outline has no area.")
+    return points
+
+
+def twice_area(points):
+    """Twice the polygon's signed area in square micrometres (positive when counter-clockwise)."""
+    total = 0
+    previous_x, previous_y = points[-1]
+    for x, y in points:
+        total += previous_x * y - x * previous_y
+        previous_x, previous_y = x, y
+    return total
+
+
+def edge_lengths(points):
+    """Length of each wall (micrometres), wall i running from point i to point i + 1."""
+    lengths = []
+    previous_x, previous_y = points[-1]
+    for x, y in points:
+        dx, dy = x - previous_x, y - previous_y
+        lengths.append(abs(dx) + abs(dy) if not dx or not dy else _sqrt_round(dx * dx + dy * dy))
+        previous_x, previous_y = x, y
+    # Edge i above is the one ending at point i; walls are numbered from their first point
+    return lengths[1:] + lengths[:1]
+
+
+def parse_wall_heights(wall_heights, wall_count, default_height, unit):
+    """Height of each wall (micrometres); missing or null entries use the room height."""
+    wall_heights = _load(wall_heights, "The wall heights")
+    if wall_heights in (None, ''):
+        return [default_height] * wall_count
+    if not isinstance(wall_heights, (list, tuple)):
+        raise FloorPlanError("The wall heights must be a list with one height per wall.")
+    if len(wall_heights) > wall_count:
+        raise FloorPlanError(f"There are {len(wall_heights)} wall heights for {wall_count} walls.")
+    factor = _unit_factor(unit)
+    heights = [
+        default_height if height in (None, '') else _length(height, factor, f"The height of wall {number}")
+        for number, height in enumerate(wall_heights, start=1)
+    ]
+    return heights + [default_height] * (wall_count - len(heights))
+
+
+def parse_openings(openings, unit):
+    """
+    Openings as (wall index or None, width, height, count) in micrometres from
+    [{"width", "height", "count" (default 1), "wall" (1-based, optional), "kind"}, ...].
+    """
+    openings = _load(openings, "The openings")
+    if openings in (None, ''):
+        return []
+    if not isinstance(openings, (list, tuple)):
+        raise FloorPlanError("The openings must be a list.")
+    if len(openings) > MAX_OPENINGS:
+        raise FloorPlanError(f"A room can have at most {MAX_OPENINGS} openings.")
+    factor = _unit_factor(unit)
+    parsed = []
+    for number, opening in enumerate(openings, start=1):
+        if not isinstance(opening, dict):
+            raise FloorPlanError(f"Opening {number} must be an object with a width and a height.")
+        if opening.get('kind', 'other') not in OPENING_KINDS:
+            raise FloorPlanError(f"Opening {number} kind must be one of {', '.join(OPENING_KINDS)}.")
+        width = _length(opening.get('width'), factor, f"Opening {number} width")
+        height = _length(opening.get('height'), factor, f"Opening {number} height")
+        count = opening.get('count', 1)
+        if isinstance(count, bool) or not isinstance(count, int) or not 1 <= count <= 1000:
+            raise FloorPlanError(f"Opening {number} count must be a whole number from 1 to 1000.")
+        wall = opening.get('wall')
+        if wall is not None and (isinstance(wall, bool) or not isinstance(wall, int) or wall < 1):
+            raise FloorPlanError(f"Opening {number} wall must be a wall number (1 for the first wall).")
+        parsed.append((wall - 1 if wall is not None else None, width, height, count))
+    return parsed
+
+
+def calculate_floor_plan(length, breadth, height, unit='meters', floor_outline=None, wall_heights=None, openings=None, check=False):
+    """
+    Floor area, wall area (square millimetres, and exactly as twice the
+    square micrometres), perimeter (micrometres) and per-wall breakdown for a room. Without an outline the floor is the
+    length x breadth rectangle, walls 1-4 running along the length, breadth,
+    length and breadth; otherwise the outline's edges. Raises FloorPlanError.
+    """
+    factor = _unit_factor(unit)
+    room_height = to_fixed(height or 0, factor)
+    if floor_outline not in (None, '', []):
+        points = parse_outline(floor_outline, unit, check=check)
+        twice_floor_area = abs(twice_area(points))
+        lengths = edge_lengths(points)
+    else:
+        room_length, room_breadth = to_fixed(length or 0, factor), to_fixed(breadth or 0, factor)
+        if room_length <= 0 or room_breadth <= 0:
+            twice_floor_area, lengths = 0, []
+        else:
+            twice_floor_area = 2 * room_length * room_breadth
+            lengths = [room_length, room_breadth, room_length, room_breadth]
+
+    heights = parse_wall_heights(wall_heights, len(lengths), max(room_height, 0), unit)
+    gross = [wall_length * wall_height for wall_length, wall_height in zip(lengths, heights)]
+    wall_area = sum(gross)
+
+    openings_area = 0
+    taken = [0] * len(lengths)
+    for wall, width, opening_height, count in parse_openings(openings, unit):
+        area = width * opening_height * count
+        if wall is not None:
+            if wall >= len(lengths):
+                raise FloorPlanError(f"Opening on wall {wall + 1}, but the room has {len(lengths)} walls.")
+            if width > lengths[wall] or opening_height > heights[wall]:
+                raise FloorPlanError(f"An opening on wall {wall + 1} is larger than the wall.")
+            taken[wall] += area
+            if taken[wall] > gross[wall]:
+                raise FloorPlanError(f"The openings on wall {wall + 1} add up to more than the wall.")
+        openings_area += area
+    if openings_area > wall_area:
+        raise FloorPlanError("The openings add up to more than the wall area.")
+
+    walls = [
+        PlanWall(wall_length, wall_height, div_round(area - opening_area, SQUARE))
+        for wall_length, wall_height, area, opening_area in zip(lengths, heights, gross, taken)
+    ]
+    return FloorPlan(
+        floor_area=div_round(twice_floor_area, 2 * SQUARE),
+        wall_area=div_round(wall_area - openings_area, SQUARE),
+        perimeter=sum(lengths),
+        openings_area=div_round(openings_area, SQUARE),
+        walls=walls,
+        twice_floor_area=twice_floor_area,
+        twice_wall_area=2 * (wall_area - openings_area),
+    )
+
+
+def validate_floor_plan(length, breadth, height, unit='meters', floor_outline=None, wall_heights=None, openings=None):
+    """Full check of a room's plan before it is saved (self-intersections included); raises FloorPlanError."""
+    return calculate_floor_plan(length, breadth, height, unit, floor_outline, wall_heights, openings, check=True)
+
+
+def has_floor_plan(room):
+    """Whether the room uses more than the plain length x breadth x height box."""
+    return bool(room.floor_outline or room.wall_heights or room.openings)
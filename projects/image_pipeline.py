@@ -0,0 +1,376 @@
+"""
+Image processing for uploaded tile and supplier images.
+
+Uploads are saved as they come and a ProcessedImage row is queued for the
+field (queue_image / queue_uploaded_images). The process_images management
+command works the queue off outside the request:
+
+- the original is decoded once (JPEG draft mode when only smaller sizes are
+  needed), turned upright from its EXIF orientation, and re-encoded for each
+  variant without EXIF, GPS or ICC metadata;
+- variants are fixed sizes (longest side) in WebP and JPEG, never larger
+  than the original;
+- dominant colours come from a median-cut palette of a 64 px copy;
+- the perceptual hash is the usual 64-bit DCT hash (low frequencies of a
+  32 x 32 greyscale copy against their median), so resized or recompressed
+  copies of a picture land a few bits apart.
+
+A claimed job holds a lease of LEASE_SECONDS, as PDF jobs do (pdf_jobs): a
+job whose worker died is claimed again once its lease is over, and fails
+after MAX_ATTEMPTS claims.
+
+best_variant picks the smallest variant that covers the width a client asks
+for, preferring WebP when the client accepts it.
+"""
+
+import datetime
+import io
+import math
+import traceback
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ProcessedImage
+
+# Variant name -> longest side in pixels, smallest first
+VARIANT_SIZES = {
+    'thumb': 160,
+    'small': 480,
+    'medium': 960,
+    'large': 1600,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_STORAGE_DIR = 'image_variants'
+
+# Refuse sources beyond this many pixels (decompression bombs)
+MAX_SOURCE_PIXELS = 50_000_000
+MAX_ATTEMPTS = 3
+LEASE_SECONDS = 300      # Far longer than the largest allowed source takes
+ORIENTATION_TAG = 0x0112
+
+DOMINANT_COLOR_COUNT = 5
+HASH_SIZE = 8            # 8 x 8 low frequencies -> 64 bits
+HASH_SAMPLE_SIZE = 32
+SIMILAR_MAX_DISTANCE = 10
+
+# Model -> image fields that get processed
+IMAGE_FIELDS = {
+    ('projects', 'tile'): ['processed_image'],
+    ('suppliers', 'supplier'): ['logo', 'shop_image'],
+    ('suppliers', 'supplierproduct'): ['image', 'image2', 'image3'],
+}
+
+
+def _image_fields(instance):
+    return IMAGE_FIELDS.get((instance._meta.app_label, instance._meta.model_name), [])
+
+
+def queue_image(instance, field_name):
+    """
+    Queues (or re-queues, after a new upload) processing of one image field.
+    Returns the ProcessedImage, or None when the field is empty.
+    """
+    image_file = getattr(instance, field_name)
+    if not image_file:
+        return None
+    job, _ = ProcessedImage.objects.update_or_create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        field_name=field_name,
+        defaults={'source_name': image_file.name, 'status': 'pending', 'attempts': 0, 'error': '', 'lease_expires_at': None},
+    )
+    return job
+
+
+def queue_uploaded_images(instance, uploaded_files):
+    """Queues the instance's image fields that were uploaded in this request (request.FILES)."""
+    return [queue_image(instance, field_name) for field_name in _image_fields(instance) if field_name in uploaded_files]
+
+
+# --- Processing ---
+
+def _open_source(job, max_side):
+    with default_storage.open(job.source_name, 'rb') as source:
+        data = source.read()
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > MAX_SOURCE_PIXELS:
+        raise ValueError(f"Image is {image.width} x {image.height}; at most {MAX_SOURCE_PIXELS} pixels are processed.")
+    original_size = image.size
+    if image.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8):
+        original_size = original_size[::-1]  # Stored on its side
+    if image.format == 'JPEG':
+        # Let the decoder scale down by 1/2, 1/4 or 1/8 while staying above the largest variant
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    image.info = {}  # Nothing from the original (EXIF, GPS, ICC, comments) is written out
+    return image, original_size
+
+
+def _flatten(image):
+    """RGBA to RGB on white, for JPEG."""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def dominant_colors(image, count=DOMINANT_COLOR_COUNT):
+    """The most common colours as [{'color': '#rrggbb', 'share': percent}]."""
+    sample = _flatten(image).copy()
+    sample.thumbnail((64, 64))
+    palette_image = sample.quantize(colors=count, method=Image.Quantize.MEDIANCUT)
+    palette = palette_image.getpalette()
+    pixels = sample.width * sample.height
+    colors = []
+    for pixel_count, index in sorted(palette_image.getcolors(), reverse=True)[:count]:
+        red, green, blue = palette[index * 3:index * 3 + 3]
+        colors.append({'color': f"#{red:02x}{green:02x}{blue:02x}", 'share': round(100 * pixel_count / pixels, 1)})
+    return colors
+
+
+_DCT_COSINES = [
+    [math.cos((2 * position + 1) * frequency * math.pi / (2 * HASH_SAMPLE_SIZE)) for position in range(HASH_SAMPLE_SIZE)]
+    for frequency in range(HASH_SIZE)
+]
+
+
+def perceptual_hash(image):
+    """64-bit DCT hash as 16 hex digits."""
+    grey = _flatten(image).convert('L').resize((HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(grey.getdata())
+    rows = [pixels[row * HASH_SAMPLE_SIZE:(row + 1) * HASH_SAMPLE_SIZE] for row in range(HASH_SAMPLE_SIZE)]
+    # Only the lowest HASH_SIZE frequencies are needed in each direction
+    row_dct = [[sum(c * p for c, p in zip(cosines, row)) for cosines in _DCT_COSINES] for row in rows]
+    coefficients = [
+        sum(c * row_dct[row][u] for row, c in enumerate(_DCT_COSINES[v]))
+        for v in range(HASH_SIZE) for u in range(HASH_SIZE)
+    ]
+    median = sorted(coefficients[1:])[len(coefficients) // 2]  # The DC term only says how bright it is
+    bits = 0
+    for coefficient in coefficients:
+        bits = (bits << 1) | (coefficient > median)
+    return f"{bits:016x}"
+
+
+def _delete_variants(variants):
+    for formats in (variants or {}).values():
+        for variant in formats.values():
+            if default_storage.exists(variant['name']):
+                default_storage.delete(variant['name'])
+
+
+def _save_result(job, fields):
+    """
+    Saves the job and ends its lease, unless a new upload re-queued it while it
+    was being processed (that upload gets processed on its own) or its lease
+    ran out and another worker claimed it. Returns whether it was saved.
+    """
+    return bool(ProcessedImage.objects.filter(
+        pk=job.pk, status='processing', source_name=job.source_name, lease_expires_at=job.lease_expires_at,
+    ).update(lease_expires_at=None, **{field: getattr(job, field) for field in fields}))
+
+
+def process_image(job):
+    """
+    Processes a claimed job (status processing, see claim_next_job) and saves the
+    results on it. Errors put it back to pending for a retry, or failed after MAX_ATTEMPTS.
+    """
+    try:
+        largest = max(VARIANT_SIZES.values())
+        image, original_size = _open_source(job, largest)
+        old_variants = job.variants
+        variants = {}
+        thumbnail = None
+        for name, size in VARIANT_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+            thumbnail = thumbnail or variant
+            variants[name] = {}
+            for extension, (pillow_format, options) in VARIANT_FORMATS.items():
+                encoded = io.BytesIO()
+                (variant if pillow_format == 'WEBP' else _flatten(variant)).save(encoded, pillow_format, **options)
+                storage_name = default_storage.save(
+                    f"{VARIANT_STORAGE_DIR}/{job.pk}/{name}.{extension}", ContentFile(encoded.getvalue()),
+                )
+                variants[name][extension] = {
+                    'name': storage_name, 'width': variant.width, 'height': variant.height, 'bytes': encoded.tell(),
+                }
+            if size >= max(original_size):
+                break  # This one is already the original size
+
+        job.variants = variants
+        job.width, job.height = original_size
+        # Both only look at a few dozen pixels, so the thumbnail is plenty
+        job.dominant_colors = dominant_colors(thumbnail)
+        job.perceptual_hash = perceptual_hash(thumbnail)
+        job.status = 'done'
+        job.error = ''
+        job.processed_at = timezone.now()
+        if _save_result(job, ['variants', 'width', 'height', 'dominant_colors', 'perceptual_hash', 'status', 'error', 'processed_at']):
+            _delete_variants(old_variants)
+        else:
+            _delete_variants(variants)
+    except Exception as e:
+        print(f"Image processing failed for ProcessedImage {job.pk} ({job.source_name}): {e}")
+        traceback.print_exc()
+        job.status = 'pending' if job.attempts < MAX_ATTEMPTS else 'failed'
+        job.error = str(e)[:1000]
+        _save_result(job, ['status', 'error'])
+    return job
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending job as processing under a lease and returns it
+    (None when the queue is empty). A processing job whose lease is over (its
+    worker died), or that has none (claimed before leases), counts as pending.
+    """
+    while True:
+        now = timezone.now()
+        job = ProcessedImage.objects.filter(
+            Q(status='pending') | Q(status='processing', lease_expires_at__lte=now) | Q(status='processing', lease_expires_at__isnull=True)
+        ).order_by('created_at', 'pk').first()
+        if job is None:
+            return None
+        if job.status == 'processing' and job.attempts >= MAX_ATTEMPTS:
+            ProcessedImage.objects.filter(pk=job.pk, status='processing', lease_expires_at=job.lease_expires_at).update(
+                status='failed', error="Processing did not finish in time.", lease_expires_at=None,
+            )
+            continue
+        lease_expires_at = now + datetime.timedelta(seconds=LEASE_SECONDS)
+        # Only one worker gets it: the update matches nothing if another one was first
+        claimed = ProcessedImage.objects.filter(pk=job.pk, status=job.status, lease_expires_at=job.lease_expires_at).update(
+            status='processing', lease_expires_at=lease_expires_at, attempts=job.attempts + 1,
+        )
+        if claimed:
+            job.status, job.lease_expires_at = 'processing', lease_expires_at
+            job.attempts += 1
+            return job
+
+
+def process_pending_images(limit=None):
+    """Works off pending jobs. Returns the processed jobs."""
+    processed = []
+    while limit is None or len(processed) < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        processed.append(process_image(job))
+    return processed
+
+
+# --- Lookup ---
+
+def _images_of(model, sources):
+    return Q(content_type=ContentType.objects.get_for_model(model), object_id__in=sources.values('pk'))
+
+
+def public_images():
+    """The images anyone may look up: the logos, shop photos and product images of active suppliers."""
+    from suppliers.models import Supplier, SupplierProduct
+
+    return ProcessedImage.objects.filter(
+        _images_of(Supplier, Supplier.objects.filter(is_active=True))
+        | _images_of(SupplierProduct, SupplierProduct.objects.filter(supplier__is_active=True))
+    )
+
+
+def visible_images(user):
+    """
+    The images a signed-in user may look up: the public ones, their own tile
+    uploads and their own supplier's images (staff see every image).
+    """
+    from suppliers.models import Supplier, SupplierProduct
+    from .models import Tile
+
+    if user.is_staff:
+        return ProcessedImage.objects.all()
+    return ProcessedImage.objects.filter(
+        _images_of(Supplier, Supplier.objects.filter(Q(is_active=True) | Q(dashboard_user=user)))
+        | _images_of(SupplierProduct, SupplierProduct.objects.filter(Q(supplier__is_active=True) | Q(supplier__dashboard_user=user)))
+        | _images_of(Tile, Tile.objects.filter(user=user))
+    )
+
+
+def variant_url(variant):
+    return default_storage.url(variant['name'])
+
+
+def best_variant(job, width=None, accept=''):
+    """
+    The smallest variant at least `width` pixels wide (the largest there is
+    when none is), WebP when 'image/webp' is in the Accept header.
+    Returns (variant name, format, variant) or None when not processed yet.
+    """
+    if job.status != 'done' or not job.variants:
+        return None
+    extension = 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+    names = sorted(job.variants, key=lambda name: job.variants[name][extension]['width'])
+    chosen = names[-1]
+    if width:
+        for name in names:
+            if job.variants[name][extension]['width'] >= width:
+                chosen = name
+                break
+    return chosen, extension, job.variants[chosen][extension]
+
+
+def hamming_distance(hash_a, hash_b):
+    return (int(hash_a, 16) ^ int(hash_b, 16)).bit_count()
+
+
+def find_similar_images(job, images, max_distance=SIMILAR_MAX_DISTANCE, limit=20):
+    """
+    Processed images among `images` (a ProcessedImage queryset, e.g.
+    visible_images(user)) whose perceptual hash is within max_distance bits,
+    closest first.
+    """
+    if not job.perceptual_hash:
+        return []
+    candidates = images.filter(status='done').exclude(Q(pk=job.pk) | Q(perceptual_hash=''))
+    target = int(job.perceptual_hash, 16)
+    matches = []
+    for pk, image_hash in candidates.values_list('pk', 'perceptual_hash'):
+        distance = (target ^ int(image_hash, 16)).bit_count()
+        if distance <= max_distance:
+            matches.append((distance, pk))
+    matches.sort()
+    matches = matches[:limit]
+    jobs = images.in_bulk([pk for _, pk in matches])
+    return [(jobs[pk], distance) for distance, pk in matches]
+
+
+def describe_image(job):
+    """Status, colours, hash and variant URLs of a job, for API responses."""
+    return {
+        'id': job.pk,
+        'source_type': ContentType.objects.get_for_id(job.content_type_id).model,
+        'source_id': job.object_id,
+        'field': job.field_name,
+        'status': job.status,
+        'width': job.width,
+        'height': job.height,
+        'dominant_colors': job.dominant_colors,
+        'perceptual_hash': job.perceptual_hash,
+        'variants': {
+            name: {extension: {**variant, 'url': variant_url(variant)} for extension, variant in formats.items()}
+            for name, formats in (job.variants or {}).items()
+        },
+    }
+
+
+def image_variants(instance):
+    """{field name: describe_image(...)} for an object's processed images (uses processed_images, so prefetch it)."""
+    return {job.field_name: describe_image(job) for job in instance.processed_images.all()}
@@ -0,0 +1,386 @@
+import decimal
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.fixed_point import (
+    AREA_SCALE, to_fixed, to_pesewas, to_area, from_fixed, from_pesewas,
+)
+from projects.project_calculations import (
+    HARDCODED_DEFAULT_ROLE_COVERAGE,
+    calculate_room_areas, calculate_material_quantities, calculate_estimated_days,
+    calculate_worker_cost, calculate_financial_totals,
+)
+from manual_estimate.services import calculate_labour_totals
+
+D = decimal.Decimal
+TWO_PLACES = D('0.01')
+
+MEASUREMENT_UNITS = ['meters', 'feet', 'inches', 'centimeters']
+TILING_MATERIALS = ['cement', 'sand', 'chemical', 'tile cement', 'grout']
+ROLES = ['master', 'labourer', 'painter', 'supervisor', 'tiler']
+
+
+# --- Decimal reference: the calculations as they were before the fixed-point core ---
+# Kept verbatim (float-built constants included) so the parity check compares
+# against what is stored for existing projects.
+
+REF_CONVERSION_FACTORS = {
+    'meters': D(1),
+    'feet': D(0.3048),
+    'inches': D(0.0254),
+    'centimeters': D(0.01),
+}
+REF_TILING_RATES = {
+    'cement': D(1) / D(6),
+    'sand': D(1.4) / D(6),
+    'chemical': D(1) / D(6.72),
+    'tile cement': D(1) / D(4),
+    'grout': D(1) / D(4.6666),
+}
+REF_SQ_YARD = D('0.836127')
+
+# Project values computed from total_area_with_waste
+AREA_DERIVED_FIELDS = {'total_labor_cost', 'profit', 'cost_per_area'}
+
+
+def ref_area_with_wastage(area):
+    if area <= 20:
+        percent = 20
+    elif area <= 50:
+        percent = 16
+    elif area <= 100:
+        percent = 8
+    else:
+        percent = 5
+    return (area * (D("1.00") + D(percent) / D("100"))).quantize(D("1.00"))
+
+
+def ref_wheelbarrows(wheelbarrows):
+    if wheelbarrows >= 300:
+        return round(wheelbarrows / 300, 2), "large tipper"
+    elif wheelbarrows >= 175:
+        return round(wheelbarrows / 175, 2), "small tipper"
+    elif wheelbarrows >= 1:
+        return round(wheelbarrows, 2), "wheelbarrow"
+    return round(wheelbarrows * 8, 2), "headpan"
+
+
+def ref_material_tier(wastage, area):
+    if wastage <= 3.01:
+        return 5 if area <= 55 else 3 if area <= 200 else 2
+    elif wastage <= 5.01:
+        return 10 if area <= 55 else 7 if area <= 200 else 5
+    return 15 if area <= 55 else 12 if area <= 200 else 10
+
+
+def reference_project(case):
+    unit = case['unit']
+    factor = REF_CONVERSION_FACTORS[unit]
+    results = {}
+    total_floor = total_wall = D(0)
+    total_floor_ww = total_wall_ww = D(0)
+    for index, (length, breadth, height) in enumerate(case['rooms']):
+        length_m, breadth_m, height_m = D(length) * factor, D(breadth) * factor, D(height) * factor
+        floor = wall = D(0)
+        if length_m > 0 and breadth_m > 0:
+            floor = length_m * breadth_m
+            if height_m > 0:
+                wall = (2 * length_m + 2 * breadth_m) * height_m
+        floor_ww, wall_ww = ref_area_with_wastage(floor), ref_area_with_wastage(wall)
+        results[f'room{index}.floor_area'] = floor
+        results[f'room{index}.wall_area'] = wall
+        results[f'room{index}.floor_area_with_waste'] = floor_ww
+        results[f'room{index}.wall_area_with_waste'] = wall_ww
+        results[f'room{index}.total_area_with_waste'] = ref_area_with_wastage(floor + wall)
+        # The project totals add up the rooms as stored
+        total_floor += stored_reference_value(floor)
+        total_wall += stored_reference_value(wall)
+        total_floor_ww += floor_ww
+        total_wall_ww += wall_ww
+    total_area = total_floor + total_wall
+    total_area_ww = total_floor_ww + total_wall_ww
+    results['total_area'] = total_area
+    results['total_area_with_waste'] = total_area_ww
+
+    floor_cov = wall_cov = D(0)
+    for role, count, _rate in case['workers']:
+        defaults = HARDCODED_DEFAULT_ROLE_COVERAGE.get(role, HARDCODED_DEFAULT_ROLE_COVERAGE['default'])
+        floor_cov += D(str(defaults['floor'])) * count
+        wall_cov += D(str(defaults['wall'])) * count
+    days_raw = D(0)
+    if total_floor > 0 and floor_cov > 0:
+        days_raw += total_floor / floor_cov
+    if total_wall > 0 and wall_cov > 0:
+        days_raw += total_wall / wall_cov
+    days = 0
+    if days_raw > 0:
+        days = max(1, math.ceil(days_raw))
+    results['estimated_days'] = D(days)
+
+    workers_total = D(0)
+    for index, (role, count, rate) in enumerate(case['workers']):
+        cost = (D(rate) * count * days).quantize(TWO_PLACES) if count and days else D(0)
+        results[f'worker{index}.total_cost'] = cost
+        workers_total += cost
+
+    wastage = D(case['wastage'])
+    mortar = D(case['mortar'])
+    for name in case['materials']:
+        raw = total_area * REF_TILING_RATES[name] if total_area else D(0)
+        tier = ref_material_tier(wastage, total_area)
+        multiplier = D(1) + D(tier) / D(100)
+        with_wastage = raw * multiplier
+        if mortar >= D('9.88') and name in ['cement', 'sand', 'tile cement', 'chemical']:
+            with_wastage *= D(1) + D(7) / D(100)
+        if name == 'sand':
+            value, _unit = ref_wheelbarrows(float(raw))
+            raw, with_wastage = D(str(value)), D(str(value * float(multiplier)))
+        elif name == 'grout':
+            value = round(float(raw) / 3)
+            raw, with_wastage = D(str(value)), D(str(value * float(multiplier)))
+        results[f'{name}.quantity'] = raw
+        results[f'{name}.quantity_with_wastage'] = with_wastage
+        wastage = D(tier)
+
+    profit_value = D(case['profit_value'])
+    labour = profit = D(0)
+    if profit_value > 0:
+        if case['profit_type'] == 'fixed':
+            labour = profit_value
+            profit = profit_value - workers_total
+        elif case['profit_type'] == 'per_area' and total_area_ww > 0:
+            labour = profit_value * total_area_ww
+            profit = labour - workers_total
+    results['total_labor_cost'] = labour
+    results['profit'] = profit
+    if total_area_ww > 0:
+        results['cost_per_area'] = labour / total_area_ww if case['profit_type'] == 'fixed' else profit_value
+    else:
+        results['cost_per_area'] = D(0)
+    return results
+
+
+def reference_manual(case):
+    area = D(case['area'])
+    profit_value = D(case['profit_value'])
+    labour = per_sq_m = D(0)
+    if case['profit_type'] == 'fixed_amount':
+        if area > 0:
+            labour = profit_value
+            per_sq_m = profit_value / area
+    elif case['profit_type'] == 'per_sq_meter':
+        per_sq_m = profit_value
+        labour = area * per_sq_m
+    elif case['profit_type'] == 'per_sq_yard':
+        per_sq_m = profit_value / REF_SQ_YARD
+        labour = area * per_sq_m
+    return {'total_labour_cost': labour, 'labour_per_sq_meter': per_sq_m}
+
+
+# --- Fixed-point path: the kernels the application uses ---
+
+def fixed_project(case):
+    unit = case['unit']
+    results = {}
+    total_floor = total_wall = total_floor_ww = total_wall_ww = 0
+    for index, (length, breadth, height) in enumerate(case['rooms']):
+        floor, wall, total, floor_ww, wall_ww, total_ww = calculate_room_areas(length, breadth, height, unit)
+        results[f'room{index}.floor_area'] = floor
+        results[f'room{index}.wall_area'] = wall
+        results[f'room{index}.floor_area_with_waste'] = floor_ww
+        results[f'room{index}.wall_area_with_waste'] = wall_ww
+        results[f'room{index}.total_area_with_waste'] = total_ww
+        total_floor += floor
+        total_wall += wall
+        total_floor_ww += floor_ww
+        total_wall_ww += wall_ww
+    total_area = total_floor + total_wall
+    total_area_ww = total_floor_ww + total_wall_ww
+    results['total_area'] = total_area
+    results['total_area_with_waste'] = total_area_ww
+
+    floor_cov = wall_cov = 0
+    for role, count, _rate in case['workers']:
+        defaults = HARDCODED_DEFAULT_ROLE_COVERAGE.get(role, HARDCODED_DEFAULT_ROLE_COVERAGE['default'])
+        floor_cov += to_area(defaults['floor']) * count
+        wall_cov += to_area(defaults['wall']) * count
+    days = calculate_estimated_days(total_floor, total_wall, floor_cov, wall_cov)
+    results['estimated_days'] = days
+
+    workers_total = 0
+    for index, (role, count, rate) in enumerate(case['workers']):
+        cost = calculate_worker_cost(to_pesewas(rate), count, 'daily', days)
+        results[f'worker{index}.total_cost'] = cost
+        workers_total += cost
+
+    wastage = to_fixed(case['wastage'], 100)
+    mortar = to_fixed(case['mortar'], 100)
+    for name in case['materials']:
+        quantity, with_wastage, _unit, tier = calculate_material_quantities(
+            name, 'tiling', total_area, wastage, mortar, case['materials'],
+        )
+        results[f'{name}.quantity'] = quantity
+        results[f'{name}.quantity_with_wastage'] = with_wastage
+        wastage = tier * 100
+
+    labour, profit, cost_per_area = calculate_financial_totals(
+        case['profit_type'], to_pesewas(case['profit_value']), total_area_ww, workers_total,
+    )
+    results['total_labor_cost'] = labour
+    results['profit'] = profit
+    results['cost_per_area'] = cost_per_area
+    return results
+
+
+def fixed_manual(case):
+    labour, per_sq_m = calculate_labour_totals(case['profit_type'], to_pesewas(case['profit_value']), to_area(case['area']))
+    return {'total_labour_cost': labour, 'labour_per_sq_meter': per_sq_m}
+
+
+MONEY_FIELDS = ('total_cost', 'total_labor_cost', 'total_labour_cost', 'profit', 'cost_per_area', 'labour_per_sq_meter')
+
+
+def stored_fixed_value(key, value):
+    """Fixed-point result as it would be stored (2 places)."""
+    if key == 'estimated_days':
+        return D(value)
+    if key.endswith(MONEY_FIELDS):
+        return from_pesewas(value)
+    return from_fixed(value, AREA_SCALE, 2)  # areas and quantities share the same scale
+
+
+def stored_reference_value(value):
+    """Decimal result as DecimalField stores it (quantized half-even to 2 places)."""
+    return D(value).quantize(TWO_PLACES, rounding=decimal.ROUND_HALF_EVEN)
+
+
+def compare_case(kind, index, expected, actual):
+    """
+    The stored values of one case that differ, as (off_by_cent, failures) lists
+    of (kind, index, key, decimal, fixed, exact decimal). The Decimal code's
+    float-built constants (Decimal(0.3048), Decimal(1.4)) and float rounding of
+    sand and grout put some values 0.01 off, and the values worked out from
+    them move along; anything else is a real bug.
+    """
+    differing = {}
+    for key, value in expected.items():
+        old_value = stored_reference_value(value)
+        new_value = stored_fixed_value(key, actual[key])
+        if old_value != new_value:
+            differing[key] = (kind, index, key, old_value, new_value, value)
+
+    def off_by_cent(key):
+        return key in differing and abs(differing[key][3] - differing[key][4]) <= TWO_PLACES
+
+    # The total area is multiplied by the per-area profit rate, and the sand and
+    # grout quantities by the wastage multiplier.
+    carried = set(AREA_DERIVED_FIELDS) if off_by_cent('total_area_with_waste') else set()
+    carried.update(f'{key}_with_wastage' for key in differing if key.endswith('.quantity') and off_by_cent(key))
+    small, failures = [], []
+    for key, entry in differing.items():
+        (small if off_by_cent(key) or key in carried else failures).append(entry)
+    return small, failures
+
+
+def random_dimension(rng, low, high):
+    # Model fields hand the calculations 2-place Decimals
+    return D(f"{rng.uniform(low, high):.2f}")
+
+
+def random_project_case(rng):
+    return {
+        'unit': rng.choice(MEASUREMENT_UNITS),
+        'rooms': [
+            (random_dimension(rng, 0.5, 30), random_dimension(rng, 0.5, 30), random_dimension(rng, 0, 4))
+            for _ in range(rng.randint(1, 8))
+        ],
+        'workers': [
+            (rng.choice(ROLES), rng.randint(1, 4), random_dimension(rng, 50, 400))
+            for _ in range(rng.randint(1, 3))
+        ],
+        'materials': rng.sample(TILING_MATERIALS, rng.randint(1, len(TILING_MATERIALS))),
+        'wastage': D(rng.choice(['3.00', '5.00', '10.00', '12.00'])),
+        'mortar': D(rng.choice(['5.00', '9.88', '10.00', '20.00'])),
+        'profit_type': rng.choice(['fixed', 'per_area']),
+        'profit_value': random_dimension(rng, 0, 20000),
+    }
+
+
+def random_manual_case(rng):
+    return {
+        'area': random_dimension(rng, 0, 800),
+        'profit_type': rng.choice(['fixed_amount', 'per_sq_meter', 'per_sq_yard']),
+        'profit_value': random_dimension(rng, 0, 50000),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the fixed-point estimate calculations against the previous Decimal '
+        'implementation and check that both produce the same stored values on random inputs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=2000, help='Number of random cases of each kind.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed (printed so a failing run can be repeated).')
+        parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions; the best run is reported.')
+        parser.add_argument('--show', type=int, default=10, help='Number of mismatching cases to print.')
+
+    def handle(self, *args, **options):
+        seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+        rng = random.Random(seed)
+        project_cases = [random_project_case(rng) for _ in range(options['cases'])]
+        manual_cases = [random_manual_case(rng) for _ in range(options['cases'])]
+        self.stdout.write(f"Seed {seed}: {len(project_cases)} project cases, {len(manual_cases)} manual estimate cases.")
+
+        # --- Parity ---
+        compared = 0
+        off_by_cent = []
+        failures = []
+        for kind, cases, reference, fixed in (
+            ('project', project_cases, reference_project, fixed_project),
+            ('manual', manual_cases, reference_manual, fixed_manual),
+        ):
+            for index, case in enumerate(cases):
+                expected = reference(case)
+                actual = fixed(case)
+                compared += len(expected)
+                small, large = compare_case(kind, index, expected, actual)
+                off_by_cent.extend(small)
+                failures.extend(large)
+
+        self.stdout.write(
+            f"Parity: {compared} values compared, {len(off_by_cent)} differ by 0.01 (float rounding in the Decimal code), "
+            f"{len(failures)} differ by more."
+        )
+        for kind, index, key, old_value, new_value, exact in (failures + off_by_cent)[:options['show']]:
+            self.stdout.write(f"    {kind}[{index}] {key}: decimal {old_value} (exact {exact}) vs fixed {new_value}")
+
+        # --- Benchmark ---
+        for kind, cases, reference, fixed in (
+            ('project', project_cases, reference_project, fixed_project),
+            ('manual', manual_cases, reference_manual, fixed_manual),
+        ):
+            timings = {}
+            for label, func in (('decimal', reference), ('fixed', fixed)):
+                best = None
+                for _ in range(max(1, options['repeat'])):
+                    started = time.perf_counter()
+                    for case in cases:
+                        func(case)
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[label] = best
+            per_case = {label: value / len(cases) * 1e6 for label, value in timings.items()} if cases else {}
+            speedup = timings['decimal'] / timings['fixed'] if timings['fixed'] else 0
+            self.stdout.write(
+                f"{kind}: decimal {per_case.get('decimal', 0):.1f} µs/case, "
+                f"fixed {per_case.get('fixed', 0):.1f} µs/case ({speedup:.2f}x)"
+            )
+
+        if failures:
+            raise CommandError(f"{len(failures)} value(s) differ from the Decimal reference by more than 0.01 (seed {seed}).")
+        self.stdout.write(self.style.SUCCESS("Fixed-point results match the Decimal reference."))
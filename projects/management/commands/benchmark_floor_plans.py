@@ -0,0 +1,111 @@
+import math
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.fixed_point import LENGTH_FACTORS_TO_MICROMETRES
+from projects.floor_plan import calculate_floor_plan, validate_floor_plan
+from projects.project_calculations import SQUARE_MICROMETRES, calculate_room_areas, stored_room_areas
+
+UNITS = list(LENGTH_FACTORS_TO_MICROMETRES)
+
+
+def random_length(rng, low, high):
+    return f"{rng.uniform(low, high):.2f}"
+
+
+def random_outline(rng, points):
+    """A star-shaped (so never self-crossing) outline with the given number of corners, in metres."""
+    # One corner per equal slice of the circle keeps every gap under 180°, so the origin sees every wall
+    step = 360 / points
+    outline = []
+    for index in range(points):
+        angle = (index + rng.uniform(0.1, 0.9)) * step
+        radius = rng.uniform(1, 8)
+        outline.append([f"{radius * math.cos(math.radians(angle)):.3f}", f"{radius * math.sin(math.radians(angle)):.3f}"])
+    return outline
+
+
+class Command(BaseCommand):
+    help = (
+        'Check the floor plan kernel against the rectangle calculation and exact geometric '
+        'identities, and time it per room for outlines of increasing size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=2000, help='Random rooms per check and per outline size.')
+        parser.add_argument('--points', default='4,8,16,32', help='Comma-separated outline sizes to time.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed (printed so a run can be repeated).')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['points'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--points must be a comma-separated list of integers.")
+        seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+        rng = random.Random(seed)
+        cases = max(1, options['cases'])
+        self.stdout.write(f"Seed {seed}, {cases} cases.")
+
+        failures = []
+        for _ in range(cases):
+            unit = rng.choice(UNITS)
+            length, breadth, height = random_length(rng, 0.5, 40), random_length(rng, 0.5, 40), random_length(rng, 0, 12)
+            box = calculate_floor_plan(length, breadth, height, unit)
+            floor, wall = box.floor_area, box.wall_area
+
+            # A rectangle outline is the same room as length x breadth, and stores the same areas
+            plan = calculate_floor_plan(None, None, height, unit, [[0, 0], [length, 0], [length, breadth], [0, breadth]], check=True)
+            stored = calculate_room_areas(length, breadth, height, unit)
+            if (plan.floor_area, plan.wall_area) != (floor, wall) or stored_room_areas(plan.twice_floor_area, plan.twice_wall_area, 2 * SQUARE_MICROMETRES) != stored:
+                failures.append(('rectangle', unit, length, breadth, height, plan, floor, wall, stored))
+
+            # An L is the big rectangle minus the corner cut out; turning and moving it changes nothing
+            cut_length, cut_breadth = random_length(rng, 0.1, float(length) - 0.1), random_length(rng, 0.1, float(breadth) - 0.1)
+            outline = [[0, 0], [length, 0], [length, cut_breadth], [cut_length, cut_breadth], [cut_length, breadth], [0, breadth]]
+            l_plan = calculate_floor_plan(None, None, height, unit, outline, check=True)
+            cut = calculate_floor_plan(f"{float(length) - float(cut_length):.2f}", f"{float(breadth) - float(cut_breadth):.2f}", 0, unit).floor_area
+            turned = [[f"{-float(y) + 3.5:.2f}", f"{float(x) - 7.25:.2f}"] for x, y in outline]
+            turned_plan = calculate_floor_plan(None, None, height, unit, turned, check=True)
+            if abs(l_plan.floor_area - (floor - cut)) > 1 or turned_plan.floor_area != l_plan.floor_area or turned_plan.perimeter != plan.perimeter:
+                failures.append(('L-shape', unit, outline, l_plan, floor - cut, turned_plan))
+
+            # Openings come off the wall area exactly
+            if float(height) > 2.2 and float(length) > 2:
+                with_door = calculate_floor_plan(length, breadth, height, unit, openings=[{'width': '0.9', 'height': '2.1', 'count': 2, 'wall': 1, 'kind': 'door'}])
+                door = calculate_floor_plan('0.9', '2.1', 0, unit).floor_area * 2
+                if abs(wall - with_door.wall_area - door) > 1:
+                    failures.append(('openings', unit, length, breadth, height, with_door, wall, door))
+
+        self.stdout.write(f"Checked {cases} rectangles, L-shapes (turned and moved) and rooms with openings: {len(failures)} mismatches.")
+        for failure in failures[:10]:
+            self.stdout.write(f"  {failure}")
+
+        rectangles = [(random_length(rng, 1, 12), random_length(rng, 1, 12), random_length(rng, 2, 4)) for _ in range(cases)]
+        started = time.perf_counter()
+        for length, breadth, height in rectangles:
+            calculate_room_areas(length, breadth, height)
+        baseline = (time.perf_counter() - started) / cases * 1e6
+        self.stdout.write(f"length x breadth x height: {baseline:.1f} µs per room")
+
+        for size in sizes:
+            outlines = [random_outline(rng, size) for _ in range(cases)]
+            heights = [[random_length(rng, 1, 4) for _ in range(size)] for _ in range(cases)]
+            openings = [{'width': '0.9', 'height': '2.1', 'kind': 'door'}, {'width': '1.2', 'height': '0.9', 'count': 2, 'kind': 'window'}]
+            started = time.perf_counter()
+            for outline, wall_heights in zip(outlines, heights):
+                calculate_floor_plan(None, None, '3', 'meters', outline, wall_heights, openings)
+            calculation = (time.perf_counter() - started) / cases * 1e6
+            started = time.perf_counter()
+            for outline, wall_heights in zip(outlines, heights):
+                validate_floor_plan(None, None, '3', 'meters', outline, wall_heights, openings)
+            validation = (time.perf_counter() - started) / cases * 1e6
+            self.stdout.write(
+                f"{size:>3}-corner outline, per-wall heights, 2 openings: "
+                f"{calculation:.1f} µs per room to calculate, {validation:.1f} µs to validate on save"
+            )
+
+        if failures:
+            raise CommandError(f"{len(failures)} floor plan(s) did not match (seed {seed}).")
+        self.stdout.write(self.style.SUCCESS("Floor plans match the rectangle calculation and the geometric checks."))
@@ -0,0 +1,295 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from accounts.models import UserProfile
+from manual_estimate.services import create_estimate_and_nested_items
+from projects import pdf_cache, pdf_jobs
+from projects.models import Material, PdfRenderJob, Project, ProjectMaterial, Room, Worker
+from projects.pdf_pool import memory_mb, warm_up
+from projects.project_calculations import calculate_project_totals
+
+BASELINE_FILE = os.path.join(settings.BASE_DIR, 'benchmarks', 'pdf_baseline.json')
+BASE_URL = 'http://localhost/'
+
+# Each path is the render behind an endpoint: (PdfRenderJob kind, extra payload)
+PATHS = {
+    'estimate': ('project', {}),                        # generate_estimatepdf, the project pdf action
+    'estimate-canvas': ('project', {'backend': 'canvas'}),
+    'manual': ('manual_data', {}),                      # generate_manual_estimate_pdf
+    'manual-saved': ('manual', {}),                     # a saved manual estimate (download, base64, share links)
+    'report': ('project_report', {}),                   # generate_project_pdf
+}
+MATERIAL_NAMES = ['cement', 'sand', 'tile cement', 'grout', 'chemical']
+ROOM_TYPES = [choice for choice, label in Room.ROOM_TYPE_CHOICES]
+ROLES = ['master', 'labourer', 'tiler', 'supervisor']
+
+
+def money(rng, low, high):
+    return Decimal(f"{rng.uniform(low, high):.2f}")
+
+
+def synthetic_user(rng):
+    user = get_user_model().objects.create_user(f"+233bench{rng.randrange(10 ** 9)}", full_name='Benchmark User')
+    UserProfile.objects.get_or_create(user=user, defaults={'company_name': 'Benchmark Tiling Ltd'})
+    return user
+
+
+def synthetic_project(user, rng, size):
+    """A tiling project with `size` rooms and materials and size / 5 worker groups, with its totals calculated."""
+    project = Project.objects.create(
+        user=user, name=f"Benchmark {size}", project_type='tiling', customer_name='Benchmark Customer',
+        customer_location='Accra', customer_phone='0240000000', description='Synthetic estimate for benchmark_pdf.',
+        wastage_percentage=Decimal('5.00'), profit_type='per_area', profit_value=money(rng, 10, 60), transport=money(rng, 0, 500),
+    )
+    for index in range(size):
+        Room.objects.create(
+            project=project, name=f"Room {index + 1}", room_type=rng.choice(ROOM_TYPES),
+            length=money(rng, 1, 12), breadth=money(rng, 1, 12), height=money(rng, 0, 3),
+        )
+    for index in range(size):
+        name = MATERIAL_NAMES[index] if index < len(MATERIAL_NAMES) else f"Tile batch {index + 1}"
+        material = Material.objects.create(user=user, name=name, unit='bag', default_unit_price=money(rng, 20, 400))
+        ProjectMaterial.objects.create(project=project, material=material, quantity=money(rng, 1, 100))
+    for index in range(max(1, size // 5)):
+        Worker.objects.create(project=project, role=rng.choice(ROLES), count=rng.randint(1, 4), rate=money(rng, 80, 300))
+    calculate_project_totals(project.pk)
+    return project
+
+
+def synthetic_manual_estimate(user, rng, size):
+    return create_estimate_and_nested_items(user, {
+        'title': f"Benchmark {size}",
+        'customer': {'name': 'Benchmark Customer', 'phone': '0240000000', 'location': 'Accra'},
+        'project_location': 'Accra', 'measurement_unit': 'meters', 'transport_cost': money(rng, 0, 500),
+        'remarks': 'Synthetic estimate for benchmark_pdf.', 'profit_type': 'per_sq_meter', 'profit_value': money(rng, 10, 60),
+        'materials': [
+            {'name': f"Material {index + 1}", 'unit_price': money(rng, 20, 400), 'quantity': money(rng, 1, 100)}
+            for index in range(size)
+        ],
+        'rooms': [
+            {'name': f"Room {index + 1}", 'type': rng.choice(ROOM_TYPES), 'floor_area': money(rng, 2, 60), 'wall_area': money(rng, 0, 80)}
+            for index in range(size)
+        ],
+    })
+
+
+def synthetic_manual_data(rng, size):
+    """What the manual estimate screen posts to generate_manual_estimate_pdf."""
+    materials = [
+        {'name': f"Material {index + 1}", 'unitPrice': str(money(rng, 20, 400)), 'quantity': str(money(rng, 1, 100))}
+        for index in range(size)
+    ]
+    for item in materials:
+        item['total'] = str(Decimal(item['unitPrice']) * Decimal(item['quantity']))
+    rooms = [
+        {'name': f"Room {index + 1}", 'floorArea': str(money(rng, 2, 60)), 'wallArea': str(money(rng, 0, 80))}
+        for index in range(size)
+    ]
+    labour = [
+        {'role': rng.choice(ROLES), 'count': str(rng.randint(1, 4)), 'rate': str(money(rng, 80, 300))}
+        for _ in range(max(1, size // 5))
+    ]
+    material_cost = sum(Decimal(item['total']) for item in materials)
+    room_area = sum(Decimal(room['floorArea']) + Decimal(room['wallArea']) for room in rooms)
+    labour_cost = money(rng, 500, 20000)
+    return {
+        'companyInfo': {'name': 'Benchmark Tiling Ltd', 'phone': '0240000000'},
+        'customerInfo': {'name': 'Benchmark Customer', 'phone': '0240000000', 'location': 'Accra'},
+        'tables': {'materials': materials, 'rooms': rooms, 'labour': labour},
+        'summary': {
+            'totalMaterialCost': str(material_cost), 'totalLabourCost': str(labour_cost),
+            'totalRoomArea': str(room_area), 'grandTotal': str(material_cost + labour_cost),
+        },
+    }
+
+
+def synthetic_job(path, size, rng):
+    kind, payload = PATHS[path]
+    user = synthetic_user(rng)
+    object_id = None
+    if kind in ('project', 'project_report'):
+        object_id = synthetic_project(user, rng, size).pk
+    elif kind == 'manual':
+        object_id = synthetic_manual_estimate(user, rng, size).pk
+    else:
+        payload = synthetic_manual_data(rng, size)
+    return PdfRenderJob(user=user, kind=kind, object_id=object_id, payload=payload, base_url=BASE_URL)
+
+
+def measure_case(path, size, repeat, seed):
+    """
+    Creates the synthetic estimate and renders it `repeat` times, each time
+    with an empty PDF cache so every render is a miss. The data is rolled back.
+    """
+    rng = random.Random(f"{seed}:{path}:{size}")
+    cache_dir = tempfile.mkdtemp(prefix='benchmark_pdf_')
+    pdf_cache.PDF_CACHE_DIR = cache_dir
+    result = {'seconds': [], 'context_ms': [], 'bytes': 0}
+    try:
+        with transaction.atomic():
+            job = synthetic_job(path, size, rng)
+            result['start_rss_mb'] = memory_mb()
+            for _ in range(repeat):
+                pdf_cache.clear()
+                started = time.perf_counter()
+                pdf = pdf_jobs.render_job(job)
+                with pdf.file:
+                    pdf.file.read()
+                result['seconds'].append(time.perf_counter() - started)
+                # How much of it went to reading the data and building the template context
+                result['context_ms'].append(pdf_cache.cache_stats()['context_ms'])
+                result['bytes'] = pdf.size
+            transaction.set_rollback(True)
+    except Exception as e:
+        result['error'] = str(e) or e.__class__.__name__
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return result
+
+
+def run_case(path, size, repeat, seed):
+    """measure_case in a forked process, so the peak RSS is this case's alone. Returns the result with peak_rss_mb."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(read_fd)
+            # project_calculations and the PDF context builders print a lot of debugging output
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = measure_case(path, size, repeat, seed)
+            with os.fdopen(write_fd, 'w') as f:
+                json.dump(result, f)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        output = f.read()
+    pid, status, usage = os.wait4(pid, 0)
+    if not output:
+        return {'error': f"benchmark process exited with status {status}"}
+    result = json.loads(output)
+    # ru_maxrss is in KB on Linux
+    result['peak_rss_mb'] = usage.ru_maxrss / 1024
+    return result
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'renderer': pdf_jobs.weasyprint_renderer()}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the PDF render paths (estimate, canvas estimate, manual estimate, saved manual '
+        'estimate, project report) on synthetic estimates of increasing size: wall time, peak RSS and '
+        'PDF size. Compares with a stored baseline and fails on regressions beyond the thresholds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,200', help='Comma-separated room and material counts (worker groups are a fifth).')
+        parser.add_argument('--paths', default=','.join(PATHS), help=f"Comma-separated render paths: {', '.join(PATHS)}.")
+        parser.add_argument('--repeat', type=int, default=3, help='Renders per case; the median time is reported.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic estimates.')
+        parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline JSON file.')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline instead of comparing.')
+        parser.add_argument('--time-threshold', type=float, default=0.5, help='Allowed slowdown over the baseline (0.5 = 50%%).')
+        parser.add_argument('--memory-threshold', type=float, default=0.2, help='Allowed peak RSS growth over the baseline.')
+        parser.add_argument('--size-threshold', type=float, default=0.1, help='Allowed PDF size growth over the baseline.')
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError("benchmark_pdf measures each case in a forked process and needs fork().")
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of integers.")
+        paths = [path.strip() for path in options['paths'].split(',') if path.strip()]
+        unknown = [path for path in paths if path not in PATHS]
+        if unknown:
+            raise CommandError(f"Unknown path(s) {', '.join(unknown)}. Choose from: {', '.join(PATHS)}.")
+        repeat = max(1, options['repeat'])
+
+        # Imports, fonts and templates are loaded once here and shared with every case, as in the renderer pool
+        self.stdout.write(f"Warmed up in {warm_up()} ms, using {memory_mb():.0f} MB.")
+        connections.close_all()
+
+        results = {}
+        for path in paths:
+            for size in sizes:
+                result = run_case(path, size, repeat, options['seed'])
+                case = f"{path}/{size}"
+                if 'error' in result:
+                    self.stdout.write(self.style.WARNING(f"{case:>22}: failed: {result['error']}"))
+                    results[case] = {'error': result['error']}
+                    continue
+                results[case] = {
+                    'seconds': round(statistics.median(result['seconds']), 4),
+                    'peak_rss_mb': round(result['peak_rss_mb'], 1),
+                    'bytes': result['bytes'],
+                }
+                self.stdout.write(
+                    f"{case:>22}: median {results[case]['seconds'] * 1000:.1f} ms, max {max(result['seconds']) * 1000:.1f} ms, "
+                    f"context {statistics.median(result['context_ms']):.1f} ms, "
+                    f"peak RSS {result['peak_rss_mb']:.1f} MB (+{result['peak_rss_mb'] - result['start_rss_mb']:.1f} MB), "
+                    f"{result['bytes'] / 1024:.1f} KB"
+                )
+
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(os.path.abspath(options['baseline'])), exist_ok=True)
+            with open(options['baseline'], 'w') as f:
+                json.dump({'machine': machine(), 'repeat': repeat, 'seed': options['seed'], 'cases': results}, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}."))
+            return
+
+        try:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            self.stdout.write(f"No baseline at {options['baseline']}; run with --save-baseline to record one.")
+            return
+        except ValueError as e:
+            raise CommandError(f"Unreadable baseline {options['baseline']}: {e}")
+        if baseline.get('machine') != machine():
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded on {baseline.get('machine')}; timings may not compare."
+            ))
+
+        regressions = []
+        thresholds = (
+            ('seconds', options['time_threshold'], 'time'),
+            ('peak_rss_mb', options['memory_threshold'], 'peak RSS'),
+            ('bytes', options['size_threshold'], 'PDF size'),
+        )
+        for case, result in results.items():
+            before = baseline.get('cases', {}).get(case)
+            if before is None or 'error' in before:
+                continue
+            if 'error' in result:
+                regressions.append(f"{case} failed: {result['error']}")
+                continue
+            for field, threshold, label in thresholds:
+                if before.get(field) and result[field] > before[field] * (1 + threshold):
+                    regressions.append(f"{case} {label} {before[field]} -> {result[field]} (+{result[field] / before[field] - 1:.0%})")
+
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f"  {regression}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
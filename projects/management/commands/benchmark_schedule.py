@@ -0,0 +1,103 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.fixed_point import ceil_div, to_area
+from projects.project_calculations import HARDCODED_DEFAULT_ROLE_COVERAGE, calculate_estimated_days
+from projects.scheduling import ScheduleUnit, room_tasks, schedule_tasks
+
+PROJECT_TYPES = ['tiling', 'painting', 'pavement']
+ROLES = ['master', 'painter', 'labourer', 'default']
+
+
+def random_project(rng, project_type, room_count, worker_groups):
+    rooms = []
+    for _ in range(room_count):
+        length, breadth, height = rng.uniform(1, 12), rng.uniform(1, 12), rng.uniform(0, 3.5)
+        floor_area = to_area(f"{length * breadth:.2f}")
+        wall_area = to_area(f"{2 * (length + breadth) * height:.2f}")
+        rooms.append((floor_area, wall_area, rng.randint(1, 4)))
+    workers = [(rng.choice(ROLES), rng.randint(1, 5)) for _ in range(worker_groups)]
+    if project_type == 'painting':
+        workers.append(('painter', 1))  # Some wall capacity for the coats
+    else:
+        workers.append(('master', 1))
+    return rooms, workers
+
+
+def build_inputs(project_type, rooms, workers):
+    tasks = []
+    for room_key, (floor_area, wall_area, coats) in enumerate(rooms):
+        tasks.extend(room_tasks(project_type, room_key, floor_area, wall_area, coats))
+    units = []
+    for group, (role, count) in enumerate(workers):
+        coverage = HARDCODED_DEFAULT_ROLE_COVERAGE.get(role, HARDCODED_DEFAULT_ROLE_COVERAGE['default'])
+        units.extend(ScheduleUnit(group, to_area(coverage['floor']), to_area(coverage['wall'])) for _ in range(count))
+    return tasks, units
+
+
+def formula_days(rooms, units):
+    floor_area = sum(floor_area for floor_area, _, _ in rooms)
+    wall_area = sum(wall_area for _, wall_area, _ in rooms)
+    return calculate_estimated_days(
+        floor_area, wall_area, sum(unit.floor for unit in units), sum(unit.wall for unit in units),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the crew scheduler on synthetic projects of increasing size and compare '
+        'its days with the area / combined coverage formula.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', default='5,50,500,2000', help='Comma-separated room counts.')
+        parser.add_argument('--workers', type=int, default=4, help='Worker groups per project (1-5 workers each).')
+        parser.add_argument('--projects', type=int, default=5, help='Projects per size and project type.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed (printed so a run can be repeated).')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['rooms'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError("--rooms must be a comma-separated list of integers.")
+        seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+        rng = random.Random(seed)
+        self.stdout.write(f"Seed {seed}: {options['projects']} projects per size and type, {options['workers']} worker groups.")
+
+        failures = []
+        for project_type in PROJECT_TYPES:
+            for size in sizes:
+                elapsed = []
+                ratios = []
+                formula_ratios = []
+                task_count = 0
+                for index in range(max(1, options['projects'])):
+                    rooms, workers = random_project(rng, project_type, size, options['workers'])
+                    started = time.perf_counter()
+                    tasks, units = build_inputs(project_type, rooms, workers)
+                    result = schedule_tasks(tasks, units)
+                    elapsed.append(time.perf_counter() - started)
+                    task_count = len(tasks)
+
+                    if result['makespan'] < result['lower_bound']:
+                        failures.append((project_type, size, index))
+                    if result['lower_bound'] > 0:
+                        ratios.append(float(result['makespan'] / result['lower_bound']))
+                    days = ceil_div(result['makespan'].numerator, result['makespan'].denominator)
+                    old_days = formula_days(rooms, units)
+                    if old_days:
+                        formula_ratios.append(days / old_days)
+
+                elapsed.sort()
+                self.stdout.write(
+                    f"{project_type:>8} {size:>5} rooms ({task_count} tasks): "
+                    f"median {elapsed[len(elapsed) // 2] * 1000:.2f} ms, max {elapsed[-1] * 1000:.2f} ms; "
+                    f"schedule / lower bound {max(ratios, default=0):.3f} at worst; "
+                    f"schedule / formula days {sum(formula_ratios) / len(formula_ratios) if formula_ratios else 0:.2f} on average"
+                )
+
+        if failures:
+            raise CommandError(f"{len(failures)} schedule(s) finished before their lower bound (seed {seed}).")
+        self.stdout.write(self.style.SUCCESS("Every schedule is at least as long as its lower bound."))
@@ -0,0 +1,122 @@
+import collections
+import html
+import io
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from projects import pdf_assets, pdf_backends, pdf_context
+from projects.models import Project
+
+BASE_URL = 'http://localhost/'
+A4_CSS_PX = (793.7, 1122.5)
+BODY_RE = re.compile(r'<body[^>]*>(.*)</body>', re.S)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.S)
+
+
+def template_words(context):
+    """Words of the text pdf_template.html shows (its body, without HTML comments) in order, upper-cased as the CSS headings are."""
+    page = render_to_string('pdf_template.html', context)
+    match = BODY_RE.search(COMMENT_RE.sub('', page))
+    return html.unescape(strip_tags(match.group(1) if match else '')).upper().split()
+
+
+def canvas_words(context):
+    """Words the canvas backend draws for the context, in drawing order, and its page count."""
+    layout = pdf_backends.draw_estimate(pdf_backends.estimate_document(context), io.BytesIO())
+    return ' '.join(layout.drawn).upper().split(), layout.canvas.getPageNumber() - 1
+
+
+def weasyprint_pages(context):
+    """WeasyPrint's page count for the context and the size of its first page in CSS px (None without pages)."""
+    document = pdf_assets.layout_template('pdf_template.html', context, BASE_URL)
+    page_size = (round(document.pages[0].width, 1), round(document.pages[0].height, 1)) if document.pages else None
+    return len(document.pages), page_size
+
+
+def first_difference(expected, drawn):
+    """Index of the first word where the two sequences differ, or None when they are the same."""
+    for index, (expected_word, drawn_word) in enumerate(zip(expected, drawn)):
+        if expected_word != drawn_word:
+            return index
+    return None if len(expected) == len(drawn) else min(len(expected), len(drawn))
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the canvas PDF backend shows the same text as pdf_template.html, in the same order, for real '
+        'projects, compare page counts with WeasyPrint, and time both backends in renders per second.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', default='', help='Comma-separated project ids (default: the latest --limit).')
+        parser.add_argument('--limit', type=int, default=5, help='Latest projects to check when --projects is not given.')
+        parser.add_argument('--runs', type=int, default=5, help='Timed renders per backend and project (0 to only check parity).')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.select_related('user').order_by('-pk')
+        if options['projects']:
+            try:
+                ids = [int(pk) for pk in options['projects'].split(',') if pk.strip()]
+            except ValueError:
+                raise CommandError("--projects must be a comma-separated list of ids.")
+            projects = projects.filter(pk__in=ids)
+        else:
+            projects = projects[:max(1, options['limit'])]
+        projects = list(projects)
+        if not projects:
+            raise CommandError("No projects to compare.")
+        fonts = pdf_backends.canvas_fonts()
+        self.stdout.write(f"{len(projects)} project(s); canvas font {fonts[0]}{'' if fonts[2] else ' (no cedi sign: GHS)'}.")
+
+        mismatches = 0
+        timings = collections.defaultdict(list)
+        for project in projects:
+            context = pdf_context.project_estimate_context(
+                pdf_context.project_estimate_data(project.pk, project.user), BASE_URL, transport=project.transport,
+            )
+
+            # Text parity: the canvas draws the words the template shows, in the same order, and nothing else
+            expected, (drawn, pages) = template_words(context), canvas_words(context)
+            difference = first_difference(expected, drawn)
+            weasyprint_page_count, page_size = weasyprint_pages(context)
+            line = (
+                f"  {project.estimate_number or project.pk}: {len(expected)} words, "
+                f"pages canvas {pages} / WeasyPrint {weasyprint_page_count}"
+            )
+            if difference is not None or page_size != A4_CSS_PX:
+                mismatches += 1
+                missing = collections.Counter(expected) - collections.Counter(drawn)
+                extra = collections.Counter(drawn) - collections.Counter(expected)
+                self.stdout.write(self.style.ERROR(
+                    f"{line}; first difference at word {difference} "
+                    f"({' '.join(expected[difference:difference + 5]) if difference is not None else '-'} / "
+                    f"{' '.join(drawn[difference:difference + 5]) if difference is not None else '-'}), "
+                    f"missing {dict(missing) or '-'}, extra {dict(extra) or '-'}, WeasyPrint page {page_size}"
+                ))
+            else:
+                self.stdout.write(f"{line}; same text, {'simple' if pdf_backends.is_simple(context) else 'complex'} (auto: "
+                                  f"{pdf_backends.choose_backend('auto', context)})")
+
+            for _ in range(max(0, options['runs'])):
+                started = time.perf_counter()
+                pdf_backends.render_canvas_estimate(context)
+                timings['canvas'].append(time.perf_counter() - started)
+                started = time.perf_counter()
+                pdf_assets.render_template_pdf('pdf_template.html', context, BASE_URL)
+                timings['weasyprint'].append(time.perf_counter() - started)
+
+        for backend, elapsed in sorted(timings.items()):
+            self.stdout.write(
+                f"{backend}: {len(elapsed) / sum(elapsed):.1f} renders/s, "
+                f"{sum(elapsed) / len(elapsed) * 1000:.1f} ms per render ({len(elapsed)} renders)"
+            )
+        if timings:
+            speedup = sum(timings['weasyprint']) / sum(timings['canvas'])
+            self.stdout.write(f"canvas is {speedup:.1f}x the speed of WeasyPrint.")
+        if mismatches:
+            raise CommandError(f"{mismatches} project(s) differ between the canvas and the template.")
+        self.stdout.write(self.style.SUCCESS("The canvas shows the same text as the template for every project."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects import pdf_cache
+
+
+class Command(BaseCommand):
+    help = 'Show the rendered PDF cache (hit rate, render time saved, size), or trim or clear it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evict-to', type=int, default=None, help='Remove least recently used PDFs until the cache is at most this many MB.')
+        parser.add_argument('--clear', action='store_true', help='Remove every cached PDF and reset the counters.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f"Removed {pdf_cache.clear()} cached PDF(s).")
+        if options['evict_to'] is not None:
+            if options['evict_to'] < 0:
+                raise CommandError("--evict-to must not be negative.")
+            self.stdout.write(f"Evicted {pdf_cache.evict(options['evict_to'] * 1024 * 1024)} cached PDF(s).")
+
+        stats = pdf_cache.cache_stats()
+        hit_rate = '-' if stats['hit_rate'] is None else f"{stats['hit_rate'] * 100:.1f}%"
+        self.stdout.write(f"PDF cache in {stats['directory']} (counting since {stats['since'] or '-'}):")
+        self.stdout.write(f"  {stats['hits']} hit(s), {stats['misses']} miss(es), hit rate {hit_rate}")
+        self.stdout.write(f"  render time spent {stats['render_ms'] / 1000:.1f}s, saved by hits {stats['saved_ms'] / 1000:.1f}s")
+        lookups = stats['hits'] + stats['misses']
+        if lookups:
+            self.stdout.write(
+                f"  {stats['context_ms'] / lookups:.1f} ms per PDF building the context, "
+                f"{stats['render_ms'] / max(stats['misses'], 1):.1f} ms per render laying it out"
+            )
+        self.stdout.write(
+            f"  {stats['entries']} PDF(s), {stats['bytes'] / 1024 / 1024:.1f} of {stats['max_bytes'] / 1024 / 1024:.0f} MB, "
+            f"{stats['evictions']} evicted"
+        )
+        self.stdout.write(f"  {stats['pool_fallbacks']} render(s) in a web process with the renderer pool down")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.pdf_pool import (
+    MAX_JOBS_PER_PROCESS, MAX_MEMORY_MB, PDF_RENDER_SOCKET, POOL_PROCESSES, PoolError, serve,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Run warm PDF renderer processes (see projects.pdf_pool) for the PDF endpoints. '
+        'Start it next to gunicorn on the same machine; without it the web workers render themselves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=POOL_PROCESSES, help='Renderer processes.')
+        parser.add_argument('--max-jobs', type=int, default=MAX_JOBS_PER_PROCESS, help='Renders before a process is replaced.')
+        parser.add_argument('--max-memory', type=int, default=MAX_MEMORY_MB, help='Resident MB above which a process is replaced.')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['max_jobs'] < 1 or options['max_memory'] < 1:
+            raise CommandError("--processes, --max-jobs and --max-memory must be at least 1.")
+        self.stdout.write(
+            f"PDF renderer pool on {PDF_RENDER_SOCKET}: {options['processes']} process(es), replaced after "
+            f"{options['max_jobs']} render(s) or {options['max_memory']} MB."
+        )
+        try:
+            serve(options['processes'], options['max_jobs'], options['max_memory'], log=self.stdout.write)
+        except PoolError as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS("PDF renderer pool stopped."))
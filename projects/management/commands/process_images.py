@@ -0,0 +1,57 @@
+import time
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from projects.image_pipeline import IMAGE_FIELDS, process_pending_images, queue_image
+from projects.models import ProcessedImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Process queued tile and supplier images (variants, dominant colours, perceptual hash). '
+        'Run it from cron, or with --loop as a long-running worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Process at most this many images per pass.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs instead of exiting when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between polls with --loop.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed images again before processing.')
+        parser.add_argument('--backfill', action='store_true', help='Queue existing images that were uploaded before processing was set up.')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            count = ProcessedImage.objects.filter(status='failed').update(status='pending', attempts=0)
+            self.stdout.write(f"Queued {count} failed image(s) again.")
+        if options['backfill']:
+            self.stdout.write(f"Queued {self.backfill()} existing image(s).")
+
+        while True:
+            started = time.perf_counter()
+            jobs = process_pending_images(limit=options['limit'])
+            if jobs:
+                done = sum(1 for job in jobs if job.status == 'done')
+                self.stdout.write(
+                    f"Processed {len(jobs)} image(s) in {time.perf_counter() - started:.2f}s: "
+                    f"{done} done, {len(jobs) - done} failed or to retry."
+                )
+            if not options['loop']:
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS("Image queue processed."))
+
+    def backfill(self):
+        queued = 0
+        for (app_label, model_name), field_names in IMAGE_FIELDS.items():
+            model = apps.get_model(app_label, model_name)
+            content_type = ContentType.objects.get_for_model(model)
+            for field_name in field_names:
+                existing = ProcessedImage.objects.filter(content_type=content_type, field_name=field_name).values('object_id')
+                instances = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).exclude(pk__in=existing)
+                for instance in instances.iterator():
+                    if queue_image(instance, field_name):
+                        queued += 1
+        return queued
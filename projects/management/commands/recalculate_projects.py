@@ -0,0 +1,268 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from projects import spawned_workers
+from projects.models import Project, ProjectMaterial, Worker, RecalculationRun
+from projects.project_calculations import calculate_project_totals
+
+User = get_user_model()
+
+# Stored fields compared before/after a recalculation. These are the values the
+# API hands back to clients, so these are the ones that go stale when
+# coverage rates, wastage tiers or role defaults change.
+PROJECT_DIFF_FIELDS = [
+    'total_floor_area', 'total_wall_area', 'total_area',
+    'total_floor_area_with_waste', 'total_wall_area_with_waste', 'total_area_with_waste',
+    'wastage_percentage', 'estimated_days', 'total_labor_cost', 'profit', 'cost_per_area',
+]
+MATERIAL_DIFF_FIELDS = ['quantity', 'quantity_with_wastage', 'unit']
+WORKER_DIFF_FIELDS = ['total_cost']
+
+
+class DryRunRollback(Exception):
+    """Raised inside the per-project transaction to discard a dry-run recalculation."""
+
+
+def _snapshot_project(project_id):
+    """Collects the stored totals for one project into a flat {label: value} dict."""
+    snapshot = {}
+    project_values = Project.objects.filter(id=project_id).values(*PROJECT_DIFF_FIELDS).first() or {}
+    for field, value in project_values.items():
+        snapshot[field] = value
+    for row in ProjectMaterial.objects.filter(project_id=project_id).values('id', 'material__name', *MATERIAL_DIFF_FIELDS):
+        for field in MATERIAL_DIFF_FIELDS:
+            snapshot[f"material[{row['material__name']}].{field}"] = row[field]
+    for row in Worker.objects.filter(project_id=project_id).values('id', 'role', *WORKER_DIFF_FIELDS):
+        for field in WORKER_DIFF_FIELDS:
+            snapshot[f"worker[{row['id']}:{row['role']}].{field}"] = row[field]
+    return snapshot
+
+
+def _diff_snapshots(before, after):
+    diff = {}
+    for key in sorted(set(before) | set(after)):
+        old_value, new_value = before.get(key), after.get(key)
+        if old_value != new_value:
+            diff[key] = (str(old_value), str(new_value))
+    return diff
+
+
+def make_executor(workers):
+    """
+    The process pool for the chunks. ProcessPoolExecutor starts its workers on
+    the first submit, when the parent already has its id cursor open and saves
+    checkpoints on the same connection. A forked worker would inherit that
+    socket, and closing it there ends the parent's session, so the workers are
+    spawned instead and open their own connections (spawned_workers).
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=spawned_workers.setup_django, initargs=(connection.settings_dict['NAME'],),
+    )
+
+
+def _recalculate_chunk(project_ids, dry_run):
+    """
+    Recalculates a chunk of projects inside a worker process.
+
+    Each project runs in its own short transaction with the project row locked
+    (select_for_update), so concurrent API writes to the same project wait for
+    the recalculation instead of interleaving with it. A failure only rolls back
+    that one project.
+
+    Returns a list of (project_id, diff, error) tuples.
+    """
+    results = []
+    for project_id in project_ids:
+        try:
+            # project_calculations prints a lot of debugging output; keep it out of the command output.
+            with contextlib.redirect_stdout(io.StringIO()):
+                try:
+                    with transaction.atomic():
+                        if not Project.objects.select_for_update().filter(id=project_id).exists():
+                            results.append((project_id, {}, "Project no longer exists"))
+                            continue
+                        before = _snapshot_project(project_id)
+                        calculate_project_totals(project_id)
+                        after = _snapshot_project(project_id)
+                        diff = _diff_snapshots(before, after)
+                        if dry_run:
+                            raise DryRunRollback()
+                except DryRunRollback:
+                    pass
+            results.append((project_id, diff, None))
+        except Exception as e:
+            results.append((project_id, {}, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class InlineExecutor:
+    """Runs chunks in the current process; used for a single worker or SQLite."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate stored totals for existing projects in parallel. '
+        'Progress is checkpointed so an interrupted run can be resumed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only recalculate projects owned by this user (id or phone number).')
+        parser.add_argument('--since', help='Only recalculate projects created on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--dry-run', action='store_true', help='Recalculate and report differences without saving anything.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes.')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Number of projects handed to a worker at a time.')
+        parser.add_argument('--run-name', help='Checkpoint name. Defaults to one derived from the filters.')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first project.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
+
+        queryset = Project.objects.all()
+        filters = {}
+
+        if options['user']:
+            user_value = options['user']
+            user_lookup = {'id': user_value} if user_value.isdigit() and len(user_value) < 9 else {'phone_number': user_value}
+            try:
+                user = User.objects.get(**user_lookup)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{user_value}' not found.")
+            queryset = queryset.filter(user=user)
+            filters['user'] = user.id
+
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+            queryset = queryset.filter(created_at__date__gte=since)
+            filters['since'] = since.isoformat()
+
+        run_name = options['run_name'] or 'recalculate' + ''.join(
+            f"-{key}={value}" for key, value in sorted(filters.items())
+        ) + ('-dry-run' if dry_run else '')
+
+        run, created = RecalculationRun.objects.get_or_create(
+            name=run_name, defaults={'filters': filters, 'dry_run': dry_run}
+        )
+        if not created and (options['restart'] or run.status == 'completed'):
+            run.last_project_id = 0
+            run.processed_count = 0
+            run.changed_count = 0
+            run.failed_count = 0
+            run.failed_project_ids = []
+            run.completed_at = None
+        run.filters = filters
+        run.dry_run = dry_run
+        run.status = 'running'
+        run.save()
+
+        if run.last_project_id:
+            self.stdout.write(f"Resuming run '{run.name}' after project id {run.last_project_id} ({run.processed_count} already processed).")
+        else:
+            self.stdout.write(f"Starting run '{run.name}'.")
+
+        queryset = queryset.filter(id__gt=run.last_project_id).order_by('id')
+        remaining = queryset.count()
+        self.stdout.write(f"{remaining} project(s) to recalculate, chunk size {chunk_size}{' (dry run)' if dry_run else ''}.")
+
+        if workers > 1 and connection.vendor == 'sqlite':
+            # SQLite allows a single writer and the id cursor below holds a read lock.
+            self.stdout.write(self.style.WARNING("SQLite does not support concurrent writers; running in a single process."))
+            workers = 1
+
+        if workers > 1:
+            executor = make_executor(workers)
+        else:
+            executor = InlineExecutor()
+
+        started = time.monotonic()
+        processed_this_run = 0
+        in_flight = deque()
+
+        def chunks():
+            chunk = []
+            for project_id in queryset.values_list('id', flat=True).iterator(chunk_size=chunk_size):
+                chunk.append(project_id)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        with executor:
+            chunk_iter = chunks()
+            exhausted = False
+            while True:
+                # Keep a bounded number of chunks queued so memory stays flat on large tables.
+                while not exhausted and len(in_flight) < workers * 2:
+                    chunk = next(chunk_iter, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    in_flight.append((chunk[-1], executor.submit(_recalculate_chunk, chunk, dry_run)))
+                if not in_flight:
+                    break
+
+                # Chunks are collected in submission (id) order, so the checkpoint
+                # never moves past a project that has not been handled yet.
+                last_id, future = in_flight.popleft()
+                results = future.result()
+                for project_id, diff, error in results:
+                    if error:
+                        run.failed_count += 1
+                        run.failed_project_ids.append(project_id)
+                        self.stderr.write(f"Project {project_id}: {error}")
+                    elif diff:
+                        run.changed_count += 1
+                        if dry_run or options['verbosity'] > 1:
+                            self.stdout.write(f"Project {project_id}:")
+                            for key, (old_value, new_value) in diff.items():
+                                self.stdout.write(f"    {key}: {old_value} -> {new_value}")
+                processed_this_run += len(results)
+                run.processed_count += len(results)
+                run.last_project_id = last_id
+                run.save(update_fields=[
+                    'processed_count', 'changed_count', 'failed_count',
+                    'failed_project_ids', 'last_project_id', 'updated_at',
+                ])
+
+                elapsed = time.monotonic() - started
+                rate = processed_this_run / elapsed if elapsed else 0
+                self.stdout.write(f"Checkpoint: {processed_this_run}/{remaining} projects, last id {last_id}, {rate:.1f} projects/s")
+
+        elapsed = time.monotonic() - started
+        run.status = 'completed'
+        run.completed_at = timezone.now()
+        run.save(update_fields=['status', 'completed_at', 'updated_at'])
+
+        rate = processed_this_run / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {processed_this_run} project(s) in {elapsed:.1f}s ({rate:.1f} projects/s), "
+            f"{run.changed_count} changed, {run.failed_count} failed{' (dry run, nothing saved)' if dry_run else ''}."
+        ))
@@ -0,0 +1,77 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from projects.models import PdfRenderJob
+from projects.pdf_jobs import MAX_RUNNING_JOBS, job_metrics, process_pending_jobs, purge_jobs, worker_name
+from projects.pdf_pool import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Render queued estimate PDFs (see projects.pdf_jobs). Run it with --loop as a '
+        'long-running worker next to the web process; --stats prints queue and render times.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Render at most this many jobs per pass.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs instead of exiting when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds between polls with --loop.')
+        parser.add_argument('--max-running', type=int, default=MAX_RUNNING_JOBS, help='Jobs rendering at once across all workers.')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue failed jobs again before rendering.')
+        parser.add_argument('--purge-days', type=int, default=None, help='Delete finished jobs and their PDFs older than this many days first.')
+        parser.add_argument('--stats', action='store_true', help='Print job counts and timings and exit.')
+        parser.add_argument('--hours', type=float, default=24, help='Window for --stats, in hours.')
+
+    def handle(self, *args, **options):
+        if options['max_running'] < 1:
+            raise CommandError("--max-running must be at least 1.")
+        if options['stats']:
+            self.print_stats(options['hours'])
+            return
+        if options['purge_days'] is not None:
+            self.stdout.write(f"Deleted {purge_jobs(options['purge_days'])} finished job(s).")
+        if options['retry_failed']:
+            count = PdfRenderJob.objects.filter(status='failed').update(
+                status='pending', attempts=0, available_at=timezone.now(), lease_expires_at=None, finished_at=None,
+            )
+            self.stdout.write(f"Queued {count} failed job(s) again.")
+
+        worker = worker_name()
+        self.stdout.write(f"Worker {worker}, at most {options['max_running']} render(s) at once.")
+        if options['loop']:
+            # Pay for the WeasyPrint import and fonts now rather than in the first job's render time
+            self.stdout.write(f"Warmed up in {warm_up()} ms.")
+        while True:
+            started = time.perf_counter()
+            jobs = process_pending_jobs(worker, limit=options['limit'], max_running=options['max_running'])
+            if jobs:
+                done = sum(1 for job in jobs if job.status == 'done')
+                self.stdout.write(
+                    f"Rendered {len(jobs)} PDF(s) in {time.perf_counter() - started:.2f}s: "
+                    f"{done} done, {len(jobs) - done} failed or to retry."
+                )
+            if not options['loop']:
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS("PDF queue processed."))
+
+    def print_stats(self, hours):
+        metrics = job_metrics(timezone.now() - datetime.timedelta(hours=hours))
+        self.stdout.write(f"PDF jobs queued in the last {hours:g} hour(s):")
+        if not metrics:
+            self.stdout.write("  none")
+        for kind, kind_metrics in sorted(metrics.items()):
+            statuses = ', '.join(f"{count} {job_status}" for job_status, count in sorted(kind_metrics['statuses'].items()))
+            self.stdout.write(
+                f"  {kind}: {kind_metrics['jobs']} job(s) ({statuses}); "
+                f"queue wait p50 {self.ms(kind_metrics['wait_ms_p50'])}, p95 {self.ms(kind_metrics['wait_ms_p95'])}; "
+                f"render p50 {self.ms(kind_metrics['render_ms_p50'])}, p95 {self.ms(kind_metrics['render_ms_p95'])}"
+            )
+
+    @staticmethod
+    def ms(value):
+        return '-' if value is None else f"{value} ms"
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_project_total_floor_area_with_waste_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecalculationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Run Name')),
+                ('filters', models.JSONField(blank=True, default=dict, verbose_name='Filters')),
+                ('dry_run', models.BooleanField(default=False, verbose_name='Dry Run')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed')], default='running', max_length=20, verbose_name='Status')),
+                ('last_project_id', models.BigIntegerField(default=0, verbose_name='Last Processed Project ID')),
+                ('processed_count', models.PositiveIntegerField(default=0, verbose_name='Processed')),
+                ('changed_count', models.PositiveIntegerField(default=0, verbose_name='Changed')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Failed')),
+                ('failed_project_ids', models.JSONField(blank=True, default=list, verbose_name='Failed Project IDs')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Recalculation Run',
+                'verbose_name_plural': 'Recalculation Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
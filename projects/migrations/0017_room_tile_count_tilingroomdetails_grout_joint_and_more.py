@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_recalculationrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='tile_count',
+            field=models.PositiveIntegerField(default=0, help_text='Whole tiles to buy from the tile layout; 0 when no tile size is set.', verbose_name='Tiles Needed (layout)'),
+        ),
+        migrations.AddField(
+            model_name='tilingroomdetails',
+            name='grout_joint',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=4, null=True, verbose_name='Grout Joint (mm)'),
+        ),
+        migrations.AddField(
+            model_name='tilingroomdetails',
+            name='tile_length',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=7, null=True, verbose_name='Tile Length (mm)'),
+        ),
+        migrations.AddField(
+            model_name='tilingroomdetails',
+            name='tile_width',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=7, null=True, verbose_name='Tile Width (mm)'),
+        ),
+    ]
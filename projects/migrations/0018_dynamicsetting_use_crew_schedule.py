@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_room_tile_count_tilingroomdetails_grout_joint_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dynamicsetting',
+            name='use_crew_schedule',
+            field=models.BooleanField(default=False, help_text='Estimate project days from the task schedule (screed, tiling, grouting, coats) instead of total area over combined coverage.', verbose_name='Use Crew Schedule'),
+        ),
+    ]
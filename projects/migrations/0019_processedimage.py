@@ -0,0 +1,41 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('projects', '0018_dynamicsetting_use_crew_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Source ID')),
+                ('field_name', models.CharField(max_length=50, verbose_name='Image Field')),
+                ('source_name', models.CharField(help_text='Storage name of the original when it was queued.', max_length=255, verbose_name='Source File')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Width')),
+                ('height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Height')),
+                ('dominant_colors', models.JSONField(blank=True, default=list, help_text="[{'color': '#rrggbb', 'share': percent}], most common first.", verbose_name='Dominant Colours')),
+                ('perceptual_hash', models.CharField(blank=True, db_index=True, help_text='64-bit DCT hash (hex) for finding similar images.', max_length=16, verbose_name='Perceptual Hash')),
+                ('variants', models.JSONField(blank=True, default=dict, help_text="{variant: {format: {'name', 'width', 'height', 'bytes'}}}", verbose_name='Variants')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Source Type')),
+            ],
+            options={
+                'verbose_name': 'Processed Image',
+                'verbose_name_plural': 'Processed Images',
+                'ordering': ['created_at'],
+                'unique_together': {('content_type', 'object_id', 'field_name')},
+            },
+        ),
+    ]
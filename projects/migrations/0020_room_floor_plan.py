@@ -0,0 +1,34 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:07
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0019_processedimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='floor_outline',
+            field=models.JSONField(blank=True, help_text="Corner points [[x, y], ...] in order around the room, in the project's measurement unit.", null=True, verbose_name='Floor Outline'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='openings',
+            field=models.JSONField(blank=True, default=list, help_text="Doors and windows taken off the wall area: [{'width', 'height', 'count', 'wall', 'kind'}].", verbose_name='Openings'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='perimeter',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), help_text='Length of all the walls in metres.', max_digits=14, verbose_name='Perimeter Calculated'),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='wall_heights',
+            field=models.JSONField(blank=True, help_text='Height of each wall (wall 1 runs from the first corner to the second); empty entries use the room height.', null=True, verbose_name='Wall Heights'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0020_room_floor_plan'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Project Estimate'), ('project_report', 'Project Report'), ('manual', 'Manual Estimate'), ('manual_data', 'Manual Estimate From Data')], max_length=20, verbose_name='Kind')),
+                ('object_id', models.PositiveIntegerField(blank=True, help_text='Project or manual estimate id; empty for posted data.', null=True, verbose_name='Source ID')),
+                ('payload', models.JSONField(blank=True, default=dict, help_text='Render options, or the posted estimate data for manual_data.', verbose_name='Payload')),
+                ('base_url', models.CharField(blank=True, help_text="Where the templates' static files are, taken from the request that queued the job.", max_length=500, verbose_name='Base URL')),
+                ('input_key', models.CharField(db_index=True, help_text='SHA-256 of the user, kind, source and payload; repeated requests reuse a pending job.', max_length=64, verbose_name='Input Key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('rendering', 'Rendering'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not rendered before this time (retries back off).', verbose_name='Available At')),
+                ('lease_expires_at', models.DateTimeField(blank=True, help_text='A rendering job past this time is taken to be lost and is claimed again.', null=True, verbose_name='Lease Expires At')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('file_name', models.CharField(blank=True, help_text='Storage name of the rendered PDF.', max_length=255, verbose_name='File')),
+                ('file_size', models.PositiveIntegerField(default=0, verbose_name='File Size')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('render_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Render Time (ms)')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pdf_render_jobs', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'PDF Render Job',
+                'verbose_name_plural': 'PDF Render Jobs',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='projects_pd_status_ae1146_idx')],
+            },
+        ),
+    ]
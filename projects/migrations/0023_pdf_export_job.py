@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0022_tile_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pdfrenderjob',
+            name='file_name',
+            field=models.CharField(blank=True, help_text='Storage name of the rendered PDF (or ZIP, for an export).', max_length=255, verbose_name='File'),
+        ),
+        migrations.AlterField(
+            model_name='pdfrenderjob',
+            name='kind',
+            field=models.CharField(choices=[('project', 'Project Estimate'), ('project_report', 'Project Report'), ('manual', 'Manual Estimate'), ('manual_data', 'Manual Estimate From Data'), ('export', 'Estimate Export (ZIP)')], max_length=20, verbose_name='Kind'),
+        ),
+        migrations.AlterField(
+            model_name='pdfrenderjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, help_text='Render options, the posted estimate data for manual_data, or the filters of an export.', verbose_name='Payload'),
+        ),
+    ]
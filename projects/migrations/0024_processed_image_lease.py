@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0023_pdf_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedimage',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='An image still processing past this time is taken to be lost and is claimed again.', null=True, verbose_name='Lease Expires At'),
+        ),
+    ]
@@ -3,11 +3,12 @@
 from django.db import models
 from django.conf import settings
 from django.db.models import JSONField
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from datetime import date
 import decimal
 from django.contrib.contenttypes.models import ContentType
-from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 
 # Default constants (used by calculations in views)
 DEFAULT_WALL_COVERAGE_RATE = decimal.Decimal(12.0)
@@ -121,6 +122,11 @@ class DynamicSetting(models.Model):
         verbose_name=_("Role Coverage Defaults"),
         help_text=_("JSON structure defining default coverage rates per worker role and work type (floor/wall).")
     )
+    use_crew_schedule = models.BooleanField(
+        default=False,
+        verbose_name=_("Use Crew Schedule"),
+        help_text=_("Estimate project days from the task schedule (screed, tiling, grouting, coats) instead of total area over combined coverage.")
+    )
 
     class Meta:
         verbose_name = _("Dynamic Setting")
@@ -304,6 +310,9 @@ class TilingRoomDetails(BaseRoomDetails):
     landing_breadth = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name=_("Landing Breadth"))
     number_of_landings = models.IntegerField(null=True, blank=True, verbose_name=_("Number of Landings"))
     has_metal_strip = models.BooleanField(default=False, verbose_name=_("Has Metal Strip"))
+    tile_length = models.DecimalField(max_digits=7, decimal_places=1, null=True, blank=True, verbose_name=_("Tile Length (mm)"))
+    tile_width = models.DecimalField(max_digits=7, decimal_places=1, null=True, blank=True, verbose_name=_("Tile Width (mm)"))
+    grout_joint = models.DecimalField(max_digits=4, decimal_places=1, null=True, blank=True, verbose_name=_("Grout Joint (mm)"))
 
     class Meta:
         verbose_name = _("Tiling Room Details")
@@ -381,6 +390,11 @@ class Room(models.Model):
     breadth = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name=_("Breadth"))
     height = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name=_("Height"))
 
+    # Optional plan geometry (see floor_plan); without it the room is the length x breadth x height box
+    floor_outline = JSONField(null=True, blank=True, verbose_name=_("Floor Outline"), help_text=_("Corner points [[x, y], ...] in order around the room, in the project's measurement unit."))
+    wall_heights = JSONField(null=True, blank=True, verbose_name=_("Wall Heights"), help_text=_("Height of each wall (wall 1 runs from the first corner to the second); empty entries use the room height."))
+    openings = JSONField(default=list, blank=True, verbose_name=_("Openings"), help_text=_("Doors and windows taken off the wall area: [{'width', 'height', 'count', 'wall', 'kind'}]."))
+
     # Generic Foreign Key to Room Details (Data only)
     details_content_type = models.ForeignKey(
         ContentType,
@@ -399,6 +413,8 @@ class Room(models.Model):
     wall_area_with_waste = models.DecimalField(max_digits=14, decimal_places=2, default=decimal.Decimal(0), verbose_name=_("Wall Area Calculated with waste"))
     total_area = models.DecimalField(max_digits=14, decimal_places=2, default=decimal.Decimal(0), verbose_name=_("Total Area Calculated"))
     total_area_with_waste = models.DecimalField(max_digits=14, decimal_places=2, default=decimal.Decimal(0), verbose_name=_("Total Area Calculated with waste"))
+    tile_count = models.PositiveIntegerField(default=0, verbose_name=_("Tiles Needed (layout)"), help_text=_("Whole tiles to buy from the tile layout; 0 when no tile size is set."))
+    perimeter = models.DecimalField(max_digits=14, decimal_places=2, default=decimal.Decimal(0), verbose_name=_("Perimeter Calculated"), help_text=_("Length of all the walls in metres."))
 
 
     class Meta:
@@ -583,11 +599,20 @@ class Worker(models.Model):
 
 class Tile(models.Model):
     """Model related to image processing of tiles, separate from estimation core (Data only)"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='tiles',
+        verbose_name=_("Uploaded By")
+    )
     processed_image = models.ImageField(
         upload_to='tiles/media/processed/',
         verbose_name=_("Processed Image")
     )
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Uploaded At"))
+    processed_images = GenericRelation('ProcessedImage')
 
     class Meta:
         verbose_name = _("Tile Image")
@@ -597,4 +622,141 @@ class Tile(models.Model):
     def __str__(self):
         return f"Tile Image {self.id} ({self.uploaded_at.strftime('%Y-%m-%d %H:%M')})"
 
+class RecalculationRun(models.Model):
+    """
+    Checkpoint for a fleet-wide recalculation (see the recalculate_projects
+    management command). Projects are processed in ascending id order, so
+    last_project_id is enough to resume an interrupted run.
+    """
+
+    STATUS_CHOICES = [
+        ('running', _('Running')),
+        ('completed', _('Completed')),
+    ]
+
+    name = models.CharField(max_length=100, unique=True, verbose_name=_("Run Name"))
+    filters = JSONField(default=dict, blank=True, verbose_name=_("Filters"))
+    dry_run = models.BooleanField(default=False, verbose_name=_("Dry Run"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name=_("Status"))
+    last_project_id = models.BigIntegerField(default=0, verbose_name=_("Last Processed Project ID"))
+    processed_count = models.PositiveIntegerField(default=0, verbose_name=_("Processed"))
+    changed_count = models.PositiveIntegerField(default=0, verbose_name=_("Changed"))
+    failed_count = models.PositiveIntegerField(default=0, verbose_name=_("Failed"))
+    failed_project_ids = JSONField(default=list, blank=True, verbose_name=_("Failed Project IDs"))
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Recalculation Run")
+        verbose_name_plural = _("Recalculation Runs")
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()}, last id {self.last_project_id})"
+
+class ProcessedImage(models.Model):
+    """
+    Processing job and results for one uploaded image field (a tile image,
+    a supplier logo or shop photo, a product image). Rows are queued by the
+    upload endpoints and worked off by the process_images management command;
+    see image_pipeline.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('processing', _('Processing')),
+        ('done', _('Done')),
+        ('failed', _('Failed')),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_("Source Type"))
+    object_id = models.PositiveIntegerField(verbose_name=_("Source ID"))
+    source = GenericForeignKey('content_type', 'object_id')
+    field_name = models.CharField(max_length=50, verbose_name=_("Image Field"))
+    source_name = models.CharField(max_length=255, verbose_name=_("Source File"), help_text=_("Storage name of the original when it was queued."))
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    error = models.TextField(blank=True, verbose_name=_("Last Error"))
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Lease Expires At"), help_text=_("An image still processing past this time is taken to be lost and is claimed again."))
+
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Width"))
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Height"))
+    dominant_colors = JSONField(default=list, blank=True, verbose_name=_("Dominant Colours"), help_text=_("[{'color': '#rrggbb', 'share': percent}], most common first."))
+    perceptual_hash = models.CharField(max_length=16, blank=True, db_index=True, verbose_name=_("Perceptual Hash"), help_text=_("64-bit DCT hash (hex) for finding similar images."))
+    variants = JSONField(default=dict, blank=True, verbose_name=_("Variants"), help_text=_("{variant: {format: {'name', 'width', 'height', 'bytes'}}}"))
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Processed Image")
+        verbose_name_plural = _("Processed Images")
+        ordering = ['created_at']
+        unique_together = [('content_type', 'object_id', 'field_name')]
+
+    def __str__(self):
+        return f"{self.field_name} of {self.content_type.model} {self.object_id} ({self.get_status_display()})"
+
+class PdfRenderJob(models.Model):
+    """
+    A queued PDF render: a project estimate, a project report, a saved manual
+    estimate, a manual estimate from posted data, or a ZIP of many estimates
+    (pdf_export). Rows are queued by the PDF job and export endpoints and
+    rendered by the render_pdf_jobs management command, so web workers never
+    render; see pdf_jobs.
+    """
+
+    KIND_CHOICES = [
+        ('project', _('Project Estimate')),
+        ('project_report', _('Project Report')),
+        ('manual', _('Manual Estimate')),
+        ('manual_data', _('Manual Estimate From Data')),
+        ('export', _('Estimate Export (ZIP)')),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('rendering', _('Rendering')),
+        ('done', _('Done')),
+        ('failed', _('Failed')),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='pdf_render_jobs',
+        verbose_name=_("User")
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name=_("Kind"))
+    object_id = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Source ID"), help_text=_("Project or manual estimate id; empty for posted data."))
+    payload = JSONField(default=dict, blank=True, verbose_name=_("Payload"), help_text=_("Render options, the posted estimate data for manual_data, or the filters of an export."))
+    base_url = models.CharField(max_length=500, blank=True, verbose_name=_("Base URL"), help_text=_("Where the templates' static files are, taken from the request that queued the job."))
+    input_key = models.CharField(max_length=64, db_index=True, verbose_name=_("Input Key"), help_text=_("SHA-256 of the user, kind, source and payload; repeated requests reuse a pending job."))
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    error = models.TextField(blank=True, verbose_name=_("Last Error"))
+    available_at = models.DateTimeField(default=timezone.now, verbose_name=_("Available At"), help_text=_("Not rendered before this time (retries back off)."))
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Lease Expires At"), help_text=_("A rendering job past this time is taken to be lost and is claimed again."))
+    worker = models.CharField(max_length=100, blank=True, verbose_name=_("Worker"))
+
+    file_name = models.CharField(max_length=255, blank=True, verbose_name=_("File"), help_text=_("Storage name of the rendered PDF (or ZIP, for an export)."))
+    file_size = models.PositiveIntegerField(default=0, verbose_name=_("File Size"))
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    render_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Render Time (ms)"))
+
+    class Meta:
+        verbose_name = _("PDF Render Job")
+        verbose_name_plural = _("PDF Render Jobs")
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'available_at'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id or ''} for {self.user} ({self.get_status_display()})"
+
 # No signals or recalculation methods within models. Calculations are external.
\ No newline at end of file
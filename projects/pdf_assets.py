@@ -0,0 +1,176 @@
+"""
+Everything WeasyPrint loads besides the HTML, without network calls.
+
+The PDF views pass base_url = this site, so a relative or site URL in a
+template (a logo, a stylesheet, a font) used to be fetched over HTTP from the
+same server, often by the very worker that was busy rendering: with sync
+gunicorn workers that waits for the timeout or deadlocks. Here:
+
+- url_fetcher(base_url) resolves URLs on this site under STATIC_URL from
+  STATIC_ROOT (or the staticfiles finders in development) and under
+  MEDIA_URL from default_storage. Small static files are kept in memory.
+  data: URLs are decoded as usual; anything else is refused, so WeasyPrint
+  leaves it out instead of waiting on the network;
+- the estimate templates keep their CSS in templates/pdf/, included inline
+  for HTML (share snapshots, the browser) and, for PDFs, parsed once per file
+  version into a weasyprint.CSS that every render reuses (stylesheet);
+- one FontConfiguration is shared by every render in the process.
+
+WeasyPrint is only imported by the first render, so processes that hand
+their renders to projects.pdf_pool never load it.
+
+render_template_pdf ties these together for the estimate templates.
+"""
+
+import functools
+import os
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http.request import split_domain_port, validate_host
+from django.template.loader import get_template, render_to_string
+from django.utils._os import safe_join
+
+from .pdf_cache import source_hash, template_hash
+
+# Template -> its stylesheet (a template too, so it can be included inline)
+TEMPLATE_STYLESHEETS = {
+    'pdf_template.html': 'pdf/estimate.css',
+    'manual_estimate_template.html': 'pdf/manual_estimate.css',
+}
+MAX_MEMORY_ASSET_BYTES = 1024 * 1024   # Larger static files are read from disk each time
+
+class AssetNotAvailable(ValueError):
+    """The URL is not a local static or media file, so it is not fetched."""
+
+
+def _url_path(prefix):
+    """STATIC_URL / MEDIA_URL as a path with leading and trailing slashes."""
+    path = urlsplit(prefix or '').path
+    return '/' + path.strip('/') + '/' if path.strip('/') else '/'
+
+
+@functools.lru_cache(maxsize=1)
+def font_config():
+    """The FontConfiguration every render in this process shares."""
+    from weasyprint.text.fonts import FontConfiguration
+    return FontConfiguration()
+
+
+@functools.lru_cache(maxsize=128)
+def _read_static(path, mtime_ns, size):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _static_file(name):
+    """Path of a static file: collectstatic's STATIC_ROOT first, then the finders."""
+    if settings.STATIC_ROOT:
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:  # ../ out of STATIC_ROOT
+            raise AssetNotAvailable(name)
+        if os.path.isfile(path):
+            return path
+    path = finders.find(name)
+    if not path:
+        raise AssetNotAvailable(name)
+    return path
+
+
+def fetch_static(name):
+    path = _static_file(name)
+    stat = os.stat(path)
+    if stat.st_size > MAX_MEMORY_ASSET_BYTES:
+        return {'file_obj': open(path, 'rb'), 'filename': os.path.basename(path)}
+    return {'string': _read_static(path, stat.st_mtime_ns, stat.st_size), 'filename': os.path.basename(path)}
+
+
+def fetch_media(name):
+    try:
+        return {'file_obj': default_storage.open(name, 'rb'), 'filename': os.path.basename(name)}
+    except (FileNotFoundError, SuspiciousFileOperation):
+        raise AssetNotAvailable(name)
+
+
+def is_local_host(host, base_url):
+    if not host:
+        return True
+    base_host = urlsplit(base_url or '').hostname
+    return host == base_host or validate_host(split_domain_port(host)[0] or host, settings.ALLOWED_HOSTS)
+
+
+def url_fetcher(base_url):
+    """A WeasyPrint url_fetcher that serves this site's static and media files from disk."""
+    static_path, media_path = _url_path(settings.STATIC_URL), _url_path(settings.MEDIA_URL)
+
+    def fetch(url, timeout=10, ssl_context=None):
+        parts = urlsplit(url)
+        if parts.scheme == 'data':
+            from weasyprint.urls import default_url_fetcher
+            return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+        if parts.scheme in ('http', 'https', '') and is_local_host(parts.hostname, base_url):
+            path = unquote(parts.path)
+            if path.startswith(static_path):
+                return fetch_static(path[len(static_path):])
+            if path.startswith(media_path):
+                return fetch_media(path[len(media_path):])
+        raise AssetNotAvailable(f"{url} is not a static or media file of this site; PDFs do not fetch it.")
+
+    return fetch
+
+
+@functools.lru_cache(maxsize=16)
+def _parse_stylesheet(path, version):
+    from weasyprint import CSS
+    with open(path, encoding='utf-8') as f:
+        return CSS(string=f.read(), url_fetcher=url_fetcher(None), font_config=font_config())
+
+
+def stylesheet_path(name):
+    return get_template(name).origin.name
+
+
+def stylesheet(name):
+    """The parsed stylesheet template `name`, parsed again only when the file changes."""
+    path = stylesheet_path(name)
+    return _parse_stylesheet(path, source_hash(path))
+
+
+def template_source_hash(template_name):
+    """Hash of a PDF template and its stylesheet, for the PDF cache key."""
+    stylesheet_name = TEMPLATE_STYLESHEETS.get(template_name)
+    if not stylesheet_name:
+        return template_hash(template_name)
+    return f"{template_hash(template_name)}:{template_hash(stylesheet_name)}"
+
+
+def layout(html_string, base_url, stylesheets=()):
+    """The laid out weasyprint.Document for an HTML document, with local assets only and the shared font configuration."""
+    from weasyprint import HTML
+    return HTML(string=html_string, base_url=base_url, url_fetcher=url_fetcher(base_url)).render(
+        stylesheets=list(stylesheets), font_config=font_config(),
+    )
+
+
+def write_pdf(html_string, base_url, stylesheets=()):
+    """The PDF for an HTML document (see layout)."""
+    return layout(html_string, base_url, stylesheets).write_pdf()
+
+
+def layout_template(template_name, context, base_url):
+    """
+    Lays out an estimate template. Its stylesheet is left out of the HTML
+    (preparsed_stylesheet) and passed already parsed instead.
+    """
+    stylesheet_name = TEMPLATE_STYLESHEETS.get(template_name)
+    html_string = render_to_string(template_name, {**context, 'preparsed_stylesheet': bool(stylesheet_name)})
+    return layout(html_string, base_url, [stylesheet(stylesheet_name)] if stylesheet_name else [])
+
+
+def render_template_pdf(template_name, context, base_url):
+    """Renders an estimate template to PDF (see layout_template)."""
+    return layout_template(template_name, context, base_url).write_pdf()
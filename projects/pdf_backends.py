@@ -0,0 +1,429 @@
+"""
+PDF backends for the standard project estimate (pdf_template.html).
+
+WeasyPrint lays out the HTML template with the full CSS engine; for a plain
+tabular estimate that layout is most of the render time. The canvas backend
+draws the same estimate straight onto a reportlab canvas instead: fixed
+columns, one pass from the top of the page down, a new page when a block does
+not fit.
+
+estimate_document turns the template context into the texts the template
+shows, formatted with the template's own filters (floatformat, date,
+default), so both backends show the same words and numbers;
+compare_pdf_backends checks that against the rendered template and times
+both backends.
+
+The backend is chosen per request (backend=weasyprint|canvas|auto), or by
+settings.PDF_BACKEND (weasyprint unless set). auto picks the canvas for
+estimates the canvas lays out as the template would (is_simple) and
+WeasyPrint for the rest (a logo, a long description, many rows).
+"""
+
+import functools
+import inspect
+import io
+import os
+
+from django.conf import settings
+from django.template import Variable, VariableDoesNotExist, defaultfilters
+import reportlab
+from reportlab.lib.colors import HexColor, white
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .pdf_cache import source_hash
+
+PDF_BACKENDS = ('weasyprint', 'canvas', 'auto')
+DEFAULT_PDF_BACKEND = getattr(settings, 'PDF_BACKEND', 'weasyprint')
+
+# auto: estimates past these go to WeasyPrint
+CANVAS_MAX_ROWS = 60
+CANVAS_MAX_DESCRIPTION = 600
+
+# A font with the cedi sign; without one the canvas uses Helvetica and writes GHS
+CANVAS_FONT_FILES = (
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/dejavu/DejaVuSans.ttf', '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf'),
+)
+
+# Template CSS, in points (1 CSS px = 0.75 pt), on WeasyPrint's default A4 page margin plus the body padding
+PX = 0.75
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN_X = 75 * PX + 5 * mm
+MARGIN_Y = 75 * PX + 15 * mm
+SECONDARY_COLOR = HexColor('#e9ecef')
+TEXT_COLOR = HexColor('#333333')
+MUTED_COLOR = HexColor('#555555')
+LIGHT_COLOR = HexColor('#777777')
+STRIPE_COLOR = HexColor('#f8f8f8')
+FOOT_COLOR = HexColor('#eeeeee')
+BANNER_COLOR = HexColor('#4141fa')
+
+ROOM_COLUMNS = (0.5, 0.25, 0.25)
+MATERIAL_COLUMNS = (0.1, 0.5, 0.2, 0.2)
+
+
+class PdfBackendError(ValueError):
+    """Unknown PDF backend."""
+
+
+def requested_backend(value):
+    """The backend asked for in a request, or None for the default; raises PdfBackendError."""
+    if value in (None, ''):
+        return None
+    if value not in PDF_BACKENDS:
+        raise PdfBackendError(f"Invalid backend. Must be one of: {', '.join(PDF_BACKENDS)}.")
+    return value
+
+
+def _var(context, path):
+    """A template variable the way the template resolves it (None where the template shows nothing)."""
+    try:
+        return Variable(path).resolve(context)
+    except VariableDoesNotExist:
+        return None
+
+
+def is_simple(context):
+    """Whether the canvas lays this estimate out as the template would."""
+    rows = len(context.get('rooms') or []) + len(context.get('materials') or [])
+    return (
+        not context.get('logo_url')
+        and rows <= CANVAS_MAX_ROWS
+        and len(str(context.get('description') or '')) <= CANVAS_MAX_DESCRIPTION
+    )
+
+
+def choose_backend(requested, context):
+    """'weasyprint' or 'canvas' for a request's backend (None: settings.PDF_BACKEND)."""
+    backend = requested or DEFAULT_PDF_BACKEND
+    if backend == 'auto':
+        return 'canvas' if is_simple(context) else 'weasyprint'
+    return backend
+
+
+def canvas_renderer():
+    return f"canvas reportlab {reportlab.Version}"
+
+
+def canvas_source_hash():
+    """The canvas layout is this module's code, so its hash is the cache key's template hash."""
+    return source_hash(inspect.getsourcefile(estimate_document))
+
+
+# --- What the estimate shows ---
+
+def _number(value, places=2):
+    return defaultfilters.floatformat(value or 0, places)
+
+
+def estimate_document(context):
+    """
+    The texts pdf_template.html shows for this context, in order, grouped by
+    the template's sections. Labels are as written in the template; the CSS
+    capitalises the headings and table headers, which the canvas does too.
+    """
+    user_profile_name = _var(context, 'user_profile.company_name')
+    representative = _var(context, 'user_profile.representative_name')
+    if user_profile_name:
+        heading = str(user_profile_name)
+    elif representative:
+        heading = f"{representative} Ventures"
+    elif context.get('customer_name'):
+        heading = f"{context['customer_name']} Ventures"
+    else:
+        heading = "[ Your Business Name ]"
+
+    from_rows = [
+        ("Company:", user_profile_name or "[Company Name]"),
+        ("Address:", _var(context, 'user_profile.address') or "[Company Address]"),
+    ]
+    if _var(context, 'user_profile.email'):
+        from_rows.append(("Email:", _var(context, 'user_info.email') or ''))
+    from_rows.append(("Phone:", _var(context, 'user_info.phone_number') or "[Company Phone]"))
+    if _var(context, 'user_profile.website'):
+        from_rows.append(("Website:", _var(context, 'user_profile.website')))
+
+    summary = [("Cost Per Area:", f"GH₵{_number(context.get('cost_per_area'))} / m²")]
+    wastage = context.get('wastage_percentage')
+    if wastage and wastage > 0:
+        summary.append(("Wastage Percentage:", f"{defaultfilters.floatformat(wastage or 0, 'g')}%"))
+    transport = context.get('transport')
+    if transport and transport > 0:
+        summary.append(("Transport Cost:", f"GH₵{_number(transport)}"))
+    extras = [("Estimated Days:", str(context.get('estimated_days') or 0))]
+    total_area = context.get('total_area')
+    if total_area and total_area > 0:
+        extras.append(("Total Area Calculated:", f"{_number(total_area)}m²"))
+
+    project_date = context.get('project_date')
+    description = context.get('description')
+    return {
+        'primary_color': context.get('primary_color') or '#007bff',
+        'heading': heading,
+        'header': [
+            ("Estimate No:", context.get('estimate_number') or "[Estimate Number]"),
+            ("Date:", defaultfilters.date(project_date, "Y-m-d") or "[Date]"),
+            ("Project Name:", context.get('project_name') or "[Project Name]"),
+        ],
+        'bill_to': [
+            ("Name:", context.get('customer_name') or "[Client Name]"),
+            ("Location:", context.get('location') or "[Client Location]"),
+            ("Phone:", context.get('contact') or "[Client Contact]"),
+        ],
+        'from': from_rows,
+        'description': str(description).splitlines() if description else None,
+        'rooms': [
+            [str(room.get('name') or "[Room Name]"), _number(room.get('floor_area_with_waste')), _number(room.get('wall_area_with_waste'))]
+            for room in context.get('rooms') or []
+        ],
+        'rooms_total': ("Total Area for Estimation:", f"{_number(total_area)} m²"),
+        'materials': [
+            [str(counter), str(_var(item, 'material.name') or "[Material Name]"), _number(item.get('quantity_with_wastage')), str(item.get('unit') or "N/A")]
+            for counter, item in enumerate(context.get('materials') or [], start=1)
+        ],
+        'summary': summary,
+        'total': ("Total Labour Cost:", f"GH₵{_number(context.get('total_labor_cost'))}"),
+        'extras': extras,
+        'signatures': [
+            "Customer Name (Signature)",
+            f"{representative or user_profile_name or 'Representative Name'} (Signature)",
+        ],
+        'terms': [
+            f"1. This estimate is valid for {context.get('validity_days') or 30} days from the issue date.",
+            "2. Any work requested outside the scope of this estimate will be billed separately.",
+            "3. Payment terms are as specified in the payment section. Timely payment is appreciated.",
+        ],
+        'footer': f"© {defaultfilters.date(project_date, 'Y') or ''} {user_profile_name or 'Your Company'}. All rights reserved.",
+    }
+
+
+# --- Canvas ---
+
+@functools.lru_cache(maxsize=1)
+def canvas_fonts():
+    """(regular, bold, whether they have the cedi sign): DejaVu Sans when installed, else Helvetica."""
+    for regular, bold in CANVAS_FONT_FILES:
+        if os.path.exists(regular) and os.path.exists(bold):
+            pdfmetrics.registerFont(TTFont('EstimateSans', regular))
+            pdfmetrics.registerFont(TTFont('EstimateSans-Bold', bold))
+            return 'EstimateSans', 'EstimateSans-Bold', True
+    return 'Helvetica', 'Helvetica-Bold', False
+
+
+class CanvasLayout:
+    """Draws top to bottom on A4 pages; `drawn` records every text, for the parity check."""
+
+    def __init__(self, pdf_canvas, primary_color):
+        self.canvas = pdf_canvas
+        self.primary = HexColor(primary_color)
+        self.regular, self.bold, self.unicode = canvas_fonts()
+        self.width = PAGE_WIDTH - 2 * MARGIN_X
+        self.y = PAGE_HEIGHT - MARGIN_Y
+        self.drawn = []
+
+    def ensure(self, height):
+        """Starts a new page unless `height` points still fit on this one."""
+        if self.y - height < MARGIN_Y:
+            self.canvas.showPage()
+            self.y = PAGE_HEIGHT - MARGIN_Y
+
+    def text(self, x, y, value, size, bold=False, color=TEXT_COLOR, align='left'):
+        value = str(value)
+        self.drawn.append(value)
+        if not self.unicode:
+            value = value.replace('₵', 'S')
+        font = self.bold if bold else self.regular
+        self.canvas.setFont(font, size)
+        self.canvas.setFillColor(color)
+        if align == 'right':
+            self.canvas.drawRightString(x, y, value)
+        elif align == 'center':
+            self.canvas.drawCentredString(x, y, value)
+        else:
+            self.canvas.drawString(x, y, value)
+        return pdfmetrics.stringWidth(value, font, size)
+
+    def rule(self, y, color, width=1, x=None, length=None):
+        x = MARGIN_X if x is None else x
+        self.canvas.setStrokeColor(color)
+        self.canvas.setLineWidth(width * PX)
+        self.canvas.line(x, y, x + (self.width if length is None else length), y)
+
+    def pair(self, x, label, value, size=14 * PX, align='left'):
+        """An info-pair line: bold label, then the value."""
+        if align == 'right':
+            value_width = pdfmetrics.stringWidth(str(value), self.regular, size)
+            self.text(x - value_width - 4, self.y, label, size, bold=True, align='right')
+            self.text(x, self.y, value, size, color=MUTED_COLOR, align='right')
+        else:
+            self.text(x, self.y, label, size, bold=True)
+            self.text(x + 120 * PX, self.y, value, size, color=MUTED_COLOR)
+
+    def heading(self, value, size=18 * PX):
+        self.ensure(size * 2.5)
+        self.y -= size
+        self.text(MARGIN_X, self.y, value, size, bold=True)
+        self.y -= 5 * PX
+        self.rule(self.y, SECONDARY_COLOR)
+        self.y -= 12 * PX
+
+    def table(self, headers, fractions, rows, footer=None, size=13 * PX):
+        widths = [fraction * self.width for fraction in fractions]
+        padding = 8 * PX
+        leading = size * 1.3
+
+        def draw_row(cells, widths, fill, text_color, bold=False, aligns=None):
+            lines = [simpleSplit(str(cell), self.bold if bold else self.regular, size, width - 2 * padding) or [''] for cell, width in zip(cells, widths)]
+            height = max(len(cell_lines) for cell_lines in lines) * leading + 2 * padding
+            self.ensure(height)
+            top, x = self.y, MARGIN_X
+            if fill is not None:
+                self.canvas.setFillColor(fill)
+                self.canvas.rect(MARGIN_X, top - height, self.width, height, stroke=0, fill=1)
+            self.canvas.setStrokeColor(SECONDARY_COLOR)
+            self.canvas.setLineWidth(PX)
+            for index, (cell_lines, width) in enumerate(zip(lines, widths)):
+                self.canvas.rect(x, top - height, width, height, stroke=1, fill=0)
+                align = (aligns or ['center'] * len(widths))[index]
+                anchor = {'left': x + padding, 'right': x + width - padding, 'center': x + width / 2}[align]
+                for line_index, line in enumerate(cell_lines):
+                    self.text(anchor, top - padding - size - line_index * leading + 2, line, size, bold=bold, color=text_color, align=align)
+                x += width
+            self.y = top - height
+
+        draw_row([header.upper() for header in headers], widths, self.primary, white, bold=True)
+        for index, row in enumerate(rows):
+            draw_row(row, widths, STRIPE_COLOR if index % 2 else None, TEXT_COLOR)
+        if footer:
+            # The label spans every column but the last, as colspan does in the template
+            draw_row(footer, [sum(widths[:-1]), widths[-1]], FOOT_COLOR, TEXT_COLOR, bold=True, aligns=['right', 'center'])
+        self.y -= 15 * PX
+
+    def summary_row(self, label, value, size=15 * PX, color=MUTED_COLOR, value_color=TEXT_COLOR, bold_value=False):
+        self.ensure(size * 1.6)
+        self.y -= size
+        self.text(MARGIN_X, self.y, label, size, bold=True, color=color)
+        self.text(MARGIN_X + self.width, self.y, value, size, bold=bold_value, color=value_color, align='right')
+        self.y -= 6 * PX
+
+
+def draw_estimate(document, pdf_file):
+    """Draws the estimate document (estimate_document) into pdf_file. Returns the CanvasLayout."""
+    pdf_canvas = canvas.Canvas(pdf_file, pagesize=A4, invariant=1)
+    pdf_canvas.setTitle(f"Estimate - {document['header'][0][1]}")
+    layout = CanvasLayout(pdf_canvas, document['primary_color'])
+    left, right = MARGIN_X, MARGIN_X + layout.width
+
+    # Header: business name and "Powered by" on the left, the estimate details on the right.
+    # Drawn in the template's order, so the text reads the same (see the parity tests)
+    layout.y -= 28 * PX
+    layout.text(left, layout.y, document['heading'], 18 * PX, bold=True)
+    layout.text(left, layout.y - 14 * PX, "Powered by TileNet", 9 * PX, color=LIGHT_COLOR)
+    layout.text(right, layout.y, "Estimate".upper(), 28 * PX, bold=True, color=layout.primary, align='right')
+    layout.y -= 14 * PX
+    for label, value in document['header']:
+        layout.y -= 14 * PX * 1.5
+        layout.pair(right, label, value, align='right')
+    layout.y -= 10 * PX
+    layout.rule(layout.y, layout.primary, width=2)
+    layout.y -= 20 * PX
+
+    # Bill To / From, side by side
+    top, bottoms = layout.y, []
+    for x, title, rows, align in ((left, "Bill To", document['bill_to'], 'left'), (right, "From", document['from'], 'right')):
+        layout.y = top - 18 * PX
+        layout.text(x, layout.y, title, 18 * PX, bold=True, align=align)
+        layout.y -= 10 * PX
+        for label, value in rows:
+            layout.y -= 14 * PX * 1.5
+            layout.pair(x, label, value, align=align)
+        bottoms.append(layout.y)
+    layout.y = min(bottoms) - 10 * PX
+    layout.rule(layout.y, layout.primary, width=2)
+    layout.y -= 15 * PX
+    if document['description'] is not None:
+        layout.ensure(30)
+        layout.y -= 14 * PX
+        layout.text(left, layout.y, "Description:", 14 * PX, bold=True)
+        for paragraph in document['description']:
+            for line in simpleSplit(paragraph, layout.regular, 14 * PX, layout.width) or ['']:
+                layout.ensure(14 * PX * 1.5)
+                layout.y -= 14 * PX * 1.5
+                layout.text(left, layout.y, line, 14 * PX, color=MUTED_COLOR)
+        layout.y -= 15 * PX
+
+    layout.heading("Room Measurements")
+    if document['rooms']:
+        layout.table(["Room Name", "Floor Area (m²)", "Wall Area (m²)"], ROOM_COLUMNS, document['rooms'], footer=document['rooms_total'])
+    else:
+        layout.summary_row("No room details available for this project.", '', size=14 * PX, color=TEXT_COLOR)
+
+    layout.heading("Materials Summary")
+    if document['materials']:
+        layout.table(["Item", "Name", "Quantity Needed", "Unit"], MATERIAL_COLUMNS, document['materials'])
+    else:
+        layout.summary_row("No materials added to this project.", '', size=14 * PX, color=TEXT_COLOR)
+
+    layout.heading("Estimate Summary")
+    layout.rule(layout.y, SECONDARY_COLOR, width=2)
+    layout.y -= 6 * PX
+    for label, value in document['summary']:
+        layout.summary_row(label, value)
+    layout.ensure(50 * PX)
+    layout.y -= 10 * PX
+    layout.rule(layout.y, layout.primary, width=2)
+    layout.y -= 4 * PX
+    layout.summary_row(*document['total'], size=20 * PX, color=layout.primary, value_color=layout.primary, bold_value=True)
+    layout.y -= 9 * PX
+    layout.rule(layout.y, SECONDARY_COLOR)
+    for label, value in document['extras']:
+        layout.y -= 14 * PX * 1.5
+        layout.pair(left, label, value)
+    layout.y -= 20 * PX
+
+    # Signatures, two boxes side by side
+    layout.ensure(80 * PX)
+    layout.y -= 30 * PX
+    layout.rule(layout.y, SECONDARY_COLOR)
+    layout.y -= 30 * PX
+    box_width = layout.width / 2
+    for index, caption in enumerate(document['signatures']):
+        centre = left + box_width * (index + 0.5)
+        layout.canvas.setStrokeColor(HexColor('#000000'))
+        layout.canvas.setLineWidth(PX)
+        layout.canvas.line(centre - box_width * 0.4, layout.y, centre + box_width * 0.4, layout.y)
+        layout.text(centre, layout.y - 14 * PX * 1.2, caption, 13 * PX, align='center')
+    layout.y -= 40 * PX
+
+    # Terms, the banner and the footer stay together
+    layout.ensure((15 + 11 * 1.6 * len(document['terms']) + 60) * PX)
+    layout.y -= 15 * PX
+    layout.text(left, layout.y, "Terms and Conditions", 15 * PX, bold=True)
+    layout.y -= 8 * PX
+    for term in document['terms']:
+        layout.y -= 11 * PX * 1.6
+        layout.text(left, layout.y, term, 11 * PX, color=MUTED_COLOR)
+    layout.y -= 15 * PX + 14 * PX
+    pdf_canvas.setFillColor(BANNER_COLOR)
+    pdf_canvas.rect(left, layout.y, layout.width, 14 * PX, stroke=0, fill=1)
+    layout.text(left + layout.width / 2, layout.y + 4 * PX, "Powered by TileNet", 10 * PX, color=white, align='center')
+    layout.y -= 20 * PX
+    layout.rule(layout.y, SECONDARY_COLOR)
+    layout.y -= 8 * PX + 11 * PX
+    layout.text(left + layout.width / 2, layout.y, document['footer'], 11 * PX, color=LIGHT_COLOR, align='center')
+
+    pdf_canvas.showPage()
+    pdf_canvas.save()
+    return layout
+
+
+def render_canvas_estimate(context):
+    """The project estimate for a pdf_template.html context, drawn by the canvas backend, as PDF bytes."""
+    pdf_file = io.BytesIO()
+    draw_estimate(estimate_document(context), pdf_file)
+    return pdf_file.getvalue()
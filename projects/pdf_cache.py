@@ -0,0 +1,276 @@
+"""
+Content-addressed cache of rendered PDFs.
+
+A PDF depends only on the estimate's data, the template (or report code) it
+is rendered with, the renderer and the render options. The cache key is the
+SHA-256 of exactly those (cache_key), so an estimate that has not changed
+since the last download is read from disk instead of rendered again. Any
+change to the data, the template file, the renderer version or the options
+gives a new key, so nothing is ever invalidated: entries that are no longer
+asked for just age out.
+
+Entries are files under PDF_CACHE_DIR on local disk (settings.PDF_CACHE_DIR
+overrides it), written atomically. Each PDF has a small JSON file beside it
+that records how long the render took. A hit touches the PDF, and storing an
+entry evicts the least recently used ones while the cache is over
+PDF_CACHE_MAX_BYTES.
+
+Hits, misses, the time spent building template contexts, render (layout)
+time spent and render time saved are counted in a stats file that the web
+and render processes share (cache_stats), along with the renders the web
+processes did themselves because the renderer pool was down (pdf_pool).
+"""
+
+import datetime
+import functools
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.template.loader import get_template
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats updates are not locked
+    fcntl = None
+
+# Bump to drop every entry (e.g. when a context change is not visible in the document or template)
+PDF_CACHE_VERSION = 1
+PDF_CACHE_DIR = getattr(settings, 'PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'tilnet_pdf_cache'))
+PDF_CACHE_MAX_BYTES = getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+STATS_FILE = 'stats.json'
+STAT_COUNTERS = ('hits', 'misses', 'context_ms', 'render_ms', 'saved_ms', 'evictions', 'pool_fallbacks')
+
+# An open PDF: key is its cache key (and ETag), file is open for reading
+CachedPdf = namedtuple('CachedPdf', ['key', 'file', 'size'])
+
+
+@functools.lru_cache(maxsize=64)
+def _file_hash(path, mtime_ns, size):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_hash(path):
+    """SHA-256 of a file, read again only when its modification time or size changes."""
+    stat = os.stat(path)
+    return _file_hash(path, stat.st_mtime_ns, stat.st_size)
+
+
+def template_hash(template_name):
+    """SHA-256 of the template file Django would load for template_name."""
+    return source_hash(get_template(template_name).origin.name)
+
+
+def cache_key(renderer, source, document, options):
+    """
+    renderer: name and version of the PDF library; source: hash of the
+    template or code; document: the estimate data the PDF shows; options:
+    everything else that changes the output (customer overrides, base URL,
+    the date printed on it).
+    """
+    inputs = json.dumps(
+        [PDF_CACHE_VERSION, renderer, source, document, options],
+        sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+def entry_path(key, extension='pdf'):
+    return os.path.join(PDF_CACHE_DIR, key[:2], f"{key}.{extension}")
+
+
+def has_entry(key):
+    """Whether the PDF for this key is cached, without opening it or marking it as used."""
+    return os.path.exists(entry_path(key))
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def open_entry(key):
+    """(open file, size, render ms) of a cached entry, or None. Marks the entry as recently used."""
+    path = entry_path(key)
+    try:
+        pdf_file = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    size = os.fstat(pdf_file.fileno()).st_size
+    try:
+        os.utime(path)
+    except OSError:
+        pass  # Evicted meanwhile; the open file still reads
+    try:
+        with open(entry_path(key, 'json'), 'rb') as f:
+            render_ms = json.load(f).get('render_ms', 0)
+    except (OSError, ValueError):
+        render_ms = 0
+    return pdf_file, size, render_ms
+
+
+def store_entry(key, pdf, render_ms):
+    # Metadata first: a PDF on disk always has its render time beside it
+    _write_atomic(entry_path(key, 'json'), json.dumps({'render_ms': render_ms, 'bytes': len(pdf)}).encode('utf-8'))
+    _write_atomic(entry_path(key), pdf)
+    evict()
+
+
+def _entries():
+    """(mtime, size, key) of every cached PDF."""
+    entries = []
+    if not os.path.isdir(PDF_CACHE_DIR):
+        return entries
+    for prefix in os.listdir(PDF_CACHE_DIR):
+        directory = os.path.join(PDF_CACHE_DIR, prefix)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.endswith('.pdf'):
+                continue
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue  # Evicted by another process meanwhile
+            entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+    return entries
+
+
+def _remove_entry(key):
+    for extension in ('pdf', 'json'):
+        try:
+            os.remove(entry_path(key, extension))
+        except FileNotFoundError:
+            pass
+
+
+def evict(max_bytes=None):
+    """Removes least recently used entries until the cache is at most max_bytes. Returns how many."""
+    max_bytes = PDF_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = _entries()
+    total = sum(size for mtime, size, key in entries)
+    evicted = 0
+    for mtime, size, key in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove_entry(key)
+        total -= size
+        evicted += 1
+    if evicted:
+        update_stats(evictions=evicted)
+    return evicted
+
+
+def clear():
+    """Removes every entry and resets the stats. Returns how many entries there were."""
+    entries = _entries()
+    for mtime, size, key in entries:
+        _remove_entry(key)
+    try:
+        os.remove(os.path.join(PDF_CACHE_DIR, STATS_FILE))
+    except FileNotFoundError:
+        pass
+    return len(entries)
+
+
+def _read_stats(f):
+    f.seek(0)
+    try:
+        stats = json.loads(f.read() or '{}')
+    except ValueError:
+        stats = {}
+    for counter in STAT_COUNTERS:
+        stats.setdefault(counter, 0)
+    stats.setdefault('since', datetime.datetime.now(datetime.timezone.utc).isoformat())
+    return stats
+
+
+def update_stats(**increments):
+    """Adds to the shared counters (under a file lock where there is one)."""
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    with open(os.path.join(PDF_CACHE_DIR, STATS_FILE), 'a+') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        stats = _read_stats(f)
+        for counter, increment in increments.items():
+            stats[counter] += increment
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(stats))
+
+
+def cache_stats():
+    """Counters since the cache was last cleared, the hit rate, and what is on disk now."""
+    stats = {counter: 0 for counter in STAT_COUNTERS}
+    stats['since'] = None
+    try:
+        with open(os.path.join(PDF_CACHE_DIR, STATS_FILE)) as f:
+            stats = _read_stats(f)
+    except FileNotFoundError:
+        pass
+    lookups = stats['hits'] + stats['misses']
+    entries = _entries()
+    stats.update({
+        'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+        'entries': len(entries),
+        'bytes': sum(size for mtime, size, key in entries),
+        'max_bytes': PDF_CACHE_MAX_BYTES,
+        'directory': PDF_CACHE_DIR,
+    })
+    return stats
+
+
+def open_or_render(renderer, source, document, options, render, context_ms=0):
+    """
+    The PDF for these inputs as a CachedPdf: the cache entry opened for
+    reading, or render() stored and then opened. The caller closes the file.
+    Cache errors (a full or read-only disk) are reported and the rendered
+    bytes are returned in memory as if there were no cache. context_ms is
+    the time the caller took to read the document, counted apart from the
+    render time.
+    """
+    key = cache_key(renderer, source, document, options)
+    try:
+        cached = open_entry(key)
+    except OSError as e:
+        print(f"PDF cache read failed for {key}: {e}")
+        cached = None
+    if cached is not None:
+        pdf_file, size, render_ms = cached
+        _count(hits=1, saved_ms=render_ms, context_ms=round(context_ms, 1))
+        return CachedPdf(key, pdf_file, size)
+
+    started = time.perf_counter()
+    pdf = render()
+    render_ms = int((time.perf_counter() - started) * 1000)
+    _count(misses=1, render_ms=render_ms, context_ms=round(context_ms, 1))
+    try:
+        store_entry(key, pdf, render_ms)
+        # Streams from disk from here on, so the rendered bytes can go
+        pdf_file = open(entry_path(key), 'rb')
+    except OSError as e:
+        print(f"PDF cache write failed for {key}: {e}")
+        pdf_file = io.BytesIO(pdf)
+    return CachedPdf(key, pdf_file, len(pdf))
+
+
+def _count(**increments):
+    try:
+        update_stats(**increments)
+    except OSError as e:
+        print(f"PDF cache stats update failed: {e}")
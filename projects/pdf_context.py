@@ -0,0 +1,173 @@
+"""
+Template contexts for the estimate PDFs, read straight from the database.
+
+The PDF paths used to serialize the project with ProjectSerializer (every
+field, the rooms with their details, the materials with their catalogue
+entries, the workers) and then pick the template's values out of that dict.
+The builders here fetch only what pdf_template.html and
+manual_estimate_template.html show, with one values() query per table, and
+format money, areas and quantities as strings once. They only read.
+
+*_estimate_data returns plain values, which is also the document the PDF
+cache key is taken from (pdf_cache.cache_key), so a change to anything the
+PDF shows gives a new key and a change to anything else does not.
+*_estimate_context turns it into the template context. Numbers the
+templates compare (`total_area > 0`) stay Decimals.
+"""
+
+import decimal
+import functools
+import random
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from manual_estimate.models import Estimate as ManualEstimate, MaterialItem, RoomArea, material_total_pesewas
+
+from .fixed_point import from_area, from_pesewas, to_area, to_pesewas
+from .models import Project, ProjectMaterial, Room
+
+PROJECT_FIELDS = (
+    'estimate_number', 'name', 'location', 'project_type', 'status', 'measurement_unit', 'estimated_days',
+    'description', 'customer_name', 'customer_phone', 'customer_location', 'total_area_with_waste',
+    'cost_per_area', 'total_labor_cost', 'wastage_percentage',
+)
+MANUAL_ESTIMATE_FIELDS = (
+    'title', 'estimate_date', 'remarks', 'estimated_days', 'wastage_percentage', 'transport_cost',
+    'total_labour_cost', 'labour_per_sq_meter', 'customer__name', 'customer__location', 'customer__phone',
+)
+COMPANY_FIELDS = ('company_name', 'address', 'website', 'phone_number')
+PROFILE_COLOR_FIELD = 'primary_color'
+MANUAL_PRIMARY_COLOR = '#004a7c'  # When the profile has no colour of its own
+
+
+def _amount(value):
+    """A 2-place string for money, areas and quantities (what floatformat:2 shows)."""
+    return f"{decimal.Decimal(value or 0):.2f}"
+
+
+@functools.lru_cache(maxsize=1)
+def profile_fields():
+    """COMPANY_FIELDS, plus the profile's colour where UserProfile has one."""
+    if PROFILE_COLOR_FIELD in {field.name for field in UserProfile._meta.get_fields()}:
+        return COMPANY_FIELDS + (PROFILE_COLOR_FIELD,)
+    return COMPANY_FIELDS
+
+
+def company_data(user):
+    """The company and account details the estimates show."""
+    company = UserProfile.objects.filter(user=user).values(*profile_fields()).first() or {}
+    return {
+        'user_profile': company,
+        'user_info': {'email': user.email, 'phone_number': user.phone_number, 'username': user.username},
+    }
+
+
+def project_estimate_data(project_id, user):
+    """What pdf_template.html shows of the user's project. Raises Project.DoesNotExist."""
+    project = Project.objects.filter(pk=project_id, user=user).values(*PROJECT_FIELDS).get()
+    rooms = Room.objects.filter(project_id=project_id).values_list('name', 'floor_area_with_waste', 'wall_area_with_waste')
+    materials = ProjectMaterial.objects.filter(project_id=project_id).values_list('material__name', 'unit', 'quantity_with_wastage')
+    return {
+        'estimate_number': project['estimate_number'] or 'N/A',
+        'project_name': project['name'] or 'N/A',
+        'location': project['location'],
+        'project_type': project['project_type'],
+        'status': project['status'],
+        'measurement_unit': project['measurement_unit'],
+        'estimated_days': project['estimated_days'],
+        'description': project['description'],
+        'customer': [project['customer_name'], project['customer_phone'], project['customer_location']],
+        'total_area': _amount(project['total_area_with_waste']),
+        'cost_per_area': _amount(project['cost_per_area']),
+        'total_labor_cost': _amount(project['total_labor_cost']),
+        'wastage_percentage': str(project['wastage_percentage'] or 0),
+        'rooms': [
+            {'name': name, 'floor_area_with_waste': _amount(floor_area), 'wall_area_with_waste': _amount(wall_area)}
+            for name, floor_area, wall_area in rooms
+        ],
+        'materials': [
+            {'material': {'name': material_name}, 'unit': unit, 'quantity_with_wastage': _amount(quantity)}
+            for material_name, unit, quantity in materials
+        ],
+        **company_data(user),
+    }
+
+
+def project_estimate_context(data, base_url, customer_name=None, contact=None, customer_location=None, transport=decimal.Decimal('0')):
+    """
+    Template context for pdf_template.html from project_estimate_data. The
+    customer details default to the project's own.
+    """
+    project_customer, project_contact, project_customer_location = data['customer']
+    return {
+        **{key: value for key, value in data.items() if key != 'customer'},
+        'project_date': timezone.now().date(),
+        'primary_color': getattr(settings, 'PRIMARY_COLOR', '#007bff'),
+        'base_url': base_url,
+        'validity_days': 30,
+        'customer_name': customer_name if customer_name is not None else project_customer or 'N/A',
+        'contact': contact if contact is not None else project_contact or 'N/A',
+        'customer_location': customer_location if customer_location is not None else project_customer_location or data['location'] or 'N/A',
+        'total_area': decimal.Decimal(data['total_area']),
+        'wastage_percentage': decimal.Decimal(data['wastage_percentage']),
+        'transport': decimal.Decimal(str(transport or '0')),
+    }
+
+
+def manual_estimate_data(estimate_id, user):
+    """What manual_estimate_template.html shows of the user's manual estimate. Raises Estimate.DoesNotExist."""
+    estimate = ManualEstimate.objects.filter(pk=estimate_id, user=user).values(*MANUAL_ESTIMATE_FIELDS).get()
+    rooms = list(RoomArea.objects.filter(estimate_id=estimate_id).values_list('name', 'floor_area', 'wall_area'))
+    materials = []
+    material_cost = 0
+    for name, unit_price, quantity in MaterialItem.objects.filter(estimate_id=estimate_id).values_list('name', 'unit_price', 'quantity'):
+        total_price = material_total_pesewas(unit_price, quantity)
+        material_cost += total_price
+        materials.append({'name': name, 'quantity': _amount(quantity), 'unit_price': _amount(unit_price), 'total_price': _amount(from_pesewas(total_price))})
+    labour_cost = to_pesewas(estimate['total_labour_cost'])
+    transport = to_pesewas(estimate['transport_cost'])
+    return {
+        'estimate_id': estimate_id,
+        'project_name': estimate['title'],
+        'project_date': estimate['estimate_date'],
+        'description': estimate['remarks'],
+        'estimated_days': estimate['estimated_days'] or 0,
+        'customer_name': estimate['customer__name'],
+        'location': estimate['customer__location'],
+        'contact': estimate['customer__phone'],
+        'rooms': [
+            {'name': name, 'floor_area': _amount(floor_area), 'wall_area': _amount(wall_area)}
+            for name, floor_area, wall_area in rooms
+        ],
+        'materials': materials,
+        'total_material_cost': _amount(from_pesewas(material_cost)),
+        'total_labor_cost': _amount(from_pesewas(labour_cost)),
+        'subtotal_cost': _amount(from_pesewas(material_cost + labour_cost)),
+        'grand_total': _amount(from_pesewas(material_cost + labour_cost + transport)),
+        'transport': _amount(from_pesewas(transport)),
+        'wastage_percentage': str(estimate['wastage_percentage'] or 0),
+        'cost_per_area': str(estimate['labour_per_sq_meter'] or 0),
+        'total_area': _amount(from_area(sum(to_area(floor_area) + to_area(wall_area) for name, floor_area, wall_area in rooms), 2)),
+        **company_data(user),
+    }
+
+
+def manual_estimate_context(data, base_url):
+    """Template context for manual_estimate_template.html from manual_estimate_data."""
+    return {
+        **data,
+        'estimate_number': f"EST-{data['estimate_id']:06d}-{random.randint(100, 999)}",
+        'validity_days': 30,
+        'primary_color': data['user_profile'].get(PROFILE_COLOR_FIELD) or MANUAL_PRIMARY_COLOR,
+        'measurement_unit': 'm',
+        'base_url': base_url,
+        'customer_name': data['customer_name'] if data['customer_name'] is not None else "[Client Name]",
+        'location': data['location'] if data['location'] is not None else "[Client Location]",
+        'contact': data['contact'] if data['contact'] is not None else "[Client Contact]",
+        'transport': decimal.Decimal(data['transport']),
+        'wastage_percentage': decimal.Decimal(data['wastage_percentage']),
+        'cost_per_area': decimal.Decimal(data['cost_per_area']),
+        'total_area': decimal.Decimal(data['total_area']),
+    }
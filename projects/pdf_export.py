@@ -0,0 +1,296 @@
+"""
+Batch export of estimate PDFs as one ZIP, e.g. a month's quotes for the
+accountant.
+
+Up to MAX_EXPORT_ESTIMATES renders take far longer than gunicorn's timeout,
+so the export endpoint only queues a PdfRenderJob of kind export
+(queue_export) and the render_pdf_jobs worker builds the ZIP (write_export);
+the client polls the job and downloads the ZIP as it would a PDF.
+
+export_items picks the user's project estimates and manual estimates by
+estimate date, project status and customer name. stream_zip renders them
+through the renderer pool (pdf_pool.render, so unchanged estimates come
+straight from the PDF cache) with at most EXPORT_WORKERS renders in flight,
+and writes each PDF into the archive as soon as it is done (zipfile on an
+unseekable stream), so the PDFs are never all held in memory. Without a pool
+the renders happen one at a time in the calling thread, where
+pdf_jobs.call_with_timeout can stop them. Estimates still waiting once the
+export has used EXPORT_RENDER_BUDGET seconds are left out. index.csv at the
+end lists every estimate, with the error for any that could not be rendered.
+"""
+
+import csv
+import datetime
+import io
+import tempfile
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import connections
+from django.utils.datastructures import MultiValueDict
+from django.utils.text import get_valid_filename
+
+from manual_estimate.models import Estimate as ManualEstimate
+
+from . import pdf_cache
+from . import pdf_jobs
+from . import pdf_pool
+from .models import PdfRenderJob, Project
+from .pdf_responses import CHUNK_SIZE
+
+EXPORT_TYPES = ('project', 'manual')
+MAX_EXPORT_ESTIMATES = 200
+EXPORT_WORKERS = pdf_pool.POOL_PROCESSES
+EXPORT_PARAMS = ('from', 'to', 'status', 'customer', 'type')
+# Seconds of rendering; the renders in flight then still finish (pdf_pool.REPLY_TIMEOUT) inside pdf_jobs.EXPORT_TIMEOUT
+EXPORT_RENDER_BUDGET = pdf_jobs.EXPORT_TIMEOUT - pdf_pool.REPLY_TIMEOUT - 30
+INDEX_FIELDS = ['file', 'type', 'id', 'reference', 'customer', 'date', 'status', 'error']
+
+ExportItem = namedtuple('ExportItem', ['kind', 'object_id', 'file_name', 'reference', 'customer', 'date', 'status', 'payload'])
+
+
+class ExportError(ValueError):
+    """The export filter is invalid or matches too many estimates."""
+
+
+class NothingToExport(ExportError):
+    """The export filter matches no estimates."""
+
+
+def _date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"{name} must be a date (YYYY-MM-DD).")
+
+
+def parse_export_filters(params):
+    """
+    Filters from query parameters: from / to (estimate dates, inclusive),
+    status (projects only), customer (part of the name) and type (project,
+    manual, or both when left out; repeat it or separate with commas).
+    """
+    kinds = [kind for value in params.getlist('type') for kind in value.split(',') if kind] or list(EXPORT_TYPES)
+    unknown = set(kinds) - set(EXPORT_TYPES)
+    if unknown:
+        raise ExportError(f"Invalid type {', '.join(sorted(unknown))}. Must be one of: {', '.join(EXPORT_TYPES)}.")
+    status = params.get('status') or None
+    if status and status not in dict(Project.STATUS_CHOICES):
+        raise ExportError(f"Invalid status. Must be one of: {', '.join(dict(Project.STATUS_CHOICES))}.")
+    filters = {
+        'date_from': _date(params.get('from'), 'from'),
+        'date_to': _date(params.get('to'), 'to'),
+        'status': status,
+        'customer': (params.get('customer') or '').strip(),
+        'kinds': kinds,
+    }
+    if filters['date_from'] and filters['date_to'] and filters['date_from'] > filters['date_to']:
+        raise ExportError("from must not be after to.")
+    return filters
+
+
+def export_items(user, filters):
+    """The estimates to export, oldest first. Raises ExportError beyond MAX_EXPORT_ESTIMATES."""
+    items = []
+    if 'project' in filters['kinds']:
+        projects = Project.objects.filter(user=user)
+        if filters['date_from']:
+            projects = projects.filter(date__gte=filters['date_from'])
+        if filters['date_to']:
+            projects = projects.filter(date__lte=filters['date_to'])
+        if filters['status']:
+            projects = projects.filter(status=filters['status'])
+        if filters['customer']:
+            projects = projects.filter(customer_name__icontains=filters['customer'])
+        for pk, estimate_number, customer_name, project_date, project_status, transport in projects.values_list(
+            'pk', 'estimate_number', 'customer_name', 'date', 'status', 'transport',
+        ):
+            reference = estimate_number or f"project-{pk}"
+            items.append(ExportItem(
+                'project', pk, f"projects/{get_valid_filename(reference)}.pdf", reference, customer_name,
+                project_date, project_status, {'transport': str(transport or '0')},
+            ))
+    # Manual estimates have no status, so a status filter leaves them out
+    if 'manual' in filters['kinds'] and not filters['status']:
+        estimates = ManualEstimate.objects.filter(user=user)
+        if filters['date_from']:
+            estimates = estimates.filter(estimate_date__gte=filters['date_from'])
+        if filters['date_to']:
+            estimates = estimates.filter(estimate_date__lte=filters['date_to'])
+        if filters['customer']:
+            estimates = estimates.filter(customer__name__icontains=filters['customer'])
+        for pk, title, customer_name, estimate_date in estimates.values_list('pk', 'title', 'customer__name', 'estimate_date'):
+            items.append(ExportItem(
+                'manual', pk, f"manual/estimate-{pk}.pdf", title, customer_name or '', estimate_date, '', {},
+            ))
+    if len(items) > MAX_EXPORT_ESTIMATES:
+        raise ExportError(
+            f"{len(items)} estimates match; export at most {MAX_EXPORT_ESTIMATES} at once (narrow the dates)."
+        )
+    items.sort(key=lambda item: (item.date or datetime.date.min, item.kind, item.object_id))
+    return items
+
+
+def _render(user, base_url, item):
+    try:
+        return pdf_pool.render(item.kind, user, base_url, object_id=item.object_id, payload=item.payload)
+    finally:
+        # This thread's own database connection
+        connections.close_all()
+
+
+def _failed(item, e):
+    print(f"PDF export failed for {item.kind} {item.object_id}: {e}")
+    return str(e) or e.__class__.__name__
+
+
+def rendered(user, base_url, items, workers=EXPORT_WORKERS, deadline=None):
+    """
+    Yields (item, pdf, error) as renders finish, with at most `workers`
+    renders running and as many more queued. Without a renderer pool the
+    renders happen in this thread, one at a time, so that their timeout
+    works. Items not started by `deadline` (time.monotonic()) are yielded
+    with an error instead of rendered.
+    """
+    pending_items = iter(items)
+
+    def timed_out():
+        return deadline is not None and time.monotonic() > deadline
+
+    if not pdf_pool.is_running():
+        for item in pending_items:
+            if timed_out():
+                yield item, None, "Not rendered: the export ran out of time."
+                continue
+            try:
+                pdf, error = pdf_pool.render(item.kind, user, base_url, object_id=item.object_id, payload=item.payload), ''
+            except Exception as e:
+                pdf, error = None, _failed(item, e)
+            yield item, pdf, error
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-export') as executor:
+        futures = {}
+        skipped = []
+
+        def submit():
+            for item in pending_items:
+                if timed_out():
+                    skipped.append(item)
+                    continue
+                futures[executor.submit(_render, user, base_url, item)] = item
+                return
+
+        for _ in range(workers * 2):
+            submit()
+        while futures:
+            done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = futures.pop(future)
+                submit()
+                try:
+                    pdf, error = future.result(), ''
+                except Exception as e:
+                    pdf, error = None, _failed(item, e)
+                yield item, pdf, error
+    for item in skipped:
+        yield item, None, "Not rendered: the export ran out of time."
+
+
+class _ZipBuffer:
+    """Unseekable file for zipfile that collects what is written until it is taken."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """What was written since the last call, as a list of at most one chunk."""
+        data, self.chunks = b''.join(self.chunks), []
+        return [data] if data else []
+
+
+def stream_zip(user, base_url, items, workers=EXPORT_WORKERS, deadline=None):
+    """The ZIP archive of the items' PDFs, plus index.csv, as chunks of bytes."""
+    buffer = _ZipBuffer()
+    index = io.StringIO()
+    writer = csv.DictWriter(index, fieldnames=INDEX_FIELDS)
+    writer.writeheader()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for item, pdf, error in rendered(user, base_url, items, workers, deadline):
+            if pdf is not None:
+                with pdf.file, archive.open(item.file_name, 'w') as entry:
+                    while True:
+                        chunk = pdf.file.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        yield from buffer.take()
+            writer.writerow({
+                'file': item.file_name if pdf is not None else '', 'type': item.kind, 'id': item.object_id,
+                'reference': item.reference, 'customer': item.customer, 'date': item.date,
+                'status': item.status, 'error': error,
+            })
+            yield from buffer.take()
+        archive.writestr('index.csv', index.getvalue())
+    yield from buffer.take()
+
+
+# --- Jobs ---
+
+def export_payload(params):
+    """The export's query parameters, as the job's payload (lists, as MultiValueDict takes them)."""
+    return {name: params.getlist(name) for name in EXPORT_PARAMS if params.getlist(name)}
+
+
+def queue_export(user, params, base_url):
+    """
+    Queues an export of the estimates the query parameters pick (see
+    parse_export_filters). Returns (job, created). Raises ExportError for a
+    bad filter, NothingToExport when it matches no estimates, and
+    pdf_jobs.TooManyPdfJobs.
+    """
+    filters = parse_export_filters(params)
+    if not export_items(user, filters):
+        raise NothingToExport("No estimates match the filter.")
+    payload = export_payload(params)
+    input_key = pdf_jobs.job_input_key(user, 'export', None, payload)
+    pending = PdfRenderJob.objects.filter(user=user, input_key=input_key, status='pending').first()
+    if pending:
+        return pending, False
+    if PdfRenderJob.objects.filter(user=user, status__in=['pending', 'rendering']).count() >= pdf_jobs.MAX_PENDING_JOBS_PER_USER:
+        raise pdf_jobs.TooManyPdfJobs(f"You already have {pdf_jobs.MAX_PENDING_JOBS_PER_USER} PDFs waiting. Try again when they are done.")
+    job = PdfRenderJob.objects.create(user=user, kind='export', payload=payload, base_url=base_url, input_key=input_key)
+    return job, True
+
+
+def write_export(job, budget=EXPORT_RENDER_BUDGET):
+    """
+    Builds an export job's ZIP from the estimates as they are now, in a
+    temporary file. Returns it as a pdf_cache.CachedPdf for pdf_jobs.process_job
+    to store.
+    """
+    try:
+        items = export_items(job.user, parse_export_filters(MultiValueDict(job.payload)))
+    except ExportError as e:
+        raise pdf_jobs.PdfJobError(str(e))
+    archive = tempfile.TemporaryFile()
+    try:
+        for chunk in stream_zip(job.user, job.base_url, items, deadline=time.monotonic() + budget):
+            archive.write(chunk)
+        size = archive.tell()
+        archive.seek(0)
+    except BaseException:
+        archive.close()
+        raise
+    return pdf_cache.CachedPdf(job.input_key, archive, size)
@@ -0,0 +1,658 @@
+"""
+Background rendering of estimate PDFs.
+
+A PDF takes seconds to render (WeasyPrint for the estimate templates,
+reportlab for the project report), and the API runs on a couple of sync
+gunicorn workers, so a few PDF requests at once used to hold up every other
+request. The PDF job endpoints only queue a PdfRenderJob (queue_job); the
+render_pdf_jobs management command renders them in its own process:
+
+- at most MAX_RUNNING_JOBS jobs render at once, across all worker processes;
+- a claimed job holds a lease of RENDER_TIMEOUT seconds, EXPORT_TIMEOUT for an
+  export (plus a margin). The worker stops a render that runs past its
+  timeout, and a job whose worker died is claimed again once its lease is
+  over. Renders a web request waits on (pdf_pool.render) get
+  SYNC_RENDER_TIMEOUT instead, which leaves room inside gunicorn's timeout
+  (settings.GUNICORN_TIMEOUT);
+- a failed render is tried again after RETRY_DELAYS and fails for good after
+  MAX_ATTEMPTS; a render whose project or estimate is gone fails at once;
+- every job records when it was queued, started and finished and how long the
+  render took (job_metrics).
+
+The render_* functions go through pdf_cache, for the synchronous endpoints
+as well, so an estimate that has not changed is not rendered twice. They
+return the PDF as an open file, so it can be streamed instead of held in
+memory.
+
+Clients poll the job, or long-poll it with ?wait=seconds, and download the
+file when it is done. Queuing the same request again while it is pending
+returns the pending job instead of a second one.
+
+Saving a manual estimate does not render it: the save queues a delayed
+pre-render (schedule_prerender) that later saves push back, or nothing for a
+draft, and the PDF is otherwise rendered by its first download.
+
+An export of many estimates as one ZIP (pdf_export) is a job too, of kind
+export: it can take minutes, far longer than a web request may, so the
+worker builds the ZIP under EXPORT_TIMEOUT and the client downloads it like
+a PDF.
+"""
+
+import datetime
+import decimal
+import hashlib
+from importlib import metadata
+import inspect
+import json
+import math
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+import reportlab
+
+from accounts.models import UserProfile
+from manual_estimate.models import Estimate as ManualEstimate
+
+from . import pdf_assets
+from . import pdf_backends
+from . import pdf_cache
+from . import pdf_context
+from .models import PdfRenderJob, Project
+from .utils import generate_project_pdf
+
+PDF_STORAGE_DIR = 'pdf_jobs'
+
+MAX_RUNNING_JOBS = 2
+MAX_PENDING_JOBS_PER_USER = 10
+MAX_ATTEMPTS = 3
+RETRY_DELAYS = (10, 60)          # Seconds before the second and later attempts
+WEB_TIMEOUT = getattr(settings, 'GUNICORN_TIMEOUT', 60)
+RENDER_TIMEOUT = 90              # Seconds for a queued render; no web request waits on the worker
+SYNC_RENDER_TIMEOUT = max(WEB_TIMEOUT - 15, 5)  # Seconds for a render a web request waits on, with time left to reply
+LEASE_MARGIN = 30
+MAX_WAIT_SECONDS = min(20, WEB_TIMEOUT // 2)    # Long-poll limit, well under gunicorn's timeout
+POLL_INTERVAL = 0.5
+KEEP_DAYS = 7
+PRERENDER_DELAY = 30            # Seconds a saved estimate waits before its background render; another save pushes it back
+EXPORT_TIMEOUT = 600            # Seconds for an export job (pdf_export), which renders up to pdf_export.MAX_EXPORT_ESTIMATES PDFs
+
+FINISHED_STATUSES = ('done', 'failed')
+RENDER_KINDS = ('project', 'project_report', 'manual', 'manual_data')  # Queued by queue_job; exports by pdf_export.queue_export
+MANUAL_DATA_SECTIONS = ('companyInfo', 'customerInfo', 'tables', 'summary')
+
+
+class PdfJobError(ValueError):
+    """The render request is invalid."""
+
+
+class TooManyPdfJobs(PdfJobError):
+    """The user already has MAX_PENDING_JOBS_PER_USER jobs waiting."""
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+# --- Rendering ---
+
+def weasyprint_renderer():
+    # From the package metadata, so finding the cache key does not import WeasyPrint
+    try:
+        return f"weasyprint {metadata.version('weasyprint')}"
+    except metadata.PackageNotFoundError:
+        return "weasyprint"
+
+
+def apply_estimate_overrides(project_instance, data):
+    """
+    Saves the customer details and transport sent with an estimate request on
+    the project, as generate_estimatepdf always has. Returns the render
+    options for render_project_estimate, with the PDF backend asked for
+    (pdf_backends); raises PdfJobError for a bad transport or backend.
+    """
+    try:
+        backend = pdf_backends.requested_backend(data.get('backend'))
+    except pdf_backends.PdfBackendError as e:
+        raise PdfJobError(str(e))
+    customer_name = data.get('customer_name')
+    contact = data.get('contact')
+    customer_location = data.get('Location')  # Note: Frontend sends 'Location'
+    transport_payload = data.get('transport')
+
+    update_fields = []
+    if customer_name is not None:
+        project_instance.customer_name = customer_name
+        update_fields.append('customer_name')
+    if contact is not None:
+        project_instance.customer_phone = contact
+        update_fields.append('customer_phone')
+    if customer_location is not None:
+        project_instance.customer_location = customer_location
+        update_fields.append('customer_location')
+
+    # Transport is shown on the estimate but never added to the project's total_cost
+    transport = decimal.Decimal('0')
+    if transport_payload is not None:
+        try:
+            transport = decimal.Decimal(str(transport_payload or '0'))
+        except (decimal.InvalidOperation, TypeError):
+            raise PdfJobError("Invalid transport value.")
+        project_instance.transport = transport
+        update_fields.append('transport')
+
+    if update_fields:
+        project_instance.save(update_fields=update_fields)
+    return {
+        'customer_name': customer_name,
+        'contact': contact,
+        'customer_location': customer_location,
+        'transport': str(transport),
+        'backend': backend,
+    }
+
+
+def render_project_estimate(project_id, user, base_url, customer_name=None, contact=None, customer_location=None, transport='0', backend=None):
+    """
+    The user's project estimate (pdf_template.html) as an open
+    pdf_cache.CachedPdf, from WeasyPrint or the canvas backend
+    (pdf_backends.choose_backend). Raises Project.DoesNotExist.
+    """
+    started = time.perf_counter()
+    project_data = pdf_context.project_estimate_data(project_id, user)
+    transport = decimal.Decimal(str(transport or '0'))
+    context_data = pdf_context.project_estimate_context(
+        project_data, base_url,
+        customer_name=customer_name,
+        contact=contact,
+        customer_location=customer_location,
+        transport=transport,
+    )
+    context_ms = (time.perf_counter() - started) * 1000
+
+    if pdf_backends.choose_backend(backend, context_data) == 'canvas':
+        renderer, source = pdf_backends.canvas_renderer(), pdf_backends.canvas_source_hash()
+
+        def render():
+            return pdf_backends.render_canvas_estimate(context_data)
+    else:
+        renderer, source = weasyprint_renderer(), pdf_assets.template_source_hash('pdf_template.html')
+
+        def render():
+            return pdf_assets.render_template_pdf('pdf_template.html', context_data, context_data['base_url'])
+
+    return pdf_cache.open_or_render(
+        renderer, source, project_data,
+        {
+            'customer': [customer_name, contact, customer_location], 'transport': transport,
+            'base_url': base_url, 'date': timezone.now().date(),  # The estimate shows the day it was made
+        },
+        render, context_ms=context_ms,
+    )
+
+
+def render_project_report(project_instance):
+    """The reportlab project report (utils.generate_project_pdf) as an open pdf_cache.CachedPdf."""
+    from .serializers import ProjectSerializer
+
+    def render():
+        temp_path = generate_project_pdf(project_instance)
+        try:
+            with open(temp_path, 'rb') as f:
+                return f.read()
+        finally:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    # The report is drawn in code, so the code is its template
+    return pdf_cache.open_or_render(
+        f"reportlab {reportlab.Version}", pdf_cache.source_hash(inspect.getsourcefile(generate_project_pdf)),
+        {'project': ProjectSerializer(project_instance).data, 'created_at': project_instance.created_at},
+        {},
+        render,
+    )
+
+
+def manual_estimate_cache_inputs(estimate_data, base_url):
+    """The pdf_cache.cache_key inputs (renderer, source, document, options) of a saved manual estimate's PDF."""
+    return (
+        weasyprint_renderer(), pdf_assets.template_source_hash('manual_estimate_template.html'),
+        estimate_data, {'base_url': base_url},
+    )
+
+
+def render_manual_estimate(estimate_id, user, base_url):
+    """The user's saved manual estimate (manual_estimate_template.html) as an open pdf_cache.CachedPdf."""
+    started = time.perf_counter()
+    estimate_data = pdf_context.manual_estimate_data(estimate_id, user)
+    context_ms = (time.perf_counter() - started) * 1000
+
+    def render():
+        template_context = pdf_context.manual_estimate_context(estimate_data, base_url)
+        return pdf_assets.render_template_pdf('manual_estimate_template.html', template_context, base_url)
+
+    return pdf_cache.open_or_render(*manual_estimate_cache_inputs(estimate_data, base_url), render, context_ms=context_ms)
+
+
+def check_manual_data(estimate_data):
+    if not isinstance(estimate_data, dict) or not all(estimate_data.get(section) for section in MANUAL_DATA_SECTIONS):
+        raise PdfJobError("Invalid data structure. Missing required sections.")
+
+
+def manual_data_context(estimate_data, user_profile):
+    """
+    Template context for manual_estimate_template.html from the data the
+    manual estimate screen posts (companyInfo, customerInfo, tables, summary).
+    Number strings in the summary and tables become Decimals, in place.
+    """
+    summary_data = estimate_data.get('summary')
+    context_data = {
+        'user_profile': user_profile, # Pass the full user profile
+        'company_info': estimate_data.get('companyInfo'),
+        'customer_info': estimate_data.get('customerInfo'),
+        'tables': estimate_data.get('tables'), # Contains materials, rooms, labour arrays
+        'summary': summary_data,
+        'date_generated': datetime.date.today().strftime('%Y-%m-%d'), # Add current date
+    }
+
+    # Convert Decimal strings in summary data to Decimal objects for calculations in template (optional but recommended)
+    try:
+        context_data['summary']['grandTotal'] = decimal.Decimal(summary_data.get('grandTotal', '0') or '0')
+        context_data['summary']['totalMaterialCost'] = decimal.Decimal(summary_data.get('totalMaterialCost', '0') or '0')
+        context_data['summary']['totalLabourCost'] = decimal.Decimal(summary_data.get('totalLabourCost', '0') or '0')
+        context_data['summary']['totalRoomArea'] = decimal.Decimal(summary_data.get('totalRoomArea', '0') or '0')
+
+        # Convert Decimal strings in table data to Decimal objects
+        for table_type in ['materials', 'rooms', 'labour']:
+            if table_type in context_data['tables']:
+                for item in context_data['tables'][table_type]:
+                    for field in item:
+                        if isinstance(item[field], str) and item[field].replace('.', '', 1).isdigit():
+                            try:
+                                item[field] = decimal.Decimal(item[field] or '0')
+                            except decimal.InvalidOperation:
+                                pass # Keep as string if invalid decimal
+
+    except Exception as e:
+        print(f"Warning: Could not convert some numeric values to Decimal: {e}")
+        # Continue, template might handle strings, but calculations will fail
+    return context_data
+
+
+def render_manual_data(estimate_data, user, base_url):
+    """A manual estimate from posted data (manual_estimate_template.html) as an open pdf_cache.CachedPdf."""
+    user_profile, created = UserProfile.objects.get_or_create(user=user)
+    # The key is taken before manual_data_context turns the numbers into Decimals
+    document = {'data': estimate_data, **pdf_context.company_data(user)}
+
+    def render():
+        return pdf_assets.render_template_pdf('manual_estimate_template.html', manual_data_context(estimate_data, user_profile), base_url)
+
+    return pdf_cache.open_or_render(
+        weasyprint_renderer(), pdf_assets.template_source_hash('manual_estimate_template.html'), document,
+        {'base_url': base_url, 'date': datetime.date.today()},
+        render,
+    )
+
+
+def render_job(job):
+    """Renders a job's PDF from the current data (or finds it in the cache). Returns a pdf_cache.CachedPdf."""
+    if job.kind == 'project':
+        return render_project_estimate(job.object_id, job.user, job.base_url, **job.payload)
+    if job.kind == 'project_report':
+        return render_project_report(Project.objects.get(id=job.object_id, user=job.user))
+    if job.kind == 'manual':
+        return render_manual_estimate(job.object_id, job.user, job.base_url)
+    if job.kind == 'manual_data':
+        return render_manual_data(job.payload, job.user, job.base_url)
+    if job.kind == 'export':
+        from . import pdf_export
+        return pdf_export.write_export(job)
+    raise PdfJobError(f"Unknown PDF job kind '{job.kind}'.")
+
+
+# --- Queue ---
+
+def job_input_key(user, kind, object_id, payload):
+    inputs = json.dumps([user.pk, kind, object_id, payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+def prerender_input_key(user, kind, object_id):
+    """The input key of schedule_prerender's jobs, apart from the user's own requests for the same estimate."""
+    return job_input_key(user, kind, object_id, {'prerender': True})
+
+
+def queue_job(user, data, base_url):
+    """
+    Queues a render from a request body: {"type": "project" | "project_report"
+    | "manual", "id": ...} or {"type": "manual_data", "data": {...}}. A project
+    estimate also takes the customer_name / contact / Location / transport
+    overrides of generate_estimatepdf, which are saved on the project now.
+    Returns (job, created). Raises PdfJobError for a bad request, Http404 when
+    the project or estimate is not the user's.
+    """
+    kind = data.get('type')
+    if kind not in RENDER_KINDS:
+        raise PdfJobError(f"Invalid type. Must be one of: {', '.join(RENDER_KINDS)}.")
+
+    object_id, payload = None, {}
+    if kind == 'manual_data':
+        payload = data.get('data')
+        check_manual_data(payload)
+    else:
+        try:
+            object_id = int(data.get('id'))
+        except (TypeError, ValueError):
+            raise PdfJobError("id is required.")
+        if kind == 'manual':
+            get_object_or_404(ManualEstimate, id=object_id, user=user)
+        else:
+            project_instance = get_object_or_404(Project, id=object_id, user=user)
+            if kind == 'project':
+                payload = apply_estimate_overrides(project_instance, data)
+
+    input_key = job_input_key(user, kind, object_id, payload)
+    # Not yet rendered, so it will render the same data: a double-click gets the same job
+    pending = PdfRenderJob.objects.filter(user=user, input_key=input_key, status='pending').first()
+    if pending:
+        return pending, False
+    if kind == 'manual':
+        # A pre-render of the estimate that has not started renders the same data: it becomes this
+        # request's job and is due now, so later saves no longer push it back
+        prerender = PdfRenderJob.objects.filter(user=user, input_key=prerender_input_key(user, kind, object_id), status='pending')
+        if prerender.update(input_key=input_key, available_at=timezone.now()):
+            job = PdfRenderJob.objects.filter(user=user, input_key=input_key, status='pending').first()
+            if job:
+                return job, False
+    if PdfRenderJob.objects.filter(user=user, status__in=['pending', 'rendering']).count() >= MAX_PENDING_JOBS_PER_USER:
+        raise TooManyPdfJobs(f"You already have {MAX_PENDING_JOBS_PER_USER} PDFs waiting. Try again when they are done.")
+    job = PdfRenderJob.objects.create(
+        user=user, kind=kind, object_id=object_id, payload=payload, base_url=base_url, input_key=input_key,
+    )
+    return job, True
+
+
+def schedule_prerender(user, kind, object_id, base_url, delay=PRERENDER_DELAY):
+    """
+    Queues a background render of a saved estimate, due in `delay` seconds,
+    so that its first download comes from the PDF cache. Saving again before
+    then moves the pending job back instead of queuing another, so a run of
+    quick saves renders only the last version (the job renders the data as
+    it is when it runs). Returns the job, or None when the user already has
+    MAX_PENDING_JOBS_PER_USER jobs waiting and the PDF is left to its first
+    download. A request for the same PDF (queue_job) takes the job over and
+    renders it at once.
+    """
+    input_key = prerender_input_key(user, kind, object_id)
+    available_at = timezone.now() + datetime.timedelta(seconds=delay)
+    pending = PdfRenderJob.objects.filter(user=user, input_key=input_key, status='pending')
+    if pending.update(available_at=available_at, base_url=base_url):
+        job = pending.first()
+        if job:
+            return job
+    if PdfRenderJob.objects.filter(user=user, status__in=['pending', 'rendering']).count() >= MAX_PENDING_JOBS_PER_USER:
+        return None
+    return PdfRenderJob.objects.create(
+        user=user, kind=kind, object_id=object_id, payload={}, base_url=base_url, input_key=input_key, available_at=available_at,
+    )
+
+
+def manual_estimate_pdf_status(estimate, user, request, job=None):
+    """
+    PDF fields for a manual estimate save response: pdf_status is "ready" when
+    the PDF of this version is in the cache, "scheduled" while a pre-render
+    job (schedule_prerender) waits or runs, and "on_download" when it will be
+    rendered by the first download of pdf_url.
+    """
+    estimate_data = pdf_context.manual_estimate_data(estimate.pk, user)
+    key = pdf_cache.cache_key(*manual_estimate_cache_inputs(estimate_data, request.build_absolute_uri('/')))
+    data = {'pdf_url': request.build_absolute_uri(reverse('estimate-pdf', args=[estimate.pk]))}
+    if pdf_cache.has_entry(key):
+        data['pdf_status'] = 'ready'
+    elif job is not None:
+        data['pdf_status'] = 'scheduled'
+        data['pdf_job_url'] = request.build_absolute_uri(reverse('pdf-render-job', args=[job.pk]))
+    else:
+        data['pdf_status'] = 'on_download'
+    return data
+
+
+def queue_position(job):
+    """How many jobs render before this pending one (0 when it is next)."""
+    if job.status != 'pending':
+        return None
+    return PdfRenderJob.objects.filter(status='pending').filter(
+        Q(available_at__lt=job.available_at) | Q(available_at=job.available_at, pk__lt=job.pk)
+    ).count()
+
+
+def describe_job(job, request):
+    data = {
+        'id': job.pk,
+        'type': job.kind,
+        'source_id': job.object_id,
+        'status': job.status,
+        'attempts': job.attempts,
+        'queue_position': queue_position(job),
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'render_ms': job.render_ms,
+        'status_url': request.build_absolute_uri(reverse('pdf-render-job', args=[job.pk])),
+    }
+    if job.status == 'done':
+        data['file_size'] = job.file_size
+        data['download_url'] = request.build_absolute_uri(reverse('pdf-render-job-download', args=[job.pk]))
+    if job.status == 'failed':
+        data['error'] = job.error
+    return data
+
+
+def wait_for_job(job, seconds):
+    """Long poll: reloads the job until it is done or failed, for at most `seconds` (capped at MAX_WAIT_SECONDS)."""
+    deadline = time.monotonic() + min(max(seconds, 0), MAX_WAIT_SECONDS)
+    while job.status not in FINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        job.refresh_from_db()
+    return job
+
+
+def job_timeout(job):
+    return EXPORT_TIMEOUT if job.kind == 'export' else RENDER_TIMEOUT
+
+
+def job_file_type(job):
+    """The file extension and content type of a job's file."""
+    return ('zip', 'application/zip') if job.kind == 'export' else ('pdf', 'application/pdf')
+
+
+# --- Worker ---
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def running_jobs(now=None):
+    """Jobs rendering under a live lease."""
+    return PdfRenderJob.objects.filter(status='rendering', lease_expires_at__gt=now or timezone.now()).count()
+
+
+def claim_next_job(worker, max_running=MAX_RUNNING_JOBS):
+    """
+    Marks the next due job as rendering by this worker and returns it. Returns
+    None when nothing is due or max_running jobs are rendering already. A
+    rendering job whose lease is over (its worker died) counts as due.
+    """
+    while True:
+        now = timezone.now()
+        if running_jobs(now) >= max_running:
+            return None
+        job = PdfRenderJob.objects.filter(
+            Q(status='pending', available_at__lte=now) | Q(status='rendering', lease_expires_at__lte=now)
+        ).order_by('available_at', 'pk').first()
+        if job is None:
+            return None
+        if job.status == 'rendering' and job.attempts >= MAX_ATTEMPTS:
+            PdfRenderJob.objects.filter(pk=job.pk, status='rendering', lease_expires_at=job.lease_expires_at).update(
+                status='failed', error="The render did not finish in time.", finished_at=now,
+            )
+            continue
+        lease_expires_at = now + datetime.timedelta(seconds=job_timeout(job) + LEASE_MARGIN)
+        # Only one worker gets it: the update matches nothing if another one was first
+        claimed = PdfRenderJob.objects.filter(pk=job.pk, status=job.status, lease_expires_at=job.lease_expires_at).update(
+            status='rendering', worker=worker, lease_expires_at=lease_expires_at, started_at=now, attempts=job.attempts + 1,
+        )
+        if not claimed:
+            continue
+        if running_jobs(now) > max_running:
+            # Another worker claimed at the same moment; give this one back
+            PdfRenderJob.objects.filter(pk=job.pk, worker=worker, status='rendering').update(
+                status='pending', lease_expires_at=None, attempts=job.attempts,
+            )
+            return None
+        job.status, job.worker, job.lease_expires_at, job.started_at = 'rendering', worker, lease_expires_at, now
+        job.attempts += 1
+        return job
+
+
+def _save_result(job, fields):
+    """Saves the job unless its lease was lost to another worker meanwhile. Returns whether it was saved."""
+    return bool(PdfRenderJob.objects.filter(pk=job.pk, status='rendering', worker=job.worker).update(
+        **{field: getattr(job, field) for field in fields}
+    ))
+
+
+def _raise_timeout(signum, frame):
+    raise RenderTimeout("The render did not finish in time.")
+
+
+def call_with_timeout(timeout, func, *args):
+    """
+    func(*args), stopped with RenderTimeout after `timeout` seconds. Inside
+    another call_with_timeout (an export's renders) the outer limit still
+    applies, and is set again afterwards.
+    """
+    # SIGALRM only exists on Unix and only works in the main thread; the lease covers the rest
+    use_alarm = hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    if not use_alarm:
+        return func(*args)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    outer = signal.alarm(timeout)
+    if outer and outer < timeout:
+        signal.alarm(outer)
+    started = time.monotonic()
+    try:
+        return func(*args)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+        if outer:
+            signal.alarm(max(outer - int(time.monotonic() - started), 1))
+
+
+def render_with_timeout(job, timeout=RENDER_TIMEOUT):
+    return call_with_timeout(timeout, render_job, job)
+
+
+def process_job(job):
+    """
+    Renders a claimed job (see claim_next_job) and stores the PDF. Errors put
+    it back to pending after a delay, or failed after MAX_ATTEMPTS.
+    """
+    started = time.perf_counter()
+    try:
+        pdf = render_with_timeout(job, job_timeout(job))
+        extension = job_file_type(job)[0]
+        with pdf.file:
+            file_name = default_storage.save(f"{PDF_STORAGE_DIR}/{job.user_id}/{job.pk}.{extension}", File(pdf.file))
+        job.status = 'done'
+        job.error = ''
+        job.file_name = file_name
+        job.file_size = pdf.size
+        job.finished_at = timezone.now()
+        job.render_ms = int((time.perf_counter() - started) * 1000)
+        if not _save_result(job, ['status', 'error', 'file_name', 'file_size', 'finished_at', 'render_ms']):
+            default_storage.delete(file_name)
+    except Exception as e:
+        print(f"PDF render failed for PdfRenderJob {job.pk} ({job.kind} {job.object_id}): {e}")
+        traceback.print_exc()
+        job.error = str(e)[:1000]
+        job.render_ms = int((time.perf_counter() - started) * 1000)
+        if job.attempts < MAX_ATTEMPTS and not isinstance(e, (ObjectDoesNotExist, PdfJobError)):
+            job.status = 'pending'
+            job.available_at = timezone.now() + datetime.timedelta(seconds=RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS)) - 1])
+            job.lease_expires_at = None
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        _save_result(job, ['status', 'error', 'render_ms', 'available_at', 'lease_expires_at', 'finished_at'])
+    return job
+
+
+def process_pending_jobs(worker=None, limit=None, max_running=MAX_RUNNING_JOBS):
+    """Renders due jobs one after the other. Returns the processed jobs."""
+    worker = worker or worker_name()
+    processed = []
+    while limit is None or len(processed) < limit:
+        job = claim_next_job(worker, max_running)
+        if job is None:
+            break
+        processed.append(process_job(job))
+    return processed
+
+
+def purge_jobs(days=KEEP_DAYS):
+    """Deletes finished jobs (and their files) older than `days`. Returns how many."""
+    finished = PdfRenderJob.objects.filter(status__in=FINISHED_STATUSES, finished_at__lt=timezone.now() - datetime.timedelta(days=days))
+    for file_name in finished.exclude(file_name='').values_list('file_name', flat=True):
+        if default_storage.exists(file_name):
+            default_storage.delete(file_name)
+    return finished.delete()[0]
+
+
+# --- Metrics ---
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list (None when empty)."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def job_metrics(since):
+    """
+    Per kind, for jobs queued since `since`: counts by status, and the median
+    and 95th percentile of the queue wait (queued to last start) and of the
+    render time of done jobs, in milliseconds.
+    """
+    metrics = {}
+    rows = PdfRenderJob.objects.filter(created_at__gte=since).values_list('kind', 'status', 'created_at', 'started_at', 'render_ms')
+    for kind, job_status, created_at, started_at, render_ms in rows:
+        kind_metrics = metrics.setdefault(kind, {'statuses': {}, 'waits': [], 'renders': []})
+        kind_metrics['statuses'][job_status] = kind_metrics['statuses'].get(job_status, 0) + 1
+        if started_at:
+            kind_metrics['waits'].append(int((started_at - created_at).total_seconds() * 1000))
+        if job_status == 'done' and render_ms is not None:
+            kind_metrics['renders'].append(render_ms)
+    for kind_metrics in metrics.values():
+        waits, renders = sorted(kind_metrics.pop('waits')), sorted(kind_metrics.pop('renders'))
+        kind_metrics.update({
+            'jobs': sum(kind_metrics['statuses'].values()),
+            'wait_ms_p50': _percentile(waits, 0.5), 'wait_ms_p95': _percentile(waits, 0.95),
+            'render_ms_p50': _percentile(renders, 0.5), 'render_ms_p95': _percentile(renders, 0.95),
+        })
+    return metrics
@@ -0,0 +1,279 @@
+"""
+Warm renderer processes for the synchronous PDF endpoints.
+
+Importing WeasyPrint, loading the fonts and laying out the first document
+take seconds and tens of megabytes, and used to happen inside every gunicorn
+worker on its first PDF request. The pdf_render_pool management command
+runs the renders in their own processes instead:
+
+- the parent imports WeasyPrint, loads the fonts, compiles the estimate
+  templates, parses their stylesheets and renders one page (warm_up), then
+  forks `processes` children that share all of it;
+- the children take requests on a Unix socket (PDF_RENDER_SOCKET) one at a
+  time and render through pdf_jobs.render_job, so the PDF cache applies as
+  for queued jobs. A web request waits on each render, so it is stopped after
+  pdf_jobs.SYNC_RENDER_TIMEOUT, and the web side gives up after REPLY_TIMEOUT;
+  both are inside gunicorn's timeout;
+- a child exits after MAX_JOBS_PER_PROCESS renders or once it uses more than
+  MAX_MEMORY_MB, and the parent forks a fresh one.
+
+The web side (render, render_html) sends a request and opens the PDF from the
+PDF cache, which both sides share on local disk; only a PDF the cache could
+not store is sent over the socket. With no pool running (development, the
+render_pdf_jobs worker, or while start-simple.sh restarts a pool that died)
+they render in the calling process under the same timeout; each such render
+is logged and counted as pool_fallbacks in the PDF cache stats.
+
+Protocol, one request per connection: a JSON line from the client, a JSON
+line back ({"key", "size", "inline"} or {"error"}), then `size` bytes when
+inline is true.
+"""
+
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.template.loader import get_template
+
+from . import pdf_assets
+from . import pdf_cache
+from . import pdf_jobs
+from .models import PdfRenderJob
+
+PDF_RENDER_SOCKET = getattr(settings, 'PDF_RENDER_SOCKET', os.path.join(tempfile.gettempdir(), 'tilnet_pdf_render.sock'))
+
+POOL_PROCESSES = 2
+MAX_JOBS_PER_PROCESS = 200
+MAX_MEMORY_MB = 400
+REPLY_TIMEOUT = pdf_jobs.SYNC_RENDER_TIMEOUT + 5  # Seconds; under gunicorn's timeout (pdf_jobs.WEB_TIMEOUT)
+RESPAWN_DELAY = 1               # Seconds before replacing a child that exited at once (a crash at start)
+LISTEN_BACKLOG = 64
+
+
+class PoolError(Exception):
+    """The pool could not render the PDF."""
+
+
+# --- Web side ---
+
+def _connect(timeout=REPLY_TIMEOUT):
+    """A socket connected to the pool, or None when no pool is running."""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(PDF_RENDER_SOCKET)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def _request(sock, request):
+    """Sends the request; returns the reply and the inline PDF bytes (None unless inline)."""
+    sock.sendall(json.dumps(request, default=str).encode('utf-8') + b'\n')
+    reader = sock.makefile('rb')
+    line = reader.readline()
+    if not line:
+        raise PoolError("The PDF renderer stopped before it replied.")
+    reply = json.loads(line)
+    if 'error' in reply:
+        raise PoolError(reply['error'])
+    body = reader.read(reply['size']) if reply.get('inline') else None
+    if body is not None and len(body) != reply['size']:
+        raise PoolError("The PDF renderer stopped while it sent the PDF.")
+    return reply, body
+
+
+def _render_here(what):
+    """Logs and counts a render done in the web process because no pool is running."""
+    print(f"PDF renderer pool is not running; rendering {what} in process {os.getpid()}.")
+    try:
+        pdf_cache.update_stats(pool_fallbacks=1)
+    except OSError as e:
+        print(f"PDF cache stats update failed: {e}")
+
+
+def is_running():
+    """Whether a pool has its socket in place (it may still have died since)."""
+    return hasattr(socket, 'AF_UNIX') and os.path.exists(PDF_RENDER_SOCKET)
+
+
+def render(kind, user, base_url='', object_id=None, payload=None):
+    """
+    The PDF of a PdfRenderJob kind (project, project_report, manual,
+    manual_data) as an open pdf_cache.CachedPdf, rendered by the pool.
+    Renders here, under the same timeout, when no pool is running.
+    """
+    job = PdfRenderJob(user=user, kind=kind, object_id=object_id, payload=payload or {}, base_url=base_url or '')
+    sock = _connect()
+    if sock is None:
+        _render_here(kind)
+        return pdf_jobs.render_with_timeout(job, pdf_jobs.SYNC_RENDER_TIMEOUT)
+    with sock:
+        reply, body = _request(sock, {
+            'kind': kind, 'user_id': user.pk, 'object_id': object_id, 'payload': job.payload, 'base_url': job.base_url,
+        })
+    if body is not None:
+        return pdf_cache.CachedPdf(reply['key'], io.BytesIO(body), reply['size'])
+    cached = pdf_cache.open_entry(reply['key'])
+    if cached is None:
+        # Evicted between the render and now
+        return pdf_jobs.render_with_timeout(job, pdf_jobs.SYNC_RENDER_TIMEOUT)
+    pdf_file, size, render_ms = cached
+    return pdf_cache.CachedPdf(reply['key'], pdf_file, size)
+
+
+def render_html(html_string, base_url):
+    """The PDF bytes of an HTML document (pdf_assets.write_pdf), rendered by the pool when one is running."""
+    sock = _connect()
+    if sock is None:
+        _render_here('html')
+        return pdf_jobs.call_with_timeout(pdf_jobs.SYNC_RENDER_TIMEOUT, pdf_assets.write_pdf, html_string, base_url)
+    with sock:
+        reply, body = _request(sock, {'html': html_string, 'base_url': base_url})
+    return body
+
+
+# --- Pool side ---
+
+def warm_up():
+    """Does everything a first render would: imports, fonts, templates, stylesheets and one layout. Returns the ms taken."""
+    started = time.perf_counter()
+    for template_name, stylesheet_name in pdf_assets.TEMPLATE_STYLESHEETS.items():
+        get_template(template_name)
+        pdf_assets.stylesheet(stylesheet_name)
+    pdf_assets.write_pdf('<p>Warm-up</p>', None)
+    return int((time.perf_counter() - started) * 1000)
+
+
+def memory_mb():
+    """Resident memory of this process in MB (peak resident memory where /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+
+
+def _reply(conn, reply, body=None):
+    conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+    if body is not None:
+        conn.sendall(body)
+
+
+def handle(conn):
+    """Renders one request from a connection and replies."""
+    request = json.loads(conn.makefile('rb').readline() or 'null')
+    if not isinstance(request, dict):
+        return
+    close_old_connections()
+    try:
+        if 'html' in request:
+            pdf = pdf_jobs.call_with_timeout(pdf_jobs.SYNC_RENDER_TIMEOUT, pdf_assets.write_pdf, request['html'], request.get('base_url'))
+            _reply(conn, {'key': '', 'size': len(pdf), 'inline': True}, pdf)
+            return
+        job = PdfRenderJob(
+            user_id=request['user_id'], kind=request['kind'], object_id=request.get('object_id'),
+            payload=request.get('payload') or {}, base_url=request.get('base_url') or '',
+        )
+        pdf = pdf_jobs.render_with_timeout(job, pdf_jobs.SYNC_RENDER_TIMEOUT)
+    except Exception as e:
+        print(f"PDF pool render failed ({request.get('kind', 'html')} {request.get('object_id')}): {e}")
+        traceback.print_exc()
+        _reply(conn, {'error': str(e) or e.__class__.__name__})
+        return
+    with pdf.file:
+        # A BytesIO when the cache could not store it: the client cannot open it from disk
+        if getattr(pdf.file, 'name', None):
+            _reply(conn, {'key': pdf.key, 'size': pdf.size, 'inline': False})
+        else:
+            _reply(conn, {'key': pdf.key, 'size': pdf.size, 'inline': True}, pdf.file.getvalue())
+
+
+def _child(listener, max_jobs, max_memory_mb):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    served = 0
+    while served < max_jobs and memory_mb() < max_memory_mb:
+        conn, address = listener.accept()
+        with conn:
+            conn.settimeout(REPLY_TIMEOUT)
+            try:
+                handle(conn)
+            except OSError as e:  # The client went away
+                print(f"PDF pool connection failed: {e}")
+        served += 1
+    close_old_connections()
+
+
+def _spawn(listener, max_jobs, max_memory_mb):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _child(listener, max_jobs, max_memory_mb)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def _listen(socket_path):
+    probe = _connect(timeout=1)
+    if probe is not None:
+        probe.close()
+        raise PoolError(f"A PDF renderer pool is already listening on {socket_path}.")
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # Left behind by a pool that was killed
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    listener.listen(LISTEN_BACKLOG)
+    return listener
+
+
+def serve(processes=POOL_PROCESSES, max_jobs=MAX_JOBS_PER_PROCESS, max_memory_mb=MAX_MEMORY_MB, log=print):
+    """Warms up, forks the renderer processes and replaces each one that exits, until SIGTERM or SIGINT."""
+    if not hasattr(os, 'fork') or not hasattr(socket, 'AF_UNIX'):
+        raise PoolError("The PDF renderer pool needs fork() and Unix sockets.")
+    log(f"Warmed up in {warm_up()} ms, using {memory_mb():.0f} MB.")
+    listener = _listen(PDF_RENDER_SOCKET)
+    # Children must not share the parent's database connection
+    connections.close_all()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    children = {}
+    try:
+        while True:
+            while len(children) < processes:
+                children[_spawn(listener, max_jobs, max_memory_mb)] = time.monotonic()
+            pid, exit_status = os.wait()
+            started = children.pop(pid, None)
+            if started is None:
+                continue
+            log(f"Renderer {pid} exited (status {exit_status}); starting a new one.")
+            if time.monotonic() - started < RESPAWN_DELAY:
+                time.sleep(RESPAWN_DELAY)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        listener.close()
+        if os.path.exists(PDF_RENDER_SOCKET):
+            os.remove(PDF_RENDER_SOCKET)
@@ -0,0 +1,144 @@
+"""
+Responses for rendered PDFs.
+
+The PDF endpoints return base64 in JSON by default, which is what existing
+clients expect. Asking for application/pdf (an Accept header, or ?format=pdf
+through PDFRenderer) gives the binary file instead: it is a third smaller, it
+has a Content-Length, and it streams from the PDF cache with an ETag. GET
+downloads also support Range requests, so an interrupted download can resume.
+
+Both modes stream from the open cache file (pdf_cache.CachedPdf) in chunks.
+The legacy base64 body is encoded chunk by chunk too, so a request never
+holds the whole PDF, its base64 and its JSON in memory at once.
+"""
+
+import base64
+import json
+import re
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+CHUNK_SIZE = 3 * 21846           # 64 KiB, a multiple of 3 so chunks encode to base64 without padding
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class PDFRenderer(BaseRenderer):
+    """
+    Lets a PDF endpoint be asked for application/pdf. The view returns the
+    file itself; anything else it returns (an error) is rendered as JSON.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return json.dumps(data).encode('utf-8')
+
+
+PDF_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, PDFRenderer]
+
+
+def wants_pdf(request):
+    return getattr(getattr(request, 'accepted_renderer', None), 'format', None) == 'pdf'
+
+
+def _read(pdf_file, start, length):
+    try:
+        pdf_file.seek(start)
+        while length > 0:
+            chunk = pdf_file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        pdf_file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single 'bytes=' range; None to send the whole
+    file (no header, or several ranges); raises ValueError when unsatisfiable.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:  # bytes=-N: the last N bytes
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+def pdf_file_response(request, pdf_file, size, etag, filename, cache_control='private, no-cache', content_type='application/pdf'):
+    """
+    The PDF (or another file, given its content_type) as a binary download: ETag (304 for If-None-Match), Content-Length,
+    and for GET a single byte range (206, or 416 when it is outside the file).
+    Closes pdf_file when it is not streamed.
+    """
+    etag = f'"{etag}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        pdf_file.close()
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        byte_range = None
+        if_range = request.headers.get('If-Range')
+        if request.method in ('GET', 'HEAD') and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                pdf_file.close()
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(_read(pdf_file, start, end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Disposition'] = f'inline; filename="{filename}"'
+        else:
+            pdf_file.seek(0)
+            response = FileResponse(pdf_file, content_type=content_type, filename=filename)
+            response.block_size = CHUNK_SIZE
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _base64_chunks(pdf_file, prefix, suffix):
+    try:
+        yield prefix
+        while True:
+            chunk = pdf_file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield base64.b64encode(chunk)
+        yield suffix
+    finally:
+        pdf_file.close()
+
+
+def base64_json_response(pdf, field=None):
+    """
+    The legacy response: the base64 PDF as a JSON string, or as {field: string}.
+    Byte for byte what Response(pdf_base64) gave, but encoded while streaming.
+    """
+    # Base64 has no characters JSON needs to escape
+    prefix, suffix = (b'"', b'"') if field is None else (json.dumps({field: ''}, separators=(',', ':'))[:-2].encode('utf-8'), b'"}')
+    pdf.file.seek(0)
+    response = StreamingHttpResponse(_base64_chunks(pdf.file, prefix, suffix), content_type='application/json')
+    response['Content-Length'] = str(len(prefix) + (pdf.size + 2) // 3 * 4 + len(suffix))
+    return response
@@ -0,0 +1,328 @@
+"""
+Pack-size procurement optimizer.
+
+convert_wheelbarrows_to_best_unit and convert_grout_total round a quantity
+into one delivery unit, so 2.1 tippers of sand becomes 3 tippers. Given the
+packs a supplier actually sells (size and price, optionally limited by stock),
+optimize_packs finds the cheapest combination that covers the quantity.
+
+Sizes and quantities are fixed-point ints (millionths, see fixed_point) and
+prices are pesewas. The search is a knapsack DP over the covered amount in
+steps of the gcd of the pack sizes: unlimited packs are unbounded items, packs
+limited by stock are split into powers of two and handled as 0/1 items. Among
+equal-cost answers the one with fewer packs wins, then the smaller over-purchase.
+"""
+
+import math
+from fractions import Fraction
+from functools import lru_cache
+
+from .fixed_point import (
+    apply_rate, ceil_div, from_pesewas, from_quantity, to_pesewas, to_quantity,
+)
+from .project_calculations import GROUT_KG_PER_BAG, SAND_UNIT_WHEELBARROWS
+
+# Upper bound on DP cells; larger requests buy the bulk with the best-value pack first
+MAX_DP_CELLS = 20_000
+
+# Cost and pack count share one int key: cost * PACK_COUNT_KEY + packs
+PACK_COUNT_KEY = 1 << 20
+_UNREACHABLE = 1 << 62
+
+# Material name -> SupplierProduct.category
+MATERIAL_PRODUCT_CATEGORIES = {
+    'cement': 'cement',
+    'sand': 'sand',
+    'grout': 'grout',
+    'tile cement': 'adhesive',
+    'tile adhesive': 'adhesive',
+    'tiles': 'tiles',
+}
+
+
+def base_quantity(material_name, unit, quantity):
+    """
+    Brings a stored ProjectMaterial quantity to the unit packs are sized in:
+    sand in wheelbarrows, grout in kg, everything else as stored.
+    Returns (quantity in millionths, unit).
+    """
+    name = (material_name or '').lower()
+    unit = unit or ''
+    if name == 'sand' and unit.lower() in SAND_UNIT_WHEELBARROWS:
+        return apply_rate(to_quantity(quantity), SAND_UNIT_WHEELBARROWS[unit.lower()]), 'wheelbarrow'
+    if name == 'grout' and unit.lower() == 'bags':
+        return to_quantity(quantity) * GROUT_KG_PER_BAG, 'kg'
+    return to_quantity(quantity), unit
+
+
+def _binary_split(limit):
+    """Splits a pack limit into 1, 2, 4, ... pieces so any count up to limit is a subset sum."""
+    pieces = []
+    multiplier = 1
+    while limit > 0:
+        take = min(multiplier, limit)
+        pieces.append(take)
+        limit -= take
+        multiplier *= 2
+    return pieces
+
+
+@lru_cache(maxsize=4096)
+def _solve(target, packs):
+    """
+    packs is a tuple of (size, price, limit-or-None). Returns a tuple with the
+    count of each pack, or None when the packs (limited by stock) cannot cover target.
+    """
+    counts = [0] * len(packs)
+    if target <= 0:
+        return tuple(counts)
+
+    step = 0
+    for size, _, _ in packs:
+        step = math.gcd(step, size)
+    sizes = [size // step for size, _, _ in packs]
+    limits = [limit for _, _, limit in packs]
+    remaining = ceil_div(target, step)
+    largest = max(sizes)
+
+    # Keep the table small: buy the bulk with the cheapest-per-unit pack first
+    by_value = sorted(range(len(packs)), key=lambda i: (Fraction(packs[i][1], sizes[i]), -sizes[i]))
+    for index in by_value:
+        if remaining + largest <= MAX_DP_CELLS:
+            break
+        wanted = ceil_div(remaining + largest - MAX_DP_CELLS, sizes[index])
+        if limits[index] is not None:
+            wanted = min(wanted, limits[index])
+            limits[index] -= wanted
+        counts[index] += wanted
+        remaining -= wanted * sizes[index]
+    if remaining <= 0:
+        return tuple(counts)
+
+    # An optimal cover never reaches target + largest pack: any pack could be dropped
+    cells = remaining + largest
+    best = [_UNREACHABLE] * cells
+    best[0] = 0
+    pieces = []
+    for index in range(len(packs)):
+        if limits[index] is None:
+            pieces.append((index, 1, None))
+        else:
+            pieces.extend((index, multiplier, True) for multiplier in _binary_split(limits[index]))
+
+    marks = []
+    for index, multiplier, bounded in pieces:
+        size = sizes[index] * multiplier
+        key = packs[index][1] * multiplier * PACK_COUNT_KEY + multiplier
+        mark = bytearray(cells)
+        if size < cells:
+            if bounded:
+                cell_range = range(cells - 1, size - 1, -1)
+            else:
+                cell_range = range(size, cells)
+            for cell in cell_range:
+                candidate = best[cell - size] + key
+                if candidate < best[cell]:
+                    best[cell] = candidate
+                    mark[cell] = 1
+        marks.append(mark)
+
+    chosen = None
+    for cell in range(remaining, cells):
+        if best[cell] < _UNREACHABLE and (chosen is None or best[cell] < best[chosen]):
+            chosen = cell
+    if chosen is None:
+        return None
+
+    cell = chosen
+    for (index, multiplier, bounded), mark in zip(reversed(pieces), reversed(marks)):
+        size = sizes[index] * multiplier
+        if bounded:
+            if mark[cell]:
+                counts[index] += multiplier
+                cell -= size
+        else:
+            while mark[cell]:
+                counts[index] += multiplier
+                cell -= size
+    return tuple(counts)
+
+
+def _summary(required, packs, counts):
+    if counts is None:
+        return None
+    lines = []
+    amount = cost = 0
+    for pack, count in zip(packs, counts):
+        if not count:
+            continue
+        amount += pack['size'] * count
+        cost += pack['price'] * count
+        lines.append({
+            'name': pack['name'],
+            'product_id': pack.get('product_id'),
+            'size': from_quantity(pack['size'], 3),
+            'price': from_pesewas(pack['price']),
+            'count': count,
+            'cost': from_pesewas(pack['price'] * count),
+        })
+    return {
+        'packs': lines,
+        'amount': from_quantity(amount, 3),
+        'over_purchase': from_quantity(amount - required, 3),
+        'cost': cost,
+    }
+
+
+def optimize_packs(required, packs):
+    """
+    Cheapest set of packs covering the required quantity (millionths).
+    packs is a list of {'name', 'size' (millionths), 'price' (pesewas), 'limit' (count or None)}.
+    Returns a summary dict (cost in pesewas) or None if the stock cannot cover it.
+    """
+    packs = [pack for pack in packs if pack['size'] > 0 and pack['price'] >= 0 and pack.get('limit') != 0]
+    if not packs:
+        return None
+    counts = _solve(required, tuple((pack['size'], pack['price'], pack.get('limit')) for pack in packs))
+    return _summary(required, packs, counts)
+
+
+def greedy_packs(required, packs):
+    """
+    The current rule, for comparison: round the whole quantity up in one pack
+    size (the largest that does not exceed it, else the smallest), moving on to
+    the next size down only when stock runs out.
+    """
+    packs = [pack for pack in packs if pack['size'] > 0 and pack['price'] >= 0 and pack.get('limit') != 0]
+    if not packs:
+        return None
+    order = sorted(range(len(packs)), key=lambda i: -packs[i]['size'])
+    fitting = [i for i in order if packs[i]['size'] <= required] or order[-1:]
+    order = order[order.index(fitting[0]):] + order[:order.index(fitting[0])]
+    counts = [0] * len(packs)
+    remaining = required
+    for index in order:
+        if remaining <= 0:
+            break
+        wanted = ceil_div(remaining, packs[index]['size'])
+        limit = packs[index].get('limit')
+        if limit is not None:
+            wanted = min(wanted, limit)
+        counts[index] = wanted
+        remaining -= wanted * packs[index]['size']
+    if remaining > 0:
+        return None
+    return _summary(required, packs, counts)
+
+
+def supplier_pack_options(material_names, supplier_id=None):
+    """
+    Pack options from SupplierProduct for several materials with one query.
+    Only in-stock products with a pack_size are used; a positive stock_quantity
+    limits how many packs can be bought.
+    Returns {material name (lower case): [pack, ...]}.
+    """
+    from suppliers.models import SupplierProduct
+
+    names = {name.lower() for name in material_names}
+    categories = {MATERIAL_PRODUCT_CATEGORIES[name] for name in names if name in MATERIAL_PRODUCT_CATEGORIES}
+    products = SupplierProduct.objects.filter(
+        in_stock=True, pack_size__gt=0, supplier__is_active=True, category__in=categories,
+    ).select_related('supplier')
+    if supplier_id:
+        products = products.filter(supplier_id=supplier_id)
+
+    options = {name: [] for name in names}
+    for product in products:
+        for name in names:
+            if MATERIAL_PRODUCT_CATEGORIES.get(name) != product.category:
+                continue
+            stock = int(product.stock_quantity or 0)
+            options[name].append({
+                'name': f"{product.name} ({product.supplier.name})",
+                'product_id': product.id,
+                'size': to_quantity(product.pack_size),
+                'price': to_pesewas(product.discounted_price),
+                'limit': stock if stock > 0 else None,
+            })
+    return options
+
+
+def parse_pack_options(raw_packs):
+    """
+    Pack options sent by the client: {material name: [{'name', 'size', 'price', 'limit'}]}.
+    Returns (options, errors).
+    """
+    options = {}
+    errors = {}
+    if not isinstance(raw_packs, dict):
+        return {}, {'packs': ["Expected an object of material name -> list of packs."]}
+    for material_name, packs in raw_packs.items():
+        if not isinstance(packs, list):
+            errors[material_name] = ["Expected a list of packs."]
+            continue
+        parsed = []
+        for position, pack in enumerate(packs, start=1):
+            try:
+                size = to_quantity(str(pack['size']))
+                price = to_pesewas(str(pack['price']))
+                limit = pack.get('limit')
+                limit = int(limit) if limit not in (None, '') else None
+            except (KeyError, TypeError, ValueError):
+                errors[material_name] = [f"Pack {position} needs a numeric 'size' and 'price'."]
+                break
+            if size <= 0 or price < 0 or (limit is not None and limit < 0):
+                errors[material_name] = [f"Pack {position} needs a positive size, a price and a non-negative limit."]
+                break
+            parsed.append({
+                'name': pack.get('name') or f"{from_quantity(size, 3).normalize()} pack",
+                'size': size,
+                'price': price,
+                'limit': limit,
+            })
+        else:
+            options[material_name.lower()] = parsed
+    return options, errors
+
+
+def optimize_project_materials(project_materials, pack_options):
+    """
+    Optimal and greedy purchases for each ProjectMaterial that has pack options.
+    Returns a dict with per-material results and totals (GHS Decimals).
+    """
+    results = []
+    total_cost = greedy_total_cost = 0
+    for project_material in project_materials:
+        name = project_material.material.name if project_material.material_id else project_material.name
+        required, unit = base_quantity(name, project_material.unit, project_material.quantity_with_wastage)
+        packs = pack_options.get(name.lower()) or []
+        entry = {
+            'material': name,
+            'unit': unit,
+            'required': from_quantity(required, 3),
+            'optimal': None,
+            'greedy': None,
+            'savings': None,
+        }
+        if packs:
+            optimal = optimize_packs(required, packs)
+            greedy = greedy_packs(required, packs)
+            if optimal:
+                total_cost += optimal['cost']
+                if greedy:
+                    greedy_total_cost += greedy['cost']
+                    entry['savings'] = from_pesewas(greedy['cost'] - optimal['cost'])
+                else:
+                    greedy_total_cost += optimal['cost']
+            for label, result in (('optimal', optimal), ('greedy', greedy)):
+                if result:
+                    entry[label] = {**result, 'cost': from_pesewas(result['cost'])}
+            if not optimal:
+                entry['error'] = "Not enough stock in the available packs to cover this quantity."
+        results.append(entry)
+    return {
+        'materials': results,
+        'total_cost': from_pesewas(total_cost),
+        'greedy_total_cost': from_pesewas(greedy_total_cost),
+        'savings': from_pesewas(greedy_total_cost - total_cost),
+    }
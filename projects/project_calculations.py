@@ -1,9 +1,20 @@
 import decimal
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 import math
+from fractions import Fraction
 
+from .fixed_point import (
+    AREA_SCALE, QUANTITY_SCALE, LENGTH_SCALE,
+    rate, div_round, ceil_div, apply_rate, round_fixed, to_fixed, from_fixed,
+    to_pesewas, from_pesewas, length_to_micrometres,
+    to_area, from_area, from_quantity,
+)
+
+from .tile_layout import layout_room
+from .floor_plan import FloorPlanError, calculate_floor_plan, has_floor_plan
+from .scheduling import build_project_schedule
 from .models import (
     Material, Project, Room, ProjectMaterial, Worker, DynamicSetting, Unit,
     TilingRoomDetails, PaintingRoomDetails,
@@ -11,20 +22,59 @@ from .models import (
 )
 
 
-def get_wastage_percentage(area: float) -> float:
-    if area <= 20:
-        return 20
-    elif area <= 50:
-        return 16
-    elif area <= 100:
-        return 8
-    else:
-        return 5
+# Wastage tiers: (largest area in square millimetres, percent), first match
+# wins; a limit of None matches any area.
+WASTAGE_TIERS = [
+    (20 * AREA_SCALE, 20),
+    (50 * AREA_SCALE, 16),
+    (100 * AREA_SCALE, 8),
+    (None, 5),
+]
+
+
+def find_tier(tiers, value):
+    """The percent of the first (limit, percent) tier with value <= limit."""
+    for limit, percent in tiers:
+        if limit is None or value <= limit:
+            return percent
+    return 0
+
+
+def get_wastage_percentage(area: int) -> int:
+    """Wastage tier for an area given in square millimetres (fixed point)."""
+    return find_tier(WASTAGE_TIERS, area)
+
+# Square micrometres (the exact product of two lengths) in a square millimetre
+SQUARE_MICROMETRES = LENGTH_SCALE * LENGTH_SCALE // AREA_SCALE
+# The Room and Project area fields keep 0.01 m²
+STORED_AREA_STEP = AREA_SCALE // 100
+
+
+def stored_area(area: int, square: int = SQUARE_MICROMETRES, percent: int = 0) -> int:
+    """
+    An exact area in units of 1/square mm² (square micrometres by default),
+    plus a percentage, rounded once to 0.01 m². Returns square millimetres.
+    """
+    return div_round(area * (100 + percent), 100 * square * STORED_AREA_STEP) * STORED_AREA_STEP
+
+
+def stored_room_areas(floor: int, wall: int, square: int = SQUARE_MICROMETRES) -> tuple:
+    """
+    The six room areas as stored, from the exact floor and wall areas (see
+    stored_area): (floor, wall, total, floor_with_waste, wall_with_waste,
+    total_with_waste) in square millimetres. The wastage tier is picked from
+    the exact area, and each value is rounded only once.
+    """
+    total = floor + wall
+
+    def with_wastage(area):
+        # area <= limit mm² exactly when ceil(area / square) <= limit
+        return stored_area(area, square, get_wastage_percentage(ceil_div(area, square)))
 
-def get_total_area_with_wastage(area: decimal.Decimal) -> decimal.Decimal:
-    percent = decimal.Decimal(get_wastage_percentage(area))
-    multiplier = decimal.Decimal("1.00") + (percent / decimal.Decimal("100"))
-    return (area * multiplier).quantize(decimal.Decimal("1.00"))
+    return (
+        stored_area(floor, square), stored_area(wall, square), stored_area(total, square),
+        with_wastage(floor), with_wastage(wall), with_wastage(total),
+    )
 
 
 DEFAULT_WALL_COVERAGE_RATE = decimal.Decimal(12.0)
@@ -32,45 +82,53 @@ DEFAULT_FLOOR_COVERAGE_RATE = decimal.Decimal(14.0)
 DEFAULT_ADDITIONAL_DAYS = 0
 HOURS_PER_WORKDAY = decimal.Decimal(8)
 
+# m² covered per worker per day
 HARDCODED_DEFAULT_ROLE_COVERAGE = {
     'master': {
-        'floor': decimal.Decimal(30),   # 25–35 m²/day realistic
-        'wall': decimal.Decimal(20),    # 15–25 m²/day
+        'floor': 30,   # 25–35 m²/day realistic
+        'wall': 20,    # 15–25 m²/day
     },
     'labourer': {
-        'floor': decimal.Decimal(0),
-        'wall': decimal.Decimal(0),
+        'floor': 0,
+        'wall': 0,
     },
     'supervisor': {
-        'floor': decimal.Decimal(0),
-        'wall': decimal.Decimal(0),
+        'floor': 0,
+        'wall': 0,
     },
     'painter': {
-        'floor': decimal.Decimal(0),
-        'wall': decimal.Decimal(120),   # Painters can cover 100–150 m²/day on good surfaces
+        'floor': 0,
+        'wall': 120,   # Painters can cover 100–150 m²/day on good surfaces
     },
     'default': {
-        'floor': decimal.Decimal(10),   # Conservative estimate
-        'wall': decimal.Decimal(10),
+        'floor': 10,   # Conservative estimate
+        'wall': 10,
     },
 }
 
 
 CONVERSION_FACTORS_TO_METERS = {
     'meters': decimal.Decimal(1),
-    'feet': decimal.Decimal(0.3048),
-    'inches': decimal.Decimal(0.0254),
-    'centimeters': decimal.Decimal(0.01),
+    'feet': decimal.Decimal('0.3048'),
+    'inches': decimal.Decimal('0.0254'),
+    'centimeters': decimal.Decimal('0.01'),
 }
 
+
+def per_piece_rate(piece_area: int) -> Fraction:
+    """Pieces per m² for a piece covering piece_area square millimetres."""
+    return Fraction(AREA_SCALE, piece_area) if piece_area else Fraction(0)
+
+
+# Material units per m², as exact rates (see fixed_point.rate).
 COVERAGE_RATES_PER_UNIT = {
     'tiling': {
-        'cement': decimal.Decimal(1) / decimal.Decimal(6),    
-        'sand': decimal.Decimal(1.4) /decimal.Decimal(6),        
-        'chemical': decimal.Decimal(1) / decimal.Decimal(6.72),      
-        'tile cement': decimal.Decimal(1) / decimal.Decimal(4),    
-        'grout': decimal.Decimal(1) / decimal.Decimal(4.6666),         
-        
+        'cement': rate(1, 6),
+        'sand': rate('1.4', 6),
+        'chemical': rate(1, '6.72'),
+        'tile cement': rate(1, 4),
+        'grout': rate(1, '4.6666'),
+
     },
 # 2 wheel barrow  of sand for 1 bag cement , 7 headpans , 1.4 wheelbarrow 
 # //300 wheel barrows  == 150 bags  for tipa large cina bucket 
@@ -96,34 +154,29 @@ COVERAGE_RATES_PER_UNIT = {
 # 300 m2 × ¢ 35 = ¢ 10,500
 
     'pavement': {
-        'cement': decimal.Decimal(1) / decimal.Decimal(5),      #   per  m²
-        'rough sand': decimal.Decimal(1) / decimal.Decimal(1.5),        
-        'pavement tiles': lambda tile_area_sq_m: decimal.Decimal(1) / tile_area_sq_m if tile_area_sq_m else decimal.Decimal(0),
-        'grouting cement': decimal.Decimal(1) / decimal.Decimal(450),        
+        'cement': rate(1, 5),      #   per  m²
+        'rough sand': rate(1, '1.5'),
+        'pavement tiles': per_piece_rate,
+        'grouting cement': rate(1, 450),
     },
 
     'mason': {
-        'cement': decimal.Decimal(1) / decimal.Decimal(7),         # ≈ 0.1429 bags per m²
-        'sand': decimal.Decimal(1) / decimal.Decimal(3.5),         # ≈ 0.2857 m³ per m²
-        'tiles': lambda tile_area_sq_m: decimal.Decimal(1) / tile_area_sq_m if tile_area_sq_m else decimal.Decimal(0),
-        'chemical': decimal.Decimal(1) / decimal.Decimal(12),      # ≈ 0.0833 liters per m²
-        'plaster': decimal.Decimal(0.02),                          # ≈ 0.02 bags per m²
-        'water': decimal.Decimal(0.015),                           # ≈ 0.015 m³ per m²
-        'blocks': decimal.Decimal(12),                             # ≈ 12 blocks per m² of wall (6" blocks)
-        'binding wire': decimal.Decimal(0.1),                      # ≈ 0.1 kg per m² for tying reinforcements
-        'reinforcement bar': decimal.Decimal(0.5),                 # ≈ 0.5 kg per m² (if reinforced wall)
+        'cement': rate(1, 7),         # ≈ 0.1429 bags per m²
+        'sand': rate(1, '3.5'),         # ≈ 0.2857 m³ per m²
+        'tiles': per_piece_rate,
+        'chemical': rate(1, 12),      # ≈ 0.0833 liters per m²
+        'plaster': rate('0.02'),                          # ≈ 0.02 bags per m²
+        'water': rate('0.015'),                           # ≈ 0.015 m³ per m²
+        'blocks': rate(12),                             # ≈ 12 blocks per m² of wall (6" blocks)
+        'binding wire': rate('0.1'),                      # ≈ 0.1 kg per m² for tying reinforcements
+        'reinforcement bar': rate('0.5'),                 # ≈ 0.5 kg per m² (if reinforced wall)
     },
 
 }
 
 def convert_to_meters(value, unit_name):
-    """Converts a value from a given unit to meters."""
-    try:
-        value = decimal.Decimal(value)
-        factor = CONVERSION_FACTORS_TO_METERS.get(unit_name.lower(), decimal.Decimal(1))
-        return value * factor
-    except (decimal.InvalidOperation, TypeError):
-        return decimal.Decimal(0)
+    """Converts a value from a given unit to meters (exact to the micrometre)."""
+    return from_fixed(length_to_micrometres(value, unit_name), LENGTH_SCALE, 6)
 
 def get_dynamic_settings(user):
     """Fetches or creates DynamicSetting for a user."""
@@ -134,7 +187,7 @@ def calculate_default_worker_coverage(user, worker_role, project_type):
     """
     Determines the default floor and wall coverage rates for a worker role
     based on user's DynamicSetting JSONField, falling back to hardcoded defaults.
-    Returns a tuple (default_floor, default_wall).
+    Returns a tuple (default_floor, default_wall) in square millimetres per day.
     """
     user_settings = get_dynamic_settings(user)
     worker_role_lower = worker_role.lower()
@@ -143,59 +196,128 @@ def calculate_default_worker_coverage(user, worker_role, project_type):
     user_specific_defaults = user_role_coverage_data.get(worker_role_lower, {})
 
     hardcoded_specific_defaults = HARDCODED_DEFAULT_ROLE_COVERAGE.get(worker_role_lower, HARDCODED_DEFAULT_ROLE_COVERAGE.get('default', {}))
-    default_floor_float = decimal.Decimal(str(user_specific_defaults.get('floor', hardcoded_specific_defaults.get('floor', 0.0))))
-    default_wall_float = decimal.Decimal(str(user_specific_defaults.get('wall', hardcoded_specific_defaults.get('wall', 0.0))))
+    default_floor = to_area(user_specific_defaults.get('floor', hardcoded_specific_defaults.get('floor', 0)))
+    default_wall = to_area(user_specific_defaults.get('wall', hardcoded_specific_defaults.get('wall', 0)))
+
+    return default_floor, default_wall
+
+def calculate_room_areas(length, breadth, height, measurement_unit='meters'):
+    """
+    Floor, wall and total area for a rectangular room, plus each with its
+    wastage tier. Dimensions are in the project's measurement unit; the
+    result is a 6-tuple of areas in square millimetres, each rounded once to
+    the 0.01 m² the room keeps (see stored_room_areas):
+    (floor, wall, total, floor_with_waste, wall_with_waste, total_with_waste).
+    """
+    floor_area = 0
+    wall_area = 0
+
+    length_um = length_to_micrometres(length or 0, measurement_unit)
+    breadth_um = length_to_micrometres(breadth or 0, measurement_unit)
+    height_um = length_to_micrometres(height or 0, measurement_unit)
+
+    # Exact, in square micrometres
+    if length_um > 0 and breadth_um > 0:
+        floor_area = length_um * breadth_um
+        if height_um > 0:
+            wall_area = (2 * length_um + 2 * breadth_um) * height_um
+
+    return stored_room_areas(floor_area, wall_area)
+
+
+# Tile sizes and joints are entered in millimetres
+MILLIMETRE = LENGTH_SCALE // 1000
+
+
+def calculate_room_tile_layout(length, breadth, height, measurement_unit, tile_length, tile_width, grout_joint=None):
+    """
+    Tile counts from the tile layout (see tile_layout) for a rectangular room.
+    Room dimensions are in the project's measurement unit, tile sizes in mm.
+    Returns (floor_tiles, wall_tiles, tile_area in square micrometres), or
+    None when no tile size is set.
+    """
+    tile_length_um = to_fixed(tile_length, MILLIMETRE)
+    tile_width_um = to_fixed(tile_width, MILLIMETRE)
+    if tile_length_um <= 0 or tile_width_um <= 0:
+        return None
+    floor_layout, wall_tiles = layout_room(
+        length_to_micrometres(length or 0, measurement_unit),
+        length_to_micrometres(breadth or 0, measurement_unit),
+        length_to_micrometres(height or 0, measurement_unit),
+        tile_length_um, tile_width_um, to_fixed(grout_joint, MILLIMETRE),
+    )
+    return floor_layout.tiles, wall_tiles, tile_length_um * tile_width_um
 
-    return default_floor_float, default_wall_float
 
 def calculate_room_areas_and_save(room_instance):
     """
-    Calculates floor, wall, and total area for a room.
-    Uses details object calculation if available, otherwise uses basic dimensions.
-    Converts dimensions to meters before calculation.
+    Calculates floor, wall, and total area for a room from its dimensions.
+    Dimensions are converted to micrometres and areas worked out in square
+    millimetres (see fixed_point), so feet/inch projects are exact too.
     Saves the updated area fields to the room instance.
     """
     print(f"Calculating areas for Room ID {room_instance.id} (Name: {room_instance.name}).")
-    calculated_floor_area = decimal.Decimal(0)
-    calculated_wall_area = decimal.Decimal(0)
-    calculated_total_area = decimal.Decimal(0)
 
     project_instance = room_instance.project
     measurement_unit = project_instance.measurement_unit.lower() if project_instance.measurement_unit else 'meters'
     print(f"Project measurement unit: {measurement_unit}")
 
-    length_m = convert_to_meters(room_instance.length or 0, measurement_unit)
-    breadth_m = convert_to_meters(room_instance.breadth or 0, measurement_unit)
-    height_m = convert_to_meters(room_instance.height or 0, measurement_unit) 
-
-    print(f"Dimensions in meters: L={length_m}, B={breadth_m}, H={height_m}")
-
-    if room_instance.details:
-        print(f"Calculating areas using details object ({type(room_instance.details).__name__}).")
-        calculated_floor_area, calculated_wall_area, calculated_total_area = room_instance.details.calculate_area_details(
-            length_m, breadth_m, height_m, room_instance # Pass dimensions in meters and room instance
-        )
-        print(f"Areas calculated by details object: Floor={calculated_floor_area}, Wall={calculated_wall_area}, Total={calculated_total_area}")
-
+    # The details objects hold stair/opening data only; the areas come from the
+    # room dimensions for every project type.
+    (
+        floor_area, wall_area, total_area,
+        floor_area_with_wastage, wall_area_with_wastage, total_area_with_wastage,
+    ) = calculate_room_areas(room_instance.length, room_instance.breadth, room_instance.height, measurement_unit)
+    print(f"Basic areas calculated (mm²): Floor={floor_area}, Wall={wall_area}, Total={total_area}")
+
+    # Outline, per-wall heights and openings (see floor_plan); plain boxes keep the areas above
+    plan = None
+    if has_floor_plan(room_instance):
+        try:
+            plan = calculate_floor_plan(
+                room_instance.length, room_instance.breadth, room_instance.height, measurement_unit,
+                room_instance.floor_outline, room_instance.wall_heights, room_instance.openings,
+            )
+        except FloorPlanError as e:
+            print(f"Warning: invalid floor plan for Room ID {room_instance.id}, using length x breadth x height: {e}")
+    if plan:
+        (
+            floor_area, wall_area, total_area,
+            floor_area_with_wastage, wall_area_with_wastage, total_area_with_wastage,
+        ) = stored_room_areas(plan.twice_floor_area, plan.twice_wall_area, 2 * SQUARE_MICROMETRES)
+        perimeter = plan.perimeter
+        print(f"Floor plan areas (mm²): Floor={floor_area}, Wall={wall_area}, Openings={plan.openings_area}")
     else:
-        print(f"Calculating basic areas using dimensions in meters (L={length_m}, B={breadth_m}, H={height_m}).")
-        if length_m > 0 and breadth_m > 0:
-            calculated_floor_area = length_m * breadth_m
-            if height_m > 0:
-                 calculated_wall_area = (2 * length_m + 2 * breadth_m) * height_m
-        calculated_total_area = calculated_floor_area + calculated_wall_area # Sum floor and wall for total area
-        print(f"Basic areas calculated: Floor={calculated_floor_area}, Wall={calculated_wall_area}, Total={calculated_total_area}")
-    calculated_floor_area_with_wastage = get_total_area_with_wastage(calculated_floor_area)
-    calculated_wall_area_with_wastage = get_total_area_with_wastage(calculated_wall_area)
-    calculated_total_area_with_wastage = get_total_area_with_wastage(calculated_total_area)
-    print(f'this is the claculted with wastage : {calculated_floor_area_with_wastage,calculated_wall_area_with_wastage,calculated_total_area_with_wastage}')
-    room_instance.floor_area = decimal.Decimal(calculated_floor_area)
-    room_instance.floor_area_with_waste = decimal.Decimal(calculated_floor_area_with_wastage)
-    room_instance.wall_area = decimal.Decimal(calculated_wall_area)
-    room_instance.wall_area_with_waste = decimal.Decimal(calculated_wall_area_with_wastage)
-    room_instance.total_area = decimal.Decimal(calculated_total_area)
-    room_instance.total_area_with_waste = decimal.Decimal(calculated_total_area_with_wastage)
-    room_instance.save(update_fields=['floor_area', 'wall_area', 'total_area','floor_area_with_waste','wall_area_with_waste','total_area_with_waste'])
+        perimeter = 0
+        if floor_area:
+            perimeter = 2 * (length_to_micrometres(room_instance.length, measurement_unit) + length_to_micrometres(room_instance.breadth, measurement_unit))
+
+    # With a tile size, the area bought is what the tile layout needs rather than a flat tier.
+    # The layout is for plain rectangular rooms; rooms with a floor plan use the tiers.
+    tile_count = 0
+    details = room_instance.details
+    if not plan and isinstance(details, TilingRoomDetails) and details.tile_length and details.tile_width:
+        tile_layout = calculate_room_tile_layout(
+            room_instance.length, room_instance.breadth, room_instance.height, measurement_unit,
+            details.tile_length, details.tile_width, details.grout_joint,
+        )
+        if tile_layout:
+            floor_tiles, wall_tiles, tile_area = tile_layout
+            tile_count = floor_tiles + wall_tiles
+            floor_area_with_wastage = stored_area(floor_tiles * tile_area)
+            wall_area_with_wastage = stored_area(wall_tiles * tile_area)
+            total_area_with_wastage = floor_area_with_wastage + wall_area_with_wastage
+            print(f"Tile layout: {floor_tiles} floor tiles, {wall_tiles} wall tiles")
+    print(f'this is the claculted with wastage : {floor_area_with_wastage,wall_area_with_wastage,total_area_with_wastage}')
+    room_instance.floor_area = from_area(floor_area)
+    room_instance.floor_area_with_waste = from_area(floor_area_with_wastage)
+    room_instance.wall_area = from_area(wall_area)
+    room_instance.wall_area_with_waste = from_area(wall_area_with_wastage)
+    room_instance.total_area = from_area(total_area)
+    room_instance.total_area_with_waste = from_area(total_area_with_wastage)
+    room_instance.tile_count = tile_count
+    room_instance.perimeter = from_fixed(perimeter, LENGTH_SCALE, 2)
+    room_instance.save(update_fields=['floor_area', 'wall_area', 'total_area','floor_area_with_waste','wall_area_with_waste','total_area_with_waste', 'tile_count', 'perimeter'])
     print(f"Saved areas for Room ID {room_instance.id}: Floor={room_instance.floor_area}, Wall={room_instance.wall_area}, Total={room_instance.total_area_with_waste}")
 
 def calculate_project_areas_and_save(project_instance):
@@ -207,53 +329,174 @@ def calculate_project_areas_and_save(project_instance):
     print(f"Calculating total project areas for Project ID {project_instance.id}.")
     rooms = project_instance.rooms.all()
 
-    total_floor = decimal.Decimal(0)
-    total_wall = decimal.Decimal(0)
-    total_floor_with_waste = decimal.Decimal(0)
-    total_wall_with_waste = decimal.Decimal(0)
+    total_floor = 0
+    total_wall = 0
+    total_floor_with_waste = 0
+    total_wall_with_waste = 0
 
     for room in rooms:
-        total_floor += decimal.Decimal(room.floor_area or 0)
-        total_wall += decimal.Decimal(room.wall_area or 0)
-        total_floor_with_waste += decimal.Decimal(room.floor_area_with_waste or 0)
-        total_wall_with_waste += decimal.Decimal(room.wall_area_with_waste or 0)
-    
+        total_floor += to_area(room.floor_area)
+        total_wall += to_area(room.wall_area)
+        total_floor_with_waste += to_area(room.floor_area_with_waste)
+        total_wall_with_waste += to_area(room.wall_area_with_waste)
+
     print(f'this is the individual ones :{total_floor_with_waste,total_wall_with_waste}')
 
-    project_instance.total_floor_area = total_floor
-    project_instance.total_wall_area = total_wall
-    project_instance.total_floor_area_with_waste = total_floor_with_waste
-    project_instance.total_wall_area_with_waste = total_wall_with_waste
-    project_instance.total_area = total_floor + total_wall 
-    project_instance.total_area_with_waste = total_floor_with_waste + total_wall_with_waste
+    project_instance.total_floor_area = from_area(total_floor)
+    project_instance.total_wall_area = from_area(total_wall)
+    project_instance.total_floor_area_with_waste = from_area(total_floor_with_waste)
+    project_instance.total_wall_area_with_waste = from_area(total_wall_with_waste)
+    project_instance.total_area = from_area(total_floor + total_wall)
+    project_instance.total_area_with_waste = from_area(total_floor_with_waste + total_wall_with_waste)
     project_instance.save(update_fields=['total_floor_area','total_floor_area_with_waste','total_wall_area_with_waste', 'total_wall_area', 'total_area','total_area_with_waste'])
     print(f"Saved total areas for Project ID {project_instance.id}: Total Floor={project_instance.total_floor_area}, Total Wall={project_instance.total_wall_area}, Total Area={project_instance.total_area}, Total Area_with waste={project_instance.total_area_with_waste}")
 
-def convert_wheelbarrows_to_best_unit(wheelbarrows: float) -> tuple[float, str]:
-    WHEELBARROWS_PER_LARGE_TIPPER = 300
-    WHEELBARROWS_PER_SMALL_TIPPER = 175 
-    HEADPANS_PER_WHEELBARROW = 8
+WHEELBARROWS_PER_LARGE_TIPPER = 300
+WHEELBARROWS_PER_SMALL_TIPPER = 175
+HEADPANS_PER_WHEELBARROW = 8
+
+# Wheelbarrows in one of each unit convert_wheelbarrows_to_best_unit can pick
+SAND_UNIT_WHEELBARROWS = {
+    'large tipper': Fraction(WHEELBARROWS_PER_LARGE_TIPPER),
+    'small tipper': Fraction(WHEELBARROWS_PER_SMALL_TIPPER),
+    'wheelbarrow': Fraction(1),
+    'headpan': Fraction(1, HEADPANS_PER_WHEELBARROW),
+}
 
-    if wheelbarrows >= WHEELBARROWS_PER_LARGE_TIPPER:
-        large_tippers = wheelbarrows / WHEELBARROWS_PER_LARGE_TIPPER
-        return round(large_tippers, 2), "large tipper"
+
+def convert_wheelbarrows_to_best_unit(wheelbarrows: int) -> tuple[int, str]:
+    """
+    Picks a delivery unit for a sand quantity given in millionths of a
+    wheelbarrow. Returns (quantity in millionths, rounded to 2 places; unit).
+    """
+    if wheelbarrows >= WHEELBARROWS_PER_LARGE_TIPPER * QUANTITY_SCALE:
+        large_tippers = div_round(wheelbarrows, WHEELBARROWS_PER_LARGE_TIPPER)
+        return round_fixed(large_tippers, QUANTITY_SCALE, 2), "large tipper"
     # Then check for small tippers (quantities between 175 and 300)
-    elif wheelbarrows >= WHEELBARROWS_PER_SMALL_TIPPER: 
-        small_tippers = wheelbarrows / WHEELBARROWS_PER_SMALL_TIPPER
-        return round(small_tippers, 2), "small tipper"
+    elif wheelbarrows >= WHEELBARROWS_PER_SMALL_TIPPER * QUANTITY_SCALE:
+        small_tippers = div_round(wheelbarrows, WHEELBARROWS_PER_SMALL_TIPPER)
+        return round_fixed(small_tippers, QUANTITY_SCALE, 2), "small tipper"
     # Then for single wheelbarrows (quantities between 1 and 175)
-    elif wheelbarrows >= 1: # This covers 1 <= wheelbarrows < 175
-        return round(wheelbarrows, 2), "wheelbarrow"
+    elif wheelbarrows >= QUANTITY_SCALE: # This covers 1 <= wheelbarrows < 175
+        return round_fixed(wheelbarrows, QUANTITY_SCALE, 2), "wheelbarrow"
     # Finally, for quantities less than 1 wheelbarrow
     else: # This covers 0 <= wheelbarrows < 1
         headpans = wheelbarrows * HEADPANS_PER_WHEELBARROW
-        return round(headpans, 2), "headpan"
+        return round_fixed(headpans, QUANTITY_SCALE, 2), "headpan"
     
-def convert_grout_total(grout: float) -> tuple[float, str]:
-    New_total = grout/3
-    return round(New_total) ,"bags"
+GROUT_KG_PER_BAG = 3
+
+
+def convert_grout_total(grout: int) -> tuple[int, str]:
+    """Grout in millionths of a kg to whole 3 kg bags (still in millionths)."""
+    bags = div_round(grout, GROUT_KG_PER_BAG * QUANTITY_SCALE)
+    return bags * QUANTITY_SCALE, "bags"
+
+
+
+
+# Extra 7% of mortar materials when the bed is 9.88mm or thicker
+THICK_MORTAR_UPLIFT = Fraction(107, 100)
+THICK_MORTAR_MIN_THICKNESS = 988  # hundredths of a mm
+THICK_MORTAR_MATERIALS = ['cement', 'sand', 'tile cement', 'chemical']
+
+
+# Material wastage tiers: (largest project wastage setting in hundredths of a
+# percent, area tiers as in WASTAGE_TIERS), first match wins.
+MATERIAL_WASTAGE_TIERS = [
+    (301, [(55 * AREA_SCALE, 5), (200 * AREA_SCALE, 3), (None, 2)]),
+    (501, [(55 * AREA_SCALE, 10), (200 * AREA_SCALE, 7), (None, 5)]),
+    (None, [(55 * AREA_SCALE, 15), (200 * AREA_SCALE, 12), (None, 10)]),
+]
+
+
+def get_material_wastage_percentage(project_wastage: int, area: int) -> int:
+    """
+    Material wastage tier from the project's wastage setting (hundredths of a
+    percent) and the area it covers (square millimetres).
+    """
+    return find_tier(find_tier(MATERIAL_WASTAGE_TIERS, project_wastage), area)
+
+
+def get_material_coverage_rate(material_name, project_type, area, selected_material_names):
+    """
+    Exact units of material per m² for a (lower-case) material name.
+    Unknown materials and project types get a rate of 0.
+    """
+    project_coverage_rates = COVERAGE_RATES_PER_UNIT.get(project_type) or {}
+
+    # --- SPECIAL LOGIC FOR CEMENT BASED ON OTHER SELECTED MATERIALS ---
+    if material_name == 'cement':
+        if 'sand' in selected_material_names:
+            # Priority 1: If sand is selected, use cement rate for sand-cement mix (1/6)
+            return project_coverage_rates.get('cement', Fraction(0))
+        elif 'tile adhesive' in selected_material_names:
+            # Priority 2: If no sand, but 'tile adhesive' is selected, use 'tile adhesive' rate for cement
+            return project_coverage_rates.get('tile adhesive', Fraction(0))
+        # Default: use the generic 'cement' rate
+        return project_coverage_rates.get('cement', Fraction(0))
+
+    # --- GENERAL LOGIC for all other materials ---
+    coverage_value = project_coverage_rates.get(material_name)
+    if coverage_value is None:
+        return Fraction(0)
+    if callable(coverage_value):
+        # Callable rates (per-piece materials) get the area they cover
+        return coverage_value(area)
+    return coverage_value
+
+
+# Materials counted from the tile layout when the rooms have a tile size
+TILE_MATERIAL_NAMES = ['tiles', 'tile']
+
+
+def calculate_material_quantities(material_name, project_type, area, project_wastage, mortar_thickness, selected_material_names, layout_tiles=0, unlaid_area=0):
+    """
+    Quantities for one material. area is in square millimetres, project_wastage
+    and mortar_thickness in hundredths (to_fixed(value, 100)). layout_tiles is
+    the tile count from the rooms' tile layouts (Room.tile_count), and
+    unlaid_area the area (square millimetres) of the rooms without one, which
+    is estimated from the coverage rate and added to it.
+
+    Returns (quantity, quantity_with_wastage, unit, wastage_percentage) with the
+    quantities in millionths of a unit. unit is None when the material keeps
+    the unit it was added with (only sand, grout and laid-out tiles are converted).
+    """
+    wastage_percentage = get_material_wastage_percentage(project_wastage, area)
+
+    if material_name in TILE_MATERIAL_NAMES and layout_tiles:
+        # The layout already counts cuts and offcuts, so no percentage on top
+        laid = layout_tiles * QUANTITY_SCALE
+        if unlaid_area <= 0:
+            return laid, laid, 'pieces', wastage_percentage
+        coverage_rate_per_unit = get_material_coverage_rate(material_name, project_type, unlaid_area, selected_material_names)
+        return (
+            laid + apply_rate(unlaid_area, coverage_rate_per_unit),
+            laid + apply_rate(unlaid_area, coverage_rate_per_unit, Fraction(100 + wastage_percentage, 100)),
+            'pieces', wastage_percentage,
+        )
 
+    coverage_rate_per_unit = get_material_coverage_rate(material_name, project_type, area, selected_material_names)
 
+    # AREA_SCALE == QUANTITY_SCALE, so area * rate is already at quantity scale.
+    quantity = apply_rate(area, coverage_rate_per_unit)
+
+    wastage_multiplier = Fraction(100 + wastage_percentage, 100)
+
+    if material_name == 'sand':
+        converted_value, converted_unit = convert_wheelbarrows_to_best_unit(quantity)
+        return converted_value, apply_rate(converted_value, wastage_multiplier), converted_unit, wastage_percentage
+
+    if material_name == 'grout':
+        converted_value, converted_unit = convert_grout_total(quantity)
+        return converted_value, apply_rate(converted_value, wastage_multiplier), converted_unit, wastage_percentage
+
+    # One rounding for the whole chain, from the exact area
+    if mortar_thickness >= THICK_MORTAR_MIN_THICKNESS and material_name in THICK_MORTAR_MATERIALS:
+        quantity_with_wastage = apply_rate(area, coverage_rate_per_unit, wastage_multiplier, THICK_MORTAR_UPLIFT)
+    else:
+        quantity_with_wastage = apply_rate(area, coverage_rate_per_unit, wastage_multiplier)
+    return quantity, quantity_with_wastage, None, wastage_percentage
 
 
 def calculate_project_material_item_totals_and_save(project_material_instance):
@@ -273,203 +516,87 @@ def calculate_project_material_item_totals_and_save(project_material_instance):
 
              project_material_instance.save(update_fields=['quantity', 'quantity_with_wastage',])
         return
-    relevant_area_dec = decimal.Decimal(project_instance.total_area or 0) # Default to total area
-    project_type = project_instance.project_type
     material_name = material_instance.name.lower() # Use lower case for consistent lookup
-    
-    material_unit = material_instance.unit.lower() if material_instance.unit else "unknown"
-
-    wastage_percentage_dec = decimal.Decimal(project_instance.wastage_percentage or 0)
-    mortar_thickness_dec = decimal.Decimal(project_instance.mortar_thickness or 0)
-    calculated_quantity_raw = decimal.Decimal(0)
-    coverage_rate_per_unit = decimal.Decimal(0) # This is the quantity of material per unit area/length/volume
-
-    project_coverage_rates = COVERAGE_RATES_PER_UNIT.get(project_type)
-    selected_material_names_lower = list(
-        project_instance.materials.all().values_list('material__name', flat=True)
+    selected_material_names_lower = [
+        name.lower() for name in project_instance.materials.all().values_list('material__name', flat=True)
+    ]
+
+    layout_tiles = unlaid_area = 0
+    if material_name in TILE_MATERIAL_NAMES:
+        # Rooms without a tile size (tile_count 0) still need tiles for their area
+        layout = project_instance.rooms.aggregate(tiles=Sum('tile_count'), unlaid_area=Sum('total_area', filter=Q(tile_count=0)))
+        layout_tiles, unlaid_area = layout['tiles'] or 0, to_area(layout['unlaid_area'] or 0)
+
+    quantity, quantity_with_wastage, converted_unit, wastage_perrc = calculate_material_quantities(
+        material_name,
+        project_instance.project_type,
+        to_area(project_instance.total_area), # Default to total area
+        to_fixed(project_instance.wastage_percentage, 100),
+        to_fixed(project_instance.mortar_thickness, 100),
+        selected_material_names_lower,
+        layout_tiles,
+        unlaid_area,
     )
-    selected_material_names_lower = [name.lower() for name in selected_material_names_lower] # Ensure all are lowercase
 
-
-    # --- SPECIAL LOGIC FOR CEMENT BASED ON OTHER SELECTED MATERIALS ---
-    if material_name == 'cement':
-        has_sand_selected = 'sand' in selected_material_names_lower
-        has_tile_cement_selected = 'tile cement' in selected_material_names_lower # Check if 'Tile Cement' itself is selected
-
-        if has_sand_selected:
-            # Priority 1: If sand is selected, use cement rate for sand-cement mix (1/6)
-            coverage_rate_per_unit = project_coverage_rates.get('cement', decimal.Decimal(0))
-            print(f"DEBUG: Cement coverage for '{project_type}' set by 'sand' presence: {coverage_rate_per_unit}")
-        elif has_tile_adhesive_selected:
-            # Priority 2: If no sand, but 'tile adhesive' is selected, use 'tile adhesive' rate for cement (1/4)
-            # This assumes 'tile adhesive' entry *in the coverage rates* defines the cement portion needed
-            # for this scenario. If 'tile adhesive' is just a flag, you might point to 'cement' directly.
-            # Based on your COVERAGE_RATES_PER_UNIT, 'tile adhesive' is a direct material entry.
-            coverage_rate_per_unit = project_coverage_rates.get('tile adhesive', decimal.Decimal(0))
-            print(f"DEBUG: Cement coverage for '{project_type}' set by 'tile adhesive' presence (no sand): {coverage_rate_per_unit}")
-        else:
-            # Default: If neither sand nor tile cement dictate it, use the generic 'cement' rate
-            coverage_rate_per_unit = project_coverage_rates.get('cement', decimal.Decimal(0))
-            print(f"DEBUG: Cement coverage for '{project_type}' set by default: {coverage_rate_per_unit}")
-
-    # --- GENERAL LOGIC for all other materials (and for cement if none of the above applied) ---
-    else:
-        # General logic for all other materials (not 'cement')
-        coverage_value = project_coverage_rates[material_name]
-
-        if coverage_value is None:
-            print(f"Warning: Coverage rate for material '{material_name}' (ID {material_instance.id}) "
-                  f"not defined for project type '{project_type}' (Project ID {project_instance.id}). Setting coverage to 0.")
-            coverage_rate_per_unit = decimal.Decimal(0)
-        else:
-            try:
-                # Handle callable coverage rates (e.g., lambda functions)
-                if callable(coverage_value):
-                    # Passing the relevant_area_dec to the callable rate
-                    coverage_rate_per_unit = decimal.Decimal(coverage_value(relevant_area_dec))
-                    print(f"Calculated coverage rate via callable for '{material_name}': {coverage_rate_per_unit}")
-                else:
-                    coverage_rate_per_unit = decimal.Decimal(coverage_value)
-                    print(f"Using fixed coverage rate for '{material_name}': {coverage_rate_per_unit}")
-
-            except (decimal.InvalidOperation, TypeError, AttributeError) as e:
-                print(f"ERROR: Problem determining coverage rate for material '{material_name}' (ID {material_instance.id}) "
-                      f"in project type '{project_type}' (Project ID {project_instance.id}): {e}. "
-                      f"Check material item data or coverage definition. Setting coverage to 0.")
-                coverage_rate_per_unit = decimal.Decimal(0)
-
-        coverage_rate_per_unit = decimal.Decimal(coverage_rate_per_unit) # Redundant but safe if previous logic was flawed
-
-    if relevant_area_dec == 0 or coverage_rate_per_unit == 0:
-        calculated_quantity_raw = decimal.Decimal(0)
-        print(f"Calculated raw quantity for '{material_name}' is 0 due to zero area or coverage.")
+    project_material_instance.quantity = from_quantity(quantity)
+    project_material_instance.quantity_with_wastage = from_quantity(quantity_with_wastage)
+    if converted_unit:
+        project_material_instance.unit = converted_unit # Sand and grout are converted to a delivery unit
     else:
-        calculated_quantity_raw = relevant_area_dec * coverage_rate_per_unit
-        print(f"Calculated raw quantity for '{material_name}': {relevant_area_dec} (area) * {coverage_rate_per_unit} (coverage) = {calculated_quantity_raw}")
+        project_material_instance.unit = project_material_instance.unit.lower() if project_material_instance.unit else "unknown"
+    print(f"Calculated totals for ProjectMaterial ID {project_material_instance.id} (Material: {material_name}, Project: {project_instance.id}): Quantity={project_material_instance.quantity}, Quantity w/ Wastage={project_material_instance.quantity_with_wastage}, Unit={project_material_instance.unit}")
 
-    
-    wastage_perrc = 0
-    if wastage_percentage_dec <= 3.01 :
-        if relevant_area_dec <= 55:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(5) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(5)
-        elif relevant_area_dec <= 200:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(3) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(3)
-        else:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(2) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(2)
-    elif wastage_percentage_dec <=5.01:
-        if relevant_area_dec <= 55:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(10) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(10)
-        elif relevant_area_dec <= 200:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(7) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(7)
-        else:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(5) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(5)
-    else:
-        if relevant_area_dec <= 55:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(15) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(15)
-        elif relevant_area_dec <= 200:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(12) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(12)
-        else:
-            wastage_multiplier = decimal.Decimal(1) + (decimal.Decimal(10) / decimal.Decimal(100))
-            wastage_perrc = decimal.Decimal(10)
-
-    quantity_with_wastage = calculated_quantity_raw * wastage_multiplier
-    initial_project_material_unit = project_material_instance.unit.lower() if project_material_instance.unit else "unknown"
-
-    print(f"Quantity with wastage: {calculated_quantity_raw} * {wastage_multiplier} = {quantity_with_wastage}")
-    if mortar_thickness_dec >= 9.88 :
-        if material_name in ['cement','sand','tile cement','chemical']:
-            quantity_with_wastage = quantity_with_wastage * (decimal.Decimal(1) + (decimal.Decimal(7) / decimal.Decimal(100)))
-    final_quantity = quantity_with_wastage
-    if material_name == 'sand':
-        quantity_in_float = float(calculated_quantity_raw) # Convert Decimal to float for the conversion function
-        converted_value, converted_unit = convert_wheelbarrows_to_best_unit(quantity_in_float)
-
-        # Assign to the ProjectMaterial instance's quantity and unit fields
-        project_material_instance.quantity = decimal.Decimal(str(converted_value)) # Convert back to Decimal for storage
-        project_material_instance.quantity_with_wastage = decimal.Decimal(str(converted_value * float(wastage_multiplier))) # Apply wastage to converted value
-        project_material_instance.unit = converted_unit # Update the unit string on the ProjectMaterial
-        print(f"Sand converted and assigned: {converted_value} {converted_unit}, Qty with wastage: {project_material_instance.quantity_with_wastage}")
-        
-    elif material_name == 'grout':
-        quantity_in_float = float(calculated_quantity_raw) # Convert Decimal to float for the conversion function
-        converted_value, converted_unit = convert_grout_total(quantity_in_float)
-
-        # Assign to the ProjectMaterial instance's quantity and unit fields
-        project_material_instance.quantity = decimal.Decimal(str(converted_value)) # Convert back to Decimal for storage
-        project_material_instance.quantity_with_wastage = decimal.Decimal(str(converted_value * float(wastage_multiplier))) # Apply wastage to converted value
-        project_material_instance.unit = converted_unit # Update the unit string on the ProjectMaterial
-        print(f"grout converted and assigned: {converted_value} {converted_unit}, Qty with wastage: {project_material_instance.quantity_with_wastage}")
-    else:
-        # For non-sand materials, assign the raw and wastage quantities directly
-        project_material_instance.quantity = calculated_quantity_raw
-        project_material_instance.quantity_with_wastage = final_quantity
-       
-        project_material_instance.unit = initial_project_material_unit
-        print(f"Calculated totals for ProjectMaterial ID {project_material_instance.id} (Material: {material_name}, Project: {project_instance.id}): Quantity={project_material_instance.quantity}, Quantity w/ Wastage={project_material_instance.quantity_with_wastage}")
-
-    project_instance.wastage_percentage =  wastage_perrc
+    project_instance.wastage_percentage = decimal.Decimal(wastage_perrc)
     print(f'wastage percentage :{wastage_perrc}')
     project_instance.save(update_fields=['wastage_percentage'])
     project_material_instance.save(update_fields=['quantity', 'quantity_with_wastage', 'unit'])
-    print(f"Updated ProjectMaterial ID {project_material_instance.id} with Quantity={project_material_instance.quantity}, Quantity w/ Wastage={project_material_instance.quantity_with_wastage}, Unit={project_material_instance.unit}")
 
 
-def calculate_worker_total_cost_and_save(worker_instance, estimated_days):
-
-    print(f"Calculating total cost for Worker ID {worker_instance.id} (Role: {worker_instance.role}).")
-    rate_dec = decimal.Decimal(worker_instance.rate or 0)
-    count_int = worker_instance.count or 0
-    rate_type = worker_instance.rate_type
-    estimated_days_dec = decimal.Decimal(estimated_days or 0)
-
-    total_cost = decimal.Decimal(0)
-
-    if count_int > 0 and rate_dec > 0 and estimated_days_dec > 0:
+def calculate_worker_cost(rate_pesewas, count, rate_type, estimated_days, equipment_pesewas_per_day=0):
+    """Total cost in pesewas for a worker line over the estimated days."""
+    total_cost = 0
+    if count > 0 and rate_pesewas > 0 and estimated_days > 0:
         if rate_type == 'daily':
-            total_cost = rate_dec * count_int * estimated_days_dec
-            print(f"Daily rate calculation: {rate_dec} * {count_int} * {estimated_days_dec} = {total_cost}")
+            total_cost = rate_pesewas * count * estimated_days
         elif rate_type == 'hourly':
             # Assuming an 8-hour workday for hourly rates
-            total_cost = rate_dec * count_int * estimated_days_dec * HOURS_PER_WORKDAY
-            print(f"Hourly rate calculation: {rate_dec} * {count_int} * {estimated_days_dec} * {HOURS_PER_WORKDAY} = {total_cost}")
+            total_cost = rate_pesewas * count * estimated_days * int(HOURS_PER_WORKDAY)
         # Add other rate types if needed
-    else:
-         print(f"Worker count ({count_int}), rate ({rate_dec}), or estimated days ({estimated_days_dec}) is zero or less. Worker cost is zero.")
+    if equipment_pesewas_per_day > 0 and estimated_days > 0:
+        total_cost += equipment_pesewas_per_day * estimated_days
+    return total_cost
+
 
-    special_equipment_cost_dec = decimal.Decimal(worker_instance.special_equipment_cost_per_day or 0)
-    if special_equipment_cost_dec > 0 and estimated_days_dec > 0:
-         equipment_cost = special_equipment_cost_dec * estimated_days_dec
-         total_cost += equipment_cost
-         print(f"Added special equipment cost: {special_equipment_cost_dec} * {estimated_days_dec} = {equipment_cost}. New total cost: {total_cost}")
-    elif special_equipment_cost_dec > 0:
-         print(f"Special equipment cost per day ({special_equipment_cost_dec}) is positive, but estimated days ({estimated_days_dec}) is zero. Special equipment cost is zero.")
+def calculate_worker_total_cost_and_save(worker_instance, estimated_days):
 
+    print(f"Calculating total cost for Worker ID {worker_instance.id} (Role: {worker_instance.role}).")
+    total_cost = calculate_worker_cost(
+        to_pesewas(worker_instance.rate),
+        worker_instance.count or 0,
+        worker_instance.rate_type,
+        int(estimated_days or 0),
+        to_pesewas(worker_instance.special_equipment_cost_per_day),
+    )
 
-    worker_instance.total_cost = total_cost
+    worker_instance.total_cost = from_pesewas(total_cost)
     worker_instance.save(update_fields=['total_cost'])
     
     print(f"Calculated total cost for Worker ID {worker_instance.id} (Role: {worker_instance.role}, Project: {worker_instance.project.id}): Total Cost={worker_instance.total_cost}")
 
 
 def calculate_combined_worker_coverage(project_instance):
-
+    """
+    Sums the daily coverage of every worker on the project.
+    Returns (floor, wall) in square millimetres per day.
+    """
     print(f"Calculating combined worker coverage for Project ID {project_instance.id}.")
-    total_floor_coverage_per_day = decimal.Decimal(0)
-    total_wall_coverage_per_day = decimal.Decimal(0)
+    total_floor_coverage_per_day = 0
+    total_wall_coverage_per_day = 0
 
-    user_settings = get_dynamic_settings(project_instance.user)
     project_type = project_instance.project_type
 
     for worker in project_instance.workers.all():
-        worker_count = decimal.Decimal(worker.count or 0)
+        worker_count = worker.count or 0
 
         if worker_count <= 0:
              print(f"Worker {worker.role} (ID {worker.id}) has zero or negative count. Skipping coverage calculation for this worker.")
@@ -480,7 +607,7 @@ def calculate_combined_worker_coverage(project_instance):
             worker.role,
             project_type
         )
-        print(f"Worker {worker.role} (ID {worker.id}) coverage rates: Floor={effective_floor_coverage_rate}/day, Wall={effective_wall_coverage_rate}/day.")
+        print(f"Worker {worker.role} (ID {worker.id}) coverage rates (mm²): Floor={effective_floor_coverage_rate}/day, Wall={effective_wall_coverage_rate}/day.")
 
 
         total_floor_coverage_per_day += effective_floor_coverage_rate * worker_count
@@ -491,97 +618,104 @@ def calculate_combined_worker_coverage(project_instance):
     print(f"Total combined worker coverage per day: Floor={total_floor_coverage_per_day}, Wall={total_wall_coverage_per_day}.")
     return total_floor_coverage_per_day, total_wall_coverage_per_day
 
-def calculate_project_estimated_days_and_save(project_instance):
-    print(f"Calculating estimated days for Project ID {project_instance.id}.")
-    total_floor_area_dec = decimal.Decimal(project_instance.total_floor_area or 0)
-    total_wall_area_dec = decimal.Decimal(project_instance.total_wall_area or 0)
-    print(f"Total project areas: Floor={total_floor_area_dec}, Wall={total_wall_area_dec}.")
-
-
-    total_combined_floor_coverage_per_day, total_combined_wall_coverage_per_day = calculate_combined_worker_coverage(project_instance)
-
-    estimated_floor_days_raw = decimal.Decimal(0)
-    estimated_wall_days_raw = decimal.Decimal(0)
+def calculate_estimated_days(floor_area, wall_area, floor_coverage_per_day, wall_coverage_per_day, additional_days=0):
+    """
+    Working days for the given areas and combined daily coverage (all in
+    square millimetres). Floor and wall days are added as exact fractions and
+    rounded up once; at least one day when there is work.
+    """
+    # days = numerator / denominator, kept as integers
+    numerator, denominator = 0, 1
+    if floor_area > 0 and floor_coverage_per_day > 0:
+        numerator, denominator = floor_area, floor_coverage_per_day
+    if wall_area > 0 and wall_coverage_per_day > 0:
+        numerator = numerator * wall_coverage_per_day + wall_area * denominator
+        denominator *= wall_coverage_per_day
 
-    if total_floor_area_dec > 0 and total_combined_floor_coverage_per_day > 0:
-         estimated_floor_days_raw = total_floor_area_dec / total_combined_floor_coverage_per_day
-         print(f"Estimated floor days raw: {total_floor_area_dec} / {total_combined_floor_coverage_per_day} = {estimated_floor_days_raw}.")
-    elif total_floor_area_dec > 0:
-         print(f"Warning: Total floor area ({total_floor_area_dec}) is positive but combined floor coverage is zero for Project {project_instance.id}. Floor days calculation may be inaccurate.")
-         pass # estimated_floor_days_raw remains 0
+    estimated_days = additional_days # Start with additional days
+    if numerator > 0:
+        estimated_days += ceil_div(numerator, denominator)
+        estimated_days = max(1, estimated_days) # Ensure at least 1 day if there's work
+    return estimated_days
 
-    if total_wall_area_dec > 0 and total_combined_wall_coverage_per_day > 0:
-         estimated_wall_days_raw = total_wall_area_dec / total_combined_wall_coverage_per_day
-         print(f"Estimated wall days raw: {total_wall_area_dec} / {total_combined_wall_coverage_per_day} = {estimated_wall_days_raw}.")
-    elif total_wall_area_dec > 0:
-         print(f"Warning: Total wall area ({total_wall_area_dec}) is positive but combined wall coverage is zero for Project {project_instance.id}. Wall days calculation may be inaccurate.")
-         # Decide how to handle this - maybe assume a very high number of days or a default?
-         pass # estimated_wall_days_raw remains 0
 
-    estimated_days_raw = estimated_floor_days_raw + estimated_wall_days_raw
-    print(f"Maximum raw estimated days (Floor vs Wall): {estimated_days_raw}.")
+def calculate_project_estimated_days_and_save(project_instance):
+    print(f"Calculating estimated days for Project ID {project_instance.id}.")
+    total_floor_area = to_area(project_instance.total_floor_area)
+    total_wall_area = to_area(project_instance.total_wall_area)
+    print(f"Total project areas (mm²): Floor={total_floor_area}, Wall={total_wall_area}.")
 
+    total_combined_floor_coverage_per_day, total_combined_wall_coverage_per_day = calculate_combined_worker_coverage(project_instance)
+    if total_floor_area > 0 and not total_combined_floor_coverage_per_day:
+         print(f"Warning: Total floor area ({total_floor_area}) is positive but combined floor coverage is zero for Project {project_instance.id}. Floor days calculation may be inaccurate.")
+    if total_wall_area > 0 and not total_combined_wall_coverage_per_day:
+         print(f"Warning: Total wall area ({total_wall_area}) is positive but combined wall coverage is zero for Project {project_instance.id}. Wall days calculation may be inaccurate.")
 
     user_settings = get_dynamic_settings(project_instance.user)
-    additional_days = decimal.Decimal(user_settings.default_additional_days or DEFAULT_ADDITIONAL_DAYS or 0)
+    additional_days = int(user_settings.default_additional_days or DEFAULT_ADDITIONAL_DAYS or 0)
     print(f"Additional days from settings: {additional_days}.")
 
-    estimated_days_final = additional_days # Start with additional days
+    if user_settings.use_crew_schedule:
+        schedule = build_project_schedule(project_instance)
+        print(f"Crew schedule: critical path={schedule['critical_path_days']} days, schedule={schedule['schedule_days']} days.")
+        project_instance.estimated_days = schedule['estimated_days']
+    else:
+        project_instance.estimated_days = calculate_estimated_days(
+            total_floor_area, total_wall_area,
+            total_combined_floor_coverage_per_day, total_combined_wall_coverage_per_day,
+            additional_days,
+        )
+    print(f"Calculated estimated days for Project {project_instance.id}: Total Estimated Days={project_instance.estimated_days}")
 
-    if estimated_days_raw > 0:
-        estimated_days_final += decimal.Decimal(math.ceil(estimated_days_raw))
-        estimated_days_final = max(decimal.Decimal(1), estimated_days_final) # Ensure at least 1 day if there's work
 
-    estimated_days_final = int(estimated_days_final) # Convert to integer for the model field
-    project_instance.estimated_days = estimated_days_final
-    print(f"Calculated estimated days for Project {project_instance.id}: Floor Days Raw={estimated_floor_days_raw}, Wall Days Raw={estimated_wall_days_raw}, Total Estimated Days={project_instance.estimated_days}")
 
+    
+def calculate_financial_totals(profit_type, profit_value, total_area, workers_total_cost):
+    """
+    Labour charge, profit and cost per m², all in pesewas.
+    profit_value and workers_total_cost are in pesewas, total_area in square millimetres.
+    Returns (total_labour_cost, profit, cost_per_area).
+    """
+    total_labour_cost = 0
+    profit_amount = 0
+    if profit_value > 0:
+        if profit_type == 'fixed':
+            total_labour_cost = profit_value
+            profit_amount = profit_value - workers_total_cost
+        elif profit_type == 'per_area' and total_area > 0:
+            labour_exact = profit_value * total_area # pesewas * mm², not yet rounded
+            total_labour_cost = div_round(labour_exact, AREA_SCALE)
+            profit_amount = div_round(labour_exact - workers_total_cost * AREA_SCALE, AREA_SCALE)
+
+    cost_per_area = 0
+    if total_area > 0:
+        if profit_type == 'fixed':
+            cost_per_area = div_round(total_labour_cost * AREA_SCALE, total_area)
+        else:
+            cost_per_area = profit_value
+    return total_labour_cost, profit_amount, cost_per_area
 
 
-    
 def calculate_project_financial_totals_and_save(project_instance):
     """Calculates and sets the financial total fields for the project."""
     print(f"Calculating project financial totals for Project ID {project_instance.id}.")
-    profit_amount = decimal.Decimal(0)
-    profit_type = project_instance.profit_type
-    profit_value = decimal.Decimal(project_instance.profit_value or 0)
-    total_area_dec = decimal.Decimal(project_instance.total_area_with_waste or 0) # Use total_area for per_area profit
-    total_labour_cost = decimal.Decimal(0)
-    print(f"Calculating total labour costs for Project {project_instance.id}.")
     if not project_instance:
         print(f"Warning: Cannot calculate total labour costs - missing project instance.")
         return
     total_project_labor_cost = Worker.objects.filter(project=project_instance).aggregate(Sum('total_cost'))['total_cost__sum']
 
-    if profit_value > 0:
-       
-        if profit_type == 'fixed':
-            total_labour_cost = profit_value
-            profit_amount = profit_value - total_project_labor_cost
-            print(f"Calculated Profit (Fixed): {profit_amount}")
-        elif profit_type == 'per_area' and total_area_dec > 0:
-            total_labour_cost = profit_value * total_area_dec
-            profit_amount = total_labour_cost - total_project_labor_cost
-            print(f"Calculated Profit (Per Area): {profit_value} * {total_area_dec} = {profit_amount}")
-        else:
-             print(f"Warning: Profit type '{profit_type}' is 'per_area' but total area is zero ({total_area_dec}) for Project {project_instance.id}. Profit set to zero.")
-    else:
-         print(f"Profit value ({profit_value}) is zero or less. Profit set to zero.")
+    total_labour_cost, profit_amount, cost_per_area = calculate_financial_totals(
+        project_instance.profit_type,
+        to_pesewas(project_instance.profit_value),
+        to_area(project_instance.total_area_with_waste), # Use total area with waste for per_area profit
+        to_pesewas(total_project_labor_cost),
+    )
 
-    project_instance.profit = profit_amount
-    project_instance.total_labor_cost = total_labour_cost
+    project_instance.profit = from_pesewas(profit_amount)
+    project_instance.total_labor_cost = from_pesewas(total_labour_cost)
+    project_instance.cost_per_area = from_pesewas(cost_per_area)
     print(f"Calculated Profit: {project_instance.profit}")
     print(f"Calculated total labour costs for Project {project_instance.id}: {project_instance.total_labor_cost}")
-
-    if total_area_dec > 0:
-        if profit_type == 'fixed':
-            project_instance.cost_per_area = (project_instance.total_labor_cost) / total_area_dec
-        else:
-            project_instance.cost_per_area = profit_value
-    else:
-        project_instance.cost_per_area = decimal.Decimal(0)
-        print(f"Total area is zero. Cost per area set to zero.")
-
     print(f"Finished calculating financial totals for Project ID {project_instance.id}.")
 
 @transaction.atomic
@@ -660,6 +794,7 @@ def calculate_project_totals(project_id):
         print("-----------------------------------------")
         project_instance.save(update_fields=final_update_fields)
         print(f"Final save for Project ID {project_instance.id}.")
+
         print(f"Finished project calculations for Project ID: {project_id}")
     except Project.DoesNotExist:
         print(f"Error: Project with ID {project_id} not found during recalculation.")
@@ -0,0 +1,127 @@
+"""
+Portfolio material rollup: one shopping list across a user's projects.
+
+The totals come from a single grouped aggregate over ProjectMaterial, so the
+number of queries does not grow with the number of projects. Sand is stored in
+whatever delivery unit suited each project (headpans, wheelbarrows, tippers),
+so those rows are brought back to wheelbarrows, added up and converted again
+with convert_wheelbarrows_to_best_unit. Grout is already in whole bags.
+
+Results are cached per user under a version read from the database: the
+number of the user's projects and their latest updated_at. Every change to a
+project's materials goes through calculate_project_totals, which saves
+updated_at, and a status change or delete changes one of the two as well, so
+a cached rollup is never used after a change, whichever process made it.
+"""
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Max, Min, Sum, When
+from django.db.models.functions import Lower
+
+from .fixed_point import apply_rate, from_quantity, to_quantity
+from .models import Project, ProjectMaterial
+from .project_calculations import SAND_UNIT_WHEELBARROWS, convert_wheelbarrows_to_best_unit
+
+ROLLUP_CACHE_TIMEOUT = 60 * 60
+DEFAULT_ROLLUP_STATUSES = ['pending']
+
+
+def _rollup_version(user_id):
+    """The user's project count and latest project change, which every rollup input change moves."""
+    version = Project.objects.filter(user_id=user_id).aggregate(projects=Count('id'), updated=Max('updated_at'))
+    updated = version['updated'].isoformat() if version['updated'] else ''
+    return f"{version['projects']}:{updated}"
+
+
+def _user_materials(user_id, statuses):
+    return (
+        ProjectMaterial.objects
+        .filter(project__user_id=user_id, project__status__in=statuses)
+        .annotate(
+            material_key=Lower('material__name'),
+            # Rows saved without a unit fall back to the catalogue unit
+            rollup_unit=Case(
+                When(unit='', then=F('material__unit')),
+                default=F('unit'),
+                output_field=CharField(),
+            ),
+        )
+    )
+
+
+def _aggregate_rows(user_id, statuses):
+    """One grouped query: totals per material name (case-insensitive) and unit."""
+    return (
+        _user_materials(user_id, statuses)
+        .values('material_key', 'rollup_unit')
+        .annotate(
+            material_name=Min('material__name'),
+            quantity=Sum('quantity'),
+            quantity_with_wastage=Sum('quantity_with_wastage'),
+            project_count=Count('project', distinct=True),
+        )
+        .order_by('material_key', 'rollup_unit')
+    )
+
+
+def build_material_rollup(user_id, statuses):
+    items = []
+    sand = None
+    sand_units = []
+    for row in _aggregate_rows(user_id, statuses):
+        unit = row['rollup_unit'] or ''
+        wheelbarrows_per_unit = SAND_UNIT_WHEELBARROWS.get(unit.lower()) if row['material_key'] == 'sand' else None
+        if wheelbarrows_per_unit is not None:
+            # Sand rows in different delivery units are merged into one line below
+            if sand is None:
+                sand = {'material': row['material_name'], 'quantity': 0, 'quantity_with_wastage': 0}
+            sand['quantity'] += apply_rate(to_quantity(row['quantity']), wheelbarrows_per_unit)
+            sand['quantity_with_wastage'] += apply_rate(to_quantity(row['quantity_with_wastage']), wheelbarrows_per_unit)
+            sand_units.append(row['rollup_unit'])
+            continue
+        items.append({
+            'material': row['material_name'],
+            'unit': unit,
+            'quantity': from_quantity(to_quantity(row['quantity']), 2),
+            'quantity_with_wastage': from_quantity(to_quantity(row['quantity_with_wastage']), 2),
+            'project_count': row['project_count'],
+        })
+
+    if sand is not None:
+        # Pick the delivery unit from the wastage total so both figures share it
+        _, unit = convert_wheelbarrows_to_best_unit(sand['quantity_with_wastage'])
+        unit_rate = 1 / SAND_UNIT_WHEELBARROWS[unit]
+        # A project can have sand in more than one unit, so the per-unit counts do not add up
+        sand_projects = (
+            _user_materials(user_id, statuses)
+            .filter(material_key='sand', rollup_unit__in=sand_units)
+            .values('project').distinct().count()
+        )
+        items.append({
+            'material': sand['material'],
+            'unit': unit,
+            'quantity': from_quantity(apply_rate(sand['quantity'], unit_rate), 2),
+            'quantity_with_wastage': from_quantity(apply_rate(sand['quantity_with_wastage'], unit_rate), 2),
+            'project_count': sand_projects,
+        })
+        items.sort(key=lambda item: (item['material'].lower(), item['unit']))
+
+    return {
+        'statuses': statuses,
+        'project_count': Project.objects.filter(user_id=user_id, status__in=statuses).count(),
+        'materials': items,
+    }
+
+
+def get_material_rollup(user_id, statuses=None):
+    """
+    Cached rollup for the user. Returns (rollup, from_cache).
+    """
+    statuses = sorted(set(statuses or DEFAULT_ROLLUP_STATUSES))
+    cache_key = f"material_rollup:{user_id}:{_rollup_version(user_id)}:{','.join(statuses)}"
+    rollup = cache.get(cache_key)
+    if rollup is not None:
+        return rollup, True
+    rollup = build_material_rollup(user_id, statuses)
+    cache.set(cache_key, rollup, ROLLUP_CACHE_TIMEOUT)
+    return rollup, False
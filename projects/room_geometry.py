@@ -0,0 +1,232 @@
+"""
+3D room geometry for the room viewer.
+
+Builds a glTF 2.0 (JSON, buffer embedded as a data URI) mesh of a rectangular
+room: the floor and the four walls, faces pointing into the room. The tiles
+are not modelled one by one; the texture coordinates are in tile repeats, so
+a single tile texture (tile plus one grout joint) on a repeating sampler draws
+the whole pattern. The pattern is laid out like tile_layout lays the real
+tiles (same orientation and starting offset), so the cut tiles the viewer
+shows at the edges are the ones the estimate counts.
+
+The mesh is always 20 vertices whatever the room and tile size, so generation
+time and memory do not grow with the room. Results are stored in
+default_storage under the SHA-256 of the inputs, and a repeated view with the
+same dimensions and tile is read back instead of being built again.
+
+Lengths are micrometres (see fixed_point); glTF positions are metres.
+"""
+
+import base64
+import hashlib
+import json
+import struct
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .fixed_point import LENGTH_SCALE
+from .tile_layout import layout_rectangle
+
+# Bump when the output changes, so stored files from older code are not served
+GEOMETRY_VERSION = 1
+GEOMETRY_STORAGE_DIR = 'room_geometry'
+
+MAX_ROOM_DIMENSION = 500 * LENGTH_SCALE   # 500 m
+MIN_TILE_SIZE = 10 * LENGTH_SCALE // 1000    # 10 mm
+MAX_TILE_SIZE = 3 * LENGTH_SCALE             # 3 m
+MAX_GROUT_JOINT = 50 * LENGTH_SCALE // 1000  # 50 mm
+
+# glTF constants
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+REPEAT = 10497
+LINEAR = 9729
+LINEAR_MIPMAP_LINEAR = 9987
+
+
+class RoomGeometryError(ValueError):
+    """The room or tile dimensions cannot be turned into a mesh."""
+
+
+def validate_geometry_inputs(length, breadth, height, tile_length=0, tile_width=0, joint=0):
+    """Raises RoomGeometryError for dimensions outside what the viewer supports (all micrometres)."""
+    for name, value in (('length', length), ('breadth', breadth)):
+        if not 0 < value <= MAX_ROOM_DIMENSION:
+            raise RoomGeometryError(f"Room {name} must be more than 0 and at most {MAX_ROOM_DIMENSION // LENGTH_SCALE} m.")
+    if not 0 <= height <= MAX_ROOM_DIMENSION:
+        raise RoomGeometryError(f"Room height must be between 0 and {MAX_ROOM_DIMENSION // LENGTH_SCALE} m.")
+    if tile_length or tile_width:
+        for name, value in (('tile length', tile_length), ('tile width', tile_width)):
+            if not MIN_TILE_SIZE <= value <= MAX_TILE_SIZE:
+                raise RoomGeometryError(f"The {name} must be between 10 mm and 3000 mm.")
+    if not 0 <= joint <= MAX_GROUT_JOINT:
+        raise RoomGeometryError("The grout joint must be between 0 and 50 mm.")
+
+
+def geometry_key(length, breadth, height, tile_length=0, tile_width=0, joint=0):
+    """Content address of a room mesh: SHA-256 of the inputs (micrometres) and GEOMETRY_VERSION."""
+    inputs = json.dumps([GEOMETRY_VERSION, length, breadth, height, tile_length, tile_width, joint], separators=(',', ':'))
+    return hashlib.sha256(inputs.encode('ascii')).hexdigest()
+
+
+def _surface_uv(width, height, tile_length, tile_width, joint):
+    """
+    Returns a function mapping a point (across, up) on a width x height surface
+    (micrometres) to texture coordinates in tile repeats, plus the layout used.
+    Without a tile size one repeat is one metre.
+    """
+    if not tile_length or not tile_width:
+        return (lambda across, up: (across / LENGTH_SCALE, up / LENGTH_SCALE)), None
+    layout = layout_rectangle(width, height, tile_length, tile_width, joint)
+    tile_x, tile_y = (tile_length, tile_width) if layout.orientation == 0 else (tile_width, tile_length)
+    pitch_x, pitch_y = tile_x + joint, tile_y + joint
+    return (lambda across, up: ((across + layout.offset_x) / pitch_x, (up + layout.offset_y) / pitch_y)), layout
+
+
+def _quad(corners, normal, size, tile_length, tile_width, joint):
+    """
+    Vertices and surface info for one rectangle. corners are the 3D points
+    (metres) at (0, 0), (width, 0), (width, height) and (0, height) of the
+    surface, counter-clockwise seen from the side the normal points to.
+    """
+    width, height = size
+    uv, layout = _surface_uv(width, height, tile_length, tile_width, joint)
+    surface_points = [(0, 0), (width, 0), (width, height), (0, height)]
+    vertices = [(corner, normal, uv(*point)) for corner, point in zip(corners, surface_points)]
+    info = {'width_m': width / LENGTH_SCALE, 'height_m': height / LENGTH_SCALE}
+    if layout:
+        info.update({'tiles': layout.tiles, 'cut_pieces': layout.cut_pieces, 'orientation': layout.orientation})
+    return vertices, info
+
+
+def room_surfaces(length, breadth, height, tile_length=0, tile_width=0, joint=0):
+    """
+    The floor and wall rectangles of the room, x along the length, z along the
+    breadth and y up (glTF is y-up), all facing into the room.
+    Returns {'floor': [(vertices, info)], 'walls': [(vertices, info), ...]}.
+    """
+    x, z, y = length / LENGTH_SCALE, breadth / LENGTH_SCALE, height / LENGTH_SCALE
+    tile = (tile_length, tile_width, joint)
+    surfaces = {
+        'floor': [_quad([(0, 0, z), (x, 0, z), (x, 0, 0), (0, 0, 0)], (0, 1, 0), (length, breadth), *tile)],
+        'walls': [],
+    }
+    if height > 0:
+        surfaces['walls'] = [
+            _quad([(0, 0, 0), (x, 0, 0), (x, y, 0), (0, y, 0)], (0, 0, 1), (length, height), *tile),    # back (z = 0)
+            _quad([(x, 0, z), (0, 0, z), (0, y, z), (x, y, z)], (0, 0, -1), (length, height), *tile),   # front (z = breadth)
+            _quad([(0, 0, z), (0, 0, 0), (0, y, 0), (0, y, z)], (1, 0, 0), (breadth, height), *tile),   # left (x = 0)
+            _quad([(x, 0, 0), (x, 0, z), (x, y, z), (x, y, 0)], (-1, 0, 0), (breadth, height), *tile),  # right (x = length)
+        ]
+    return surfaces
+
+
+def _pack(values, fmt):
+    return struct.pack(f'<{len(values)}{fmt}', *values)
+
+
+def build_room_gltf(length, breadth, height, tile_length=0, tile_width=0, joint=0):
+    """
+    glTF 2.0 document (a dict) for the room. One mesh with a 'floor' and a
+    'walls' primitive, each with its own material so the viewer can give them
+    different tiles. Tile sizes are kept in the materials' extras.
+    """
+    validate_geometry_inputs(length, breadth, height, tile_length, tile_width, joint)
+    surfaces = room_surfaces(length, breadth, height, tile_length, tile_width, joint)
+
+    buffer = bytearray()
+    buffer_views = []
+    accessors = []
+
+    def add_accessor(data, component_type, count, accessor_type, target, **extra):
+        # bufferView offsets must be 4-byte aligned
+        buffer.extend(b'\0' * (-len(buffer) % 4))
+        buffer_views.append({'buffer': 0, 'byteOffset': len(buffer), 'byteLength': len(data), 'target': target})
+        buffer.extend(data)
+        accessors.append({
+            'bufferView': len(buffer_views) - 1, 'componentType': component_type,
+            'count': count, 'type': accessor_type, **extra,
+        })
+        return len(accessors) - 1
+
+    materials = []
+    primitives = []
+    surface_info = {}
+    tile_extras = {}
+    if tile_length and tile_width:
+        tile_extras = {
+            'tile_length_mm': tile_length / 1000, 'tile_width_mm': tile_width / 1000, 'grout_joint_mm': joint / 1000,
+            # Share of a texture repeat taken by the joint, for drawing grout lines into the tile texture
+            'joint_fraction_u': joint / (tile_length + joint), 'joint_fraction_v': joint / (tile_width + joint),
+        }
+
+    for name, quads in surfaces.items():
+        if not quads:
+            continue
+        positions, normals, uvs, indices = [], [], [], []
+        for vertices, _ in quads:
+            base = len(positions) // 3
+            for position, normal, uv in vertices:
+                positions.extend(position)
+                normals.extend(normal)
+                uvs.extend(uv)
+            indices.extend([base, base + 1, base + 2, base, base + 2, base + 3])
+        count = len(positions) // 3
+        position_accessor = add_accessor(
+            _pack(positions, 'f'), FLOAT, count, 'VEC3', ARRAY_BUFFER,
+            min=[min(positions[axis::3]) for axis in range(3)],
+            max=[max(positions[axis::3]) for axis in range(3)],
+        )
+        normal_accessor = add_accessor(_pack(normals, 'f'), FLOAT, count, 'VEC3', ARRAY_BUFFER)
+        uv_accessor = add_accessor(_pack(uvs, 'f'), FLOAT, count, 'VEC2', ARRAY_BUFFER)
+        index_accessor = add_accessor(_pack(indices, 'H'), UNSIGNED_SHORT, len(indices), 'SCALAR', ELEMENT_ARRAY_BUFFER)
+
+        materials.append({
+            'name': name,
+            'pbrMetallicRoughness': {'baseColorFactor': [1, 1, 1, 1], 'metallicFactor': 0, 'roughnessFactor': 0.6},
+            'extras': tile_extras,
+        })
+        primitives.append({
+            'attributes': {'POSITION': position_accessor, 'NORMAL': normal_accessor, 'TEXCOORD_0': uv_accessor},
+            'indices': index_accessor,
+            'material': len(materials) - 1,
+        })
+        surface_info[name] = [info for _, info in quads]
+
+    return {
+        'asset': {'version': '2.0', 'generator': 'tilnet room_geometry'},
+        'scene': 0,
+        'scenes': [{'nodes': [0]}],
+        'nodes': [{'mesh': 0, 'name': 'room'}],
+        'meshes': [{'name': 'room', 'primitives': primitives}],
+        'materials': materials,
+        'samplers': [{'wrapS': REPEAT, 'wrapT': REPEAT, 'magFilter': LINEAR, 'minFilter': LINEAR_MIPMAP_LINEAR}],
+        'accessors': accessors,
+        'bufferViews': buffer_views,
+        'buffers': [{
+            'byteLength': len(buffer),
+            'uri': 'data:application/octet-stream;base64,' + base64.b64encode(bytes(buffer)).decode('ascii'),
+        }],
+        'extras': {'surfaces': surface_info, 'geometry_version': GEOMETRY_VERSION},
+    }
+
+
+def get_room_geometry(length, breadth, height, tile_length=0, tile_width=0, joint=0):
+    """
+    The room's glTF document as bytes, from storage when this geometry was
+    built before. Returns (gltf_bytes, key, from_cache).
+    """
+    validate_geometry_inputs(length, breadth, height, tile_length, tile_width, joint)
+    key = geometry_key(length, breadth, height, tile_length, tile_width, joint)
+    path = f"{GEOMETRY_STORAGE_DIR}/{key}.gltf"
+    if default_storage.exists(path):
+        with default_storage.open(path, 'rb') as stored:
+            return stored.read(), key, True
+
+    gltf = json.dumps(build_room_gltf(length, breadth, height, tile_length, tile_width, joint), separators=(',', ':')).encode('utf-8')
+    if not default_storage.exists(path):  # Another request may have stored it meanwhile; same content either way
+        default_storage.save(path, ContentFile(gltf))
+    return gltf, key, False
@@ -0,0 +1,181 @@
+"""
+Bulk room import for a project.
+
+Rows come either from a JSON list or from a CSV export of a spreadsheet (one
+room per line, header row required). Every row is validated with the same
+serializers the single-room endpoints use, then the rooms and their details
+are written with bulk_create and the project is recalculated once.
+"""
+
+import csv
+import decimal
+import io
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .fixed_point import LENGTH_FACTORS_TO_MICROMETRES, from_fixed, length_to_micrometres
+from .models import Room, TilingRoomDetails, PaintingRoomDetails
+from .serializers import RoomSerializer, TilingRoomDetailsSerializer, PaintingRoomDetailsSerializer
+from . import project_calculations
+
+MAX_BULK_ROOMS = 500
+
+ROOM_FIELDS = ['name', 'room_type', 'length', 'breadth', 'height', 'floor_outline', 'wall_heights', 'openings']
+DIMENSION_FIELDS = ['length', 'breadth', 'height']
+
+# project_type -> (details model, details serializer)
+ROOM_DETAILS_MAP = {
+    'tiling': (TilingRoomDetails, TilingRoomDetailsSerializer),
+    'painting': (PaintingRoomDetails, PaintingRoomDetailsSerializer),
+}
+
+
+class RoomImportError(Exception):
+    """The upload itself could not be read (as opposed to a bad row)."""
+
+
+def read_rooms_csv(uploaded_file):
+    """
+    Reads rooms from an uploaded CSV file. Column names are matched case-insensitively
+    and empty cells are left out, so optional fields can simply be left blank.
+    Comma, semicolon and tab separated exports are accepted.
+    """
+    raw = uploaded_file.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    if not text.strip():
+        raise RoomImportError("The uploaded file is empty.")
+
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    if not reader.fieldnames:
+        raise RoomImportError("The uploaded file has no header row.")
+
+    rows = []
+    for record in reader:
+        row = {}
+        for column, value in record.items():
+            if column is None:
+                continue  # Extra cells beyond the header
+            column = column.strip().lower().replace(' ', '_')
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ''):
+                row[column] = value
+        if row:
+            rows.append(row)
+    return rows
+
+
+def convert_dimensions(row, project_unit):
+    """
+    Converts length/breadth/height given in the row's own 'unit' to the project's
+    measurement unit, so a survey taken in feet can be imported into a metre project.
+    """
+    row_unit = (row.pop('unit', None) or project_unit or 'meters').lower()
+    project_unit = (project_unit or 'meters').lower()
+    if row_unit == project_unit:
+        return None
+    if row_unit not in LENGTH_FACTORS_TO_MICROMETRES:
+        return {'unit': [f"Unknown unit '{row_unit}'. Use one of: {', '.join(LENGTH_FACTORS_TO_MICROMETRES)}."]}
+
+    project_factor = LENGTH_FACTORS_TO_MICROMETRES.get(project_unit, LENGTH_FACTORS_TO_MICROMETRES['meters'])
+    errors = {}
+    for field in DIMENSION_FIELDS:
+        value = row.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            value = decimal.Decimal(str(value))
+        except decimal.InvalidOperation:
+            errors[field] = ["A valid number is required."]
+            continue
+        if not value.is_finite():
+            errors[field] = ["A valid number is required."]
+            continue
+        row[field] = str(from_fixed(length_to_micrometres(value, row_unit), project_factor, 2))
+    return errors or None
+
+
+def validate_room_rows(project, rows):
+    """
+    Validates every row in one pass.
+
+    Returns (valid_rows, errors) where valid_rows is a list of
+    (row_number, room_data, detail_data) and errors is a list of
+    {'row': row_number, 'errors': {...}}. Row numbers start at 1.
+    """
+    _, detail_serializer_class = ROOM_DETAILS_MAP.get(project.project_type, (None, None))
+    detail_data_key = f'{project.project_type}_details'
+    detail_fields = set(detail_serializer_class.Meta.fields) - {'id', 'room'} if detail_serializer_class else set()
+
+    valid_rows = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': row_number, 'errors': {'_detail': ["Each room must be an object."]}})
+            continue
+        row = dict(row)
+        row_errors = {}
+
+        unit_errors = convert_dimensions(row, project.measurement_unit)
+        if unit_errors:
+            row_errors.update(unit_errors)
+
+        # Details may be nested like the estimate payload ('tiling_details') or flat (CSV columns)
+        detail_data = row.pop(detail_data_key, None) or {}
+        for field in detail_fields:
+            if field in row:
+                detail_data.setdefault(field, row.pop(field))
+
+        room_serializer = RoomSerializer(data={field: row[field] for field in ROOM_FIELDS if field in row}, context={'project_instance': project})
+        if not room_serializer.is_valid():
+            row_errors.update(room_serializer.errors)
+
+        validated_details = {}
+        if detail_serializer_class:
+            detail_serializer = detail_serializer_class(data=detail_data)
+            if detail_serializer.is_valid():
+                validated_details = dict(detail_serializer.validated_data)
+            else:
+                row_errors.update(detail_serializer.errors)
+
+        if row_errors:
+            errors.append({'row': row_number, 'errors': row_errors})
+        else:
+            valid_rows.append((row_number, dict(room_serializer.validated_data), validated_details))
+    return valid_rows, errors
+
+
+@transaction.atomic
+def bulk_create_rooms(project, valid_rows):
+    """
+    Creates the rooms and their details with three queries (rooms, details, links)
+    instead of the per-room save/details/save sequence, then recalculates the project once.
+    """
+    rooms = Room.objects.bulk_create([
+        Room(project=project, **room_data) for _, room_data, _ in valid_rows
+    ])
+
+    details_model, _ = ROOM_DETAILS_MAP.get(project.project_type, (None, None))
+    if details_model:
+        room_content_type = ContentType.objects.get_for_model(Room)
+        details = details_model.objects.bulk_create([
+            details_model(room_content_type=room_content_type, room_object_id=room.pk, **detail_data)
+            for room, (_, _, detail_data) in zip(rooms, valid_rows)
+        ])
+        details_content_type = ContentType.objects.get_for_model(details_model)
+        for room, details_instance in zip(rooms, details):
+            room.details_content_type = details_content_type
+            room.details_object_id = details_instance.pk
+        Room.objects.bulk_update(rooms, ['details_content_type', 'details_object_id'])
+
+    project_calculations.calculate_project_totals(project.id)
+    return rooms
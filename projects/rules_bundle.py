@@ -0,0 +1,428 @@
+"""
+Offline rules bundle for client-side estimation.
+
+The coverage rates, wastage tiers, unit conversions and role coverage the
+server estimates with live in project_calculations, estimates.utils and the
+user's DynamicSetting. build_rules_bundle() compiles them into one compact
+JSON document, so a client can run the same calculations offline and only
+sync the results. RULES_BUNDLE.md (repository root) is the spec: what every
+table means and the order the steps are applied in.
+
+All numbers are integers in the fixed-point units of fixed_point (areas in
+square millimetres, lengths in micrometres, quantities in millionths, money
+in pesewas); exact rates are [numerator, denominator] pairs and every
+rounding is half to even. The bundle carries golden test vectors computed
+by the server's own functions; evaluate() is a reference implementation
+that uses nothing but the bundle, and check_rules_bundle runs it against
+the vectors.
+
+The bundle's "version" is the SHA-256 of its content, so it changes when a
+table, the user's settings or RULES_SCHEMA_VERSION change, and doubles as
+the ETag.
+"""
+
+import hashlib
+import json
+from fractions import Fraction
+from functools import lru_cache
+
+from estimates import utils as quick_estimate
+
+from . import project_calculations as calc
+from .fixed_point import (
+    AREA_SCALE, LENGTH_FACTORS_TO_MICROMETRES, LENGTH_SCALE, MONEY_SCALE, QUANTITY_SCALE,
+    rate, to_area, to_fixed,
+)
+
+# Bump when the meaning of a field changes (clients reject schemas they do not know)
+RULES_SCHEMA_VERSION = 2
+
+PER_PIECE = 'per_piece'
+
+
+def _fraction(value):
+    return [value.numerator, value.denominator]
+
+
+def _tiers(tiers):
+    return [[limit, percent] for limit, percent in tiers]
+
+
+def _coverage_rates():
+    rates = {}
+    for project_type, materials in calc.COVERAGE_RATES_PER_UNIT.items():
+        rates[project_type] = {
+            name: PER_PIECE if callable(value) else _fraction(value)
+            for name, value in materials.items()
+        }
+    return rates
+
+
+@lru_cache(maxsize=1)
+def rules_tables():
+    """The tables shared by every user (they only change with the code)."""
+    return {
+        'rounding': 'half_even',
+        'scales': {'money': MONEY_SCALE, 'length': LENGTH_SCALE, 'area': AREA_SCALE, 'quantity': QUANTITY_SCALE},
+        'units': dict(LENGTH_FACTORS_TO_MICROMETRES),
+        'project': {
+            'wastage_tiers': _tiers(calc.WASTAGE_TIERS),
+            'area_rounding_places': 2,
+            'material_wastage_tiers': [[limit, _tiers(tiers)] for limit, tiers in calc.MATERIAL_WASTAGE_TIERS],
+            'coverage_rates': _coverage_rates(),
+            'tile_materials': list(calc.TILE_MATERIAL_NAMES),
+            'sand_units': [
+                [name, _fraction(wheelbarrows)] for name, wheelbarrows in calc.SAND_UNIT_WHEELBARROWS.items()
+            ],
+            'grout_kg_per_bag': calc.GROUT_KG_PER_BAG,
+            'thick_mortar': {
+                'min_thickness': calc.THICK_MORTAR_MIN_THICKNESS,
+                'materials': list(calc.THICK_MORTAR_MATERIALS),
+                'uplift': _fraction(calc.THICK_MORTAR_UPLIFT),
+            },
+            'hours_per_workday': int(calc.HOURS_PER_WORKDAY),
+        },
+        'quick_estimate': {
+            'wastage_tiers': _tiers(quick_estimate.WASTAGE_TIERS),
+            'coverage_rates': {
+                project_type: {name: _fraction(rate(1, coverage)) for name, coverage in materials.items()}
+                for project_type, materials in quick_estimate.COVERAGE_AREAS.items()
+            },
+            'standard_floor_thickness': quick_estimate.STANDARD_FLOOR_THICKNESS,
+            'thickness_project_types': list(quick_estimate.THICKNESS_PROJECT_TYPES),
+            'thickness_materials': list(quick_estimate.THICKNESS_MATERIALS),
+        },
+    }
+
+
+def user_rules(user_settings):
+    """
+    The user's DynamicSetting as bundle fields: role coverage in square
+    millimetres per worker per day (their overrides on top of the defaults,
+    like calculate_default_worker_coverage), and the days settings.
+    """
+    overrides = user_settings.role_coverage_defaults or {}
+    roles = {}
+    for role in sorted(set(calc.HARDCODED_DEFAULT_ROLE_COVERAGE) | set(overrides)):
+        defaults = calc.HARDCODED_DEFAULT_ROLE_COVERAGE.get(role, calc.HARDCODED_DEFAULT_ROLE_COVERAGE['default'])
+        role_overrides = overrides.get(role) or {}
+        roles[role] = {
+            surface: to_area(role_overrides.get(surface, defaults.get(surface, 0)))
+            for surface in ('floor', 'wall')
+        }
+    return {
+        'roles': roles,
+        'additional_days': int(user_settings.default_additional_days or calc.DEFAULT_ADDITIONAL_DAYS or 0),
+        # With the crew schedule on, the server's days come from scheduling, which the bundle does not describe
+        'estimated_days_method': 'schedule' if user_settings.use_crew_schedule else 'coverage',
+    }
+
+
+# --- Golden test vectors ---
+
+ROOM_CASES = [
+    ('4', '3.5', '2.7', 'meters'),
+    ('2.345', '1.111', '2.4', 'meters'),
+    ('12', '10', '9', 'feet'),
+    ('150', '120', '0', 'inches'),
+    ('450', '380', '270', 'centimeters'),
+    ('0', '3', '3', 'meters'),
+]
+WASTAGE_CASES = [0, 20 * AREA_SCALE, 20 * AREA_SCALE + 1, 50 * AREA_SCALE, 75_500_000, 100 * AREA_SCALE, 100 * AREA_SCALE + 1, 10 ** 9]
+QUICK_WASTAGE_CASES = [0, 5 * AREA_SCALE - 1, 5 * AREA_SCALE, 20 * AREA_SCALE, 49_999_999, 99 * AREA_SCALE, 100 * AREA_SCALE]
+MATERIAL_CASES = [
+    # (material, project type, area m², project wastage %, mortar thickness mm, selected materials, layout tiles)
+    ('cement', 'tiling', '12.5', '3', '5', ['cement', 'sand'], 0),
+    ('cement', 'tiling', '12.5', '3', '5', ['cement', 'tile adhesive'], 0),
+    ('sand', 'tiling', '60', '5', '12', ['cement', 'sand'], 0),
+    ('sand', 'tiling', '2500', '5', '12', ['cement', 'sand'], 0),
+    ('sand', 'tiling', '0.4', '3', '5', ['sand'], 0),
+    ('chemical', 'tiling', '60', '10', '9.88', ['chemical'], 0),
+    ('tile cement', 'tiling', '250', '10', '5', ['tile cement'], 0),
+    ('grout', 'tiling', '87.3', '3', '5', ['grout'], 0),
+    ('tiles', 'tiling', '30', '5', '5', ['tiles'], 0),
+    ('tiles', 'tiling', '30', '5', '5', ['tiles'], 347),
+    ('pavement tiles', 'pavement', '300', '3', '5', ['pavement tiles'], 0),
+    ('rough sand', 'pavement', '300', '5', '10', ['rough sand'], 0),
+    ('blocks', 'mason', '41.25', '6', '5', ['blocks'], 0),
+    ('paint', 'painting', '80', '3', '5', ['paint'], 0),
+]
+DAYS_CASES = [
+    # (floor m², wall m², floor coverage m²/day, wall coverage m²/day, additional days)
+    ('120', '260', '60', '40', 0),
+    ('35.5', '0', '30', '20', 2),
+    ('0', '0', '30', '20', 1),
+    ('0.5', '0', '30', '0', 0),
+    ('80', '120', '0', '120', 0),
+]
+WORKER_COST_CASES = [
+    # (rate GHS, count, rate type, days, equipment GHS/day)
+    ('150', 2, 'daily', 7, '0'),
+    ('22.5', 3, 'hourly', 4, '35'),
+    ('0', 1, 'daily', 5, '20'),
+    ('100', 1, 'weekly', 5, '0'),
+]
+FINANCIAL_CASES = [
+    # (profit type, profit value GHS, total area m², workers' cost GHS)
+    ('fixed', '5000', '87.35', '3200'),
+    ('per_area', '35', '300', '6000'),
+    ('per_area', '12.5', '41.333', '100'),
+    ('fixed', '0', '20', '100'),
+    ('per_area', '35', '0', '10'),
+]
+QUICK_MATERIAL_CASES = [
+    # (project type, area m², floor thickness µm)
+    ('tiles', '30', quick_estimate.STANDARD_FLOOR_THICKNESS),
+    ('tiles', '4.2', 75_000),
+    ('pavement', '120', 0),
+    ('pavement', '120', 100_000),
+    ('carpentry', '18.5', quick_estimate.STANDARD_FLOOR_THICKNESS),
+    ('roofing', '40', quick_estimate.STANDARD_FLOOR_THICKNESS),
+]
+
+
+@lru_cache(maxsize=1)
+def golden_vectors():
+    """Inputs and the server's outputs for each rule, all in fixed-point integers."""
+    vectors = []
+
+    def add(rule, inputs, output):
+        vectors.append({'rule': rule, 'input': inputs, 'output': output})
+
+    for length, breadth, height, unit in ROOM_CASES:
+        add('room_areas', {'length': length, 'breadth': breadth, 'height': height, 'unit': unit},
+            list(calc.calculate_room_areas(length, breadth, height, unit)))
+    for area in WASTAGE_CASES:
+        add('wastage', {'area': area}, calc.get_wastage_percentage(area))
+    for name, project_type, area, wastage, thickness, selected, layout_tiles in MATERIAL_CASES:
+        inputs = {
+            'material': name, 'project_type': project_type, 'area': to_area(area),
+            'project_wastage': to_fixed(wastage, 100), 'mortar_thickness': to_fixed(thickness, 100),
+            'selected_materials': selected, 'layout_tiles': layout_tiles,
+        }
+        quantity, with_wastage, unit, percent = calc.calculate_material_quantities(
+            name, project_type, inputs['area'], inputs['project_wastage'], inputs['mortar_thickness'], selected, layout_tiles,
+        )
+        add('material_quantity', inputs, {'quantity': quantity, 'quantity_with_wastage': with_wastage, 'unit': unit, 'wastage_percentage': percent})
+    for floor, wall, floor_coverage, wall_coverage, additional in DAYS_CASES:
+        inputs = {
+            'floor_area': to_area(floor), 'wall_area': to_area(wall),
+            'floor_coverage': to_area(floor_coverage), 'wall_coverage': to_area(wall_coverage), 'additional_days': additional,
+        }
+        add('estimated_days', inputs, calc.calculate_estimated_days(
+            inputs['floor_area'], inputs['wall_area'], inputs['floor_coverage'], inputs['wall_coverage'], additional,
+        ))
+    for worker_rate, count, rate_type, days, equipment in WORKER_COST_CASES:
+        inputs = {'rate': to_fixed(worker_rate, MONEY_SCALE), 'count': count, 'rate_type': rate_type, 'days': days, 'equipment_per_day': to_fixed(equipment, MONEY_SCALE)}
+        add('worker_cost', inputs, calc.calculate_worker_cost(inputs['rate'], count, rate_type, days, inputs['equipment_per_day']))
+    for profit_type, profit_value, area, workers_cost in FINANCIAL_CASES:
+        inputs = {
+            'profit_type': profit_type, 'profit_value': to_fixed(profit_value, MONEY_SCALE),
+            'total_area': to_area(area), 'workers_cost': to_fixed(workers_cost, MONEY_SCALE),
+        }
+        labour, profit, cost_per_area = calc.calculate_financial_totals(
+            profit_type, inputs['profit_value'], inputs['total_area'], inputs['workers_cost'],
+        )
+        add('financial_totals', inputs, {'total_labour_cost': labour, 'profit': profit, 'cost_per_area': cost_per_area})
+    for area in QUICK_WASTAGE_CASES:
+        add('quick_wastage', {'area': area}, quick_estimate.calculate_wastage_percentage(area))
+    for project_type, area, thickness in QUICK_MATERIAL_CASES:
+        area = to_area(area)
+        wastage = quick_estimate.calculate_wastage_percentage(area)
+        materials = quick_estimate.calculate_materials(project_type, area, wastage, thickness)
+        add('quick_materials', {'project_type': project_type, 'area': area, 'wastage_percentage': wastage, 'floor_thickness': thickness},
+            {name: to_fixed(quantity, 100) for name, quantity in materials.items()})
+    return vectors
+
+
+def build_rules_bundle(user_settings):
+    """The rules bundle (a dict) for a user's DynamicSetting, with its content version."""
+    bundle = {
+        'schema': RULES_SCHEMA_VERSION,
+        **rules_tables(),
+        'settings': user_rules(user_settings),
+        'vectors': golden_vectors(),
+    }
+    content = json.dumps(bundle, sort_keys=True, separators=(',', ':'))
+    bundle['version'] = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    return bundle
+
+
+# --- Reference implementation (bundle data only) ---
+
+def _div_round(numerator, denominator):
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def _apply(value, *fractions):
+    numerator, denominator = value, 1
+    for fraction_numerator, fraction_denominator in fractions:
+        numerator *= fraction_numerator
+        denominator *= fraction_denominator
+    return _div_round(numerator, denominator)
+
+
+def _tier(tiers, value, strict=False):
+    for limit, result in tiers:
+        if limit is None or value < limit or (not strict and value == limit):
+            return result
+    return 0
+
+
+def _decimal_to_fixed(text, scale):
+    # Exact conversion of a decimal string (the inputs of the vectors)
+    value = Fraction(text) * scale
+    return _div_round(value.numerator, value.denominator)
+
+
+def _room_areas(bundle, inputs):
+    scale = bundle['scales']
+    factor = bundle['units'].get(inputs['unit'].lower(), scale['length'])
+    length, breadth, height = (_decimal_to_fixed(inputs[key], factor) for key in ('length', 'breadth', 'height'))
+    square = scale['length'] * scale['length'] // scale['area']
+    step = scale['area'] // 10 ** bundle['project']['area_rounding_places']
+    floor = wall = 0
+    if length > 0 and breadth > 0:
+        floor = length * breadth
+        if height > 0:
+            wall = (2 * length + 2 * breadth) * height
+
+    def stored(area, percent=0):
+        return _div_round(area * (100 + percent), 100 * square * step) * step
+
+    def with_wastage(area):
+        return stored(area, _tier(bundle['project']['wastage_tiers'], -(-area // square)))
+
+    total = floor + wall
+    return [stored(floor), stored(wall), stored(total), with_wastage(floor), with_wastage(wall), with_wastage(total)]
+
+
+def _material_quantity(bundle, inputs):
+    rules = bundle['project']
+    scale = bundle['scales']['quantity']
+    name, area = inputs['material'], inputs['area']
+    percent = _tier(_tier(rules['material_wastage_tiers'], inputs['project_wastage']), area)
+    result = {'quantity': 0, 'quantity_with_wastage': 0, 'unit': None, 'wastage_percentage': percent}
+    if name in rules['tile_materials'] and inputs['layout_tiles']:
+        pieces = inputs['layout_tiles'] * scale
+        return {**result, 'quantity': pieces, 'quantity_with_wastage': pieces, 'unit': 'pieces'}
+
+    rates = rules['coverage_rates'].get(inputs['project_type'], {})
+    if name == 'cement' and 'sand' not in inputs['selected_materials'] and 'tile adhesive' in inputs['selected_materials']:
+        coverage = rates.get('tile adhesive', [0, 1])
+    else:
+        coverage = rates.get(name, [0, 1])
+    if coverage == PER_PIECE:
+        coverage = [bundle['scales']['area'], area] if area else [0, 1]
+    quantity = _apply(area, coverage)
+    wastage = [100 + percent, 100]
+
+    if name == 'sand':
+        # Largest unit the quantity (in wheelbarrows) reaches; below one wheelbarrow, the smallest unit
+        units = rules['sand_units']
+        for unit, (wheelbarrows, per) in units:
+            if quantity * per >= wheelbarrows * scale or unit == units[-1][0]:
+                converted = _apply(quantity, [per, wheelbarrows])
+                break
+        step = scale // 100
+        converted = _div_round(converted, step) * step
+        return {**result, 'quantity': converted, 'quantity_with_wastage': _apply(converted, wastage), 'unit': unit}
+    if name == 'grout':
+        bags = _div_round(quantity, rules['grout_kg_per_bag'] * scale) * scale
+        return {**result, 'quantity': bags, 'quantity_with_wastage': _apply(bags, wastage), 'unit': 'bags'}
+
+    mortar = rules['thick_mortar']
+    if inputs['mortar_thickness'] >= mortar['min_thickness'] and name in mortar['materials']:
+        with_wastage = _apply(area, coverage, wastage, mortar['uplift'])
+    else:
+        with_wastage = _apply(area, coverage, wastage)
+    return {**result, 'quantity': quantity, 'quantity_with_wastage': with_wastage}
+
+
+def _estimated_days(bundle, inputs):
+    numerator, denominator = 0, 1
+    if inputs['floor_area'] > 0 and inputs['floor_coverage'] > 0:
+        numerator, denominator = inputs['floor_area'], inputs['floor_coverage']
+    if inputs['wall_area'] > 0 and inputs['wall_coverage'] > 0:
+        numerator = numerator * inputs['wall_coverage'] + inputs['wall_area'] * denominator
+        denominator *= inputs['wall_coverage']
+    days = inputs['additional_days']
+    if numerator > 0:
+        days = max(1, days - (-numerator // denominator))
+    return days
+
+
+def _worker_cost(bundle, inputs):
+    cost = 0
+    days = inputs['days']
+    if inputs['count'] > 0 and inputs['rate'] > 0 and days > 0:
+        if inputs['rate_type'] == 'daily':
+            cost = inputs['rate'] * inputs['count'] * days
+        elif inputs['rate_type'] == 'hourly':
+            cost = inputs['rate'] * inputs['count'] * days * bundle['project']['hours_per_workday']
+    if inputs['equipment_per_day'] > 0 and days > 0:
+        cost += inputs['equipment_per_day'] * days
+    return cost
+
+
+def _financial_totals(bundle, inputs):
+    area_scale = bundle['scales']['area']
+    profit_type, profit_value, area, workers_cost = (
+        inputs['profit_type'], inputs['profit_value'], inputs['total_area'], inputs['workers_cost'],
+    )
+    labour = profit = 0
+    if profit_value > 0:
+        if profit_type == 'fixed':
+            labour, profit = profit_value, profit_value - workers_cost
+        elif profit_type == 'per_area' and area > 0:
+            labour = _div_round(profit_value * area, area_scale)
+            profit = _div_round(profit_value * area - workers_cost * area_scale, area_scale)
+    cost_per_area = 0
+    if area > 0:
+        cost_per_area = _div_round(labour * area_scale, area) if profit_type == 'fixed' else profit_value
+    return {'total_labour_cost': labour, 'profit': profit, 'cost_per_area': cost_per_area}
+
+
+def _quick_materials(bundle, inputs):
+    rules = bundle['quick_estimate']
+    scale = bundle['scales']['quantity']
+    thickness = inputs['floor_thickness']
+    materials = {}
+    for name, coverage in rules['coverage_rates'].get(inputs['project_type'], {}).items():
+        rates = [coverage, [100 + inputs['wastage_percentage'], 100]]
+        if inputs['project_type'] in rules['thickness_project_types'] and name in rules['thickness_materials'] and thickness:
+            rates.append([thickness, rules['standard_floor_thickness']])
+        materials[name] = _div_round(_apply(inputs['area'], *rates) * 100, scale)
+    return materials
+
+
+RULES = {
+    'room_areas': _room_areas,
+    'wastage': lambda bundle, inputs: _tier(bundle['project']['wastage_tiers'], inputs['area']),
+    'material_quantity': _material_quantity,
+    'estimated_days': _estimated_days,
+    'worker_cost': _worker_cost,
+    'financial_totals': _financial_totals,
+    'quick_wastage': lambda bundle, inputs: _tier(bundle['quick_estimate']['wastage_tiers'], inputs['area'], strict=True),
+    'quick_materials': _quick_materials,
+}
+
+
+def evaluate(bundle, rule, inputs):
+    """Computes a rule from the bundle alone, as RULES_BUNDLE.md specifies it."""
+    return RULES[rule](bundle, inputs)
+
+
+def check_vectors(bundle):
+    """The vectors evaluate() does not reproduce, as (vector, result) pairs."""
+    # Round trip through JSON so the check sees what a client receives
+    bundle = json.loads(json.dumps(bundle))
+    failures = []
+    for vector in bundle['vectors']:
+        result = evaluate(bundle, vector['rule'], vector['input'])
+        if result != vector['output']:
+            failures.append((vector, result))
+    return failures
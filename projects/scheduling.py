@@ -0,0 +1,349 @@
+"""
+Crew scheduling for a project.
+
+calculate_estimated_days assumes every worker helps with all the floor work
+and then all the wall work. Here the work is split into tasks per room with
+dependencies (screed before floor tiles, tiles before grout, one paint coat
+after another), and the individual workers are scheduled onto them:
+
+- critical path: the longest dependency chain when every capable worker
+  could help on every task at once. No schedule can beat it, nor the total
+  work over the whole crew.
+- schedule: list scheduling, the workers as the limited resource. Whenever a
+  worker is free they start the ready task with the longest chain still
+  behind it; with nothing left to start they join the running task that will
+  take longest. Workers stay on a task until it is done.
+
+Areas are square millimetres and daily coverage square millimetres per day
+(see fixed_point); times come back as Fractions of a day.
+"""
+
+import heapq
+from collections import namedtuple
+from fractions import Fraction
+
+from .fixed_point import AREA_SCALE, ceil_div, from_fixed, from_pesewas, to_area, to_pesewas
+from .models import PaintingRoomDetails
+
+DEFAULT_PAINT_COATS = 2
+
+# How much faster than laying tiles (the role's floor/wall coverage) each task goes
+SCREED_SPEED = 2
+GROUT_SPEED = 4
+
+# Schedule clock: seconds of an eight-hour working day. Each task's finish is
+# rounded up to the next tick, so times are exact to well under a minute.
+TICKS_PER_DAY = 8 * 60 * 60
+
+FLOOR = 'floor'
+WALL = 'wall'
+
+ScheduleTask = namedtuple('ScheduleTask', ['key', 'room', 'name', 'surface', 'area', 'speed', 'depends_on'])
+ScheduleUnit = namedtuple('ScheduleUnit', ['group', 'floor', 'wall'])  # One worker; coverage per day
+
+
+def room_tasks(project_type, room_key, floor_area, wall_area, paint_coats=None):
+    """The tasks for one room. Keys are (room_key, task name)."""
+    def key(name):
+        return (room_key, name)
+
+    tasks = []
+    if project_type == 'tiling':
+        if floor_area > 0:
+            tasks.append(ScheduleTask(key('screed'), room_key, 'screed', FLOOR, floor_area, SCREED_SPEED, ()))
+        if wall_area > 0:
+            tasks.append(ScheduleTask(key('wall tiling'), room_key, 'wall tiling', WALL, wall_area, 1, ()))
+        if floor_area > 0:
+            # Walls first, so the new floor is not walked on and splashed
+            depends_on = (key('screed'),) + ((key('wall tiling'),) if wall_area > 0 else ())
+            tasks.append(ScheduleTask(key('floor tiling'), room_key, 'floor tiling', FLOOR, floor_area, 1, depends_on))
+        if floor_area + wall_area > 0:
+            depends_on = tuple(task.key for task in tasks if task.name in ('floor tiling', 'wall tiling'))
+            tasks.append(ScheduleTask(key('grouting'), room_key, 'grouting', FLOOR, floor_area + wall_area, GROUT_SPEED, depends_on))
+    elif project_type == 'painting':
+        if wall_area > 0:
+            previous = ()
+            for coat in range(1, (paint_coats or DEFAULT_PAINT_COATS) + 1):
+                name = f'coat {coat}'
+                tasks.append(ScheduleTask(key(name), room_key, name, WALL, wall_area, 1, previous))
+                previous = (key(name),)
+    else:
+        if floor_area > 0:
+            tasks.append(ScheduleTask(key('floor work'), room_key, 'floor work', FLOOR, floor_area, 1, ()))
+        if wall_area > 0:
+            tasks.append(ScheduleTask(key('wall work'), room_key, 'wall work', WALL, wall_area, 1, ()))
+    return tasks
+
+
+def _covers(load, unit_rates, ticks):
+    """Whether the workers can clear both loads in `ticks`, the best at floors taking the floors."""
+    floor_needed = load[FLOOR]
+    wall_capacity = 0
+    for rates in unit_rates:
+        floor_capacity = rates[FLOOR] * ticks
+        if floor_needed <= 0:
+            wall_capacity += rates[WALL] * ticks
+        elif floor_capacity <= floor_needed:
+            floor_needed -= floor_capacity
+        else:
+            wall_capacity += rates[WALL] * (floor_capacity - floor_needed) / rates[FLOOR]
+            floor_needed = 0
+    return floor_needed <= 0 and wall_capacity >= load[WALL]
+
+
+def _load_bound(load, unit_rates, crew_rate):
+    """Fewest ticks in which the crew could clear the floor and wall loads, ignoring dependencies."""
+    if not load[FLOOR] and not load[WALL]:
+        return 0
+    unit_rates = sorted(
+        (rates for rates in unit_rates if rates[FLOOR] or rates[WALL]),
+        key=lambda rates: Fraction(rates[FLOOR], rates[WALL]) if rates[WALL] else float('inf'),
+        reverse=True,
+    )
+    # Everyone on the floors and then everyone on the walls always works
+    low = 0
+    high = sum(ceil_div(load[surface].numerator, load[surface].denominator * crew_rate[surface])
+               for surface in (FLOOR, WALL) if load[surface])
+    while low < high:
+        middle = (low + high) // 2
+        if _covers(load, unit_rates, middle):
+            high = middle
+        else:
+            low = middle + 1
+    return high
+
+
+def schedule_tasks(tasks, units):
+    """
+    Schedules tasks onto worker units.
+
+    tasks is a list of ScheduleTask, units a list of ScheduleUnit. Returns a dict:
+    'makespan', 'critical_path' and 'lower_bound' (Fractions of a day; the bound is
+    the larger of the critical path and the total work over the crew),
+    'tasks' {key: (start, end)}, 'busy' [busy days per unit] and 'unstaffed'
+    [keys of tasks nobody can do].
+    """
+    index = {task.key: position for position, task in enumerate(tasks)}
+    successors = [[] for _ in tasks]
+    waiting_on = [0] * len(tasks)
+    for position, task in enumerate(tasks):
+        for dependency in task.depends_on:
+            if dependency in index:
+                successors[index[dependency]].append(position)
+                waiting_on[position] += 1
+
+    # Work is area * TICKS_PER_DAY, so a rate in area per day clears it in whole ticks
+    work = [task.area * TICKS_PER_DAY for task in tasks]
+    unit_rates = [{FLOOR: unit.floor, WALL: unit.wall} for unit in units]
+
+    # Unconstrained durations: every capable worker on the task
+    crew_rate = {surface: sum(rates[surface] for rates in unit_rates) for surface in (FLOOR, WALL)}
+    durations = []
+    unstaffed = set()
+    for position, task in enumerate(tasks):
+        rate = crew_rate[task.surface] * task.speed
+        if rate > 0:
+            durations.append(ceil_div(work[position], rate))
+        else:
+            durations.append(0)
+            unstaffed.add(position)
+
+    # Topological order, then the longest chain from each task to the end
+    order = []
+    pending = list(waiting_on)
+    stack = [position for position in range(len(tasks)) if not pending[position]]
+    while stack:
+        position = stack.pop()
+        order.append(position)
+        for successor in successors[position]:
+            pending[successor] -= 1
+            if not pending[successor]:
+                stack.append(successor)
+    if len(order) != len(tasks):
+        raise ValueError("Task dependencies form a cycle.")
+    tail = [0] * len(tasks)
+    for position in reversed(order):
+        tail[position] = durations[position] + max((tail[successor] for successor in successors[position]), default=0)
+    critical_path = max(tail, default=0)
+
+    # Nor can it beat the total work for the crew: the shortest time in which
+    # the workers, splitting their days between floor and wall, cover both loads
+    load = {FLOOR: 0, WALL: 0}
+    for position, task in enumerate(tasks):
+        if position not in unstaffed:
+            load[task.surface] += Fraction(work[position], task.speed)
+    lower_bound = max(critical_path, _load_bound(load, unit_rates, crew_rate))
+
+    # --- List scheduling ---
+    now = 0
+    remaining = list(work)
+    crews = [[] for _ in tasks]
+    rates = [0] * len(tasks)
+    started = {}
+    times = {}
+    busy = [0] * len(units)
+    ready = {FLOOR: [], WALL: []}
+    active = set()
+    idle = set(range(len(units)))
+
+    def release(position):
+        if position in unstaffed:
+            # Nobody can do it: it is skipped and does not hold up what follows
+            times[tasks[position].key] = (now, now)
+            finish(position)
+        else:
+            heapq.heappush(ready[tasks[position].surface], (-tail[position], position))
+
+    def finish(position):
+        for successor in successors[position]:
+            waiting_on[successor] -= 1
+            if not waiting_on[successor]:
+                release(successor)
+
+    for position in range(len(tasks)):
+        if not waiting_on[position]:
+            release(position)
+
+    while True:
+        # Start ready tasks, most urgent first, each with the free worker best at it
+        while idle:
+            choices = [(heap[0], surface) for surface, heap in ready.items()
+                       if heap and any(unit_rates[unit][surface] for unit in idle)]
+            if not choices:
+                break
+            (_, position), surface = min(choices)
+            heapq.heappop(ready[surface])
+            unit = max((unit for unit in idle if unit_rates[unit][surface]), key=lambda unit: (unit_rates[unit][surface], -unit))
+            idle.discard(unit)
+            crews[position].append(unit)
+            rates[position] = unit_rates[unit][surface] * tasks[position].speed
+            active.add(position)
+            started[position] = now
+
+        # Nothing left to start: free workers help on the longest running task they can do
+        for unit in sorted(idle):
+            helpable = [position for position in active if unit_rates[unit][tasks[position].surface]]
+            if not helpable:
+                continue
+            position = max(helpable, key=lambda position: (remaining[position] * TICKS_PER_DAY // rates[position], -position))
+            idle.discard(unit)
+            crews[position].append(unit)
+            rates[position] += unit_rates[unit][tasks[position].surface] * tasks[position].speed
+
+        if not active:
+            break
+
+        step = min(ceil_div(remaining[position], rates[position]) for position in active)
+        now += step
+        finished = []
+        for position in active:
+            remaining[position] -= rates[position] * step
+            for unit in crews[position]:
+                busy[unit] += step
+            if remaining[position] <= 0:
+                finished.append(position)
+        for position in sorted(finished, key=lambda position: (-tail[position], position)):
+            active.discard(position)
+            idle.update(crews[position])
+            crews[position] = []
+            rates[position] = 0
+            times[tasks[position].key] = (started[position], now)
+            finish(position)
+
+    def days(ticks):
+        return Fraction(ticks, TICKS_PER_DAY)
+
+    return {
+        'makespan': days(now),
+        'critical_path': days(critical_path),
+        'lower_bound': days(lower_bound),
+        'tasks': {key: (days(start), days(end)) for key, (start, end) in times.items()},
+        'busy': [days(ticks) for ticks in busy],
+        'unstaffed': [tasks[position].key for position in sorted(unstaffed)],
+    }
+
+
+def _days(value):
+    """Fraction of a day to a Decimal with two places."""
+    return from_fixed(ceil_div(value.numerator * 100, value.denominator), 100, 2)
+
+
+def build_project_schedule(project_instance):
+    """
+    Schedule for a saved project, from its rooms, workers and the user's role
+    coverage defaults. Returns a dict ready for the API.
+    """
+    # Imported here: project_calculations uses this module for estimated days
+    from .project_calculations import (
+        calculate_default_worker_coverage, calculate_worker_cost, get_dynamic_settings,
+    )
+
+    project_type = project_instance.project_type
+    rooms = list(project_instance.rooms.all())
+    tasks = []
+    for room in rooms:
+        paint_coats = None
+        if project_type == 'painting' and isinstance(room.details, PaintingRoomDetails):
+            paint_coats = room.details.num_paint_coats
+        tasks.extend(room_tasks(project_type, room.id, to_area(room.floor_area), to_area(room.wall_area), paint_coats))
+
+    workers = [worker for worker in project_instance.workers.all() if (worker.count or 0) > 0]
+    units = []
+    for worker in workers:
+        floor, wall = calculate_default_worker_coverage(project_instance.user, worker.role, project_type)
+        units.extend(ScheduleUnit(worker.id, floor, wall) for _ in range(worker.count))
+
+    result = schedule_tasks(tasks, units)
+
+    user_settings = get_dynamic_settings(project_instance.user)
+    additional_days = int(user_settings.default_additional_days or 0)
+    scheduled_days = additional_days
+    if result['makespan'] > 0:
+        scheduled_days = max(1, additional_days + ceil_div(result['makespan'].numerator, result['makespan'].denominator))
+
+    busy_by_worker = {}
+    for unit, busy in zip(units, result['busy']):
+        busy_by_worker[unit.group] = busy_by_worker.get(unit.group, 0) + busy
+    roles = []
+    for worker in workers:
+        cost = calculate_worker_cost(
+            to_pesewas(worker.rate), worker.count, worker.rate_type, scheduled_days,
+            to_pesewas(worker.special_equipment_cost_per_day),
+        )
+        paid_days = worker.count * scheduled_days
+        busy = busy_by_worker.get(worker.id, Fraction(0))
+        utilization = busy / paid_days if paid_days else Fraction(0)
+        roles.append({
+            'worker_id': worker.id,
+            'role': worker.role,
+            'count': worker.count,
+            'busy_days': _days(busy),
+            'utilization_percentage': _days(utilization * 100),
+            'cost': from_pesewas(cost),
+            'idle_cost': from_pesewas(cost - (cost * utilization.numerator) // utilization.denominator),
+        })
+
+    room_names = {room.id: room.name for room in rooms}
+    task_rows = []
+    for task in tasks:
+        start, end = result['tasks'].get(task.key, (None, None))
+        task_rows.append({
+            'room_id': task.room,
+            'room': room_names.get(task.room),
+            'task': task.name,
+            'area': from_fixed(task.area, AREA_SCALE, 2),
+            'start_day': _days(start) if start is not None else None,
+            'end_day': _days(end) if end is not None else None,
+            'unstaffed': task.key in result['unstaffed'],
+        })
+    task_rows.sort(key=lambda row: (row['start_day'] is None, row['start_day'] or 0, row['room'] or ''))
+
+    return {
+        'critical_path_days': _days(result['critical_path']),
+        'lower_bound_days': _days(result['lower_bound']),
+        'schedule_days': _days(result['makespan']),
+        'estimated_days': scheduled_days,
+        'additional_days': additional_days,
+        'roles': roles,
+        'tasks': task_rows,
+    }
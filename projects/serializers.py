@@ -1,3 +1,5 @@
+import json
+
 from django.forms import ValidationError
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
@@ -11,6 +13,7 @@ User = get_user_model()
 from .models import (
     Unit, Material, DynamicSetting, Project, Room, TilingRoomDetails, PaintingRoomDetails, ProjectMaterial, Worker, Tile
 )
+from .floor_plan import FloorPlanError, has_floor_plan, validate_floor_plan
 
 # Helper function to print serializer errors
 def print_serializer_errors(serializer_name, errors):
@@ -54,6 +57,9 @@ class TilingRoomDetailsSerializer(serializers.ModelSerializer):
             'landing_breadth',
             'number_of_landings',
             'has_metal_strip',
+            'tile_length',
+            'tile_width',
+            'grout_joint',
         ]
         read_only_fields = [
             'id',
@@ -101,15 +107,36 @@ class RoomSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'project', 'name', 'room_type',
             'length', 'breadth', 'height',
+            'floor_outline', 'wall_heights', 'openings',
             'floor_area', 'wall_area', 'total_area',
             'floor_area_with_waste', 'wall_area_with_waste', 'total_area_with_waste',
+            'tile_count', 'perimeter',
             'details_data',
         ]
         read_only_fields = [
             'floor_area', 'wall_area', 'total_area',
             'floor_area_with_waste', 'wall_area_with_waste', 'total_area_with_waste',
+            'tile_count', 'perimeter',
         ]
 
+    def validate(self, data):
+        """Checks the outline, wall heights and openings together with the dimensions (see floor_plan)."""
+        plan_fields = ['length', 'breadth', 'height', 'floor_outline', 'wall_heights', 'openings']
+        if not any(field in data for field in plan_fields[3:]) and not (self.instance and has_floor_plan(self.instance)):
+            return data
+        values = {field: data.get(field, getattr(self.instance, field, None)) for field in plan_fields}
+        project_instance = self.context.get('project_instance') or getattr(self.instance, 'project', None)
+        unit = getattr(project_instance, 'measurement_unit', None) or 'meters'
+        try:
+            validate_floor_plan(unit=unit, **values)
+        except FloorPlanError as e:
+            raise serializers.ValidationError(str(e))
+        # Stored parsed, so CSV/form text is kept as JSON rather than a string
+        for field in plan_fields[3:]:
+            if isinstance(data.get(field), str):
+                data[field] = json.loads(data[field]) if data[field] else ([] if field == 'openings' else None)
+        return data
+
     def get_details_data(self, obj):
         if obj.details:
             if isinstance(obj.details, TilingRoomDetails):
@@ -298,7 +325,7 @@ class TileSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tile
         fields = '__all__'
-        read_only_fields = ['uploaded_at']
+        read_only_fields = ['user', 'uploaded_at']
 
 class ProjectStatusSerializer(serializers.ModelSerializer):
     class Meta:
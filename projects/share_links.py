@@ -0,0 +1,143 @@
+"""
+Share links for estimates.
+
+A contractor shares a project estimate or a manual estimate with a client as
+a link instead of a base64 PDF. Sharing renders the estimate once into an
+HTML and a PDF snapshot stored in default_storage under the SHA-256 of the
+estimate's data (its "version"), so sharing the same unchanged estimate again
+reuses the stored files and any change gives a new snapshot; a snapshot is
+never rewritten.
+
+The link is a signed token (django.core.signing) carrying the snapshot key
+and the expiry time, so opening it checks the signature and reads the file:
+no database query and no rendering. The files are immutable, so they are
+served with an ETag and long cache headers (up to the link's expiry).
+"""
+
+import datetime
+import decimal
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from . import pdf_context
+from .models import Project
+
+# Bump when the templates or the context change, so older snapshots are not reused
+SNAPSHOT_VERSION = 2
+SNAPSHOT_STORAGE_DIR = 'share_snapshots'
+SHARE_LINK_SALT = 'projects.share_links'
+
+DEFAULT_SHARE_DAYS = 14
+MAX_SHARE_DAYS = 90
+MAX_CACHE_SECONDS = 365 * 24 * 60 * 60
+
+SNAPSHOT_KINDS = ('project', 'manual')
+SNAPSHOT_CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+class ShareLinkError(ValueError):
+    """The share link is invalid, tampered with or expired."""
+
+
+def snapshot_key(kind, version_data):
+    """Content address of a snapshot: SHA-256 of the estimate data and SNAPSHOT_VERSION."""
+    inputs = json.dumps([SNAPSHOT_VERSION, kind, version_data], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+def snapshot_path(key, extension):
+    return f"{SNAPSHOT_STORAGE_DIR}/{key[:2]}/{key}.{extension}"
+
+
+def store_snapshot(kind, version_data, render_html, base_url):
+    """
+    Stores the HTML and PDF snapshot for this version of an estimate unless
+    they exist already. render_html() is only called when they do not.
+    Returns (key, created).
+    """
+    key = snapshot_key(kind, version_data)
+    html_path, pdf_path = snapshot_path(key, 'html'), snapshot_path(key, 'pdf')
+    # The HTML is saved last, so it marks a complete snapshot
+    if default_storage.exists(html_path):
+        return key, False
+
+    from . import pdf_pool  # pdf_pool imports pdf_jobs, which imports this module
+
+    html_string = render_html()
+    if not default_storage.exists(pdf_path):
+        default_storage.save(pdf_path, ContentFile(pdf_pool.render_html(html_string, base_url)))
+    if not default_storage.exists(html_path):  # Another request may have stored it meanwhile; same content either way
+        default_storage.save(html_path, ContentFile(html_string.encode('utf-8')))
+    return key, True
+
+
+def project_snapshot(project_id, user, base_url):
+    """Stores (or finds) the snapshot of the user's project estimate. Returns (key, created)."""
+    project_data = pdf_context.project_estimate_data(project_id, user)
+    transport = Project.objects.filter(pk=project_id).values_list('transport', flat=True).get()
+    transport = decimal.Decimal(str(transport or '0'))
+    version_data = {'project': project_id, 'data': project_data, 'transport': transport}
+
+    def render_html():
+        return render_to_string('pdf_template.html', pdf_context.project_estimate_context(project_data, base_url, transport=transport))
+
+    return store_snapshot('project', version_data, render_html, base_url)
+
+
+def sign_share_link(kind, key, expires_in_days=DEFAULT_SHARE_DAYS):
+    """Signed token for a snapshot. Returns (token, expires_at)."""
+    expires_at = int(time.time()) + int(expires_in_days * 24 * 60 * 60)
+    token = signing.dumps({'k': kind, 's': key, 'e': expires_at}, salt=SHARE_LINK_SALT, compress=True)
+    return token, datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc)
+
+
+def read_share_link(token):
+    """The (kind, key, expires_at) a share link points to; raises ShareLinkError when invalid or expired."""
+    try:
+        payload = signing.loads(token, salt=SHARE_LINK_SALT)
+        kind, key, expires_at = payload['k'], payload['s'], int(payload['e'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise ShareLinkError("This share link is not valid.")
+    if kind not in SNAPSHOT_KINDS or len(key) != 64:
+        raise ShareLinkError("This share link is not valid.")
+    if expires_at <= time.time():
+        raise ShareLinkError("This share link has expired.")
+    return kind, key, expires_at
+
+
+def parse_share_days(value):
+    """Link lifetime in days from the request (default DEFAULT_SHARE_DAYS); raises ShareLinkError."""
+    if value in (None, ''):
+        return DEFAULT_SHARE_DAYS
+    try:
+        days = float(value)
+    except (TypeError, ValueError):
+        raise ShareLinkError("expires_in_days must be a number.")
+    if not 0 < days <= MAX_SHARE_DAYS:
+        raise ShareLinkError(f"expires_in_days must be more than 0 and at most {MAX_SHARE_DAYS}.")
+    return days
+
+
+def share_link_response(request, kind, key, created, expires_in_days):
+    """Signs a link to the snapshot and returns the body of the share endpoints' response."""
+    token, expires_at = sign_share_link(kind, key, expires_in_days)
+    return {
+        'token': token,
+        'snapshot': key,
+        'snapshot_created': created,
+        'expires_at': expires_at,
+        'html_url': request.build_absolute_uri(reverse('shared-estimate', args=[token])),
+        'pdf_url': request.build_absolute_uri(reverse('shared-estimate-pdf', args=[token])),
+    }
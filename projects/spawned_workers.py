@@ -0,0 +1,24 @@
+"""
+Set-up for worker processes started with the spawn method (see
+recalculate_projects). A spawned process starts from a fresh interpreter, so
+Django has to be set up before anything that imports models, and it opens
+its own database connections instead of inheriting the parent's.
+
+This module imports nothing from the apps: the pool unpickles its
+initializer before Django is ready.
+"""
+
+
+def setup_django(database_name=None):
+    """
+    Process pool initializer. database_name is the parent's default database
+    name, which differs from the settings under the test runner.
+    """
+    import django
+    from django.apps import apps
+    from django.conf import settings
+
+    if database_name:
+        settings.DATABASES['default']['NAME'] = database_name
+    if not apps.ready:
+        django.setup()
@@ -0,0 +1,249 @@
+import datetime
+import decimal
+import io
+import random
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounts.models import UserProfile
+
+from . import image_pipeline, pdf_context, rollup
+from .fixed_point import from_area
+from .management.commands import recalculate_projects
+from .management.commands.benchmark_calculations import (
+    compare_case, fixed_manual, fixed_project, random_manual_case, random_project_case,
+    ref_area_with_wastage, reference_manual, reference_project, stored_reference_value,
+)
+from .management.commands.compare_pdf_backends import (
+    A4_CSS_PX, BASE_URL, canvas_words, first_difference, template_words, weasyprint_pages,
+)
+from .models import Material, ProcessedImage, Project, ProjectMaterial, RecalculationRun, Room, Tile
+from .project_calculations import (
+    CONVERSION_FACTORS_TO_METERS, QUANTITY_SCALE, calculate_material_quantities,
+    calculate_project_material_item_totals_and_save, calculate_room_areas, to_area,
+)
+from .tile_layout import _axis_profile, layout_rectangle
+
+D = decimal.Decimal
+
+try:
+    import weasyprint
+except (ImportError, OSError):  # Not installed, or its system libraries (Pango) are missing
+    weasyprint = None
+
+SEED = 20261019
+CASES = 500
+
+
+class FixedPointParityTests(SimpleTestCase):
+    """The fixed-point calculations store what the Decimal ones did (see benchmark_calculations)."""
+
+    def test_room_area_is_rounded_once(self):
+        # 0.64 x 12.11 inches is 0.0050002489 m²: 0.01 m², not 5000 mm² and then 0.00
+        floor, wall, total, floor_with_waste = calculate_room_areas('0.64', '12.11', '0', 'inches')[:4]
+        self.assertEqual(from_area(floor, 2), D('0.01'))
+        self.assertEqual((wall, total), (0, floor))
+        self.assertEqual(from_area(floor_with_waste, 2), D('0.01'))
+
+    def test_room_areas_match_exact_decimal(self):
+        rng = random.Random(SEED)
+        for case in (random_project_case(rng) for _ in range(CASES)):
+            factor = CONVERSION_FACTORS_TO_METERS[case['unit']]
+            for length, breadth, height in case['rooms']:
+                floor = length * factor * breadth * factor
+                wall = (2 * length + 2 * breadth) * factor * height * factor
+                expected = [
+                    stored_reference_value(floor), stored_reference_value(wall), stored_reference_value(floor + wall),
+                    ref_area_with_wastage(floor), ref_area_with_wastage(wall), ref_area_with_wastage(floor + wall),
+                ]
+                actual = [from_area(area, 2) for area in calculate_room_areas(length, breadth, height, case['unit'])]
+                self.assertEqual(actual, expected, (case['unit'], length, breadth, height))
+
+    def test_matches_decimal_reference(self):
+        rng = random.Random(SEED)
+        for kind, make_case, reference, fixed in (
+            ('project', random_project_case, reference_project, fixed_project),
+            ('manual', random_manual_case, reference_manual, fixed_manual),
+        ):
+            for index in range(CASES):
+                case = make_case(rng)
+                _off_by_cent, failures = compare_case(kind, index, reference(case), fixed(case))
+                self.assertEqual(failures, [], case)
+
+
+class RecalculateProjectsTests(TransactionTestCase):
+    """recalculate_projects with more than one worker (committed data, so the workers see it)."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('0200000026', 'password', full_name='Recalculate')
+        for index in range(3):
+            project = Project.objects.create(user=user, name=f"Project {index}", project_type='tiling')
+            Room.objects.create(project=project, name='Room', length='4', breadth='3', height='2.5')
+
+    def test_two_workers(self):
+        # On SQLite the chunks run in this process; on Postgres in two spawned workers
+        call_command('recalculate_projects', workers=2, chunk_size=1, run_name='two-workers', stdout=io.StringIO())
+        run = RecalculationRun.objects.get(name='two-workers')
+        self.assertEqual((run.status, run.processed_count, run.failed_count), ('completed', 3, 0))
+        self.assertEqual(run.last_project_id, Project.objects.latest('pk').pk)
+        self.assertEqual(set(Room.objects.values_list('floor_area', flat=True)), {decimal.Decimal('12.00')})
+
+    def test_workers_are_spawned(self):
+        # A forked worker would inherit (and close) the parent's database connection
+        with recalculate_projects.make_executor(2) as executor:
+            self.assertEqual(executor._mp_context.get_start_method(), 'spawn')
+            diff = executor.submit(recalculate_projects._diff_snapshots, {'a': 1}, {'a': 2}).result(timeout=120)
+        self.assertEqual(diff, {'a': ('1', '2')})
+
+
+class MaterialRollupTests(TestCase):
+    """The portfolio rollup (see rollup)."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('0200000029', 'password', full_name='Rollup')
+        # The catalogue sand and the user's own, in different delivery units
+        sand = Material.objects.create(name='Sand', unit='wheelbarrow', default_unit_price='10.00')
+        own_sand = Material.objects.create(user=self.user, name='sand', unit='headpan', default_unit_price='1.00')
+        self.project = Project.objects.create(user=self.user, name='Both units', project_type='tiling')
+        other = Project.objects.create(user=self.user, name='Headpans', project_type='tiling')
+        for project, material, quantity in ((self.project, sand, '4'), (self.project, own_sand, '6'), (other, own_sand, '3')):
+            ProjectMaterial.objects.create(
+                project=project, material=material, name=material.name, unit=material.unit, quantity=quantity, quantity_with_wastage=quantity,
+            )
+
+    def test_sand_counts_each_project_once(self):
+        data, from_cache = rollup.get_material_rollup(self.user.pk)
+        self.assertEqual([(item['material'].lower(), item['project_count']) for item in data['materials']], [('sand', 2)])
+
+    def test_a_project_change_is_not_served_from_cache(self):
+        self.assertFalse(rollup.get_material_rollup(self.user.pk)[1])
+        self.assertTrue(rollup.get_material_rollup(self.user.pk)[1])
+        self.project.status = 'completed'
+        self.project.save()
+        data, from_cache = rollup.get_material_rollup(self.user.pk)
+        self.assertFalse(from_cache)
+        self.assertEqual(data['project_count'], 1)
+
+
+class TileLayoutTests(SimpleTestCase):
+    """Tile counts from the tile layout (see tile_layout); lengths in micrometres."""
+
+    def test_axis_profile(self):
+        self.assertEqual(_axis_profile(1000, 300, 300, 0), (3, [100]))
+        # The grid starts 50 before the edge: a cut at each end
+        self.assertEqual(_axis_profile(1000, 300, 300, 50), (2, [250, 150]))
+        # The joints take up room too
+        self.assertEqual(_axis_profile(1000, 300, 310, 0), (3, [70]))
+
+    def test_exact_fit_has_no_cuts(self):
+        layout = layout_rectangle(600, 600, 300, 300)
+        self.assertEqual((layout.tiles, layout.full_tiles, layout.cut_pieces), (4, 4, 0))
+
+    def test_edge_strips_share_tiles(self):
+        # 9 whole tiles, 3 + 3 edge strips of 100 cut three to a tile, and a corner
+        layout = layout_rectangle(1000, 1000, 300, 300)
+        self.assertEqual((layout.tiles, layout.full_tiles, layout.cut_pieces, layout.reused_offcuts), (12, 9, 7, 4))
+
+    def test_tile_is_turned_to_fit(self):
+        layout = layout_rectangle(600, 300, 300, 600)
+        self.assertEqual((layout.tiles, layout.orientation), (1, 90))
+
+
+class TileQuantityTests(TestCase):
+    """Tiles for a project where only some rooms have a tile size."""
+
+    def test_layout_count_alone_when_every_room_is_laid_out(self):
+        quantities = calculate_material_quantities('tiles', 'mason', to_area(20), 500, 0, ['tiles'], 10)
+        self.assertEqual(quantities, (10 * QUANTITY_SCALE, 10 * QUANTITY_SCALE, 'pieces', 10))
+
+    def test_rooms_without_a_tile_size_are_added(self):
+        user = get_user_model().objects.create_user('0200000031', 'password', full_name='Tiles')
+        project = Project.objects.create(user=user, name='Mixed', project_type='mason', total_area='20.00', wastage_percentage='5')
+        Room.objects.create(project=project, name='Laid out', length='4', breadth='3', total_area='12.00', tile_count=10)
+        Room.objects.create(project=project, name='No tile size', length='4', breadth='2', total_area='8.00', tile_count=0)
+        tiles = Material.objects.create(name='Tiles', unit='pieces', default_unit_price='5.00')
+        item = ProjectMaterial.objects.create(project=project, material=tiles, name='Tiles', unit='pieces')
+
+        calculate_project_material_item_totals_and_save(item)
+        item.refresh_from_db()
+        unlaid, unlaid_with_wastage, _unit, _tier = calculate_material_quantities('tiles', 'mason', to_area(8), 500, 0, ['tiles'])
+        self.assertGreater(unlaid, 0)
+        self.assertEqual(item.quantity, decimal.Decimal(10 * QUANTITY_SCALE + unlaid) / QUANTITY_SCALE)
+        self.assertEqual(item.quantity_with_wastage, decimal.Decimal(10 * QUANTITY_SCALE + unlaid_with_wastage) / QUANTITY_SCALE)
+        self.assertEqual(item.unit, 'pieces')
+
+
+class ImageJobLeaseTests(TestCase):
+    """Claimed image jobs hold a lease (see image_pipeline.claim_next_job)."""
+
+    def setUp(self):
+        self.image = ProcessedImage.objects.create(
+            content_type=ContentType.objects.get_for_model(Tile), object_id=1, field_name='processed_image', source_name='tiles/a.jpg',
+        )
+
+    def expire_lease(self):
+        ProcessedImage.objects.filter(pk=self.image.pk).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        job = image_pipeline.claim_next_job()
+        self.assertEqual((job.pk, job.status, job.attempts), (self.image.pk, 'processing', 1))
+        self.assertIsNotNone(job.lease_expires_at)
+        self.assertIsNone(image_pipeline.claim_next_job())
+
+    def test_expired_lease_is_claimed_again(self):
+        lost = image_pipeline.claim_next_job()
+        self.expire_lease()
+        job = image_pipeline.claim_next_job()
+        self.assertEqual((job.pk, job.attempts), (self.image.pk, 2))
+        # The first worker's late result no longer saves
+        lost.status = 'done'
+        self.assertFalse(image_pipeline._save_result(lost, ['status']))
+
+    def test_job_fails_after_max_attempts(self):
+        ProcessedImage.objects.filter(pk=self.image.pk).update(status='processing', attempts=image_pipeline.MAX_ATTEMPTS)
+        self.expire_lease()
+        self.assertIsNone(image_pipeline.claim_next_job())
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.status, 'failed')
+
+
+class PdfBackendParityTests(TestCase):
+    """The canvas backend shows what pdf_template.html does (see compare_pdf_backends)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('0200000044', 'password', full_name='Parity', email='parity@example.com')
+        UserProfile.objects.update_or_create(user=user, defaults={
+            'company_name': 'Parity Tiling Ltd', 'city': 'Accra', 'address': '1 Ring Road', 'phone_number': '0200000044',
+        })
+        project = Project.objects.create(
+            user=user, name='Parity House', project_type='tiling', estimate_number='EST-PARITY', location='East Legon',
+            customer_name='Ama Mensah', customer_phone='0244000000', description='Floor and wall tiling & skirting',
+            total_area_with_waste='89.25', total_labor_cost='1200.00', cost_per_area='13.45', wastage_percentage='5',
+            transport='150.00',
+        )
+        for name, floor_area, wall_area in (('Kitchen', '12.60', '36.75'), ('Living Room & Hall', '31.50', '0'), ('Bath', '4.20', '21.00')):
+            Room.objects.create(project=project, name=name, floor_area_with_waste=floor_area, wall_area_with_waste=wall_area)
+        for name, unit, quantity in (('Cement', 'bags', '4.20'), ('Sand', 'wheelbarrow', '3.50'), ('Tile Cement', 'bags', '2.00')):
+            material = Material.objects.create(name=name, unit=unit, default_unit_price='10.00')
+            ProjectMaterial.objects.create(project=project, material=material, name=name, unit=unit, quantity_with_wastage=quantity)
+        cls.context = pdf_context.project_estimate_context(
+            pdf_context.project_estimate_data(project.pk, user), BASE_URL, transport=project.transport,
+        )
+
+    def test_canvas_draws_the_template_words_in_order(self):
+        expected = template_words(self.context)
+        drawn, _pages = canvas_words(self.context)
+        self.assertIn('EST-PARITY', expected)
+        self.assertIsNone(first_difference(expected, drawn), (expected, drawn))
+
+    @unittest.skipIf(weasyprint is None, "WeasyPrint is not available.")
+    def test_weasyprint_page_is_a4(self):
+        page_count, page_size = weasyprint_pages(self.context)
+        self.assertGreaterEqual(page_count, 1)
+        self.assertEqual(page_size, A4_CSS_PX)
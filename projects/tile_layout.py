@@ -0,0 +1,133 @@
+"""
+Tile layout for rectangular surfaces.
+
+Instead of a flat wastage tier, works out how a grid of tiles falls on a
+floor or wall: how many whole tiles, how many cut pieces, and how many of
+those cut pieces can come from the offcut of another cut (edge strips are
+cut several to a tile, and a strip from one edge leaves an offcut that can
+fill the opposite edge when both fit in one tile). The grid orientation and
+starting offset are searched to use the fewest tiles, then make the fewest
+cuts, then avoid thin slivers.
+
+All lengths are micrometres (see fixed_point). Results are cached by
+(surface dimensions, tile dimensions, joint).
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from .fixed_point import ceil_div
+
+# Offsets tried per axis (as fractions of the tile pitch), on top of the
+# centred layout and the layouts that end on a whole tile.
+OFFSET_STEPS = 12
+
+TileLayout = namedtuple('TileLayout', [
+    'tiles',            # Tiles to buy
+    'full_tiles',       # Tiles laid whole
+    'cut_pieces',       # Cut pieces laid (edges and corners)
+    'reused_offcuts',   # Cut pieces taken from another cut's offcut
+    'orientation',      # 0: tile length along the surface length, 90: turned
+    'offset_x',         # Grid offset along the length (micrometres)
+    'offset_y',         # Grid offset along the width (micrometres)
+])
+
+EMPTY_LAYOUT = TileLayout(0, 0, 0, 0, 0, 0, 0)
+
+
+def _axis_profile(span, tile, pitch, offset):
+    """
+    Tiles along one axis for a grid starting at -offset.
+    Returns (whole tiles, [cut widths]) with at most two cuts (start and end).
+    """
+    cuts = []
+    start = -offset
+    if start < 0:
+        visible = start + tile
+        if visible > 0:
+            cuts.append(min(visible, span))
+        start += pitch
+    whole = 0
+    if start + tile <= span:
+        whole = (span - start - tile) // pitch + 1
+        start += whole * pitch
+    if start < span:
+        cuts.append(span - start)
+    return whole, cuts
+
+
+def _axis_offsets(span, tile, pitch):
+    offsets = {pitch * step // OFFSET_STEPS for step in range(OFFSET_STEPS)}
+    remainder = span % pitch
+    offsets.add(((pitch - remainder) // 2) % pitch)  # Equal cuts at both ends
+    offsets.add((tile - span) % pitch)  # Whole tile at the far end
+    return sorted(offsets)
+
+
+def _tiles_for_strips(cuts, count, tile):
+    """
+    Tiles needed for `count` strips of each cut width along one axis. A tile
+    yields as many strips as fit across it, and when both widths fit in one
+    tile a start strip and an end strip can share it.
+    Returns (tiles, pieces cut from another piece's offcut).
+    """
+    if not cuts or not count:
+        return 0, 0
+    pieces = len(cuts) * count
+    tiles = sum(ceil_div(count, tile // cut) for cut in cuts)
+    if len(cuts) == 2 and cuts[0] + cuts[1] <= tile:
+        tiles = min(tiles, ceil_div(count, tile // (cuts[0] + cuts[1])))
+    return tiles, pieces - tiles
+
+
+@lru_cache(maxsize=8192)
+def layout_rectangle(length, width, tile_length, tile_width, joint=0):
+    """
+    Best layout of tile_length x tile_width tiles (joint between them) on a
+    length x width rectangle. All arguments in micrometres.
+    """
+    if length <= 0 or width <= 0 or tile_length <= 0 or tile_width <= 0:
+        return EMPTY_LAYOUT
+
+    best = None
+    best_key = None
+    orientations = [0] if tile_length == tile_width else [0, 90]
+    for orientation in orientations:
+        tile_x, tile_y = (tile_length, tile_width) if orientation == 0 else (tile_width, tile_length)
+        pitch_x, pitch_y = tile_x + joint, tile_y + joint
+        x_profiles = [(offset, _axis_profile(length, tile_x, pitch_x, offset)) for offset in _axis_offsets(length, tile_x, pitch_x)]
+        y_profiles = [(offset, _axis_profile(width, tile_y, pitch_y, offset)) for offset in _axis_offsets(width, tile_y, pitch_y)]
+
+        for offset_x, (whole_x, cuts_x) in x_profiles:
+            for offset_y, (whole_y, cuts_y) in y_profiles:
+                # Strips along the x edges are whole in y, and the other way round
+                edge_x_tiles, edge_x_reused = _tiles_for_strips(cuts_x, whole_y, tile_x)
+                edge_y_tiles, edge_y_reused = _tiles_for_strips(cuts_y, whole_x, tile_y)
+                corners = len(cuts_x) * len(cuts_y)
+                full_tiles = whole_x * whole_y
+                tiles = full_tiles + edge_x_tiles + edge_y_tiles + corners
+                cut_pieces = len(cuts_x) * whole_y + len(cuts_y) * whole_x + corners
+                smallest_cut = min(cuts_x + cuts_y) if cut_pieces else max(tile_x, tile_y)
+                key = (tiles, cut_pieces, -smallest_cut)
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best = TileLayout(
+                        tiles, full_tiles, cut_pieces, edge_x_reused + edge_y_reused,
+                        orientation, offset_x, offset_y,
+                    )
+    return best
+
+
+def layout_room(length, breadth, height, tile_length, tile_width, joint=0):
+    """
+    Layouts for a rectangular room: the floor and the four walls.
+    Returns (floor_layout, wall_tiles) where wall_tiles is the tile count for
+    all four walls (0 without a height).
+    """
+    floor = layout_rectangle(length, breadth, tile_length, tile_width, joint)
+    wall_tiles = 0
+    if height > 0:
+        long_wall = layout_rectangle(length, height, tile_length, tile_width, joint)
+        short_wall = layout_rectangle(breadth, height, tile_length, tile_width, joint)
+        wall_tiles = 2 * long_wall.tiles + 2 * short_wall.tiles
+    return floor, wall_tiles
@@ -19,9 +19,21 @@ custom_urlpatterns = [
     path('settings/update/', views.update_settings, name='update-user-settings'),
     path('estimate/pdf/generate/', views.generate_estimatepdf, name='generate-estimate-pdf'),
     path('tile-image/process/', views.process_tile_image, name='process-tile-image'),
+    path('images/<int:pk>/', views.image_detail, name='image-detail'),
+    path('images/<int:pk>/variant/', views.image_variant, name='image-variant'),
+    path('images/<int:pk>/similar/', views.similar_images, name='similar-images'),
     path('rooms/3d/manual/',views.generate_manual_estimate_pdf, name ="manual pdf generations"),
     path('estimate/pdf/download/', views.download_estimate_pdf, name='download-estimate-pdf'),
+    path('pdf/jobs/', views.pdf_render_jobs, name='pdf-render-jobs'),
+    path('pdf/jobs/<int:pk>/', views.pdf_render_job, name='pdf-render-job'),
+    path('pdf/jobs/<int:pk>/download/', views.download_pdf_render_job, name='pdf-render-job-download'),
+    path('pdf/export/', views.export_estimate_pdfs, name='export-estimate-pdfs'),
+    path('pdf/cache/', views.pdf_cache_stats, name='pdf-cache-stats'),
+    path('share/<str:token>/', views.shared_estimate, name='shared-estimate'),
+    path('share/<str:token>/pdf/', views.shared_estimate, {'extension': 'pdf'}, name='shared-estimate-pdf'),
+    path('rules/bundle/', views.offline_rules_bundle, name='offline-rules-bundle'),
     path('<int:pk>/update-status/', views.update_project_status, name='update-project-status'),
+    path('portfolio/materials/', views.material_rollup, name='material-rollup'),
 ]
 
 urlpatterns = [
@@ -22,7 +22,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from weasyprint import HTML
 
 from accounts.models import UserProfile, get_projects_left, use_feature_if_allowed
 
@@ -39,6 +38,7 @@ from .serializers import (
 )
 
 from . import project_calculations
+from . import pdf_pool
 
 room_detail_serializers_map = {
     'tiling': TilingRoomDetailsSerializer,
@@ -710,7 +710,7 @@ def generate_estimatepdf(request):
             
             pdf_html_content = render_to_string('pdf_template.html', context_data)
 
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, context_data['base_url'])
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
             return Response(pdf_base64, status=status.HTTP_200_OK)
 
@@ -805,7 +805,7 @@ def generate_manual_estimate_pdf(request):
             # Generate the PDF using WeasyPrint
             # base_url is important for finding static files (like the logo)
             base_url = request.build_absolute_uri('/')
-            pdf_file = HTML(string=pdf_html_content, base_url=base_url).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, base_url)
 
             # Encode the PDF to base64 and return
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
@@ -851,7 +851,6 @@ def download_estimate_pdf(request):
             from .serializers import ProjectSerializer
             from django.template.loader import render_to_string
             from django.conf import settings
-            from weasyprint import HTML
             import base64, decimal
 
             project_instance = get_object_or_404(
@@ -909,7 +908,7 @@ def download_estimate_pdf(request):
             }
 
             pdf_html_content = render_to_string('pdf_template.html', context_data)
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, context_data['base_url'])
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
             return Response({ 'pdf_base64': pdf_base64 }, status=status.HTTP_200_OK)
 
@@ -951,7 +950,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from weasyprint import HTML
 
 from accounts.models import UserProfile, get_projects_left, use_feature_if_allowed
 
@@ -968,6 +966,7 @@ from .serializers import (
 )
 
 from . import project_calculations
+from . import pdf_pool
 
 room_detail_serializers_map = {
     'tiling': TilingRoomDetailsSerializer,
@@ -1639,7 +1638,7 @@ def generate_estimatepdf(request):
             
             pdf_html_content = render_to_string('pdf_template.html', context_data)
 
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, context_data['base_url'])
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
             return Response(pdf_base64, status=status.HTTP_200_OK)
 
@@ -1734,7 +1733,7 @@ def generate_manual_estimate_pdf(request):
             # Generate the PDF using WeasyPrint
             # base_url is important for finding static files (like the logo)
             base_url = request.build_absolute_uri('/')
-            pdf_file = HTML(string=pdf_html_content, base_url=base_url).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, base_url)
 
             # Encode the PDF to base64 and return
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
@@ -1828,7 +1827,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from weasyprint import HTML
 
 from accounts.models import UserProfile, get_projects_left, use_feature_if_allowed
 
@@ -1845,6 +1843,7 @@ from .serializers import (
 )
 
 from . import project_calculations
+from . import pdf_pool
 
 room_detail_serializers_map = {
     'tiling': TilingRoomDetailsSerializer,
@@ -2516,7 +2515,7 @@ def generate_estimatepdf(request):
             
             pdf_html_content = render_to_string('pdf_template.html', context_data)
 
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, context_data['base_url'])
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
             return Response(pdf_base64, status=status.HTTP_200_OK)
 
@@ -2611,7 +2610,7 @@ def generate_manual_estimate_pdf(request):
             # Generate the PDF using WeasyPrint
             # base_url is important for finding static files (like the logo)
             base_url = request.build_absolute_uri('/')
-            pdf_file = HTML(string=pdf_html_content, base_url=base_url).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, base_url)
 
             # Encode the PDF to base64 and return
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
@@ -2705,7 +2704,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from weasyprint import HTML
 
 from accounts.models import UserProfile, get_projects_left, use_feature_if_allowed
 
@@ -2722,6 +2720,7 @@ from .serializers import (
 )
 
 from . import project_calculations
+from . import pdf_pool
 
 room_detail_serializers_map = {
     'tiling': TilingRoomDetailsSerializer,
@@ -3393,7 +3392,7 @@ def generate_estimatepdf(request):
             
             pdf_html_content = render_to_string('pdf_template.html', context_data)
 
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, context_data['base_url'])
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
             return Response(pdf_base64, status=status.HTTP_200_OK)
 
@@ -3488,7 +3487,7 @@ def generate_manual_estimate_pdf(request):
             # Generate the PDF using WeasyPrint
             # base_url is important for finding static files (like the logo)
             base_url = request.build_absolute_uri('/')
-            pdf_file = HTML(string=pdf_html_content, base_url=base_url).write_pdf()
+            pdf_file = pdf_pool.render_html(pdf_html_content, base_url)
 
             # Encode the PDF to base64 and return
             pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
@@ -3564,32 +3563,35 @@ import datetime
 import base64
 import os
 import decimal
+import math
+import time
 
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
-from django.http import Http404, HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.contrib.auth import get_user_model
-from django.db.models import Prefetch
+from django.db.models import Prefetch, prefetch_related_objects
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
 
 from rest_framework import status, viewsets, permissions
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
-from weasyprint import HTML
 
 from accounts.models import UserProfile, get_projects_left, use_feature_if_allowed
 
 from .models import (
     DynamicSetting, Material, Project, Room, ProjectMaterial, Worker, Tile,
     Unit,
-    TilingRoomDetails, PaintingRoomDetails,
+    TilingRoomDetails, PaintingRoomDetails, ProcessedImage, PdfRenderJob,
 )
 
 from .serializers import (
@@ -3599,6 +3601,21 @@ from .serializers import (
 )
 
 from . import project_calculations
+from . import room_import
+from . import rollup
+from . import procurement
+from . import scheduling
+from . import room_geometry
+from . import image_pipeline
+from . import share_links
+from . import rules_bundle
+from . import pdf_jobs
+from . import pdf_export
+from . import pdf_backends
+from . import pdf_pool
+from . import pdf_cache
+from . import pdf_responses
+from .fixed_point import length_to_micrometres, to_fixed
 
 room_detail_serializers_map = {
     'tiling': TilingRoomDetailsSerializer,
@@ -3725,6 +3742,95 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=True, methods=['get', 'post'], url_path='procurement')
+    def procurement(self, request, pk=None):
+        """
+        Cheapest pack combination for each material of the project.
+
+        Packs come from in-stock SupplierProducts with a pack_size (?supplier=<id>
+        to use one supplier), or from a POSTed 'packs' object of
+        material name -> [{'name', 'size', 'price', 'limit'}], which takes precedence.
+        Each result is compared with rounding the whole quantity up in one pack size.
+        """
+        project = self.get_object()
+        project_materials = list(project.materials.all())
+
+        supplier_id = request.data.get('supplier') if request.method == 'POST' else None
+        supplier_id = supplier_id or request.query_params.get('supplier')
+        pack_options = procurement.supplier_pack_options(
+            [pm.material.name for pm in project_materials], supplier_id=supplier_id
+        )
+
+        if request.method == 'POST' and request.data.get('packs') is not None:
+            client_options, errors = procurement.parse_pack_options(request.data.get('packs'))
+            if errors:
+                return Response({"error": errors}, status=status.HTTP_400_BAD_REQUEST)
+            pack_options.update(client_options)
+
+        result = procurement.optimize_project_materials(project_materials, pack_options)
+        return Response({'project': project.id, **result})
+
+    @action(detail=True, methods=['get'], url_path='schedule')
+    def schedule(self, request, pk=None):
+        """
+        Crew schedule for the project: tasks per room in dependency order, the
+        critical-path duration, and per-role utilization and cost over the
+        scheduled days. Compare 'estimated_days' with the project's stored value.
+        """
+        project = self.get_object()
+        prefetch_related_objects([project], 'rooms__details', 'workers')
+        result = scheduling.build_project_schedule(project)
+        return Response({'project': project.id, 'project_estimated_days': project.estimated_days, **result})
+
+    @action(detail=True, methods=['post'], url_path='share')
+    def share(self, request, pk=None):
+        """
+        Signed, expiring link to an immutable HTML/PDF snapshot of the estimate
+        for the client. The snapshot is rendered once per version of the
+        estimate; body: {"expires_in_days": 14}.
+        """
+        try:
+            expires_in_days = share_links.parse_share_days(request.data.get('expires_in_days'))
+        except share_links.ShareLinkError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        project = self.get_object()
+        base_url = request.build_absolute_uri('/')[:-1] + settings.STATIC_URL
+        try:
+            key, created = share_links.project_snapshot(project.pk, request.user, base_url)
+        except Exception as e:
+            print(f"Error creating the share snapshot for project {project.id}: {e}")
+            return Response({"error": "Error generating the estimate snapshot: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(
+            share_links.share_link_response(request, 'project', key, created, expires_in_days),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['get'], url_path='pdf', renderer_classes=[pdf_responses.PDFRenderer, *pdf_responses.PDF_RENDERER_CLASSES[:-1]])
+    def pdf(self, request, pk=None):
+        """
+        The estimate PDF with the project's saved customer details and
+        transport, as a file (ETag, Range) unless JSON is asked for, which
+        gives the base64 like generate_estimatepdf. ?backend=weasyprint|canvas|auto
+        picks the renderer (see pdf_backends).
+        """
+        project = self.get_object()
+        try:
+            backend = pdf_backends.requested_backend(request.query_params.get('backend'))
+        except pdf_backends.PdfBackendError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Rendered by the warm renderer pool (pdf_pool), which loads the project itself
+            pdf = pdf_pool.render(
+                'project', request.user, request.build_absolute_uri('/')[:-1] + settings.STATIC_URL,
+                object_id=project.pk, payload={'transport': str(project.transport or '0'), 'backend': backend},
+            )
+        except Exception as e:
+            print(f"Error generating PDF for project {project.id}: {e}")
+            return Response({"error": "Error generating PDF: " + str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if pdf_responses.wants_pdf(request):
+            return pdf_responses.pdf_file_response(request, pdf.file, pdf.size, pdf.key, f"estimate-{project.estimate_number or project.pk}.pdf")
+        return pdf_responses.base64_json_response(pdf)
+
 class UnitViewSet(viewsets.ModelViewSet):
     queryset = Unit.objects.all()
     serializer_class = UnitSerializer
@@ -3888,6 +3994,66 @@ class RoomViewSet(viewsets.ModelViewSet):
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create many rooms for one project in a single request.
+
+        Send 'project' plus either 'rooms' (a JSON list of rooms) or 'file' (a CSV
+        upload with one room per line). Each room may carry its own 'unit'; its
+        dimensions are converted to the project's measurement unit. Tiling/painting
+        details go in '<project_type>_details' or as flat fields/columns.
+
+        By default nothing is saved if any row is invalid. With 'skip_invalid'
+        set, the valid rows are saved and the invalid ones are reported.
+        """
+        project_id = request.data.get('project')
+        if not project_id:
+            return Response({"error": "project is required."}, status=status.HTTP_400_BAD_REQUEST)
+        project = get_object_or_404(Project, id=project_id, user=request.user)
+
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                rows = room_import.read_rooms_csv(upload)
+            except room_import.RoomImportError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('rooms')
+            if isinstance(rows, str):
+                try:
+                    rows = json.loads(rows)
+                except ValueError:
+                    return Response({"error": "rooms must be a JSON list."}, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(rows, list):
+                return Response({"error": "Send a 'rooms' list or a CSV 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not rows:
+            return Response({"error": "No rooms to create."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > room_import.MAX_BULK_ROOMS:
+            return Response(
+                {"error": f"At most {room_import.MAX_BULK_ROOMS} rooms can be created at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        skip_invalid = str(request.data.get('skip_invalid', request.query_params.get('skip_invalid', ''))).lower() in ('1', 'true', 'yes')
+
+        valid_rows, errors = room_import.validate_room_rows(project, rows)
+        print(f"Bulk rooms for project {project.id}: {len(valid_rows)} valid, {len(errors)} invalid (skip_invalid={skip_invalid})")
+
+        if errors and not skip_invalid:
+            return Response({"created": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+        if not valid_rows:
+            return Response({"created": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        rooms = room_import.bulk_create_rooms(project, valid_rows)
+
+        response_rooms = Room.objects.filter(id__in=[room.id for room in rooms]).prefetch_related('details')
+        return Response({
+            "created": RoomSerializer(response_rooms, many=True).data,
+            "errors": errors,
+        }, status=status.HTTP_201_CREATED)
+
 
 class CreateProjectEstimateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -4110,14 +4276,61 @@ def update_3d_room(request):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def generate_3d_room_view(request):
+    """
+    glTF mesh of a room's floor and walls with the tile pattern mapped on.
+
+    Send 'room' (id of one of your rooms; dimensions and tile size come from it)
+    or 'length', 'breadth', 'height' and 'measurement_unit'. 'tile_length',
+    'tile_width' and 'grout_joint' (mm) override the room's tile. The same
+    dimensions and tile are served from storage instead of being rebuilt.
+    """
     user = request.user
+    data = request.data
+    measurement_unit = data.get('measurement_unit') or 'meters'
+    length, breadth, height = data.get('length'), data.get('breadth'), data.get('height')
+    tile_length, tile_width, grout_joint = None, None, None
+
+    room_id = data.get('room')
+    if room_id:
+        try:
+            room = Room.objects.select_related('project').get(pk=room_id, project__user=user)
+        except (Room.DoesNotExist, ValueError, TypeError):
+            return Response({"error": "Room not found."}, status=status.HTTP_404_NOT_FOUND)
+        measurement_unit = room.project.measurement_unit or 'meters'
+        length, breadth, height = room.length, room.breadth, room.height
+        if isinstance(room.details, TilingRoomDetails):
+            tile_length, tile_width, grout_joint = room.details.tile_length, room.details.tile_width, room.details.grout_joint
+
+    tile_length = data.get('tile_length', tile_length)
+    tile_width = data.get('tile_width', tile_width)
+    grout_joint = data.get('grout_joint', grout_joint)
+
+    try:
+        geometry_inputs = (
+            length_to_micrometres(length or 0, measurement_unit),
+            length_to_micrometres(breadth or 0, measurement_unit),
+            length_to_micrometres(height or 0, measurement_unit),
+            to_fixed(tile_length or 0, project_calculations.MILLIMETRE),
+            to_fixed(tile_width or 0, project_calculations.MILLIMETRE),
+            to_fixed(grout_joint or 0, project_calculations.MILLIMETRE),
+        )
+        room_geometry.validate_geometry_inputs(*geometry_inputs)
+    except room_geometry.RoomGeometryError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     # Assuming check_and_use_feature is defined elsewhere
     result = use_feature_if_allowed(user, "room_view")
 
     if not result["success"]:
         return Response({"error": result["message"]}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({"message": "3D room view generation triggered."})
+    gltf, geometry_key, from_cache = room_geometry.get_room_geometry(*geometry_inputs)
+    return Response({
+        "message": "3D room view generated.",
+        "geometry_key": geometry_key,
+        "cached": from_cache,
+        "gltf": json.loads(gltf),
+    })
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated])
@@ -4133,6 +4346,25 @@ def update_project_status(request, pk):
         return Response({'message': 'Project status updated.', 'data': serializer.data})
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def material_rollup(request):
+    """
+    Aggregated shopping list across the user's projects.
+    ?status=pending,in_progress picks the project statuses (default: pending).
+    """
+    valid_statuses = [choice[0] for choice in Project.STATUS_CHOICES]
+    statuses = [value.strip() for value in request.query_params.get('status', '').split(',') if value.strip()]
+    invalid = [value for value in statuses if value not in valid_statuses]
+    if invalid:
+        return Response(
+            {"error": f"Unknown status: {', '.join(invalid)}. Use one of: {', '.join(valid_statuses)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    data, from_cache = rollup.get_material_rollup(request.user.id, statuses)
+    return Response({**data, 'cached': from_cache})
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_settings(request):
@@ -4152,14 +4384,11 @@ def update_settings(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(pdf_responses.PDF_RENDERER_CLASSES)
 def generate_estimatepdf(request):
     if request.method == 'POST':
         # Get data from the frontend payload
         project_id = request.data.get('project_id')
-        customer_name_payload = request.data.get('customer_name')
-        contact_payload = request.data.get('contact')
-        location_payload = request.data.get('Location') # Note: Frontend sends 'Location'
-        transport_payload = request.data.get('transport')
 
         if not project_id:
             return Response({"error": "Project ID is required."}, status=status.HTTP_400_BAD_REQUEST)
@@ -4168,111 +4397,27 @@ def generate_estimatepdf(request):
             # Fetch the project instance efficiently with related data
             # Use get_object_or_404 for cleaner error handling if project doesn't exist or user has no permission
             project_instance = get_object_or_404(
-                Project.objects.prefetch_related(
-                    # Prefetch Rooms and their details
-                    # Assuming 'details' is the related_name from Room to its detail model (TilingRoomDetails, PaintingRoomDetails, etc.)
-                    Prefetch('rooms', queryset=Room.objects.prefetch_related('details')),
-                    # Prefetch ProjectMaterials, their related Material, and the Material's related Unit
-                    # Assuming 'material' is the ForeignKey from ProjectMaterial to Material
-                    # Assuming 'unit' is the ForeignKey from Material to Unit
-                    Prefetch('materials', queryset=ProjectMaterial.objects.select_related('material')),
-                    # Prefetch Workers
-                    'workers',
-                ),
+                Project,
                 id=project_id,
                 user=request.user # Ensure project belongs to the authenticated user
             )
 
-            # --- Apply updates from payload and save ---
-            # We only save the specific fields that can be updated via this endpoint
-            update_fields = []
-            if customer_name_payload is not None:
-                project_instance.customer_name = customer_name_payload
-                update_fields.append('customer_name')
-            if contact_payload is not None:
-                project_instance.customer_phone = contact_payload
-                update_fields.append('customer_phone')
-            if location_payload is not None:
-                project_instance.customer_location = location_payload
-                update_fields.append('customer_location')
-
-            # Handle transport conversion and update
-            current_transport = decimal.Decimal('0') # Default to 0 if payload transport is invalid or None
-            if transport_payload is not None:
-                try:
-                    current_transport = decimal.Decimal(str(transport_payload or '0')) # Ensure it's a string for Decimal conversion
-                    project_instance.transport = current_transport # Save transport value
-                    update_fields.append('transport')
-                    # IMPORTANT: Do NOT add transport to total_cost and save it here.
-                    # The grand_total will be calculated in the context data using the components.
-                except (decimal.InvalidOperation, TypeError):
-                    # Handle cases where transport is not a valid number
-                    return Response({"error": "Invalid transport value."}, status=status.HTTP_400_BAD_REQUEST)
-
-            if update_fields:
-                project_instance.save(update_fields=update_fields)
-
-            # --- Prepare Context Data for Template ---
-            # Fetch the user profile - assuming one exists or gets created
-            user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-            user = request.user
-            project_data = ProjectSerializer(project_instance).data
-            subtotal = decimal.Decimal(project_data.get('subtotal_cost', '0'))
-            profit_amount = decimal.Decimal(project_data.get('profit', '0'))
-            calculated_grand_total = subtotal + profit_amount + current_transport
-            print(f"these are the data used for generating the pdf {project_data,subtotal,profit_amount}")
-
-            context_data = {
-                'user_profile': user_profile, 
-                'user_info': user,
-                'project_date': timezone.now().date(),
-                'primary_color': settings.PRIMARY_COLOR if hasattr(settings, 'PRIMARY_COLOR') else '#007bff', # Get primary color from settings
-                'base_url': request.build_absolute_uri('/')[:-1] + settings.STATIC_URL, # Base URL for static files
-                'validity_days': 30, # Or get from settings or UserProfile
-                
-                # Project & Estimate Details
-                'estimate_number': project_data.get('estimate_number', 'N/A'),
-                'project_name': project_data.get('name', 'N/A'),
-                 # Should be a date object or string
-                'location': project_data.get('location', 'N/A'), # Project location
-                'project_type': project_instance.project_type, # Assuming project_type is direct field
-                'status': project_data.get('status', 'N/A'),
-                'measurement_unit': project_data.get('measurement_unit', 'meters'),
-                'estimated_days': project_data.get('estimated_days', 0),
-                'description': project_data.get('description', ''), # Project description
-
-                # Customer Information (from payload, fallback to project instance/data)
-                'customer_name': customer_name_payload if customer_name_payload is not None else project_instance.customer_name or 'N/A',
-                'contact': contact_payload if contact_payload is not None else project_instance.customer_phone or 'N/A',
-                'customer_location': location_payload if location_payload is not None else project_instance.customer_location or project_instance.location or 'N/A', # Use location from payload, fallback to customer_location, then project location
-
-                # Area Details
-                'total_area': decimal.Decimal(project_data.get('total_area_with_waste', '0')),
-                'total_floor_area': decimal.Decimal(project_data.get('floor_area_with_waste', '0')),
-                'total_wall_area': decimal.Decimal(project_data.get('total_wall_area_with_waste', '0')),
-                'cost_per_area': decimal.Decimal(project_data.get('cost_per_area', '0')),
-
-                # Lists of related items (prefetched data should be available through serializer data)
-                'rooms': project_data.get('rooms', []),
-                'materials': project_data.get('materials', []),
-                'workers': project_data.get('workers', []),
-                'total_material_cost': decimal.Decimal(project_data.get('total_material_cost', '0')),
-                'total_labor_cost': decimal.Decimal(project_data.get('total_labor_cost', '0')),
-                'subtotal_cost': subtotal, # Use the calculated subtotal
-                'wastage_percentage': decimal.Decimal(project_data.get('wastage_percentage', '0')),
-                'profit_type': project_data.get('profit_type'),
-                'profit_value': decimal.Decimal(project_data.get('profit_value', '0') or '0'), # Ensure profit_value is Decimal
-                'profit': profit_amount, # Use the calculated profit amount
-                'transport': current_transport, # Use the validated and potentially updated transport from payload
-                'grand_total': calculated_grand_total, # Use the calculated grand total
-
-            }
-            
-            pdf_html_content = render_to_string('pdf_template.html', context_data)
-
-            pdf_file = HTML(string=pdf_html_content, base_url=context_data['base_url']).write_pdf()
-            pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
-            return Response(pdf_base64, status=status.HTTP_200_OK)
+            # Save the customer details and transport from the payload on the project
+            try:
+                render_options = pdf_jobs.apply_estimate_overrides(project_instance, request.data)
+            except pdf_jobs.PdfJobError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Rendered by the warm renderer pool (pdf_pool), or here when none is running
+            pdf = pdf_pool.render(
+                'project', request.user,
+                request.build_absolute_uri('/')[:-1] + settings.STATIC_URL, # Base URL for static files
+                object_id=project_instance.pk, payload=render_options,
+            )
+            # The file itself for Accept: application/pdf (or ?format=pdf), base64 JSON otherwise
+            if pdf_responses.wants_pdf(request):
+                return pdf_responses.pdf_file_response(request, pdf.file, pdf.size, pdf.key, f"estimate-{project_instance.estimate_number or project_instance.pk}.pdf")
+            return pdf_responses.base64_json_response(pdf)
 
         except Project.DoesNotExist:
             return Response({"error": "Project not found or you do not have permission."}, status=status.HTTP_404_NOT_FOUND)
@@ -4289,10 +4434,158 @@ def generate_estimatepdf(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def process_tile_image(request):
-    return Response({"message": "Image processing endpoint - Implementation needed."})
+    """
+    Uploads a tile image ('processed_image', or 'image') and queues it for
+    processing; poll images/<id>/ for the variants, colours and hash.
+    """
+    data = request.data.copy()
+    if 'processed_image' not in data and 'image' in request.FILES:
+        data['processed_image'] = request.FILES['image']
+    serializer = TileSerializer(data=data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    tile = serializer.save(user=request.user)
+    job = image_pipeline.queue_image(tile, 'processed_image')
+    return Response(
+        {"message": "Tile image queued for processing.", "tile": serializer.data, "image": image_pipeline.describe_image(job)},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+def _requested_image_width(request):
+    """Width in device pixels from ?width= (CSS pixels) and ?dpr= (device pixel ratio)."""
+    try:
+        width = float(request.GET.get('width') or 0)
+        dpr = float(request.GET.get('dpr') or 1)
+    except ValueError:
+        return None
+    if width <= 0:
+        return None
+    return math.ceil(width * min(max(dpr, 1), 4))
+
+
+def _image_accept(request):
+    # ?format= wins over the Accept header, for clients that cannot set headers on image requests
+    requested_format = request.GET.get('format')
+    if requested_format in ('webp', 'jpeg'):
+        return f'image/{requested_format}'
+    return request.headers.get('Accept', '')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def image_detail(request, pk):
+    """
+    Processing status, dominant colours, hash and variants of an image the
+    user may see (image_pipeline.visible_images), with the best variant for
+    ?width=&dpr=.
+    """
+    job = get_object_or_404(image_pipeline.visible_images(request.user), pk=pk)
+    data = image_pipeline.describe_image(job)
+    best = image_pipeline.best_variant(job, _requested_image_width(request), _image_accept(request))
+    if best:
+        name, extension, variant = best
+        data['best'] = {'variant': name, 'format': extension, **variant, 'url': image_pipeline.variant_url(variant)}
+    return Response(data)
+
+
+@require_GET
+def image_variant(request, pk):
+    """
+    Redirects to the smallest variant that covers ?width= (times ?dpr=), in
+    WebP when the client accepts it. Until the image is processed it
+    redirects to the original upload.
+
+    A plain Django view: image requests send Accept: image/*, which DRF's
+    content negotiation would answer with 406. <img> requests carry no
+    token, so only the public supplier and product images are served here
+    (image_pipeline.public_images); a tile's uploader gets its variant URLs
+    from images/<id>/.
+    """
+    job = get_object_or_404(image_pipeline.public_images(), pk=pk)
+    best = image_pipeline.best_variant(job, _requested_image_width(request), _image_accept(request))
+    url = image_pipeline.variant_url(best[2]) if best else default_storage.url(job.source_name)
+    response = HttpResponseRedirect(url)
+    response['Vary'] = 'Accept'
+    response['Cache-Control'] = 'public, max-age=86400' if best else 'no-cache'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar_images(request, pk):
+    """
+    Images that look alike (perceptual hash within ?max_distance= bits,
+    default 10), closest first, among the images the user may see.
+    """
+    images = image_pipeline.visible_images(request.user)
+    job = get_object_or_404(images, pk=pk)
+    if job.status != 'done':
+        return Response({"error": "The image has not been processed yet."}, status=status.HTTP_409_CONFLICT)
+    try:
+        max_distance = min(int(request.query_params.get('max_distance', image_pipeline.SIMILAR_MAX_DISTANCE)), 32)
+    except ValueError:
+        return Response({"error": "max_distance must be a whole number."}, status=status.HTTP_400_BAD_REQUEST)
+    matches = image_pipeline.find_similar_images(job, images, max_distance=max_distance)
+    return Response({
+        'image': job.pk,
+        'similar': [{**image_pipeline.describe_image(match), 'distance': distance} for match, distance in matches],
+    })
+
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def offline_rules_bundle(request):
+    """
+    Coverage rates, wastage tiers, unit conversions and the user's role
+    coverage as one versioned bundle, with golden test vectors, for estimating
+    offline (spec in RULES_BUNDLE.md). Send the ETag back in If-None-Match to
+    get a 304 while the bundle is unchanged.
+    """
+    bundle = rules_bundle.build_rules_bundle(project_calculations.get_dynamic_settings(request.user))
+    etag = f'"{bundle["version"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(bundle)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@require_GET
+def shared_estimate(request, token, extension='html'):
+    """
+    Public view of a shared estimate snapshot (see share_links). Checks the
+    signed token and streams the stored file: no database query, no rendering.
+    A plain Django view so it stays free of authentication and content negotiation.
+    """
+    try:
+        kind, key, expires_at = share_links.read_share_link(token)
+    except share_links.ShareLinkError as e:
+        return HttpResponse(str(e), status=status.HTTP_410_GONE, content_type='text/plain; charset=utf-8')
+
+    etag = f'"{key}"'
+    max_age = min(int(expires_at - time.time()), share_links.MAX_CACHE_SECONDS)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        path = share_links.snapshot_path(key, extension)
+        try:
+            stored = default_storage.open(path, 'rb')
+        except FileNotFoundError:
+            raise Http404("The estimate snapshot is no longer available.")
+        response = FileResponse(
+            stored, content_type=share_links.SNAPSHOT_CONTENT_TYPES[extension], filename=f"estimate-{key[:12]}.{extension}",
+        )
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    response['X-Robots-Tag'] = 'noindex, nofollow'
+    return response
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(pdf_responses.PDF_RENDERER_CLASSES)
 def generate_manual_estimate_pdf(request):
     """
     Generates a PDF estimate from manually entered data received from the frontend.
@@ -4311,65 +4604,14 @@ def generate_manual_estimate_pdf(request):
             if not all([company_info, customer_info, tables_data, summary_data]):
                  return Response({"error": "Invalid data structure. Missing required sections."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Fetch the user profile for additional company details or custom template logic
-            user_profile, created = UserProfile.objects.get_or_create(user=request.user)
-
-            # --- Determine Template ---
-            # For now, we'll use a single generic template.
-            # In the future, you could add logic here to select a template
-            # based on user_profile settings (e.g., user_profile.pdf_template_name)
-            template_name = 'manual_estimate_template.html' # You will create this template
-
-            # --- Prepare Context Data for Template ---
-            # Map the received JSON data to template variables
-            context_data = {
-                'user_profile': user_profile, # Pass the full user profile
-                'company_info': company_info,
-                'customer_info': customer_info,
-                'tables': tables_data, # Contains materials, rooms, labour arrays
-                'summary': summary_data,
-                'date_generated': datetime.date.today().strftime('%Y-%m-%d'), # Add current date
-                # You could add estimate number generation here if not done on frontend
-                # 'estimate_number': generate_unique_estimate_number(request.user),
-                # Pass a primary color if the template uses it
-                # 'primary_color': user_profile.theme_color or '#007bff', # Example: get color from profile
-            }
-
-            # Convert Decimal strings in summary data to Decimal objects for calculations in template (optional but recommended)
-            try:
-                context_data['summary']['grandTotal'] = decimal.Decimal(summary_data.get('grandTotal', '0') or '0')
-                context_data['summary']['totalMaterialCost'] = decimal.Decimal(summary_data.get('totalMaterialCost', '0') or '0')
-                context_data['summary']['totalLabourCost'] = decimal.Decimal(summary_data.get('totalLabourCost', '0') or '0')
-                context_data['summary']['totalRoomArea'] = decimal.Decimal(summary_data.get('totalRoomArea', '0') or '0')
-
-                # Convert Decimal strings in table data to Decimal objects
-                for table_type in ['materials', 'rooms', 'labour']:
-                    if table_type in context_data['tables']:
-                        for item in context_data['tables'][table_type]:
-                            for field in item:
-                                if isinstance(item[field], str) and item[field].replace('.', '', 1).isdigit():
-                                    try:
-                                        item[field] = decimal.Decimal(item[field] or '0')
-                                    except decimal.InvalidOperation:
-                                        pass # Keep as string if invalid decimal
-
-            except Exception as e:
-                print(f"Warning: Could not convert some numeric values to Decimal: {e}")
-                # Continue, template might handle strings, but calculations will fail
-
-
-            # Render the HTML template
-            # Ensure your template directory is configured in settings.py
-            pdf_html_content = render_to_string(template_name, context_data)
-
-            # Generate the PDF using WeasyPrint
+            # Render with WeasyPrint in the renderer pool (or take the unchanged PDF from the cache)
             # base_url is important for finding static files (like the logo)
-            base_url = request.build_absolute_uri('/')
-            pdf_file = HTML(string=pdf_html_content, base_url=base_url).write_pdf()
+            pdf = pdf_pool.render('manual_data', request.user, request.build_absolute_uri('/'), payload=estimate_data)
 
-            # Encode the PDF to base64 and return
-            pdf_base64 = base64.b64encode(pdf_file).decode('utf-8')
-            return Response(pdf_base64, status=status.HTTP_200_OK)
+            # The file itself for Accept: application/pdf (or ?format=pdf), base64 JSON otherwise
+            if pdf_responses.wants_pdf(request):
+                return pdf_responses.pdf_file_response(request, pdf.file, pdf.size, pdf.key, "estimate.pdf")
+            return pdf_responses.base64_json_response(pdf)
 
         except Exception as e:
             # Log the error and return a 500 response
@@ -4385,6 +4627,7 @@ def generate_manual_estimate_pdf(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(pdf_responses.PDF_RENDERER_CLASSES)
 def download_estimate_pdf(request):
     """
     Unified endpoint to generate and return pdf_base64 for either:
@@ -4392,6 +4635,7 @@ def download_estimate_pdf(request):
     - manual estimate (manual_estimate app)
 
     Expects JSON body: { "type": "project" | "manual", "id": number }
+    Accept: application/pdf (or ?format=pdf) returns the file itself instead.
     """
     estimate_type = request.data.get('type')
     obj_id = request.data.get('id')
@@ -4403,35 +4647,118 @@ def download_estimate_pdf(request):
 
     try:
         if estimate_type == 'project':
-            # Lazily import to avoid cycles
-            from .models import Project
-            from .utils import generate_project_pdf
-            import base64, os
-
             project = get_object_or_404(Project, id=obj_id, user=request.user)
-            temp_path = generate_project_pdf(project)
-            try:
-                with open(temp_path, 'rb') as f:
-                    pdf_bytes = f.read()
-                pdf_b64 = base64.b64encode(pdf_bytes).decode('utf-8')
-            finally:
-                try:
-                    os.remove(temp_path)
-                except Exception:
-                    pass
-            return Response({"pdf_base64": pdf_b64}, status=status.HTTP_200_OK)
+            pdf = pdf_pool.render('project_report', request.user, object_id=project.pk)
+            filename = f"report-{project.estimate_number or project.pk}.pdf"
+        else:
+            # manual estimate branch
+            from manual_estimate.models import Estimate as ManualEstimate
 
-        # manual estimate branch
-        from manual_estimate.models import Estimate as ManualEstimate
-        from manual_estimate.utils import generate_estimate_pdf_base64 as generate_manual_pdf_base64
+            estimate = get_object_or_404(ManualEstimate, id=obj_id, user=request.user)
+            pdf = pdf_pool.render('manual', request.user, request.build_absolute_uri('/'), object_id=estimate.pk)
+            filename = f"estimate-{estimate.pk}.pdf"
 
-        estimate = get_object_or_404(
-            ManualEstimate.objects.select_related('customer').prefetch_related('rooms', 'materials'),
-            id=obj_id,
-            user=request.user,
-        )
-        pdf_b64 = generate_manual_pdf_base64(estimate, request.user, request=request)
-        return Response({"pdf_base64": pdf_b64}, status=status.HTTP_200_OK)
+        if pdf_responses.wants_pdf(request):
+            return pdf_responses.pdf_file_response(request, pdf.file, pdf.size, pdf.key, filename)
+        return pdf_responses.base64_json_response(pdf, 'pdf_base64')
 
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def pdf_render_jobs(request):
+    """
+    Background PDF rendering (see pdf_jobs), so no web worker waits on a render.
+    POST: {"type": "project" | "project_report" | "manual", "id": ...} or
+          {"type": "manual_data", "data": {...}} queues a render and returns
+          the job (202); a "project" estimate also takes the customer_name /
+          contact / Location / transport of generate_estimatepdf.
+    GET: the user's 20 most recent jobs.
+    Poll the job's status_url (?wait=seconds to long-poll) and fetch its
+    download_url when the status is done.
+    """
+    if request.method == 'GET':
+        jobs = PdfRenderJob.objects.filter(user=request.user).order_by('-created_at')[:20]
+        return Response([pdf_jobs.describe_job(job, request) for job in jobs])
+
+    try:
+        job, created = pdf_jobs.queue_job(request.user, request.data, request.build_absolute_uri('/'))
+    except pdf_jobs.TooManyPdfJobs as e:
+        return Response({"error": str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    except pdf_jobs.PdfJobError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response = Response(pdf_jobs.describe_job(job, request), status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('pdf-render-job', args=[job.pk])
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def pdf_render_job(request, pk):
+    """
+    Status of a PDF job. ?wait=seconds holds the request until the job is done
+    or failed, for at most pdf_jobs.MAX_WAIT_SECONDS.
+    """
+    job = get_object_or_404(PdfRenderJob, pk=pk, user=request.user)
+    try:
+        wait = float(request.query_params.get('wait') or 0)
+    except ValueError:
+        return Response({"error": "wait must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+    if wait > 0:
+        job = pdf_jobs.wait_for_job(job, wait)
+    response = Response(pdf_jobs.describe_job(job, request))
+    if job.status not in pdf_jobs.FINISHED_STATUSES:
+        response['Retry-After'] = '2'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_pdf_render_job(request, pk):
+    """The rendered PDF (the ZIP of an export) of a done job, with ETag and Range support."""
+    job = get_object_or_404(PdfRenderJob, pk=pk, user=request.user)
+    if job.status != 'done':
+        return Response(
+            {"error": "The PDF is not ready yet." if job.status != 'failed' else f"The PDF could not be rendered: {job.error}", "status": job.status},
+            status=status.HTTP_409_CONFLICT,
+        )
+    try:
+        stored = default_storage.open(job.file_name, 'rb')
+    except FileNotFoundError:
+        raise Http404("The PDF is no longer available.")
+    extension, content_type = pdf_jobs.job_file_type(job)
+    # The file never changes once the job is done
+    return pdf_responses.pdf_file_response(
+        request, stored, job.file_size, f"{job.input_key[:16]}-{job.pk}",
+        f"{job.kind.replace('_', '-')}-{job.object_id or job.pk}.{extension}", content_type=content_type,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_estimate_pdfs(request):
+    """
+    Queues a ZIP of the user's estimate PDFs (see pdf_export) and returns the
+    job (202), as POST pdf/jobs/ does; fetch its download_url when the status
+    is done. ?from=&to= (estimate dates, YYYY-MM-DD), ?status= (projects
+    only), ?customer= (part of the name), ?type=project|manual.
+    """
+    try:
+        job, created = pdf_export.queue_export(request.user, request.query_params, request.build_absolute_uri('/'))
+    except pdf_export.NothingToExport as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except pdf_export.ExportError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except pdf_jobs.TooManyPdfJobs as e:
+        return Response({"error": str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response = Response(pdf_jobs.describe_job(job, request), status=status.HTTP_202_ACCEPTED)
+    response['Location'] = reverse('pdf-render-job', args=[job.pk])
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def pdf_cache_stats(request):
+    """Hit rate, render time saved and size of the rendered PDF cache (see pdf_cache)."""
+    return Response(pdf_cache.cache_stats())
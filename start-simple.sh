@@ -10,10 +10,39 @@ source /app/venv/bin/activate
 export PORT=${PORT:-8000}
 echo "Using PORT: $PORT"
 
+# Run database migrations (some also fill in new stored fields, e.g. manual estimate totals)
+echo "Running database migrations..."
+python manage.py migrate --noinput || echo "Migration failed, continuing..."
+
 # Basic Django check
 echo "Running Django system check..."
 python manage.py check || echo "Django check failed, continuing..."
 
+# Runs a long-lived management command in the background and starts it
+# again whenever it exits, so a crash does not silently stop the work it does
+supervise() {
+    local name="$1"
+    shift
+    while true; do
+        python manage.py "$@"
+        echo "$name exited with status $?; restarting in 5 seconds..."
+        sleep 5
+    done
+}
+
+# Render the queued PDF jobs (projects/pdf_jobs.py); without it every job stays pending
+echo "Starting PDF job worker..."
+supervise "PDF job worker" render_pdf_jobs --loop &
+
+# Process uploaded tile and supplier images (projects/image_pipeline.py)
+echo "Starting image worker..."
+supervise "Image worker" process_images --loop &
+
+# Start the warm PDF renderer pool next to Gunicorn (projects/pdf_pool.py);
+# while it is down the web workers render in-process (counted as pool_fallbacks)
+echo "Starting PDF renderer pool..."
+supervise "PDF renderer pool" pdf_render_pool --processes ${PDF_POOL_PROCESSES:-2} &
+
 # Start the application immediately
 echo "Starting Gunicorn server on port $PORT..."
 exec gunicorn tile_estimator.wsgi:application \
@@ -22,4 +51,4 @@ exec gunicorn tile_estimator.wsgi:application \
     --error-logfile - \
     --access-logfile - \
     --workers 1 \
-    --timeout 60
+    --timeout ${GUNICORN_TIMEOUT:-60}
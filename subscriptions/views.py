@@ -42,6 +42,7 @@ import logging # Import logging
 User = get_user_model()
 
 from accounts.models import  SubscriptionPlan, UserSubscription # Import your models
+from projects.fixed_point import to_pesewas, from_pesewas
 
 # --- Helper function for subscription logic ---
 from datetime import timedelta
@@ -129,10 +130,11 @@ def process_successful_payment(payment_record: PaymentTransaction, paystack_data
             print(f"[{reference}] Paystack data missing 'amount'. Cannot verify.")
             return False
 
-        received_amount_ghs = paystack_amount_pesewas / 100
+        # Paystack reports pesewas; compare as integers, not floats
+        received_amount_ghs = from_pesewas(int(paystack_amount_pesewas))
 
         # Compare with the amount you stored (which is in GHS)
-        if received_amount_ghs != float(payment_record.amount):
+        if int(paystack_amount_pesewas) != to_pesewas(payment_record.amount):
             print(f"[{reference}] Amount mismatch! Expected {payment_record.amount} GHS, received {received_amount_ghs} GHS.")
             payment_record.status = 'amount_mismatch' # Or 'failed_fraud_attempt'
             payment_record.gateway_response = f"Amount mismatch: Expected {payment_record.amount}, Received {received_amount_ghs}"
@@ -605,7 +607,7 @@ class VerifyPaystackPaymentAPIView(APIView):
 
             # Important: Verify currency and amount match
             # Paystack amount is in kobo/pesewas, convert to GHS for comparison
-            received_amount_ghs = paystack_amount_kobo / 100.0
+            received_amount_ghs = from_pesewas(int(paystack_amount_kobo or 0))
 
             # Use a database transaction to ensure atomicity
             # If any step fails, all changes are rolled back.
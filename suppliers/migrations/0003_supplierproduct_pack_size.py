@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suppliers', '0002_alter_supplier_options_alter_supplierproduct_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplierproduct',
+            name='pack_size',
+            field=models.DecimalField(blank=True, decimal_places=3, help_text="How much material one unit of this product covers, in the estimate's unit (bags for cement, wheelbarrows for sand, kg for grout). Used by the procurement optimizer.", max_digits=10, null=True),
+        ),
+    ]
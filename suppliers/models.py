@@ -1,6 +1,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.contrib.contenttypes.fields import GenericRelation
 
 class Supplier(models.Model):
     """Model for material suppliers"""
@@ -9,6 +10,7 @@ class Supplier(models.Model):
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to='supplier_logos/', null=True, blank=True)
     shop_image = models.ImageField(upload_to='supplier_shops/', null=True, blank=True)
+    processed_images = GenericRelation('projects.ProcessedImage')
     
     # Contact Information
     address = models.TextField()
@@ -95,9 +97,15 @@ class SupplierProduct(models.Model):
     # Additional product images
     image2 = models.ImageField(upload_to='supplier_products/', null=True, blank=True)
     image3 = models.ImageField(upload_to='supplier_products/', null=True, blank=True)
+    processed_images = GenericRelation('projects.ProcessedImage')
     
     unit = models.CharField(max_length=50, choices=UNIT_CHOICES)
     category = models.CharField(max_length=100, choices=CATEGORY_CHOICES)
+    pack_size = models.DecimalField(
+        max_digits=10, decimal_places=3, null=True, blank=True,
+        help_text="How much material one unit of this product covers, in the estimate's unit "
+                  "(bags for cement, wheelbarrows for sand, kg for grout). Used by the procurement optimizer."
+    )
     
     # Stock Management
     in_stock = models.BooleanField(default=True)
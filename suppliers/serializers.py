@@ -1,23 +1,32 @@
 
 from rest_framework import serializers
+from projects.image_pipeline import image_variants
 from .models import Supplier, SupplierProduct, Order, OrderItem, SupplierReview
 
 class SupplierProductSerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     discounted_price = serializers.ReadOnlyField()
     is_low_stock = serializers.ReadOnlyField()
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = SupplierProduct
         fields = '__all__'
 
+    def get_image_variants(self, obj):
+        return image_variants(obj)
+
 class SupplierSerializer(serializers.ModelSerializer):
     products_count = serializers.SerializerMethodField()
     active_products_count = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Supplier
         fields = '__all__'
+
+    def get_image_variants(self, obj):
+        return image_variants(obj)
     
     def get_products_count(self, obj):
         return obj.products.count()
@@ -27,11 +36,15 @@ class SupplierSerializer(serializers.ModelSerializer):
 
 class SupplierDetailSerializer(serializers.ModelSerializer):
     products = SupplierProductSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Supplier
         fields = '__all__'
 
+    def get_image_variants(self, obj):
+        return image_variants(obj)
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     
@@ -129,11 +142,15 @@ class ProductDashboardSerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     discounted_price = serializers.ReadOnlyField()
     is_low_stock = serializers.ReadOnlyField()
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = SupplierProduct
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
+
+    def get_image_variants(self, obj):
+        return image_variants(obj)
     
     def validate_supplier(self, value):
         """Ensure user can only manage their own supplier's products"""
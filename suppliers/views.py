@@ -7,6 +7,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from django.db.models import Avg, Count, Sum, F
 from django.db import models
+from projects.image_pipeline import queue_uploaded_images
 from .models import Supplier, SupplierProduct, Order, SupplierReview
 from .serializers import (
     SupplierSerializer, SupplierDetailSerializer, SupplierProductSerializer,
@@ -16,7 +17,7 @@ from .serializers import (
 
 class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint for viewing suppliers"""
-    queryset = Supplier.objects.filter(is_active=True)
+    queryset = Supplier.objects.filter(is_active=True).prefetch_related('processed_images')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['city', 'region', 'is_verified']
     search_fields = ['name', 'description', 'city', 'address']
@@ -26,6 +27,12 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
         if self.action == 'retrieve':
             return SupplierDetailSerializer
         return SupplierSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('products__processed_images')
+        return queryset
     
     def get_permissions(self):
         """Anyone can view suppliers"""
@@ -35,7 +42,7 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
     def products(self, request, pk=None):
         """Get products for a specific supplier"""
         supplier = self.get_object()
-        products = supplier.products.filter(in_stock=True)
+        products = supplier.products.filter(in_stock=True).prefetch_related('processed_images')
         serializer = SupplierProductSerializer(products, many=True)
         return Response(serializer.data)
     
@@ -49,7 +56,7 @@ class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
 
 class SupplierProductViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint for viewing supplier products"""
-    queryset = SupplierProduct.objects.filter(in_stock=True)
+    queryset = SupplierProduct.objects.filter(in_stock=True).prefetch_related('processed_images')
     serializer_class = SupplierProductSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['supplier', 'category', 'in_stock']
@@ -106,7 +113,12 @@ class SupplierDashboardViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Associate supplier with the authenticated user"""
-        serializer.save(dashboard_user=self.request.user)
+        supplier = serializer.save(dashboard_user=self.request.user)
+        queue_uploaded_images(supplier, self.request.FILES)
+
+    def perform_update(self, serializer):
+        supplier = serializer.save()
+        queue_uploaded_images(supplier, self.request.FILES)
     
     @action(detail=True, methods=['get'])
     def dashboard_stats(self, request, pk=None):
@@ -145,15 +157,20 @@ class ProductDashboardViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Only show products for the supplier owned by authenticated user"""
         if hasattr(self.request.user, 'supplier_dashboard'):
-            return SupplierProduct.objects.filter(supplier=self.request.user.supplier_dashboard)
+            return SupplierProduct.objects.filter(supplier=self.request.user.supplier_dashboard).prefetch_related('processed_images')
         return SupplierProduct.objects.none()
     
     def perform_create(self, serializer):
         """Associate product with user's supplier"""
         if hasattr(self.request.user, 'supplier_dashboard'):
-            serializer.save(supplier=self.request.user.supplier_dashboard)
+            product = serializer.save(supplier=self.request.user.supplier_dashboard)
+            queue_uploaded_images(product, self.request.FILES)
         else:
             raise serializers.ValidationError("User does not have a supplier dashboard.")
+
+    def perform_update(self, serializer):
+        product = serializer.save()
+        queue_uploaded_images(product, self.request.FILES)
     
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
@@ -275,7 +292,8 @@ def create_supplier_account(request):
     
     serializer = SupplierDashboardSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        serializer.save(dashboard_user=request.user)
+        supplier = serializer.save(dashboard_user=request.user)
+        queue_uploaded_images(supplier, request.FILES)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 @api_view(['POST'])
@@ -286,6 +304,7 @@ def register_supplier(request):
     if serializer.is_valid():
         # Create supplier without dashboard_user initially
         supplier = serializer.save(is_verified=False, is_active=True)
+        queue_uploaded_images(supplier, request.FILES)
         return Response({
             "detail": "Supplier registered successfully. Please contact admin for verification.",
             "supplier": serializer.data
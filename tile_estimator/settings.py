@@ -421,6 +421,10 @@ CACHES = {
     }
 }
 
+# Seconds gunicorn gives a request before it kills the worker (start-simple.sh
+# passes the same variable); the synchronous PDF render timeouts fit inside it
+GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+
 LOGGING = {
     "version": 1,
     "handlers": {